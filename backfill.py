@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多日期补采：按日期范围补齐 data/solar_data_<日期>.json 与 screenshots/<日期>/
+
+每个系统只登录一次，并在同一会话中依次采集所有日期；三个系统之间并行执行。
+采集完成后逐日合并保存，最后统一更新一次日期导航。
+"""
+
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from date_utils import iter_dates, format_date, days_before_today
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+
+def find_missing_dates(start_date, end_date, data_dir='data'):
+    """返回日期范围内 data/ 下尚无 solar_data_<日期>.json 的日期"""
+    return [
+        d for d in iter_dates(start_date, end_date)
+        if not os.path.exists(os.path.join(data_dir, f'solar_data_{d}.json'))
+    ]
+
+
+class BackfillRunner:
+    """按 (系统, 电站, 日期) 组织补采任务，每个系统复用一个登录会话"""
+
+    def __init__(self, updater, dates, max_workers=3):
+        self.updater = updater
+        # 今天及以后的日期没有完整数据，直接跳过
+        self.dates = sorted({format_date(d) for d in dates if days_before_today(d) >= 1})
+        self.max_workers = max_workers
+
+    def screenshots_dir_for_date(self, date_str):
+        """返回指定日期的截图目录"""
+        return os.path.join(self.updater.base_screenshots_dir, date_str)
+
+    def plan_jobs(self):
+        """列出全部 (系统, 电站, 日期) 任务，便于日志与排查"""
+        config = self.updater.get_project_config()
+        jobs = []
+        for date_str in self.dates:
+            for project in config['huawei']['projects']:
+                jobs.append(('huawei', project['id'], date_str))
+            for pid in config['sems']['projects']:
+                jobs.append(('sems', str(pid), date_str))
+            for pid in config['esolar']['projects']:
+                jobs.append(('esolar', str(pid), date_str))
+        return jobs
+
+    def backfill_huawei(self):
+        """华为：优先用令牌管理器保存的会话请求接口（不启动浏览器）；
+        仍缺数据的日期一次登录，每个电站导航一次，按日期向前翻页"""
+        from huawei_scraper import HuaweiFusionSolarScraper
+        config = self.updater.get_project_config()['huawei']
+        if not (config['username'] and config['password']):
+            logger.warning('华为系统的用户名或密码为空，跳过华为补采')
+            return {}
+        all_results = self.updater.fetch_huawei_via_api(self.dates)
+        pending = [d for d in self.dates if len(all_results.get(d, {})) < len(config['projects'])]
+        if pending:
+            with HuaweiFusionSolarScraper(
+                config['username'],
+                config['password'],
+                config['projects'],
+                screenshots_dir=self.screenshots_dir_for_date(pending[-1]),
+                target_date=pending[-1],
+                deadline=self.updater.get_source_deadline('huawei')
+            ) as scraper:
+                for date_str, results in scraper.run_dates(pending, self.screenshots_dir_for_date).items():
+                    all_results.setdefault(date_str, {}).update(results)
+        for date_str, results in all_results.items():
+            self.updater.crop_huawei_screenshots(results, self.screenshots_dir_for_date(date_str))
+        return all_results
+
+    def backfill_sems(self):
+        """SEMS：优先用令牌管理器提供的token并发请求接口（token可刷新时不启动浏览器）；
+        其余日期一次登录，先用登录后的token请求接口，仍缺的日期逐日回到电站页翻页截图并OCR"""
+        import sems_combined_tool
+        config = self.updater.get_project_config()['sems']
+        if not (config['username'] and config['password']):
+            logger.warning('SEMS系统的用户名或密码为空，跳过SEMS补采')
+            return {}
+        outputs = {}
+
+        def record_api_results(api_results):
+            for date_str, results in api_results.items():
+                outputs[date_str] = {'sems_data': {}, 'ocr_id5_generation': None, 'api_results': results}
+                logger.info(f"SEMS补采 {date_str}: 接口发电量={(results.get('5') or {}).get('daily_generation')}")
+
+        record_api_results(self.updater.fetch_sems_via_api(self.dates))
+        pending = [d for d in self.dates if d not in outputs]
+        if not pending:
+            return outputs
+        with sems_combined_tool.SEMSScreenshotTool(
+            config['username'],
+            config['password'],
+            screenshots_dir=self.screenshots_dir_for_date(pending[-1]),
+            target_date=pending[-1],
+            deadline=self.updater.get_source_deadline('sems')
+        ) as sems_tool:
+            if not sems_tool.login():
+                logger.warning('SEMS系统登录失败，跳过SEMS补采')
+                return outputs
+            record_api_results(sems_tool.fetch_via_api(pending))
+            for date_str in sorted((d for d in pending if d not in outputs), reverse=True):
+                screenshot_path = sems_tool.capture_date(date_str, self.screenshots_dir_for_date(date_str))
+                ocr_value = None
+                if screenshot_path:
+                    ocr_value = self.updater.extract_daily_generation_from_image(screenshot_path)
+                outputs[date_str] = {
+                    'sems_data': sems_tool.extract_power_data_from_api_responses(),
+                    'ocr_id5_generation': ocr_value
+                }
+                logger.info(f'SEMS补采 {date_str}: OCR发电量={ocr_value}')
+        return outputs
+
+    def backfill_esolar(self):
+        """ESolar：一次登录，逐日回到首页翻页并读取月视图"""
+        import esolar_scraper
+        config = self.updater.get_project_config()['esolar']
+        if not (config['username'] and config['password']):
+            logger.warning('ESolar系统的用户名或密码为空，跳过ESolar补采')
+            return {}
+        outputs = {}
+        with esolar_scraper.ESolarScraper(
+            config['username'],
+            config['password'],
+            screenshots_dir=self.screenshots_dir_for_date(self.dates[-1]),
+            target_date=self.dates[-1],
+            deadline=self.updater.get_source_deadline('esolar')
+        ) as scraper:
+            if not scraper.login():
+                logger.error('ESolar系统登录失败，跳过ESolar补采')
+                return {}
+            values = scraper.collect_dates(self.dates, self.screenshots_dir_for_date)
+            for date_str, dg in values.items():
+                outputs[date_str] = {
+                    "6": {
+                        "name": scraper.project_names.get(6, '零碳商业园'),
+                        "dcCapacity": scraper.project_capacities.get(6, {}).get('dcCapacity', 0),
+                        "acCapacity": scraper.project_capacities.get(6, {}).get('acCapacity', 0),
+                        "dailyGeneration": dg
+                    }
+                }
+        return outputs
+
+    def run(self):
+        """执行补采，返回成功保存的日期列表"""
+        if not self.dates:
+            logger.info('没有需要补采的日期')
+            return []
+        jobs = self.plan_jobs()
+        logger.info(f"开始补采 {self.dates[0]} ~ {self.dates[-1]}，共 {len(self.dates)} 天、{len(jobs)} 个任务")
+
+        runners = {
+            'huawei': self.backfill_huawei,
+            'sems': self.backfill_sems,
+            'esolar': self.backfill_esolar
+        }
+        outputs = {}
+        # 三个系统各自使用独立浏览器，可以并行；同一系统内的日期共享会话，顺序执行
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {name: executor.submit(runner) for name, runner in runners.items()}
+            for name, future in futures.items():
+                try:
+                    outputs[name] = future.result() or {}
+                except Exception as e:
+                    logger.error(f"{name} 补采出错: {str(e)}")
+                    outputs[name] = {}
+
+        yesterday = format_date(None)
+        saved = []
+        original_date = self.updater.target_date
+        original_update_default = self.updater.update_default_data_file
+        try:
+            for date_str in self.dates:
+                self.updater.set_target_date(date_str)
+                # 只有昨天的数据才覆盖默认文件solar_data.json
+                self.updater.update_default_data_file = (date_str == yesterday)
+                sems_output = outputs['sems'].get(date_str) or {}
+                if self.updater.merge_and_save(
+                    outputs['huawei'].get(date_str) or {},
+                    sems_output.get('sems_data') or {},
+                    outputs['esolar'].get(date_str) or {},
+                    sems_output.get('ocr_id5_generation'),
+                    update_navigation=False,
+                    sems_results=sems_output.get('api_results')
+                ):
+                    saved.append(date_str)
+        finally:
+            self.updater.set_target_date(original_date)
+            self.updater.update_default_data_file = original_update_default
+
+        logger.info(f"补采完成: 成功 {len(saved)}/{len(self.dates)} 天")
+        return saved
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+持久化浏览器配置目录：按系统保留 --user-data-dir，使HTTP缓存与编译代码缓存跨运行保留
+
+三个系统的前端都是体积较大的单页应用，空配置目录每次都要重新下载、解析全部脚本。
+启用后每个系统使用固定的配置目录（.browser_profiles/<系统>/）：
+- 加锁：配置目录同一时间只能被一个浏览器进程使用，锁被占用时本次退回临时配置目录
+- 损坏检测：Local State、Preferences 无法解析时清空配置目录重新开始
+- 容量上限：超出上限时先清理缓存目录，仍超出则清空整个配置目录
+
+设置 SOLAR_BROWSER_PROFILES=1 启用；SOLAR_BROWSER_PROFILE_DIR 指定根目录，
+SOLAR_BROWSER_PROFILE_MAX_MB 指定每个配置目录的容量上限（默认500MB）。
+配置目录中包含cookie，不要提交到仓库。
+"""
+
+import os
+import json
+import time
+import shutil
+import socket
+import logging
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_MB = 500
+
+# 无法判断持有进程是否存活时（Windows），超过该时长的锁视为遗留
+STALE_LOCK_SECONDS = 6 * 3600
+
+# 超出容量上限时优先清理的缓存目录（相对于配置目录）
+CACHE_DIRS = [
+    os.path.join('Default', 'Cache'),
+    os.path.join('Default', 'Code Cache'),
+    os.path.join('Default', 'GPUCache'),
+    os.path.join('Default', 'Service Worker', 'CacheStorage'),
+    os.path.join('Default', 'Service Worker', 'ScriptCache'),
+    'GrShaderCache',
+    'ShaderCache'
+]
+
+# 浏览器异常退出后遗留、会阻止下次启动的单实例锁文件
+SINGLETON_FILES = ['SingletonLock', 'SingletonSocket', 'SingletonCookie']
+
+# 必须能解析为JSON的文件，否则视为配置目录损坏
+JSON_FILES = ['Local State', os.path.join('Default', 'Preferences')]
+
+
+def profiles_enabled():
+    return os.environ.get('SOLAR_BROWSER_PROFILES', '0') in ('1', 'true', 'yes')
+
+
+def profiles_root():
+    return os.environ.get('SOLAR_BROWSER_PROFILE_DIR', '.browser_profiles')
+
+
+def max_profile_bytes():
+    try:
+        return int(float(os.environ.get('SOLAR_BROWSER_PROFILE_MAX_MB', DEFAULT_MAX_MB)) * 1024 * 1024)
+    except ValueError:
+        return DEFAULT_MAX_MB * 1024 * 1024
+
+
+def directory_size(path):
+    total = 0
+    for directory, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(directory, name))
+            except OSError:
+                pass
+    return total
+
+
+def _process_alive(pid):
+    if os.name == 'nt':
+        return None
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+class BrowserProfile:
+    """一个系统的持久化配置目录"""
+
+    def __init__(self, name, root=None, max_bytes=None):
+        self.name = name
+        self.root = root or profiles_root()
+        self.path = os.path.abspath(os.path.join(self.root, name))
+        self.lock_path = os.path.join(self.root, f'{name}.lock')
+        self.max_bytes = max_bytes if max_bytes is not None else max_profile_bytes()
+        self.locked = False
+
+    def _lock_is_stale(self):
+        try:
+            with open(self.lock_path, 'r', encoding='utf-8') as f:
+                owner = json.load(f)
+        except (OSError, ValueError):
+            return True
+        if owner.get('host') != socket.gethostname():
+            return False
+        alive = _process_alive(owner.get('pid', 0))
+        if alive is None:
+            return time.time() - owner.get('locked_at', 0) > STALE_LOCK_SECONDS
+        return not alive
+
+    def acquire(self):
+        """加锁，成功返回True；配置目录正被其他浏览器进程使用时返回False"""
+        os.makedirs(self.root, exist_ok=True)
+        for _ in range(2):
+            try:
+                fd = os.open(self.lock_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            except FileExistsError:
+                if not self._lock_is_stale():
+                    return False
+                logger.info(f"{self.name} 配置目录的锁已遗留，清除")
+                try:
+                    os.remove(self.lock_path)
+                except OSError:
+                    pass
+                continue
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'pid': os.getpid(), 'host': socket.gethostname(), 'locked_at': time.time()}, f)
+            self.locked = True
+            return True
+        return False
+
+    def release(self):
+        """解锁，并在浏览器退出后检查容量上限"""
+        if not self.locked:
+            return
+        self.enforce_size_cap()
+        try:
+            os.remove(self.lock_path)
+        except OSError:
+            pass
+        self.locked = False
+
+    def is_corrupt(self):
+        """关键的JSON文件无法解析时返回原因，正常时返回None"""
+        for relative in JSON_FILES:
+            path = os.path.join(self.path, relative)
+            if not os.path.exists(path):
+                continue
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    json.load(f)
+            except (OSError, ValueError) as e:
+                return f"{relative} 无法解析: {str(e)}"
+        return None
+
+    def reset(self):
+        """清空配置目录"""
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def _remove_singleton_files(self):
+        # 持有锁时不可能有其他浏览器在使用该目录，遗留的单实例锁文件可以安全删除
+        for name in SINGLETON_FILES:
+            path = os.path.join(self.path, name)
+            if os.path.lexists(path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def enforce_size_cap(self):
+        """超出容量上限时先清理缓存目录，仍超出则清空配置目录；返回清理后的大小"""
+        size = directory_size(self.path)
+        if size <= self.max_bytes:
+            return size
+        logger.info(f"{self.name} 配置目录 {size / 1024 / 1024:.0f} MB 超出上限 "
+                    f"{self.max_bytes / 1024 / 1024:.0f} MB，清理缓存")
+        for relative in CACHE_DIRS:
+            shutil.rmtree(os.path.join(self.path, relative), ignore_errors=True)
+        size = directory_size(self.path)
+        if size > self.max_bytes:
+            logger.info(f"{self.name} 清理缓存后仍有 {size / 1024 / 1024:.0f} MB，清空配置目录")
+            self.reset()
+            size = 0
+        return size
+
+    def prepare(self):
+        """启动浏览器前调用：加锁、检查损坏与容量，返回配置目录路径；无法使用时返回None"""
+        if not self.acquire():
+            logger.info(f"{self.name} 配置目录正被其他浏览器使用，本次使用临时配置目录")
+            return None
+        reason = self.is_corrupt()
+        if reason:
+            logger.warning(f"{self.name} 配置目录已损坏（{reason}），清空后重新创建")
+            self.reset()
+        else:
+            self.enforce_size_cap()
+        self._remove_singleton_files()
+        os.makedirs(self.path, exist_ok=True)
+        return self.path
+
+
+def open_profile(name):
+    """启用持久化配置目录时返回已加锁的BrowserProfile，否则返回None"""
+    if not profiles_enabled() or not name:
+        return None
+    profile = BrowserProfile(name)
+    if profile.prepare() is None:
+        return None
+    return profile
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+采集检查点：按目标日期保存各数据源（华为、SEMS、ESolar、天气）的中间结果
+
+检查点保存在 data/checkpoints/<日期>/<数据源>.json。使用 --resume 运行时，
+只重新执行检查点缺失或无效的数据源，其余直接复用，然后再合并保存。
+"""
+
+import os
+import json
+import logging
+from datetime import datetime
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def validate_huawei(payload):
+    """华为结果有效：每个项目都提取到了发电量"""
+    if not isinstance(payload, dict) or not payload:
+        return False
+    return all(isinstance(v, dict) and _is_number(v.get('daily_generation')) for v in payload.values())
+
+
+def validate_sems(payload):
+    """SEMS结果有效：接口返回或OCR识别到项目5发电量"""
+    if not isinstance(payload, dict):
+        return False
+    api_result = (payload.get('api_results') or {}).get('5')
+    if isinstance(api_result, dict) and _is_number(api_result.get('daily_generation')):
+        return True
+    return _is_number(payload.get('ocr_id5_generation'))
+
+
+def validate_esolar(payload):
+    """ESolar结果有效：项目6有发电量"""
+    if not isinstance(payload, dict) or not payload:
+        return False
+    return all(isinstance(v, dict) and _is_number(v.get('dailyGeneration')) for v in payload.values())
+
+
+def validate_weather(payload):
+    """天气结果有效：包含温度与天气描述"""
+    return isinstance(payload, dict) and _is_number(payload.get('temperature')) and bool(payload.get('weather_description'))
+
+
+VALIDATORS = {
+    'huawei': validate_huawei,
+    'sems': validate_sems,
+    'esolar': validate_esolar,
+    'weather': validate_weather
+}
+
+
+class CheckpointStore:
+    """单个目标日期的检查点目录"""
+
+    def __init__(self, target_date, base_dir='data'):
+        self.target_date = target_date
+        self.checkpoint_dir = os.path.join(base_dir, 'checkpoints', target_date)
+
+    def path_for(self, source):
+        return os.path.join(self.checkpoint_dir, f'{source}.json')
+
+    def save(self, source, payload):
+        """保存数据源结果（先写临时文件再替换，避免中断时留下半个文件）"""
+        try:
+            os.makedirs(self.checkpoint_dir, exist_ok=True)
+            path = self.path_for(source)
+            tmp_path = path + '.tmp'
+            record = {
+                'source': source,
+                'date': self.target_date,
+                'saved_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'valid': self.is_valid(source, payload),
+                'payload': payload
+            }
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(record, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, path)
+            logger.info(f"检查点已保存: {path} (valid={record['valid']})")
+            return True
+        except Exception as e:
+            logger.warning(f"保存检查点 {source} 失败: {str(e)}")
+            return False
+
+    def load(self, source):
+        """读取数据源结果；文件缺失、损坏或内容无效时返回None"""
+        path = self.path_for(source)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                record = json.load(f)
+        except Exception as e:
+            logger.warning(f"检查点 {path} 无法读取: {str(e)}")
+            return None
+        payload = record.get('payload') if isinstance(record, dict) else None
+        if not self.is_valid(source, payload):
+            logger.info(f"检查点 {path} 内容无效，需要重新采集")
+            return None
+        return payload
+
+    def is_valid(self, source, payload):
+        validator = VALIDATORS.get(source)
+        if validator is None:
+            return payload is not None
+        try:
+            return bool(validator(payload))
+        except Exception:
+            return False
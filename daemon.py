@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+常驻模式入口：保持三个系统的已登录浏览器会话，并按内置定时计划每日更新仪表盘
+
+与 main.py（每次冷启动、登录三次）不同，常驻进程只在首次运行或会话失效时登录；
+两次运行之间定期检查会话（ensure_driver_alive + 回到登录后首页），
+失效时标记为未登录，下次运行再重新登录；浏览器无响应或内存超限时由驱动看门狗回收重建并恢复登录。
+SEMS token与华为会话由令牌管理器（token_manager）在后台线程中到期前刷新，更新时接口可直接使用。
+
+用法:
+    python daemon.py --at 06:30
+    python daemon.py --at 06:30 --run-now
+    python daemon.py --at 06:30 --sample-interval 15 --sample-window 05:00-20:00
+"""
+
+import os
+import sys
+import time
+import signal
+import logging
+import argparse
+import threading
+from datetime import datetime, timedelta
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+class WarmSessionManager:
+    """管理各系统常驻的爬虫实例（浏览器 + 登录状态）"""
+
+    def __init__(self):
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    def is_alive(self, instance):
+        checker = getattr(instance, 'ensure_driver_alive', None)
+        if checker is None:
+            return getattr(instance, 'driver', None) is not None
+        try:
+            return bool(checker())
+        except Exception:
+            return False
+
+    def revalidate(self, source, instance):
+        """回到登录后的首页，确认会话仍处于登录状态；失效时标记为未登录"""
+        home_url = getattr(instance, 'home_url', None)
+        if not getattr(instance, 'logged_in', False) or not home_url:
+            instance.logged_in = False
+            return False
+        from readiness import wait_for_page_ready
+        try:
+            instance.driver.switch_to.default_content()
+            governor = getattr(instance, 'governor', None)
+            if governor is not None:
+                governor.throttle()
+            instance.driver.get(home_url)
+            wait_for_page_ready(instance.driver, budget=3, label=f'{source}会话检查')
+            current_url = (instance.driver.current_url or '').lower()
+            if 'login' in current_url:
+                logger.info(f"{source} 会话已失效（被重定向到登录页），下次运行时重新登录")
+                instance.logged_in = False
+                return False
+            return True
+        except Exception as e:
+            logger.warning(f"{source} 会话检查失败: {str(e)}")
+            instance.logged_in = False
+            return False
+
+    def reset_run_state(self, instance):
+        """清理上一次运行遗留的状态"""
+        if hasattr(instance, 'api_responses'):
+            instance.api_responses = []
+        if hasattr(instance, 'extracted_daily_generation'):
+            instance.extracted_daily_generation = None
+        if hasattr(instance, 'current_day_offset'):
+            instance.current_day_offset = 0
+        if getattr(instance, 'watchdog', None) is not None:
+            # 回收次数上限按每次运行计算
+            instance.watchdog.recycles = 0
+
+    def acquire(self, source, factory, **attrs):
+        """返回可用的爬虫实例：浏览器失效时重建，会话失效时标记为需要重新登录"""
+        with self.lock:
+            instance = self.sessions.get(source)
+            if instance is not None and not self.is_alive(instance):
+                logger.info(f"{source} 浏览器已失效，重新启动")
+                self.close(source)
+                instance = None
+            if instance is None:
+                instance = factory()
+                instance.__enter__()
+                self.sessions[source] = instance
+                logger.info(f"{source} 已启动新的常驻浏览器")
+            else:
+                for key, value in attrs.items():
+                    setattr(instance, key, value)
+                if attrs.get('screenshots_dir'):
+                    os.makedirs(attrs['screenshots_dir'], exist_ok=True)
+                self.reset_run_state(instance)
+                if self.revalidate(source, instance):
+                    logger.info(f"{source} 复用已登录的常驻会话")
+            return instance
+
+    def keepalive(self):
+        """定期检查所有会话，保持页面活跃"""
+        with self.lock:
+            for source, instance in list(self.sessions.items()):
+                watchdog = getattr(instance, 'watchdog', None)
+                if watchdog is not None:
+                    # 长时间运行后内存增长或渲染进程卡死时回收重建，避免下次运行时整个数据源失败
+                    watchdog.check('常驻保活', force=True)
+                if not self.is_alive(instance):
+                    logger.info(f"{source} 浏览器已失效，下次运行时重建")
+                    self.close(source)
+                elif getattr(instance, 'logged_in', False):
+                    self.revalidate(source, instance)
+
+    def close(self, source):
+        instance = self.sessions.pop(source, None)
+        if instance is None:
+            return
+        try:
+            instance.__exit__(None, None, None)
+        except Exception as e:
+            logger.warning(f"关闭 {source} 浏览器时出错: {str(e)}")
+
+    def close_all(self):
+        for source in list(self.sessions.keys()):
+            self.close(source)
+
+
+def next_run_time(at, now=None):
+    """计算下一次执行时间（at为 'HH:MM'）"""
+    now = now or datetime.now()
+    hour, minute = [int(x) for x in at.split(':', 1)]
+    candidate = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if candidate <= now:
+        candidate += timedelta(days=1)
+    return candidate
+
+
+def parse_time_window(window):
+    """解析 'HH:MM-HH:MM' 形式的时段，返回 ((时, 分), (时, 分))"""
+    start, end = window.split('-', 1)
+    return tuple(tuple(int(x) for x in part.strip().split(':', 1)) for part in (start, end))
+
+
+def in_time_window(window, now=None):
+    """当前时间是否在时段内（含起止）"""
+    now = now or datetime.now()
+    start, end = window
+    return start <= (now.hour, now.minute) <= end
+
+
+class DashboardDaemon:
+    """常驻进程：内置每日定时计划 + 会话保活"""
+
+    def __init__(self, at='06:30', keepalive_minutes=20, run_budget=None, source_budgets=None, stage_workers=4,
+                 sample_interval=None, sample_window='05:00-20:00'):
+        self.at = at
+        self.sample_seconds = int(sample_interval * 60) if sample_interval else None
+        self.sample_window = parse_time_window(sample_window)
+        self.keepalive_seconds = max(60, int(keepalive_minutes * 60))
+        self.last_keepalive = time.time()
+        self.run_budget = run_budget
+        self.source_budgets = source_budgets
+        self.stage_workers = stage_workers
+        self.sessions = WarmSessionManager()
+        self.token_managers = []
+        self.stop_event = threading.Event()
+
+    def run_once(self):
+        """执行一次仪表盘更新（目标日期为昨天）"""
+        from update_solar_dashboard import create_updater_from_env
+        started = time.time()
+        try:
+            updater = create_updater_from_env(run_budget=self.run_budget, source_budgets=self.source_budgets)
+            updater.session_manager = self.sessions
+            # 常驻浏览器在本进程内，不能使用独立进程的并发模式
+            ok = updater.update_dashboard(concurrent=False, max_workers=self.stage_workers)
+            logger.info(f"本次更新{'成功' if ok else '失败'}，耗时 {time.time() - started:.1f} 秒")
+            return ok
+        except Exception as e:
+            logger.error(f"本次更新出错: {str(e)}")
+            return False
+
+    def sample_once(self):
+        """在采样时段内用常驻会话采集一次各电站当前功率"""
+        if not in_time_window(self.sample_window):
+            return None
+        from update_solar_dashboard import create_updater_from_env
+        from power_sampler import PowerSampler
+        try:
+            updater = create_updater_from_env()
+            return PowerSampler(self.sessions, updater).sample_once()
+        except Exception as e:
+            logger.error(f"功率采样出错: {str(e)}")
+            return None
+
+    def tick(self):
+        """两次更新之间的周期性任务：开启采样时采样（同时起到保活作用），否则保活"""
+        if self.sample_seconds and in_time_window(self.sample_window):
+            self.sample_once()
+        elif time.time() - self.last_keepalive >= self.keepalive_seconds - 1:
+            self.sessions.keepalive()
+            self.last_keepalive = time.time()
+
+    def start_token_refresh(self):
+        """启动SEMS与华为接口令牌的后台刷新（只刷新已保存的令牌，不打开浏览器）"""
+        from update_solar_dashboard import create_updater_from_env
+        import sems_api
+        import fusionsolar_api
+        try:
+            config = create_updater_from_env().get_project_config()
+        except Exception as e:
+            logger.warning(f"读取账号配置失败，不启动令牌后台刷新: {str(e)}")
+            return
+        for source, module in (('huawei', fusionsolar_api), ('sems', sems_api)):
+            if config[source]['username'] and config[source]['password']:
+                self.token_managers.append(module.token_manager(config[source]['username'], config[source]['password']).start())
+
+    def stop(self, *_):
+        logger.info("收到停止信号，准备退出常驻进程")
+        self.stop_event.set()
+
+    def serve(self, run_now=False):
+        """主循环：到点执行更新，其余时间定期保活"""
+        try:
+            self.start_token_refresh()
+            if run_now:
+                self.run_once()
+            while not self.stop_event.is_set():
+                target = next_run_time(self.at)
+                logger.info(f"下一次更新时间: {target.strftime('%Y-%m-%d %H:%M')}")
+                while not self.stop_event.is_set():
+                    remaining = (target - datetime.now()).total_seconds()
+                    if remaining <= 0:
+                        break
+                    interval = self.keepalive_seconds
+                    if self.sample_seconds:
+                        interval = min(interval, self.sample_seconds)
+                    if self.stop_event.wait(min(remaining, interval)):
+                        break
+                    if (target - datetime.now()).total_seconds() > 0:
+                        self.tick()
+                if self.stop_event.is_set():
+                    break
+                self.run_once()
+        finally:
+            for manager in self.token_managers:
+                manager.stop()
+            self.sessions.close_all()
+            logger.info("常驻进程已退出，浏览器已全部关闭")
+
+
+def main(argv=None):
+    from run_budget import parse_budget_specs
+    parser = argparse.ArgumentParser(description='太阳能仪表盘常驻更新进程')
+    parser.add_argument('--at', default=os.environ.get('SOLAR_DAEMON_AT', '06:30'), help='每日执行时间（HH:MM，本地时间）')
+    parser.add_argument('--keepalive-minutes', type=float, default=20, help='会话保活检查间隔（分钟）')
+    parser.add_argument('--run-now', action='store_true', help='启动后立即执行一次更新')
+    parser.add_argument('--run-budget', type=float, default=None, help='每次更新的时间预算（秒）')
+    parser.add_argument('--source-budget', action='append', default=[], metavar='系统=秒数', help='单个系统的时间预算')
+    parser.add_argument('--stage-workers', type=int, default=4, help='同时执行的阶段数')
+    parser.add_argument('--sample-interval', type=float, default=None, help='日内功率采样间隔（分钟），不设置则不采样')
+    parser.add_argument('--sample-window', default='05:00-20:00', help='功率采样时段（HH:MM-HH:MM）')
+    args = parser.parse_args(argv)
+
+    daemon = DashboardDaemon(
+        at=args.at,
+        keepalive_minutes=args.keepalive_minutes,
+        run_budget=args.run_budget,
+        source_budgets=parse_budget_specs(args.source_budget),
+        stage_workers=args.stage_workers,
+        sample_interval=args.sample_interval,
+        sample_window=args.sample_window
+    )
+    signal.signal(signal.SIGTERM, daemon.stop)
+    signal.signal(signal.SIGINT, daemon.stop)
+    daemon.serve(run_now=args.run_now)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+日期工具：目标日期解析、与今天的天数差、日期范围展开
+"""
+
+from datetime import datetime, date, timedelta
+
+
+def parse_date(value):
+    """将 'YYYY-MM-DD' 字符串、datetime 或 date 统一转换为 date；None 表示昨天"""
+    if value is None:
+        return date.today() - timedelta(days=1)
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value).strip(), '%Y-%m-%d').date()
+
+
+def format_date(value):
+    """格式化为 'YYYY-MM-DD'"""
+    return parse_date(value).strftime('%Y-%m-%d')
+
+
+def days_before_today(value):
+    """目标日期距今天的天数（昨天为1）"""
+    return (date.today() - parse_date(value)).days
+
+
+def months_before_current(value):
+    """目标日期所在月份距当前月份的月数（本月为0）"""
+    target = parse_date(value)
+    today = date.today()
+    return (today.year - target.year) * 12 + (today.month - target.month)
+
+
+def iter_dates(start, end):
+    """按时间顺序展开 [start, end] 闭区间内的日期字符串"""
+    current = parse_date(start)
+    last = parse_date(end)
+    if current > last:
+        current, last = last, current
+    while current <= last:
+        yield current.strftime('%Y-%m-%d')
+        current += timedelta(days=1)
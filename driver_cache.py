@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+浏览器驱动路径缓存：只在浏览器主版本变化时联网解析驱动
+
+首次启动时记录浏览器版本与 webdriver-manager 解析出的驱动路径，之后的启动离线读取
+浏览器版本（执行 --version 或读取 Windows 注册表），主版本未变且驱动文件仍存在时直接使用缓存路径，
+不再每次启动都做远程版本查询。联网解析失败时退回仍存在的旧驱动。
+
+缓存文件默认为 .driver_cache/drivers.json，可用 SOLAR_DRIVER_CACHE 指定。
+"""
+
+import os
+import re
+import json
+import shutil
+import logging
+import subprocess
+from datetime import datetime
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+# 各平台上浏览器可执行文件的常见名称/位置
+BROWSER_BINARIES = {
+    'chrome': [
+        'google-chrome', 'google-chrome-stable', 'chromium', 'chromium-browser',
+        '/Applications/Google Chrome.app/Contents/MacOS/Google Chrome'
+    ],
+    'edge': [
+        'microsoft-edge', 'microsoft-edge-stable',
+        '/Applications/Microsoft Edge.app/Contents/MacOS/Microsoft Edge'
+    ]
+}
+
+# Windows 注册表中记录浏览器版本的位置
+WINDOWS_VERSION_KEYS = {
+    'chrome': r'Software\Google\Chrome\BLBeacon',
+    'edge': r'Software\Microsoft\Edge\BLBeacon'
+}
+
+VERSION_PATTERN = re.compile(r'(\d+)\.\d+\.\d+(?:\.\d+)?')
+
+
+def cache_path():
+    return os.environ.get('SOLAR_DRIVER_CACHE', os.path.join('.driver_cache', 'drivers.json'))
+
+
+def _parse_version(text):
+    match = VERSION_PATTERN.search(text or '')
+    return match.group(0) if match else None
+
+
+def major_version(version):
+    match = VERSION_PATTERN.search(version or '')
+    return int(match.group(1)) if match else None
+
+
+def _binary_version(binary):
+    try:
+        output = subprocess.run([binary, '--version'], capture_output=True, text=True, timeout=10).stdout
+        return _parse_version(output)
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _windows_registry_version(browser_type):
+    try:
+        import winreg
+    except ImportError:
+        return None
+    for root in (winreg.HKEY_CURRENT_USER, winreg.HKEY_LOCAL_MACHINE):
+        try:
+            with winreg.OpenKey(root, WINDOWS_VERSION_KEYS[browser_type]) as key:
+                return _parse_version(winreg.QueryValueEx(key, 'version')[0])
+        except OSError:
+            continue
+    return None
+
+
+def detect_browser_version(browser_type):
+    """离线读取已安装浏览器的版本号，读取不到时返回None"""
+    if os.name == 'nt':
+        return _windows_registry_version(browser_type)
+    for binary in BROWSER_BINARIES.get(browser_type, []):
+        path = binary if os.path.isabs(binary) else shutil.which(binary)
+        if path and os.path.exists(path):
+            version = _binary_version(path)
+            if version:
+                return version
+    return None
+
+
+class DriverCache:
+    """按浏览器类型记录 {浏览器版本, 驱动路径, 驱动版本} 的缓存文件"""
+
+    def __init__(self, path=None):
+        self.path = path or cache_path()
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, entries):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entries, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def get(self, browser_type):
+        return self.load().get(browser_type)
+
+    def record(self, browser_type, browser_version, driver_path):
+        entries = self.load()
+        entries[browser_type] = {
+            'browser_version': browser_version,
+            'browser_major': major_version(browser_version),
+            'driver_path': driver_path,
+            'driver_version': _binary_version(driver_path),
+            'resolved_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+        try:
+            self._write(entries)
+        except OSError as e:
+            logger.warning(f"写入驱动缓存失败: {str(e)}")
+
+    def invalidate(self, browser_type):
+        entries = self.load()
+        if entries.pop(browser_type, None) is not None:
+            try:
+                self._write(entries)
+            except OSError:
+                pass
+
+    def resolve(self, browser_type, resolver):
+        """返回驱动路径：主版本未变时使用缓存，否则调用resolver()联网解析并记录"""
+        browser_version = detect_browser_version(browser_type)
+        browser_major = major_version(browser_version)
+        entry = self.get(browser_type)
+        cached_path = entry.get('driver_path') if entry else None
+        cached_usable = bool(cached_path) and os.path.exists(cached_path)
+
+        if cached_usable and (browser_major is None or entry.get('browser_major') == browser_major):
+            logger.info(f"使用缓存的{browser_type}驱动: {cached_path}（浏览器 {browser_version or entry.get('browser_version')}）")
+            return cached_path
+
+        if entry and browser_major is not None and entry.get('browser_major') != browser_major:
+            logger.info(f"{browser_type}浏览器主版本由 {entry.get('browser_major')} 变为 {browser_major}，重新解析驱动")
+        try:
+            driver_path = resolver()
+        except Exception as e:
+            if cached_usable:
+                logger.warning(f"联网解析驱动失败: {str(e)}，继续使用缓存的驱动 {cached_path}")
+                return cached_path
+            raise
+        self.record(browser_type, browser_version, driver_path)
+        logger.info(f"已记录{browser_type}驱动: {driver_path}（浏览器 {browser_version or '版本未知'}）")
+        return driver_path
+
+
+def is_version_mismatch(error):
+    """浏览器启动失败是否因为驱动与浏览器版本不匹配"""
+    message = str(error)
+    return 'only supports' in message or 'This version of' in message
@@ -0,0 +1,607 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+浏览器驱动池：三个系统的爬虫共用浏览器进程
+
+- build_browser_options 统一生成各爬虫共用的浏览器参数（无头模式、SSL、UA等），
+  并按启动配置（SOLAR_LAUNCH_PROFILE：standard / low-memory）添加窗口大小与内存相关参数
+- launch_browser 统一负责驱动查找、启动重试与超时设置（驱动路径经 driver_cache 缓存）
+- DriverPool 持有浏览器进程，按租约给每个爬虫分配独立的浏览器上下文（无法创建时退化为新标签页）；
+  同一线程内的多个租约共用一个浏览器进程，不同线程的租约使用不同的浏览器进程。
+  租约归还后关闭对应标签页，浏览器进程保留给下一个爬虫使用，服务一定次数后自动回收重建。
+- 启用持久化配置目录（browser_profile）时，租约按系统使用各自的浏览器进程和 --user-data-dir，
+  在默认上下文中打开标签页，使HTTP缓存与编译代码缓存跨运行保留。
+
+一次串行运行只冷启动一次浏览器，而不是每个系统各启动一次。
+"""
+
+import os
+import time
+import shutil
+import atexit
+import logging
+import threading
+from selenium import webdriver
+from selenium.webdriver.edge.service import Service as EdgeService
+from selenium.webdriver.edge.options import Options as EdgeOptions
+from selenium.webdriver.chrome.service import Service as ChromeService
+from selenium.webdriver.chrome.options import Options as ChromeOptions
+from webdriver_manager.chrome import ChromeDriverManager
+from driver_cache import DriverCache, is_version_mismatch
+from fast_probe import record_lookup_miss
+from browser_profile import profiles_enabled, open_profile
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+USER_AGENTS = {
+    'chrome': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36',
+    'edge': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36 Edg/124.0.0.0'
+}
+
+# 各爬虫共用的启动参数
+SHARED_ARGUMENTS = [
+    '--disable-blink-features=AutomationControlled',
+    '--disable-extensions',
+    '--disable-notifications',
+    '--disable-software-rasterizer',
+    '--no-sandbox',
+    '--disable-dev-shm-usage',
+    '--disable-gpu',
+    '--ignore-certificate-errors',
+    '--allow-insecure-localhost',
+    '--disable-web-security'
+]
+
+# 关闭站点隔离：与 --disable-web-security 一起保证各系统跨域的iframe与接口可以访问，
+# 属于兼容性设置而不是内存设置，所有启动配置都保留
+SITE_ISOLATION_ARGUMENTS = ['--disable-site-isolation-trials']
+SITE_ISOLATION_FEATURES = ['IsolateOrigins', 'site-per-process']
+
+# 所有启动配置都关闭的浏览器功能（--disable-features 只有最后一个生效，统一合并后添加）
+SHARED_DISABLED_FEATURES = ['TranslateUI']
+
+# 启动配置：standard 与原来的参数一致；low-memory 面向小内存的CI机器，便于并行运行多个会话
+LAUNCH_PROFILES = {
+    'standard': {
+        'window_size': '1920,1080',
+        'arguments': [],
+        'disabled_features': []
+    },
+    'low-memory': {
+        # 只取数值的阶段使用较小的窗口，截图阶段临时把视口放大到 SCREENSHOT_VIEWPORT
+        'window_size': '1280,800',
+        'arguments': [
+            '--renderer-process-limit=2',
+            '--js-flags=--max-old-space-size=512',
+            '--disable-background-networking',
+            '--disable-component-update',
+            '--disable-default-apps',
+            '--disable-sync',
+            '--disable-breakpad',
+            '--no-first-run',
+            '--mute-audio',
+            '--disk-cache-size=52428800'
+        ],
+        'disabled_features': ['BackForwardCache', 'MediaRouter', 'OptimizationHints', 'CalculateNativeWinOcclusion']
+    }
+}
+
+# 截图阶段的视口大小（与standard配置的窗口一致）
+SCREENSHOT_VIEWPORT = (1920, 1080)
+
+# 默认超时设置（各爬虫可在租约中覆盖）
+DEFAULT_TIMEOUTS = {'page_load': 60, 'script': 60, 'implicit': 15}
+
+# 浏览器服务多少个租约后回收重建，避免长时间运行后内存持续增长
+DEFAULT_RECYCLE_AFTER = 20
+
+
+def is_ci_environment():
+    """检测是否在CI环境中运行"""
+    return (
+        os.environ.get('CI') == 'true' or
+        os.environ.get('GITHUB_ACTIONS') == 'true' or
+        os.environ.get('CONTINUOUS_INTEGRATION') == 'true' or
+        os.environ.get('JENKINS_URL') is not None or
+        os.environ.get('CI_NAME') is not None
+    )
+
+
+def default_browser_type():
+    """CI环境使用Chrome，本地使用Edge"""
+    return 'chrome' if is_ci_environment() else 'edge'
+
+
+def launch_profile_name():
+    """当前的启动配置名（SOLAR_LAUNCH_PROFILE，默认standard）"""
+    name = os.environ.get('SOLAR_LAUNCH_PROFILE', 'standard')
+    if name not in LAUNCH_PROFILES:
+        logger.warning(f"未知的启动配置 {name}，使用standard")
+        return 'standard'
+    return name
+
+
+def headless_shell_binary():
+    """SOLAR_HEADLESS_SHELL 指定的 chrome-headless-shell 路径（设为1时在PATH中查找），未启用时返回None"""
+    value = os.environ.get('SOLAR_HEADLESS_SHELL', '')
+    if not value or value in ('0', 'false', 'no'):
+        return None
+    path = shutil.which('chrome-headless-shell') if value in ('1', 'true', 'yes') else value
+    if not path or not os.path.exists(path):
+        logger.warning(f"未找到chrome-headless-shell（SOLAR_HEADLESS_SHELL={value}），使用完整的Chrome")
+        return None
+    return path
+
+
+def is_small_window():
+    """当前启动配置的窗口是否小于截图所需的视口"""
+    width, height = (int(v) for v in LAUNCH_PROFILES[launch_profile_name()]['window_size'].split(','))
+    return width < SCREENSHOT_VIEWPORT[0] or height < SCREENSHOT_VIEWPORT[1]
+
+
+def build_browser_options(browser_type=None, headless=None, extra_arguments=None, launch_profile=None):
+    """生成各爬虫共用的浏览器参数；headless为None时仅在CI环境中启用无头模式"""
+    browser_type = browser_type or default_browser_type()
+    if headless is None:
+        headless = is_ci_environment()
+    profile = LAUNCH_PROFILES[launch_profile or launch_profile_name()]
+    options = ChromeOptions() if browser_type == 'chrome' else EdgeOptions()
+
+    shell = headless_shell_binary() if headless and browser_type == 'chrome' else None
+    if shell:
+        # chrome-headless-shell 本身就是无头浏览器，不需要 --headless
+        options.binary_location = shell
+    elif headless:
+        options.add_argument('--headless=new')
+    for argument in SHARED_ARGUMENTS + SITE_ISOLATION_ARGUMENTS + profile['arguments']:
+        options.add_argument(argument)
+    options.add_argument(f"--window-size={profile['window_size']}")
+    disabled_features = SITE_ISOLATION_FEATURES + SHARED_DISABLED_FEATURES + profile['disabled_features']
+    options.add_argument(f"--disable-features={','.join(disabled_features)}")
+    if browser_type == 'chrome':
+        # 添加DNS服务器设置，解决域名解析问题
+        options.add_argument('--dns-servers=8.8.8.8,8.8.4.4')
+    options.add_argument(f'--user-agent={USER_AGENTS[browser_type]}')
+    for argument in extra_arguments or []:
+        options.add_argument(argument)
+
+    # 实验性选项
+    options.add_experimental_option('excludeSwitches', ['enable-logging', 'enable-automation'])
+    options.add_experimental_option('useAutomationExtension', False)
+    options.add_experimental_option('prefs', {
+        'profile.default_content_setting_values': {'notifications': 2}
+    })
+    return options
+
+
+def _driver_service(browser_type):
+    """查找浏览器驱动：CI环境使用缓存的webdriver-manager驱动路径，本地优先使用msedgedriver.exe或系统PATH"""
+    if browser_type == 'chrome':
+        if is_ci_environment():
+            # 只在浏览器主版本变化时调用webdriver-manager联网解析
+            return ChromeService(DriverCache().resolve('chrome', lambda: ChromeDriverManager().install()))
+        try:
+            return ChromeService()
+        except Exception as e:
+            logger.warning(f"系统PATH中的ChromeDriver不可用: {e}，回退到webdriver-manager")
+            return ChromeService(DriverCache().resolve('chrome', lambda: ChromeDriverManager().install()))
+    for directory in (os.getcwd(), os.path.dirname(os.path.abspath(__file__))):
+        driver_path = os.path.join(directory, 'msedgedriver.exe')
+        if os.path.exists(driver_path):
+            logger.info(f"使用本地Edge驱动: {driver_path}")
+            return EdgeService(driver_path)
+    logger.info("未找到本地Edge驱动，将使用系统PATH中的驱动")
+    return EdgeService()
+
+
+def set_screenshot_viewport(driver, enabled=True):
+    """小窗口启动配置下，截图阶段把当前标签页的视口临时放大到 SCREENSHOT_VIEWPORT（enabled=False时恢复），返回是否生效"""
+    if driver is None or not is_small_window():
+        return False
+    try:
+        if enabled:
+            driver.execute_cdp_cmd('Emulation.setDeviceMetricsOverride', {
+                'width': SCREENSHOT_VIEWPORT[0], 'height': SCREENSHOT_VIEWPORT[1],
+                'deviceScaleFactor': 1, 'mobile': False
+            })
+        else:
+            driver.execute_cdp_cmd('Emulation.clearDeviceMetricsOverride', {})
+        return True
+    except Exception as e:
+        logger.debug(f"设置截图视口失败: {e}")
+        return False
+
+
+def launch_browser(browser_type=None, options=None, retry_attempts=3):
+    """启动浏览器（带重试），返回WebDriver"""
+    browser_type = browser_type or default_browser_type()
+    options = options or build_browser_options(browser_type)
+    for attempt in range(1, retry_attempts + 1):
+        driver = None
+        try:
+            logger.info(f"第 {attempt}/{retry_attempts} 次尝试启动{browser_type}浏览器...")
+            service = _driver_service(browser_type)
+            if browser_type == 'chrome':
+                driver = webdriver.Chrome(service=service, options=options)
+            else:
+                driver = webdriver.Edge(service=service, options=options)
+            logger.info(f"{browser_type}浏览器启动成功")
+            return driver
+        except Exception as e:
+            logger.error(f"浏览器启动失败 (尝试 {attempt}/{retry_attempts}): {str(e)}")
+            if is_version_mismatch(e):
+                # 缓存的驱动与浏览器版本不符，下次重试时重新解析
+                DriverCache().invalidate(browser_type)
+            if driver is not None:
+                try:
+                    driver.quit()
+                except Exception:
+                    pass
+            if attempt >= retry_attempts:
+                raise
+            time.sleep(2 * attempt)
+
+
+class PooledDriver:
+    """租约给爬虫的驱动：调用任何WebDriver方法前自动切换到本租约的标签页
+
+    quit()/close() 只归还租约，不会关闭共用的浏览器进程。
+    """
+
+    def __init__(self, pool, browser, owner, handle, context_id, timeouts):
+        self._pool = pool
+        self._browser = browser
+        self.owner = owner
+        self.handle = handle
+        self.context_id = context_id
+        self.timeouts = timeouts
+        self.released = False
+
+    def __getattr__(self, name):
+        self._pool.activate(self)
+        return getattr(self._browser.driver, name)
+
+    def find_element(self, *args, **kwargs):
+        """查找元素；未命中时记录被隐式等待阻塞的时间"""
+        started = time.monotonic()
+        try:
+            return self.__getattr__('find_element')(*args, **kwargs)
+        except Exception:
+            record_lookup_miss(time.monotonic() - started)
+            raise
+
+    def find_elements(self, *args, **kwargs):
+        started = time.monotonic()
+        elements = self.__getattr__('find_elements')(*args, **kwargs)
+        if not elements:
+            record_lookup_miss(time.monotonic() - started)
+        return elements
+
+    def browser_pid(self):
+        """租约所在浏览器的驱动进程PID（浏览器进程是其子进程），无法获取时返回None"""
+        try:
+            return self._browser.driver.service.process.pid
+        except Exception:
+            return None
+
+    def quit(self):
+        self._pool.release(self)
+
+    def close(self):
+        self._pool.release(self)
+
+
+class _Browser:
+    """池中的一个浏览器进程"""
+
+    def __init__(self, browser_type, headless, driver, profile_name=None, profile=None):
+        self.browser_type = browser_type
+        self.headless = headless
+        self.driver = driver
+        self.profile_name = profile_name
+        self.profile = profile
+        self.home_handle = driver.current_window_handle
+        self.thread_id = None
+        self.leases = []
+        # 已选定本浏览器、正在锁外检查存活或打开标签页的租用数
+        self.pending = 0
+        self.active = None
+        self.served = 0
+        self.lock = threading.RLock()
+
+    def is_alive(self):
+        try:
+            self.driver.window_handles
+            return True
+        except Exception:
+            return False
+
+    def quit(self):
+        try:
+            self.driver.quit()
+        except Exception as e:
+            logger.warning(f"关闭浏览器时出错: {str(e)}")
+        if self.profile is not None:
+            self.profile.release()
+
+
+class DriverPool:
+    """浏览器进程池"""
+
+    def __init__(self, max_browsers=None, recycle_after=DEFAULT_RECYCLE_AFTER, isolate_contexts=True):
+        self.max_browsers = max_browsers or int(os.environ.get('SOLAR_MAX_BROWSERS', '3'))
+        self.recycle_after = recycle_after
+        self.isolate_contexts = isolate_contexts
+        self.browsers = []
+        self.condition = threading.Condition()
+        self.launches = 0
+        # 已预留名额、正在锁外启动的浏览器数
+        self.launching = 0
+
+    def _find_browser(self, browser_type, headless, profile_name=None):
+        """返回当前线程可复用的浏览器：同类型、同配置目录、未被其他线程占用（不检查存活，调用方持有池锁）"""
+        thread_id = threading.get_ident()
+        for browser in self.browsers:
+            if browser.browser_type != browser_type or browser.headless != headless:
+                continue
+            if browser.profile_name != profile_name:
+                continue
+            if (browser.leases or browser.pending) and browser.thread_id != thread_id:
+                continue
+            return browser
+        return None
+
+    def _open_lease_target(self, browser):
+        """在浏览器中为租约打开独立的上下文（不可用时打开新标签页），返回 (窗口句柄, 上下文ID)"""
+        driver = browser.driver
+        before = set(driver.window_handles)
+        # 独立上下文不使用配置目录的磁盘缓存，持久化配置目录的浏览器直接在默认上下文中打开标签页
+        if self.isolate_contexts and browser.profile is None:
+            context_id = None
+            try:
+                context_id = driver.execute_cdp_cmd('Target.createBrowserContext', {'disposeOnDetach': True})['browserContextId']
+                driver.execute_cdp_cmd('Target.createTarget', {'url': 'about:blank', 'browserContextId': context_id})
+                for _ in range(20):
+                    new_handles = set(driver.window_handles) - before
+                    if new_handles:
+                        handle = new_handles.pop()
+                        driver.switch_to.window(handle)
+                        return handle, context_id
+                    time.sleep(0.1)
+            except Exception as e:
+                logger.debug(f"无法创建独立的浏览器上下文: {e}")
+            if context_id:
+                try:
+                    driver.execute_cdp_cmd('Target.disposeBrowserContext', {'browserContextId': context_id})
+                except Exception:
+                    pass
+            logger.info("浏览器不支持独立上下文，使用新标签页")
+            self.isolate_contexts = False
+        driver.switch_to.new_window('tab')
+        return driver.current_window_handle, None
+
+    def _launch(self, browser_type, headless, profile_name):
+        """启动新的浏览器进程；指定的配置目录无法启动时清空后退回临时配置目录"""
+        profile = open_profile(profile_name)
+        if profile is not None:
+            logger.info(f"{profile_name} 使用持久化配置目录: {profile.path}")
+            options = build_browser_options(browser_type, headless, [f'--user-data-dir={profile.path}'])
+            try:
+                driver = launch_browser(browser_type, options)
+                return _Browser(browser_type, headless, driver, profile_name, profile)
+            except Exception as e:
+                logger.warning(f"{profile_name} 使用持久化配置目录启动失败: {str(e)}，清空配置目录后改用临时配置目录")
+                profile.reset()
+                profile.release()
+        driver = launch_browser(browser_type, build_browser_options(browser_type, headless))
+        return _Browser(browser_type, headless, driver, profile_name)
+
+    def _evict_idle_browser(self):
+        """浏览器数已达上限时从池中移除一个空闲的浏览器（类型或配置目录不同而无法复用），
+        返回该浏览器（由调用方在锁外关闭），没有时返回None"""
+        for browser in self.browsers:
+            if not browser.leases and not browser.pending:
+                logger.info(f"关闭空闲的浏览器（{browser.profile_name or browser.browser_type}）以启动新的浏览器")
+                self.browsers.remove(browser)
+                return browser
+        return None
+
+    def _reserve_browser(self, owner, browser_type, headless, profile_name):
+        """在池锁内选定当前线程可复用的浏览器（pending加一），或预留一个启动名额（返回None）
+
+        存活检查、启动与关闭浏览器都较慢，在锁外进行，不阻塞其他线程的租用与归还。
+        """
+        evicted = []
+        try:
+            with self.condition:
+                while True:
+                    browser = self._find_browser(browser_type, headless, profile_name)
+                    if browser is not None:
+                        browser.thread_id = threading.get_ident()
+                        browser.pending += 1
+                        return browser
+                    if len(self.browsers) + self.launching >= self.max_browsers:
+                        idle = self._evict_idle_browser()
+                        if idle is not None:
+                            evicted.append(idle)
+                    if len(self.browsers) + self.launching < self.max_browsers:
+                        self.launching += 1
+                        return None
+                    logger.info(f"浏览器数已达上限 {self.max_browsers}，{owner} 等待空闲浏览器...")
+                    self.condition.wait(timeout=5)
+        finally:
+            for browser in evicted:
+                browser.quit()
+
+    def _launch_reserved(self, browser_type, headless, profile_name):
+        """用预留的名额启动浏览器并登记到池中（pending为1）"""
+        try:
+            browser = self._launch(browser_type, headless, profile_name)
+        except Exception:
+            with self.condition:
+                self.launching -= 1
+                self.condition.notify_all()
+            raise
+        with self.condition:
+            self.launching -= 1
+            browser.thread_id = threading.get_ident()
+            browser.pending += 1
+            self.browsers.append(browser)
+            self.launches += 1
+        return browser
+
+    def _unreserve(self, browser, remove=False):
+        """取消对浏览器的占用；remove为True时从池中移除并关闭（浏览器已失效）"""
+        with self.condition:
+            browser.pending -= 1
+            if remove and browser in self.browsers:
+                self.browsers.remove(browser)
+            self.condition.notify_all()
+        if remove:
+            browser.quit()
+
+    def acquire(self, owner, browser_type=None, headless=None, timeouts=None, profile=None):
+        """租用一个标签页，返回PooledDriver；profile为持久化配置目录名（通常是系统名，未启用时忽略）"""
+        browser_type = browser_type or default_browser_type()
+        if headless is None:
+            headless = is_ci_environment()
+        timeouts = dict(DEFAULT_TIMEOUTS, **(timeouts or {}))
+        profile_name = profile if profiles_enabled() else None
+        while True:
+            browser = self._reserve_browser(owner, browser_type, headless, profile_name)
+            if browser is None:
+                browser = self._launch_reserved(browser_type, headless, profile_name)
+            elif not browser.is_alive():
+                logger.info("池中的浏览器已失效，移除")
+                self._unreserve(browser, remove=True)
+                continue
+            break
+        try:
+            with browser.lock:
+                handle, context_id = self._open_lease_target(browser)
+                lease = PooledDriver(self, browser, owner, handle, context_id, timeouts)
+                browser.active = None
+                self.activate(lease)
+                try:
+                    browser.driver.execute_cdp_cmd(
+                        "Page.addScriptToEvaluateOnNewDocument",
+                        {"source": "Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"}
+                    )
+                except Exception as e:
+                    logger.debug(f"设置webdriver特征隐藏脚本失败: {e}")
+        except Exception:
+            self._unreserve(browser)
+            raise
+        with self.condition:
+            browser.pending -= 1
+            browser.leases.append(lease)
+            browser.served += 1
+            browser_count = len(self.browsers)
+        logger.info(f"{owner} 租用浏览器标签页（该浏览器已服务 {browser.served} 次，池中共 {browser_count} 个浏览器）")
+        return lease
+
+    def activate(self, lease):
+        """切换到租约的标签页并应用其超时设置"""
+        browser = lease._browser
+        if lease.released:
+            raise RuntimeError(f"{lease.owner} 的浏览器租约已归还")
+        with browser.lock:
+            if browser.active is lease:
+                return
+            driver = browser.driver
+            driver.switch_to.window(lease.handle)
+            driver.set_page_load_timeout(lease.timeouts['page_load'])
+            driver.set_script_timeout(lease.timeouts['script'])
+            driver.implicitly_wait(lease.timeouts['implicit'])
+            browser.active = lease
+
+    def release(self, lease):
+        """归还租约：关闭标签页，必要时回收浏览器；传入非池化的驱动时直接关闭"""
+        if not isinstance(lease, PooledDriver):
+            if lease is not None:
+                try:
+                    lease.quit()
+                except Exception:
+                    pass
+            return
+        if lease.released:
+            return
+        browser = lease._browser
+        with self.condition:
+            with browser.lock:
+                lease.released = True
+                if lease in browser.leases:
+                    browser.leases.remove(lease)
+                try:
+                    driver = browser.driver
+                    if lease.handle in driver.window_handles:
+                        driver.switch_to.window(lease.handle)
+                        driver.close()
+                    if lease.context_id:
+                        driver.execute_cdp_cmd('Target.disposeBrowserContext', {'browserContextId': lease.context_id})
+                    driver.switch_to.window(browser.home_handle)
+                except Exception as e:
+                    logger.warning(f"归还 {lease.owner} 的标签页时出错: {str(e)}")
+                browser.active = None
+                logger.info(f"{lease.owner} 已归还浏览器标签页")
+                if not browser.leases and not browser.pending and (browser.served >= self.recycle_after or not browser.is_alive()):
+                    logger.info(f"浏览器已服务 {browser.served} 次，回收重建")
+                    self.browsers.remove(browser)
+                    browser.quit()
+            self.condition.notify_all()
+
+    def discard(self, lease):
+        """浏览器不健康时调用：归还租约并关闭其所在的整个浏览器进程（不再复用）"""
+        if not isinstance(lease, PooledDriver):
+            self.release(lease)
+            return
+        browser = lease._browser
+        with self.condition:
+            lease.released = True
+            if lease in browser.leases:
+                browser.leases.remove(lease)
+            if browser.leases:
+                logger.warning(f"关闭的浏览器上还有 {len(browser.leases)} 个租约，将一并失效")
+            if browser in self.browsers:
+                self.browsers.remove(browser)
+            logger.info(f"{lease.owner} 的浏览器已丢弃")
+            browser.quit()
+            self.condition.notify_all()
+
+    def browser_pids(self):
+        """池中各浏览器驱动进程的PID（浏览器进程是其子进程），用于内存测量"""
+        pids = []
+        for browser in list(self.browsers):
+            try:
+                pids.append(browser.driver.service.process.pid)
+            except Exception:
+                continue
+        return pids
+
+    def close_all(self):
+        """关闭池中全部浏览器"""
+        with self.condition:
+            for browser in self.browsers:
+                browser.quit()
+            self.browsers = []
+            self.condition.notify_all()
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_default_pool():
+    """返回本进程共用的驱动池（进程退出时自动关闭全部浏览器）"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = DriverPool()
+            atexit.register(_default_pool.close_all)
+        return _default_pool
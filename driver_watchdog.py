@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+驱动健康看门狗：浏览器失去响应或内存超限时回收重建，并恢复登录会话
+
+各爬虫在处理每个电站/日期之前调用 check()：
+- 响应性：在限定时间内执行一次简单脚本（渲染进程崩溃、会话断开、卡死都视为不健康）
+- 内存：浏览器进程树的RSS（见 memory_probe）与当前标签页的JS堆
+超过阈值时先保存当前会话（仍可响应时），关闭整个浏览器进程并重新租用，
+再通过 login()（优先从会话保管库恢复cookie）恢复登录，调用方从当前电站/日期继续。
+
+环境变量：SOLAR_WATCHDOG=0 关闭；SOLAR_WATCHDOG_MAX_RSS_MB（默认2048）、
+SOLAR_WATCHDOG_MAX_HEAP_MB（默认768）、SOLAR_WATCHDOG_RESPONSE_SECONDS（默认20）、
+SOLAR_WATCHDOG_INTERVAL（两次采样的最短间隔秒数，默认30）。
+"""
+
+import os
+import time
+import logging
+import threading
+
+from memory_probe import process_tree_rss, MB
+from session_vault import remember_session
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+HEAP_JS = "return performance.memory ? performance.memory.usedJSHeapSize : null;"
+
+# 每个爬虫实例最多回收的次数，避免浏览器反复崩溃时无限重建
+MAX_RECYCLES = 3
+
+
+def watchdog_enabled():
+    return os.environ.get('SOLAR_WATCHDOG', '1') not in ('0', 'false', 'no')
+
+
+def _env_number(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _timed_call(fn, timeout):
+    """在后台线程中执行fn，返回 (结果, 异常)；超时时异常为TimeoutError"""
+    outcome = {}
+
+    def target():
+        try:
+            outcome['value'] = fn()
+        except Exception as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=target, name='driver-watchdog-call', daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        return None, TimeoutError(f'{timeout:.0f} 秒内没有响应')
+    return outcome.get('value'), outcome.get('error')
+
+
+class DriverWatchdog:
+    """一个爬虫实例的驱动看门狗
+
+    restart 为爬虫重新租用浏览器的方法（如 start_browser / initialize_driver）。
+    """
+
+    def __init__(self, scraper, portal, restart):
+        self.scraper = scraper
+        self.portal = portal
+        self.restart = restart
+        self.max_rss_mb = _env_number('SOLAR_WATCHDOG_MAX_RSS_MB', 2048)
+        self.max_heap_mb = _env_number('SOLAR_WATCHDOG_MAX_HEAP_MB', 768)
+        self.response_seconds = _env_number('SOLAR_WATCHDOG_RESPONSE_SECONDS', 20)
+        self.interval = _env_number('SOLAR_WATCHDOG_INTERVAL', 30)
+        self.last_check = 0
+        self.recycles = 0
+
+    @property
+    def driver(self):
+        return getattr(self.scraper, 'driver', None)
+
+    def sample(self):
+        """采样一次驱动健康状况"""
+        driver = self.driver
+        sample = {'responsive': False, 'response_seconds': None, 'rss_mb': None, 'heap_mb': None, 'error': None}
+        if driver is None:
+            sample['error'] = '驱动未初始化'
+            return sample
+        started = time.monotonic()
+        heap, error = _timed_call(lambda: driver.execute_script(HEAP_JS), self.response_seconds)
+        sample['response_seconds'] = round(time.monotonic() - started, 2)
+        if error is not None:
+            sample['error'] = str(error).splitlines()[0] if str(error) else type(error).__name__
+            return sample
+        sample['responsive'] = True
+        if heap:
+            sample['heap_mb'] = round(heap / MB, 1)
+        browser_pid = getattr(driver, 'browser_pid', None)
+        pid = browser_pid() if callable(browser_pid) else None
+        if pid:
+            rss = process_tree_rss([pid])
+            if rss is not None:
+                sample['rss_mb'] = round(rss / MB, 1)
+        return sample
+
+    def problems(self, sample):
+        """返回超过阈值的原因列表"""
+        reasons = []
+        if not sample['responsive']:
+            reasons.append(f"浏览器无响应（{sample['error']}）")
+        if sample['rss_mb'] is not None and sample['rss_mb'] > self.max_rss_mb:
+            reasons.append(f"浏览器内存 {sample['rss_mb']} MB 超过 {self.max_rss_mb:.0f} MB")
+        if sample['heap_mb'] is not None and sample['heap_mb'] > self.max_heap_mb:
+            reasons.append(f"页面JS堆 {sample['heap_mb']} MB 超过 {self.max_heap_mb:.0f} MB")
+        return reasons
+
+    def check(self, label='', force=False):
+        """检查驱动健康状况，必要时回收重建并恢复登录；返回是否发生了回收（且已恢复登录）
+
+        force=False 时距上次采样不足 interval 秒则跳过。
+        """
+        if not watchdog_enabled():
+            return False
+        now = time.monotonic()
+        if not force and now - self.last_check < self.interval:
+            return False
+        self.last_check = now
+        sample = self.sample()
+        reasons = self.problems(sample)
+        if not reasons:
+            logger.debug(f"{self.portal} 驱动健康: {sample}")
+            return False
+        logger.warning(f"{self.portal} 驱动不健康（{label}）: {'；'.join(reasons)}")
+        return self.recycle(sample['responsive'])
+
+    def recycle(self, responsive=True):
+        """关闭当前浏览器进程，重新租用并恢复登录，返回是否恢复成功"""
+        if self.recycles >= MAX_RECYCLES:
+            logger.error(f"{self.portal} 浏览器已回收 {self.recycles} 次，不再重建")
+            return False
+        self.recycles += 1
+        was_logged_in = getattr(self.scraper, 'logged_in', False)
+        if responsive and was_logged_in:
+            # 浏览器仍可响应时先保存最新的cookie与storage，重建后据此恢复
+            remember_session(self.scraper, self.portal)
+        pool = getattr(self.scraper, 'driver_pool', None)
+        if pool is not None and self.driver is not None:
+            pool.discard(self.driver)
+        self.scraper.driver = None
+        logger.info(f"{self.portal} 第 {self.recycles} 次回收浏览器，重新启动")
+        try:
+            self.restart()
+        except Exception as e:
+            logger.error(f"{self.portal} 重新启动浏览器失败: {str(e)}")
+            return False
+        self.last_check = time.monotonic()
+        if not was_logged_in:
+            return True
+        self.scraper.logged_in = False
+        try:
+            ok = bool(self.scraper.login())
+        except Exception as e:
+            logger.error(f"{self.portal} 回收后恢复登录失败: {str(e)}")
+            ok = False
+        if ok:
+            logger.info(f"{self.portal} 浏览器回收完成，已恢复登录")
+        return ok
@@ -4,13 +4,7 @@ import os
 import time
 import json
 import logging
-from datetime import datetime, timedelta
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.edge.service import Service as EdgeService
-from selenium.webdriver.edge.options import Options as EdgeOptions
-from selenium.webdriver.chrome.service import Service as ChromeService
-from selenium.webdriver.chrome.options import Options as ChromeOptions
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.action_chains import ActionChains
@@ -21,9 +15,17 @@ from selenium.common.exceptions import (
 )
 import re
 import io
-import base64
-from webdriver_manager.chrome import ChromeDriverManager
-from webdriver_manager.microsoft import EdgeChromiumDriverManager
+from date_utils import parse_date, format_date, days_before_today, months_before_current
+from run_budget import unlimited
+from rate_limiter import get_governor
+from driver_pool import get_default_pool
+from session_vault import restore_session, remember_session
+from resource_blocking import ResourceBlocker
+from driver_watchdog import DriverWatchdog
+from readiness import (install_network_tracker, wait_until, wait_for_page_ready, wait_for_network_idle,
+                       wait_for_element, wait_for_element_stable, wait_for_chart_ready)
+from fast_probe import resolve_first
+from network_capture import attach_recorder
 
 # 可选的OCR支持
 try:
@@ -50,6 +52,23 @@ def setup_logging():
 
 logger = setup_logging()
 
+# ECharts悬浮提示框的候选选择器，按顺序尝试
+TOOLTIP_SELECTORS = [
+    (By.CSS_SELECTOR, "div.echarts-tooltip"),
+    (By.CSS_SELECTOR, "div.echarts-tooltip-wrap"),
+    (By.CSS_SELECTOR, "div.zr-tooltip"),
+    (By.CSS_SELECTOR, "div.tooltip"),
+    (By.CSS_SELECTOR, "div[class*='tooltip']"),
+]
+
+# 月度图表接口响应的记录规则：URL正则（默认不限）与响应文本必须包含的关键字（ECharts配置）
+MONTH_CHART_CAPTURE = {
+    'month_chart': (os.environ.get('SOLAR_ESOLAR_CAPTURE_PATTERN', '.'), 'xAxis')
+}
+
+# 月度图表接口响应到达前最多等待的秒数
+MONTH_CHART_RESPONSE_SECONDS = 2
+
 def is_ci_environment():
     """检测是否在CI环境中运行"""
     return (
@@ -60,11 +79,78 @@ def is_ci_environment():
         os.environ.get('CI_NAME') is not None
     )
 
+def month_value_from_payload(payload, target_day):
+    """在接口JSON中查找ECharts配置（xAxis + series），返回目标日的发电量(kWh)；找不到时返回None"""
+    def pick_label(x):
+        if x is None:
+            return None
+        m = re.search(r"(\d{1,2})", str(x))
+        return int(m.group(1)) if m else None
+
+    stack = [payload]
+    while stack:
+        cur = stack.pop(0)
+        if isinstance(cur, dict):
+            xa = cur.get('xAxis')
+            se = cur.get('series')
+            if xa and se:
+                xa0 = xa[0] if isinstance(xa, list) else xa
+                xdata = xa0.get('data') if isinstance(xa0, dict) else None
+                idx = -1
+                if isinstance(xdata, list):
+                    for i, lab in enumerate(xdata):
+                        n = pick_label(lab)
+                        if n is not None and str(n) == str(target_day):
+                            idx = i
+                            break
+                # 未找到目标日标签时不回退到最后一条，跳过该序列
+                if isinstance(se, list) and idx >= 0:
+                    for series in se:
+                        data = series.get('data') if isinstance(series, dict) else None
+                        if isinstance(data, list) and len(data) > idx:
+                            item = data[idx]
+                            v = item.get('value') if isinstance(item, dict) else item
+                            if isinstance(v, (int, float)) and not isinstance(v, bool):
+                                num = float(v)
+                                ya = cur.get('yAxis')
+                                ya0 = ya[0] if isinstance(ya, list) and ya else ya
+                                axis_name = str(ya0.get('name', '')) if isinstance(ya0, dict) else ''
+                                if re.search(r"MWh", axis_name, re.I):
+                                    num *= 1000.0
+                                return round(num, 2)
+            for v in cur.values():
+                if isinstance(v, (dict, list)):
+                    stack.append(v)
+        elif isinstance(cur, list):
+            for v in cur:
+                if isinstance(v, (dict, list)):
+                    stack.append(v)
+    return None
+
 class ESolarScraper:
-    def __init__(self, username, password, screenshots_dir=None, data_file_path=None):
+    def __init__(self, username, password, screenshots_dir=None, data_file_path=None, target_date=None, deadline=None, driver_pool=None):
         self.username = username
         self.password = password
         self.driver = None
+        # 目标日期（'YYYY-MM-DD'），默认为昨天
+        self.target_date = format_date(target_date)
+        # 时间预算（run_budget.Deadline），耗尽时停止后续步骤并返回已获取的数据
+        self.deadline = deadline or unlimited('esolar')
+        # 登录状态与登录成功后的首页地址，补采多个日期或复用常驻会话时用于回到初始页面
+        self.logged_in = False
+        self.home_url = None
+        # 请求限速与浏览器会话名额（多进程/多机器共享）
+        self.governor = get_governor('esolar', username)
+        self.session_handle = None
+        # 驱动池（driver_pool.DriverPool），默认使用本进程共用的驱动池
+        self.driver_pool = driver_pool or get_default_pool()
+        # 只读取月度数值，不加载图片和字体（OCR兜底只截取canvas图表，不受影响）
+        self.resource_blocker = ResourceBlocker(self, 'esolar')
+        # 长时间悬停扫描后浏览器无响应或内存超限时回收重建，恢复登录后从当前日期继续
+        self.watchdog = DriverWatchdog(self, 'esolar', self.initialize_driver)
+        # 月度图表接口响应的记录器（见network_capture），capture_since 之前发出的请求不参与解析
+        self.network_recorder = None
+        self.capture_since = 0
         
         # 设置截图目录
         if screenshots_dir:
@@ -88,130 +174,6 @@ class ESolarScraper:
         self.browser_type = 'chrome' if ci_env else 'edge'
         logger.info(f"检测到{'CI' if ci_env else '本地'}环境，将使用{self.browser_type}浏览器")
         
-        # 配置浏览器选项
-        if self.browser_type == 'chrome':
-            self.chrome_options = ChromeOptions()
-            
-            # CI环境配置
-            if ci_env:
-                logger.info("CI环境：启用无头模式")
-                self.chrome_options.add_argument('--headless')
-                self.chrome_options.add_argument('--no-sandbox')
-                self.chrome_options.add_argument('--disable-dev-shm-usage')
-                self.chrome_options.add_argument('--disable-gpu')
-                self.chrome_options.add_argument('--remote-debugging-port=9222')
-            
-            # 基本配置
-            self.chrome_options.add_argument('--disable-software-rasterizer')
-            self.chrome_options.add_argument('--disable-features=IsolateOrigins,site-per-process')
-            self.chrome_options.add_argument('--disable-site-isolation-trials')
-            self.chrome_options.add_argument('--disable-extensions')
-            self.chrome_options.add_argument('--disable-notifications')
-            self.chrome_options.add_argument('--disable-features=TranslateUI')
-            self.chrome_options.add_argument('--window-size=1920,1080')
-            
-            # SSL相关配置
-            self.chrome_options.add_argument('--ignore-certificate-errors')
-            self.chrome_options.add_argument('--allow-insecure-localhost')
-            self.chrome_options.add_argument('--ssl-protocol=any')
-            self.chrome_options.add_argument('--disable-web-security')
-            
-            # 用户代理
-            self.chrome_options.add_argument(
-                "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-            )
-            
-            # 添加DNS服务器设置，解决域名解析问题
-            self.chrome_options.add_argument('--dns-servers=8.8.8.8,8.8.4.4')
-            
-            # 实验性选项
-            self.chrome_options.add_experimental_option('excludeSwitches', ['enable-logging', 'enable-automation'])
-            self.chrome_options.add_experimental_option('detach', False)
-            self.chrome_options.add_experimental_option('useAutomationExtension', False)
-            self.chrome_options.add_argument('--disable-blink-features=AutomationControlled')
-            
-            # 性能日志
-            try:
-                self.chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
-            except Exception:
-                pass
-            
-            # 首选项设置
-            self.chrome_options.add_experimental_option('prefs', {
-                'profile.default_content_setting_values': {
-                    'images': 1,
-                    'javascript': 1,
-                    'plugins': 1,
-                    'popups': 1,
-                    'notifications': 2,
-                },
-                'profile.managed_default_content_settings': {
-                    'images': 1,
-                    'javascript': 1,
-                    'plugins': 1,
-                    'popups': 1,
-                    'notifications': 2
-                },
-                'site-isolation-trial-opt-out': True
-            })
-            
-        else:  # Edge
-            # 配置Edge浏览器选项
-            self.edge_options = EdgeOptions()
-            
-            # 添加兼容性和性能参数
-            self.edge_options.add_argument('--disable-software-rasterizer')
-            self.edge_options.add_argument('--disable-features=IsolateOrigins,site-per-process')
-            self.edge_options.add_argument('--disable-site-isolation-trials')
-            self.edge_options.add_argument('--no-sandbox')
-            self.edge_options.add_argument('--disable-dev-shm-usage')
-            self.edge_options.add_argument('--disable-gpu')
-            
-            # 设置用户代理（使用正确格式，避免Edge打开多个错误页面）
-            self.edge_options.add_argument(
-                "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36 Edg/120.0.0.0"
-            )
-            
-            # 实验性选项
-            self.edge_options.add_experimental_option('excludeSwitches', ['enable-logging', 'enable-automation'])
-            self.edge_options.add_experimental_option('detach', False)
-            self.edge_options.add_experimental_option('useAutomationExtension', False)
-            
-            # 禁用自动化控制特征
-            self.edge_options.add_argument('--disable-blink-features=AutomationControlled')
-            
-            # 使用更宽松的浏览器设置以允许网站正常功能运行
-            self.edge_options.add_argument('--disable-extensions')
-            self.edge_options.add_argument('--disable-notifications')
-            self.edge_options.add_argument('--disable-features=TranslateUI')
-            
-            # 开启性能日志以捕获Network事件（Chromium驱动支持）
-            try:
-                self.edge_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
-            except Exception:
-                pass
-            
-            # 添加基本的首选项设置，保持简单
-            self.edge_options.add_experimental_option('prefs', {
-                'profile.default_content_setting_values': {
-                    'images': 1,
-                    'javascript': 1,
-                    'plugins': 1,  # 允许必要的插件
-                    'popups': 1,   # 允许必要的弹窗
-                    'notifications': 2,  # 阻止通知
-                },
-                # 移除了过于严格的内容设置异常规则
-                'profile.managed_default_content_settings': {
-                    'images': 1,
-                    'javascript': 1,
-                    'plugins': 1,
-                    'popups': 1,
-                    'notifications': 2
-                },
-                # 禁用站点隔离
-                'site-isolation-trial-opt-out': True
-                })
-        
         # 项目容量映射
         self.project_capacities = {
             1: {'dcCapacity': 5.9826, 'acCapacity': 4.77},    # 梁才宋滩
@@ -233,84 +195,62 @@ class ESolarScraper:
         }
     
     def __enter__(self):
-        """进入上下文管理器时初始化WebDriver"""
-        self.initialize_driver()
+        """进入上下文管理器时占用会话名额并初始化WebDriver"""
+        self.session_handle = self.governor.acquire_session(self.deadline)
+        try:
+            self.initialize_driver()
+        except Exception:
+            self.governor.release_session(self.session_handle)
+            self.session_handle = None
+            raise
         return self
     
     def __exit__(self, exc_type, exc_val, exc_tb):
          """退出上下文管理器时关闭WebDriver"""
          try:
              if self.driver:
-                 self.driver.quit()
-                 logger.info('WebDriver已关闭')
+                 self.driver_pool.release(self.driver)
+                 self.driver = None
+                 logger.info('WebDriver标签页已归还')
          except Exception as e:
              logger.warning(f'关闭WebDriver时发生异常: {e}')
+         self.governor.release_session(self.session_handle)
+         self.session_handle = None
     
-    def initialize_driver(self):
-        """初始化WebDriver，支持Chrome和Edge"""
+    def ensure_driver_alive(self):
+        """确保浏览器驱动仍然存活"""
+        if self.driver is None:
+            return False
         try:
-            if self.browser_type == 'chrome':
-                logger.info("初始化Chrome浏览器...")
-                
-                # 在CI环境中使用webdriver-manager自动管理ChromeDriver
-                if is_ci_environment():
-                    logger.info("CI环境：使用webdriver-manager自动管理ChromeDriver")
-                    service = ChromeService(ChromeDriverManager().install())
-                else:
-                    # 本地环境，尝试使用系统PATH中的ChromeDriver
-                    try:
-                        service = ChromeService()
-                        logger.info("使用系统PATH中的ChromeDriver")
-                    except Exception as e:
-                        logger.warning(f"系统PATH中的ChromeDriver不可用: {e}")
-                        logger.info("回退到webdriver-manager")
-                        service = ChromeService(ChromeDriverManager().install())
-                
-                # 初始化Chrome WebDriver
-                self.driver = webdriver.Chrome(
-                    service=service,
-                    options=self.chrome_options
-                )
-                
-            else:  # Edge
-                logger.info("初始化Edge浏览器...")
-                
-                # 获取当前脚本所在目录
-                script_dir = os.path.dirname(os.path.abspath(__file__))
-                # 假设msedgedriver.exe与脚本在同一目录
-                driver_path = os.path.join(script_dir, 'msedgedriver.exe')
-                service = None
-                
-                # 检查驱动文件是否存在
-                if os.path.exists(driver_path):
-                    # 使用指定路径的驱动
-                    service = EdgeService(driver_path)
-                    self.driver = webdriver.Edge(service=service, options=self.edge_options)
-                else:
-                    # 使用系统PATH中的驱动
-                    logger.info("未找到本地Edge驱动，将使用系统PATH中的驱动")
-                    self.driver = webdriver.Edge(options=self.edge_options)
-            
-            # 设置页面加载超时
-            self.driver.set_page_load_timeout(30)
-            # 设置脚本执行超时
-            self.driver.set_script_timeout(30)
-            # 设置隐式等待时间
-            self.driver.implicitly_wait(10)
-            
-            logger.info(f'{self.browser_type} WebDriver初始化成功')
-        except Exception as e:
-            logger.error(f'WebDriver初始化失败: {str(e)}')
-            raise
+            self.driver.execute_script('return 1 + 1;')
+            return True
+        except Exception:
+            return False
+
+    def initialize_driver(self):
+        """从驱动池租用浏览器标签页，并挂上月度图表接口响应的记录器"""
+        self.driver = self.driver_pool.acquire(
+            'esolar', self.browser_type,
+            timeouts={'page_load': 30, 'script': 30, 'implicit': 10}, profile='esolar'
+        )
+        self.resource_blocker.apply()
+        install_network_tracker(self.driver)
+        self.network_recorder = attach_recorder(self.driver, MONTH_CHART_CAPTURE)
+        logger.info(f'{self.browser_type} WebDriver标签页已就绪')
     
     def login(self):
         """登录ESolar系统"""
         try:
             if not self.driver:
                 self.initialize_driver()
+            
+            # 优先恢复保存的会话，校验失败时才执行界面登录
+            if restore_session(self, 'esolar'):
+                return True
                 
             # 访问登录页面
             logger.info(f'正在访问登录页面: https://esolar.tbecloud.com/login')
+            self.governor.throttle(deadline=self.deadline)
             self.driver.get('https://esolar.tbecloud.com/login')
             
             # 最大化浏览器窗口
@@ -441,8 +381,8 @@ class ESolarScraper:
                 
                 # 方式3: 检查是否存在登出按钮或其他登录后特有的元素
                 try:
-                    # 等待3秒让页面完全加载
-                    time.sleep(3)
+                    # 等待页面完全加载
+                    wait_for_page_ready(self.driver, budget=3, label='ESolar登录后首页加载', deadline=self.deadline)
                     
                     # 打印当前URL和页面标题，用于调试
                     current_url = self.driver.current_url
@@ -466,6 +406,10 @@ class ESolarScraper:
                 # 如果任一检测方式成功，认为登录成功
                 if login_success:
                     logger.info(f'登录成功')
+                    self.logged_in = True
+                    self.home_url = self.driver.current_url
+                    self.resource_blocker.log_stats('登录后首页')
+                    remember_session(self, 'esolar')
                     return True
                 else:
                     logger.warning('所有登录成功检测方式均失败，可能登录失败或页面结构与预期不同')
@@ -531,7 +475,9 @@ class ESolarScraper:
                         # 尝试直接移除模态框
                         logger.info("尝试直接通过JavaScript移除模态框元素")
                         self.driver.execute_script("arguments[0].remove();", modal)
-                        time.sleep(1)  # 给DOM一些时间来更新
+                        # 等待模态框从DOM中移除
+                        wait_until(lambda: self.driver.execute_script("return !arguments[0].isConnected;", modal),
+                                   budget=1, label='ESolar关闭模态框', deadline=self.deadline)
                         logger.info("通过JavaScript移除模态框成功")
                     except Exception as js_error:
                         logger.error(f"移除模态框失败: {js_error}")
@@ -545,31 +491,10 @@ class ESolarScraper:
     def _collect_tooltip_text(self):
         """收集ECharts悬浮提示文本，扩展选择器集合并按显示优先返回文本"""
         try:
-            selectors = [
-                "div.echarts-tooltip",
-                "div.echarts-tooltip-wrap",
-                "div.zr-tooltip",
-                "div.tooltip",
-                "div[class*='tooltip']",
-            ]
-            for sel in selectors:
-                try:
-                    el = self.driver.find_element(By.CSS_SELECTOR, sel)
-                    if el and el.is_displayed():
-                        txt = (el.text or "").strip()
-                        if not txt:
-                            try:
-                                html = (el.get_attribute('innerHTML') or '').strip()
-                                if html:
-                                    html = re.sub(r"<br\s*/?>", "\n", html, flags=re.I)
-                                    html = re.sub(r"<[^>]+>", "", html)
-                                    txt = html.strip()
-                            except Exception:
-                                pass
-                        if txt:
-                            return txt
-                except Exception:
-                    pass
+            # 整个选择器集合在浏览器中一次解析（文本为空时以去掉标签的innerHTML代替），只需一次驱动往返
+            hit = resolve_first(self.driver, TOOLTIP_SELECTORS, require='text', visible=True, html_fallback=True)
+            if hit:
+                return hit['text']
             # 回退：扫描所有div，筛选绝对定位且包含中文“发电量”的浮层
             tooltip = self.driver.execute_script(
                 r"""
@@ -727,137 +652,13 @@ class ESolarScraper:
         return None
 
     def _fetch_month_value_via_network(self, target_day):
-        """通过性能日志与CDP抓取网络JSON，解析目标日发电量(kWh)"""
-        try:
-            try:
-                self.driver.execute_cdp_cmd('Network.enable', {})
-            except Exception:
-                pass
-            time.sleep(0.6)
-            try:
-                logs = self.driver.get_log('performance')
-            except Exception:
-                logs = []
-            try:
-                logger.debug(f"performance logs captured: {len(logs)} entries")
-            except Exception:
-                pass
-            req_ids = []
-            urls = {}
-            for entry in logs:
-                try:
-                    data = json.loads(entry.get('message'))
-                    method = data.get('message', {}).get('method')
-                    params = data.get('message', {}).get('params', {})
-                    if method == 'Network.responseReceived':
-                        resp = params.get('response', {})
-                        mime = (resp.get('mimeType') or '').lower()
-                        rtype = (params.get('type') or '').lower()
-                        req_id = params.get('requestId')
-                        url = resp.get('url')
-                        if req_id and ('json' in mime or rtype in ('xhr','fetch')):
-                            req_ids.append(req_id)
-                            urls[req_id] = url
-                except Exception:
-                    continue
-            try:
-                logger.debug(f"candidate response ids: {len(req_ids)}; sample urls: { [urls.get(rid) for rid in req_ids[-3:]] }")
-            except Exception:
-                pass
-            for req_id in reversed(req_ids):
-                body_text = None
-                try:
-                    rb = self.driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': req_id})
-                    if rb and isinstance(rb, dict) and 'body' in rb:
-                        body_text = rb['body']
-                        if rb.get('base64Encoded'):
-                            try:
-                                body_text = base64.b64decode(body_text).decode('utf-8', errors='ignore')
-                            except Exception:
-                                pass
-                except Exception:
-                    continue
-                if not body_text:
-                    continue
-                # 调试：保存最近的响应体以便分析
-                try:
-                    if isinstance(self.screenshots_dir, str):
-                        p = os.path.join(self.screenshots_dir, 'last_network_payload.json')
-                        with open(p, 'w', encoding='utf-8') as f:
-                            f.write(body_text if isinstance(body_text, str) else str(body_text))
-                except Exception:
-                    pass
-                try:
-                    payload = json.loads(body_text)
-                except Exception:
-                    try:
-                        m = re.search(r"\{.*\}", body_text, re.S)
-                        payload = json.loads(m.group(0)) if m else None
-                    except Exception:
-                        payload = None
-                if not payload:
-                    continue
-                try:
-                    def pick_label(x):
-                        if x is None:
-                            return None
-                        s = str(x)
-                        m2 = re.search(r"(\d{1,2})", s)
-                        return int(m2.group(1)) if m2 else None
-                    stack = [payload]
-                    while stack:
-                        cur = stack.pop(0)
-                        if isinstance(cur, dict):
-                            xa = cur.get('xAxis')
-                            se = cur.get('series')
-                            if xa and se:
-                                xa0 = xa[0] if isinstance(xa, list) else xa
-                                xdata = xa0.get('data') if isinstance(xa0, dict) else None
-                                if isinstance(xdata, list):
-                                    idx = -1
-                                    for i, lab in enumerate(xdata):
-                                        n = pick_label(lab)
-                                        if n is not None and str(n) == str(target_day):
-                                            idx = i
-                                            break
-                                    # 若未找到目标日标签，则不进行回退到最后一条，保持idx为-1，后续将跳过该序列。
-                                    if idx < 0:
-                                        idx = -1
-                                    if isinstance(se, list) and idx >= 0:
-                                        for s in se:
-                                            data = s.get('data') if isinstance(s, dict) else None
-                                            name = str(s.get('name','')) if isinstance(s, dict) else ''
-                                            if isinstance(data, list) and len(data) > idx:
-                                                item = data[idx]
-                                                v = item.get('value') if isinstance(item, dict) else item
-                                                if isinstance(v, (int, float)):
-                                                    unit = None
-                                                    try:
-                                                        ya = cur.get('yAxis')
-                                                        ya0 = ya[0] if isinstance(ya, list) else ya
-                                                        axis_name = str(ya0.get('name','')) if isinstance(ya0, dict) else ''
-                                                        if re.search(r"MWh", axis_name, re.I):
-                                                            unit = 'MWh'
-                                                        elif re.search(r"kWh", axis_name, re.I):
-                                                            unit = 'kWh'
-                                                    except Exception:
-                                                        pass
-                                                    num = float(v)
-                                                    if unit == 'MWh':
-                                                        num *= 1000.0
-                                                    return round(num, 2)
-                            for v in cur.values():
-                                if isinstance(v, (dict, list)):
-                                    stack.append(v)
-                        elif isinstance(cur, list):
-                            for v in cur:
-                                if isinstance(v, (dict, list)):
-                                    stack.append(v)
-                except Exception:
-                    continue
-            return None
-        except Exception:
+        """从记录的接口响应中解析目标日发电量(kWh)：响应已到达时立即返回，否则等到请求完成"""
+        if self.network_recorder is None:
             return None
+        return self.network_recorder.wait_for(
+            'month_chart', since=self.capture_since, timeout=MONTH_CHART_RESPONSE_SECONDS,
+            parse=lambda entry: month_value_from_payload(entry['body'], target_day), deadline=self.deadline
+        )
 
     def _hover_day_via_echarts_pixel_map(self, target_day, chart_element=None):
         """使用ECharts的convertToPixel计算目标日柱状图的像素坐标，并执行精准悬停触发tooltip读取"""
@@ -1021,13 +822,9 @@ class ESolarScraper:
                             )
                         except Exception:
                             pass
-                        # 轮询tooltip
-                        tip = None
-                        for _ in range(6):
-                            time.sleep(0.18)
-                            tip = self._collect_tooltip_text()
-                            if tip:
-                                break
+                        # 等待tooltip出现
+                        tip = wait_until(self._collect_tooltip_text, budget=1.08, label='ESolar悬停提示框',
+                                         deadline=self.deadline, poll=0.18) or None
                         day_label = self._extract_day_from_tooltip_text(tip)
                         val = self._parse_generation_from_text(tip)
                         if isinstance(val, (int, float)) and (day_label is not None) and int(day_label) == int(target_day):
@@ -1182,7 +979,7 @@ class ESolarScraper:
                         pass
                     # 1) ActionChains原生悬停
                     ActionChains(self.driver).move_to_element_with_offset(chart, x, y).pause(0.6).perform()
-                    time.sleep(0.8)
+                    wait_until(self._collect_tooltip_text, budget=0.8, label='ESolar悬停提示框', deadline=self.deadline)
                     # 调试：保存悬停后的整页截图
                     try:
                         if isinstance(self.screenshots_dir, str):
@@ -1306,13 +1103,12 @@ class ESolarScraper:
                         """,
                         chart, abs_x, abs_y, day
                     )
-                    # 轮询等待tooltip出现（最多1.2秒，每200ms检查一次）
-                    tip2 = None
-                    for _ in range(6):
-                        time.sleep(0.20)
-                        tip2 = self._collect_tooltip_text()
-                        if tip2 or (time.time() - start_time > max_total):
-                            break
+                    # 等待tooltip出现（最多1.2秒，且不超过整体扫描时限）
+                    tip2 = wait_until(
+                        self._collect_tooltip_text,
+                        timeout=max(0.0, min(1.2, max_total - (time.time() - start_time))),
+                        budget=1.2, label='ESolar悬停提示框', deadline=self.deadline, poll=0.2
+                    ) or None
                     if tip2:
                         logger.debug(f"hover tip2: ({x},{y}) -> {tip2}")
                     day_label2 = self._extract_day_from_tooltip_text(tip2)
@@ -1353,8 +1149,8 @@ class ESolarScraper:
                                 except Exception:
                                     pass
                                 ActionChains(self.driver).move_to_element_with_offset(chart, x, int(height * y_frac)).pause(0.25).perform()
-                                time.sleep(0.35)
-                                tip3 = self._collect_tooltip_text()
+                                tip3 = wait_until(self._collect_tooltip_text, budget=0.35, label='ESolar悬停提示框',
+                                                  deadline=self.deadline) or ''
                                 if tip3:
                                     logger.debug(f"hover tip3: ({x},{int(height * y_frac)}) -> {tip3}")
                                 day_label3 = self._extract_day_from_tooltip_text(tip3)
@@ -1474,7 +1270,7 @@ class ESolarScraper:
                 chart = WebDriverWait(self.driver, 8).until(
                     EC.presence_of_element_located((By.CSS_SELECTOR, 'canvas[data-zr-dom-id]'))
                 )
-            day = target_day or (datetime.now() - timedelta(days=1)).day
+            day = target_day or parse_date(self.target_date).day
             # 计算大致坐标
             try:
                 info = self.driver.execute_script(
@@ -1522,9 +1318,9 @@ class ESolarScraper:
                     ActionChains(self.driver).move_to_element_with_offset(chart, x, int(height * y_frac)).pause(0.2).perform()
                 except Exception:
                     pass
-                time.sleep(0.2)
                 # 先尝试DOM tooltip文本
-                tip = self._collect_tooltip_text()
+                tip = wait_until(self._collect_tooltip_text, budget=0.2, label='ESolar悬停提示框',
+                                 deadline=self.deadline) or ''
                 if tip:
                     day_label = self._extract_day_from_tooltip_text(tip)
                     val = self._parse_generation_from_text(tip)
@@ -1579,20 +1375,22 @@ class ESolarScraper:
             
             logger.info('开始执行登录后的操作')
             
-            # 用户要求：点击anticon-caret-left元素
+            # 用户要求：点击anticon-caret-left元素（每点击一次向前翻一天，直到目标日期）
             try:
-                logger.info('尝试点击class=anticon-caret-left的元素')
+                days_back = days_before_today(self.target_date)
+                logger.info(f'尝试点击class=anticon-caret-left的元素 {days_back} 次以切换到 {self.target_date}')
                 # 尝试点击anticon-caret-left元素
                 try:
-                    anticon_element = WebDriverWait(self.driver, 10).until(
-                        EC.element_to_be_clickable((By.CLASS_NAME, 'anticon-caret-left'))
-                    )
-                    anticon_element.click()
+                    for _ in range(days_back):
+                        anticon_element = WebDriverWait(self.driver, 10).until(
+                            EC.element_to_be_clickable((By.CLASS_NAME, 'anticon-caret-left'))
+                        )
+                        anticon_element.click()
+                        # 等待切换日期后的数据请求完成
+                        wait_for_network_idle(self.driver, budget=2, label='ESolar切换日期', deadline=self.deadline)
                     logger.info('成功点击class=anticon-caret-left的元素')
-                    # 等待页面变化
-                    time.sleep(2)
-                    # 额外等待，确保页面与图表稳定
-                    time.sleep(5)
+                    # 等待图表重新渲染完成
+                    wait_for_chart_ready(self.driver, budget=5, label='ESolar图表渲染', deadline=self.deadline)
                 except Exception as e:
                     logger.error(f'点击class=anticon-caret-left元素失败: {str(e)}')
                 
@@ -1604,7 +1402,7 @@ class ESolarScraper:
                     )
                     # 确保图表元素可见
                     self.driver.execute_script("arguments[0].scrollIntoView(true);", chart)
-                    time.sleep(1)
+                    wait_for_element_stable(self.driver, chart, budget=1, label='ESolar图表滚动', deadline=self.deadline)
                     # 截取图表并保存到指定路径，命名为power_curve_6.png
                     chart_screenshot_path = os.path.join(self.screenshots_dir, 'power_curve_6.png')
                     chart.screenshot(chart_screenshot_path)
@@ -1613,11 +1411,11 @@ class ESolarScraper:
                     logger.error(f'截取canvas图表失败: {str(e)}')
                 # 新增：截图完成后，进入“estation”模块并切换“月”标签，提取本日发电量
                 try:
+                    self.deadline.check('月视图提取本日发电量')
                     dg = self.extract_daily_generation_via_station_menu()
                     self.extracted_daily_generation = dg
-                    target_date = datetime.now() - timedelta(days=1)
-                    target_day = target_date.day
-                    logger.info(f"通过estation模块提取到前一日({target_date.strftime('%Y-%m-%d')}, 日={target_day})发电量: {dg}")
+                    target_day = parse_date(self.target_date).day
+                    logger.info(f"通过estation模块提取到目标日({self.target_date}, 日={target_day})发电量: {dg}")
                 except Exception as nav_e:
                     logger.warning(f"导航至estation/月份页并提取本日发电量失败: {nav_e}")
             except Exception as e:
@@ -1643,6 +1441,9 @@ class ESolarScraper:
         """在截图完成后，点击左侧导航'estation'，点击项目项，再点击'月'标签，并尝试提取前一日发电量数值(kWh)。"""
         if not self.driver:
             raise RuntimeError('WebDriver未初始化')
+        # 只解析本次进入月视图之后到达的接口响应（补采多个日期时不会读到上一个日期的月份）
+        if self.network_recorder is not None:
+            self.capture_since = self.network_recorder.mark()
         wait = WebDriverWait(self.driver, 15)
         # 1) 点击左侧导航中的“电站/estation”模块（兼容中文和英文文案，并确保不在iframe中）
         try:
@@ -1694,7 +1495,7 @@ class ESolarScraper:
                 clicked = True
             except Exception:
                 pass
-        time.sleep(1)
+        wait_for_element(self.driver, 'div.ant-space-item', budget=1, label='ESolar电站菜单展开', deadline=self.deadline)
         # 2) 点击项目项（ant-space-item）。优先点击包含“零碳商业园”的项，否则点击第一个。
         station_item = None
         try:
@@ -1706,10 +1507,11 @@ class ESolarScraper:
         except Exception:
             pass
         station_item.click()
-        time.sleep(1)
-        # 等待页面加载五秒
-        logger.info('点击项目项后，等待页面加载五秒')
-        time.sleep(5)
+        # 等待电站页面加载完成
+        logger.info('点击项目项后，等待页面加载完成')
+        wait_for_page_ready(self.driver, budget=6, label='ESolar电站页面加载', deadline=self.deadline)
+        if self.deadline.expired('ESolar电站页面'):
+            return None
         # 3) 点击tab-switch下的“月”标签
         tab_switch = wait.until(EC.presence_of_element_located((By.CLASS_NAME, "tab-switch")))
         # 强化“月”标签的定位与点击策略
@@ -1757,7 +1559,8 @@ class ESolarScraper:
                 except Exception:
                     pass
 
-            time.sleep(0.6)
+            wait_until(lambda: 'active' in (month_tab.get_attribute('class') or ''),
+                       budget=0.6, label='ESolar月标签激活', deadline=self.deadline)
 
         # 4) 等待“月”变为激活态
         try:
@@ -1769,10 +1572,25 @@ class ESolarScraper:
                 self.driver.execute_script("arguments[0].classList.add('active');", month_tab)
             except Exception:
                 pass
-        time.sleep(1)
-        # 点击月标签后等待五秒
-        logger.info('点击月标签后，等待五秒')
-        time.sleep(5)
+        # 点击月标签后等待月度图表加载完成
+        logger.info('点击月标签后，等待月度图表加载完成')
+        wait_for_chart_ready(self.driver, budget=6, label='ESolar月度图表加载', deadline=self.deadline)
+        if self.deadline.expired('ESolar月度图表'):
+            return None
+        # 目标日期不在本月时，向前翻到目标月份
+        months_back = months_before_current(self.target_date)
+        if months_back > 0:
+            logger.info(f'目标日期 {self.target_date} 不在本月，向前翻 {months_back} 个月')
+            for _ in range(months_back):
+                try:
+                    WebDriverWait(self.driver, 10).until(
+                        EC.element_to_be_clickable((By.CLASS_NAME, 'anticon-caret-left'))
+                    ).click()
+                    wait_for_network_idle(self.driver, budget=2, label='ESolar切换月份', deadline=self.deadline)
+                except Exception as e:
+                    logger.warning(f'切换到上一个月失败: {e}')
+                    break
+            wait_for_chart_ready(self.driver, budget=3, label='ESolar月度图表加载', deadline=self.deadline)
         # 进入包含图表的iframe（若存在），先回到主文档再递归查找
         try:
             try:
@@ -1825,14 +1643,16 @@ class ESolarScraper:
                 pass
         except Exception:
             chart = None
-        target_day = (datetime.now() - timedelta(days=1)).day
-        # 优先兜底：通过Network日志抓取JSON并解析
+        target_day = parse_date(self.target_date).day
+        # 优先兜底：从记录的月度图表接口响应中解析
         try:
             val_net = self._fetch_month_value_via_network(target_day)
             if isinstance(val_net, (int, float)):
                 return round(float(val_net), 2)
         except Exception:
             pass
+        if self.deadline.expired('ECharts像素映射悬停'):
+            return None
         # 先尝试：基于ECharts像素映射的精准悬停读取
         try:
             val_pixel = self._hover_day_via_echarts_pixel_map(target_day, chart_element=chart)
@@ -1840,6 +1660,8 @@ class ESolarScraper:
                 return round(float(val_pixel), 2)
         except Exception:
             pass
+        if self.deadline.expired('ECharts读取脚本'):
+            return None
         # 执行ECharts读取脚本
         echarts_result = None
         try:
@@ -2037,15 +1859,19 @@ class ESolarScraper:
                 except Exception:
                     pass
 
+        if self.deadline.expired('悬停扫描'):
+            return None
         # 9) 兜底：悬停扫描尝试直接触发tooltip并解析
         try:
-            tg = (datetime.now() - timedelta(days=1)).day
+            tg = target_day
             val_hover = self.hover_scan_and_read_month_value(tg, chart_element=chart)
             if isinstance(val_hover, (int, float)):
                 return round(float(val_hover), 2)
         except Exception:
             pass
 
+        if self.deadline.expired('OCR兜底'):
+            return None
         # 9.1) OCR兜底：精确悬停后进行OCR解析
         try:
             val_ocr = self.ocr_read_chart_value_after_hover(target_day, chart_element=chart)
@@ -2054,6 +1880,8 @@ class ESolarScraper:
         except Exception:
             pass
 
+        if self.deadline.expired('区域DOM扫描'):
+            return None
         # 9.2) 区域DOM扫描：在图表容器附近搜寻数值+单位
         try:
             container = None
@@ -2083,7 +1911,7 @@ class ESolarScraper:
                     texts = arr
             except Exception:
                 pass
-            month = (datetime.now() - timedelta(days=1)).month
+            month = parse_date(self.target_date).month
             for t in texts:
                 m = re.search(r"([\d.,]+)\s*(kWh|MWh|Wh|度)", t, re.I)
                 if m:
@@ -2100,6 +1928,8 @@ class ESolarScraper:
         except Exception:
             pass
 
+        if self.deadline.expired('页面范围扫描'):
+            return None
         # 9.3) 页面范围扫描：全页查找包含单位的数值（最后一步前的回退）
         try:
             texts = []
@@ -2121,7 +1951,7 @@ class ESolarScraper:
                     texts = arr
             except Exception:
                 pass
-            month = (datetime.now() - timedelta(days=1)).month
+            month = parse_date(self.target_date).month
             for t in texts:
                 m = re.search(r"([\d.,]+)\s*(kWh|MWh|Wh|度)", t, re.I)
                 if m:
@@ -2138,10 +1968,12 @@ class ESolarScraper:
         except Exception:
             pass
 
+        if self.deadline.expired('DOM关键词扫描'):
+            return None
         # 10) 最终兜底：扫描DOM文本块关键词（昨日/昨天/上一日/前一日/上一天）
         try:
             blocks = self.driver.find_elements(By.XPATH, "//*[contains(text(),'昨日') or contains(text(),'昨天') or contains(text(),'上一日') or contains(text(),'前一日') or contains(text(),'上一天')]")
-            month = (datetime.now() - timedelta(days=1)).month
+            month = parse_date(self.target_date).month
             day_pat = re.compile(rf"(?:\\b|^)\\s*{target_day}\\s*日|{month}\\s*月\\s*{target_day}\\s*日")
             for b in blocks:
                 txt = (b.text or '').strip()
@@ -2162,6 +1994,33 @@ class ESolarScraper:
         return None
 
 
+    def collect_dates(self, dates, screenshots_dir_for_date):
+        """在同一登录会话中依次采集多个日期，返回 {日期: 本日发电量}"""
+        results = {}
+        for date_str in sorted({format_date(d) for d in dates}, reverse=True):
+            if self.deadline.expired(f'补采 {date_str}'):
+                results[date_str] = None
+                continue
+            self.target_date = date_str
+            self.screenshots_dir = screenshots_dir_for_date(date_str)
+            os.makedirs(self.screenshots_dir, exist_ok=True)
+            self.extracted_daily_generation = None
+            self.watchdog.check(f'补采 {date_str}')
+            try:
+                # 回到登录后的首页，使日期翻页从今天开始计数
+                if self.home_url:
+                    self.driver.switch_to.default_content()
+                    self.governor.throttle(deadline=self.deadline)
+                    self.driver.get(self.home_url)
+                    wait_for_page_ready(self.driver, budget=5, label='ESolar首页加载', deadline=self.deadline)
+                self.perform_post_login_actions()
+            except Exception as e:
+                logger.warning(f'补采日期 {date_str} 失败: {e}')
+            results[date_str] = self.extracted_daily_generation
+            logger.info(f'补采日期 {date_str} 本日发电量: {results[date_str]}')
+        return results
+
+
 def run_scraper():
     """运行ESolar系统爬虫并返回提取的项目数据"""
     try:
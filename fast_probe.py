@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+快速探测式元素查找：在隐式等待为0的状态下依次尝试候选选择器
+
+各爬虫的驱动设置了10~15秒的隐式等待，策略级联中每个不存在的选择器都会阻塞整个隐式等待时长。
+- zero_implicit_wait：临时把隐式等待设为0，退出时恢复（可嵌套）
+- probe / probe_first：不阻塞地查找单个或多个候选选择器
+- wait_for_any：确实需要等待时使用的显式等待（轮询候选选择器，直到任一出现或超时）
+- resolve_first：把整个候选列表连同要读取的属性、文本一次性交给浏览器解析，
+  一个级联只需一次 execute_script 往返
+
+驱动池租出的驱动会记录隐式等待下未命中的查找耗时（即浪费的时间），
+与快速探测的次数一起汇总在 probe_report() 中，每次运行结束时输出到日志。
+"""
+
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+# 未命中的查找耗时超过该值才视为被隐式等待阻塞
+BLOCKED_MISS_SECONDS = 0.5
+
+# 在浏览器中依次解析候选选择器，返回第一个满足条件的元素及其文本、属性
+RESOLVE_FIRST_JS = r"""
+const [candidates, attributes, require, pattern, visibleOnly, htmlFallback, root] = arguments;
+const scope = root || document;
+const regex = pattern ? new RegExp(pattern) : null;
+const isVisible = (el) => !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length);
+const textOf = (el) => {
+  let text = (el.innerText || '').trim();
+  if (!text && htmlFallback) {
+    text = (el.innerHTML || '').replace(/<br\s*\/?>/gi, '\n').replace(/<[^>]+>/g, '').trim();
+  }
+  return text;
+};
+for (let i = 0; i < candidates.length; i++) {
+  const [kind, selector] = candidates[i];
+  let nodes = [];
+  try {
+    if (kind === 'xpath') {
+      const found = document.evaluate(selector, scope, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+      for (let j = 0; j < found.snapshotLength; j++) { nodes.push(found.snapshotItem(j)); }
+    } else {
+      nodes = Array.from(scope.querySelectorAll(selector));
+    }
+  } catch (e) {
+    continue;
+  }
+  for (const el of nodes) {
+    if (visibleOnly && !isVisible(el)) { continue; }
+    const data = {index: i, element: el, text: textOf(el), attributes: {}};
+    for (const name of attributes) { data.attributes[name] = el.getAttribute(name); }
+    if (require) {
+      const value = require === 'text' ? data.text : data.attributes[require];
+      if (!value || (regex && !regex.test(value))) { continue; }
+    }
+    return data;
+  }
+}
+return null;
+"""
+
+
+def _to_js_candidate(by, selector):
+    """把Selenium的 (by, selector) 转换为浏览器端可解析的 ('css'|'xpath', 选择器)"""
+    if by == 'xpath':
+        return ['xpath', selector]
+    if by == 'css selector':
+        return ['css', selector]
+    if by == 'class name':
+        return ['css', '.' + selector]
+    if by == 'id':
+        return ['css', f'[id={json.dumps(selector)}]']
+    if by == 'name':
+        return ['css', f'[name={json.dumps(selector)}]']
+    if by == 'tag name':
+        return ['css', selector]
+    raise ValueError(f"批量解析不支持的定位方式: {by}")
+
+
+class LookupStats:
+    """本进程内的元素查找统计（线程安全）"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.counts = {'blocked_misses': 0, 'wasted_seconds': 0.0, 'probes': 0, 'probe_misses': 0, 'avoided_seconds': 0.0,
+                           'batches': 0, 'round_trips_saved': 0}
+
+    def add(self, **values):
+        with self.lock:
+            for key, value in values.items():
+                self.counts[key] += value
+
+    def report(self):
+        with self.lock:
+            report = dict(self.counts)
+        report['wasted_seconds'] = round(report['wasted_seconds'], 1)
+        report['avoided_seconds'] = round(report['avoided_seconds'], 1)
+        return report
+
+
+_stats = LookupStats()
+
+
+def reset_probe_stats():
+    _stats.reset()
+
+
+def probe_report():
+    return _stats.report()
+
+
+def merge_probe_report(report):
+    """并入其他进程（并发模式的工作进程）的统计结果"""
+    if report:
+        _stats.add(**{key: report.get(key, 0) for key in _stats.report()})
+
+
+def record_lookup_miss(seconds):
+    """驱动池在隐式等待下查找未命中时调用"""
+    if seconds >= BLOCKED_MISS_SECONDS:
+        _stats.add(blocked_misses=1, wasted_seconds=seconds)
+
+
+def log_probe_report(report=None):
+    report = report or probe_report()
+    if report['blocked_misses'] or report['probes'] or report.get('batches'):
+        logger.info(f"元素查找：隐式等待下未命中 {report['blocked_misses']} 次，浪费 {report['wasted_seconds']} 秒；"
+                    f"快速探测 {report['probes']} 次（未命中 {report['probe_misses']} 次，避免约 {report['avoided_seconds']} 秒等待）；"
+                    f"批量解析 {report.get('batches', 0)} 次，减少约 {report.get('round_trips_saved', 0)} 次驱动往返")
+    return report
+
+
+def configured_implicit_wait(driver):
+    """驱动当前配置的隐式等待秒数"""
+    timeouts = getattr(driver, 'timeouts', None)
+    if isinstance(timeouts, dict):
+        # 驱动池租约记录的超时设置
+        return timeouts.get('implicit', 0)
+    try:
+        return driver.timeouts.implicit_wait
+    except Exception:
+        return 0
+
+
+@contextmanager
+def zero_implicit_wait(driver):
+    """临时关闭隐式等待，退出时恢复原设置"""
+    depth = getattr(driver, '_fast_probe_depth', 0)
+    implicit = configured_implicit_wait(driver)
+    if depth == 0 and implicit:
+        driver.implicitly_wait(0)
+    driver._fast_probe_depth = depth + 1
+    try:
+        yield driver
+    finally:
+        driver._fast_probe_depth = depth
+        if depth == 0 and implicit:
+            try:
+                driver.implicitly_wait(implicit)
+            except Exception:
+                pass
+
+
+def _find_all(driver, by, selector, root, visible):
+    elements = (root or driver).find_elements(by, selector)
+    if visible:
+        elements = [element for element in elements if element.is_displayed()]
+    return elements
+
+
+def probe(driver, by, selector, root=None, visible=False):
+    """不阻塞地查找元素，未找到返回None；root为查找的起点元素（缺省为整个页面）"""
+    element, _ = probe_first(driver, [(by, selector)], root=root, visible=visible)
+    return element
+
+
+def probe_all(driver, by, selector, root=None, visible=False):
+    """不阻塞地查找全部匹配元素"""
+    with zero_implicit_wait(driver):
+        try:
+            elements = _find_all(driver, by, selector, root, visible)
+        except Exception:
+            elements = []
+    _stats.add(probes=1, probe_misses=0 if elements else 1,
+               avoided_seconds=0 if elements else configured_implicit_wait(driver))
+    return elements
+
+
+def probe_first(driver, candidates, root=None, visible=False):
+    """依次尝试候选 (by, selector)，返回 (第一个找到的元素, 命中的候选)；都未找到时返回 (None, None)"""
+    implicit = configured_implicit_wait(driver)
+    with zero_implicit_wait(driver):
+        for candidate in candidates:
+            try:
+                elements = _find_all(driver, candidate[0], candidate[1], root, visible)
+            except Exception:
+                elements = []
+            if elements:
+                _stats.add(probes=1)
+                return elements[0], candidate
+            _stats.add(probes=1, probe_misses=1, avoided_seconds=implicit)
+    return None, None
+
+
+def wait_for_any(driver, candidates, timeout=10, root=None, visible=False, label='元素', poll=0.2):
+    """显式等待候选选择器中任一出现，返回 (元素, 命中的候选)；超时返回 (None, None)"""
+    started = time.monotonic()
+    with zero_implicit_wait(driver):
+        while True:
+            for candidate in candidates:
+                try:
+                    elements = _find_all(driver, candidate[0], candidate[1], root, visible)
+                except Exception:
+                    elements = []
+                if elements:
+                    return elements[0], candidate
+            if time.monotonic() - started >= timeout:
+                logger.debug(f"等待{label}超时（{timeout} 秒）")
+                return None, None
+            time.sleep(poll)
+
+
+def resolve_first(driver, candidates, attributes=(), require=None, pattern=None, root=None,
+                  visible=False, html_fallback=False):
+    """一次往返解析候选选择器，返回第一个满足条件的结果；都未找到时返回None
+
+    结果为 {'index': 命中的候选序号, 'candidate': 命中的候选, 'element': 元素, 'text': 文本,
+    'attributes': {属性名: 值}}。require 为 'text' 或某个属性名时，只接受该值非空
+    （且匹配正则 pattern）的元素；html_fallback 为True时，innerText为空的元素以去掉标签的innerHTML作为文本。
+    """
+    attributes = list(attributes)
+    if require and require != 'text' and require not in attributes:
+        attributes.append(require)
+    js_candidates = [_to_js_candidate(by, selector) for by, selector in candidates]
+    try:
+        result = driver.execute_script(RESOLVE_FIRST_JS, js_candidates, attributes, require, pattern,
+                                       visible, html_fallback, root)
+    except Exception as e:
+        logger.debug(f"批量解析选择器失败: {str(e)}")
+        result = None
+    # 逐个候选查找并逐个读取属性时，每个候选、每个匹配元素的属性都需要单独往返
+    _stats.add(batches=1, round_trips_saved=max(len(candidates) * (1 + len(attributes)) - 1, 0))
+    if not result:
+        return None
+    result['candidate'] = candidates[result['index']]
+    return result
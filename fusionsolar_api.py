@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+华为FusionSolar接口客户端：复用浏览器登录会话，直接请求门户的JSON接口
+
+登录仍由浏览器完成（必要时包括验证码），之后把会话cookie转移到带连接池的 requests.Session，
+并作为令牌交给令牌管理器（token_manager）保存；会话在有效期内定期保活（请求会话接口），
+之后的运行直接用保存的cookie请求接口，保活失败时才通过无头浏览器重新登录。
+一次取得电站列表，再按电站与日期请求能量平衡接口，得到本日发电量与5分钟功率序列，
+不再为每个电站做页面导航、点击"前一日"和元素查找。功率序列只作为数据返回（写入 power_curve.data_points），
+不生成图片，已有的页面截图保持不变。接口请求失败或没有数据的电站仍由页面爬取兜底。
+
+设置 SOLAR_FUSIONSOLAR_API=0 可关闭。
+"""
+
+import os
+import time
+import logging
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from date_utils import format_date
+from rate_limiter import get_governor
+from token_manager import get_token_manager, manager_enabled
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+SESSION_PATH = '/unisess/v1/auth/session'
+STATION_LIST_PATH = '/rest/pvms/web/station/v1/station/station-list'
+ENERGY_BALANCE_PATH = '/rest/pvms/web/station/v1/overview/energy-balance'
+
+# 电站所在时区（接口按该时区的自然日统计）
+STATION_TIMEZONE = timezone(timedelta(hours=8))
+STATION_TIMEZONE_NAME = 'Asia/Shanghai'
+
+class FusionSolarAPIError(Exception):
+    """接口返回错误或会话已失效（例如被重定向到登录页）"""
+
+
+class FusionSolarSessionError(FusionSolarAPIError):
+    """会话已失效（HTTP 401/403、被重定向到登录页或取不到CSRF令牌）"""
+
+
+def api_enabled():
+    return os.environ.get('SOLAR_FUSIONSOLAR_API', '1') not in ('0', 'false', 'no')
+
+
+def to_number(value):
+    """接口中的数值可能是字符串或 '--'，无法解析时返回None"""
+    if value is None or value in ('', '--', '-'):
+        return None
+    try:
+        return float(str(value).replace(',', ''))
+    except ValueError:
+        return None
+
+
+def day_start_millis(date_str):
+    """电站时区中某天零点的毫秒时间戳"""
+    day = datetime.strptime(format_date(date_str), '%Y-%m-%d').replace(tzinfo=STATION_TIMEZONE)
+    return int(day.timestamp() * 1000)
+
+
+class FusionSolarAPI:
+    """复用浏览器会话的FusionSolar接口客户端"""
+
+    def __init__(self, base_url, session=None, timeout=20, governor=None, deadline=None):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.governor = governor
+        self.deadline = deadline
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.csrf_token = None
+        self.stations = None
+        # 会话被接口拒绝时置为True，由调用方让令牌管理器重新获取
+        self.session_rejected = False
+
+    @classmethod
+    def from_driver(cls, driver, **kwargs):
+        """从已登录的浏览器中取出门户地址、cookie与UA，创建客户端"""
+        parsed = urlparse(driver.current_url or '')
+        if not parsed.scheme or not parsed.netloc:
+            raise FusionSolarAPIError('浏览器当前页面不是FusionSolar门户')
+        client = cls(f"{parsed.scheme}://{parsed.netloc}", **kwargs)
+        try:
+            cookies = driver.execute_cdp_cmd('Network.getAllCookies', {}).get('cookies', [])
+        except Exception:
+            cookies = driver.get_cookies()
+        host = parsed.hostname or ''
+        copied = 0
+        for cookie in cookies:
+            domain = (cookie.get('domain') or '').lstrip('.')
+            # 只转移门户域名（及其上级域名）下的cookie
+            if domain and not host.endswith(domain):
+                continue
+            client.session.cookies.set(cookie['name'], cookie['value'], domain=cookie.get('domain'), path=cookie.get('path', '/'))
+            copied += 1
+        try:
+            user_agent = driver.execute_script('return navigator.userAgent;')
+        except Exception:
+            user_agent = None
+        client.session.headers.update({
+            'Accept': 'application/json, text/plain, */*',
+            'Referer': driver.current_url,
+            'Origin': client.base_url,
+            'X-Requested-With': 'XMLHttpRequest'
+        })
+        if user_agent:
+            client.session.headers['User-Agent'] = user_agent
+        logger.info(f"FusionSolar接口客户端已复用浏览器会话（{copied} 个cookie，{client.base_url}）")
+        return client
+
+    @classmethod
+    def from_token(cls, token, **kwargs):
+        """用令牌管理器保存的会话（export_token 的结果）创建客户端，不需要浏览器"""
+        client = cls(token['base_url'], **kwargs)
+        for cookie in token.get('cookies') or []:
+            client.session.cookies.set(cookie['name'], cookie['value'], domain=cookie.get('domain'), path=cookie.get('path', '/'))
+        client.session.headers.update({
+            'Accept': 'application/json, text/plain, */*',
+            'Referer': token.get('referer') or client.base_url + '/',
+            'Origin': client.base_url,
+            'X-Requested-With': 'XMLHttpRequest'
+        })
+        if token.get('user_agent'):
+            client.session.headers['User-Agent'] = token['user_agent']
+        return client
+
+    def export_token(self):
+        """导出会话（门户地址、cookie、UA），交给令牌管理器保存"""
+        return {
+            'base_url': self.base_url,
+            'cookies': [{'name': c.name, 'value': c.value, 'domain': c.domain, 'path': c.path} for c in self.session.cookies],
+            'user_agent': self.session.headers.get('User-Agent'),
+            'referer': self.session.headers.get('Referer')
+        }
+
+    def keepalive(self):
+        """请求会话接口以延长会话（服务端按最近一次请求计算闲置时间），返回更新cookie后的会话令牌"""
+        self.csrf_token = None
+        self.ensure_csrf()
+        return self.export_token()
+
+    def _throttle(self):
+        if self.governor is not None:
+            self.governor.throttle(deadline=self.deadline)
+
+    def _request(self, method, path, **kwargs):
+        if self.deadline is not None and self.deadline.expired(f'FusionSolar接口 {path}'):
+            raise FusionSolarAPIError('时间预算已耗尽')
+        self._throttle()
+        headers = kwargs.pop('headers', {})
+        if self.csrf_token:
+            headers['roarand'] = self.csrf_token
+        response = self.session.request(method, self.base_url + path, headers=headers, timeout=self.timeout, **kwargs)
+        if response.status_code in (401, 403):
+            raise FusionSolarSessionError(f'会话已失效（HTTP {response.status_code}）')
+        response.raise_for_status()
+        try:
+            payload = response.json()
+        except ValueError:
+            # 会话失效时接口返回登录页HTML
+            raise FusionSolarSessionError(f'{path} 没有返回JSON（可能已被重定向到登录页）')
+        if isinstance(payload, dict) and payload.get('success') is False:
+            raise FusionSolarAPIError(f"{path} 返回失败: {payload.get('failCode') or payload.get('message')}")
+        return payload
+
+    def ensure_csrf(self):
+        """读取会话的CSRF令牌（之后的请求放在roarand请求头中）"""
+        if self.csrf_token is None:
+            payload = self._request('GET', SESSION_PATH)
+            self.csrf_token = payload.get('csrfToken') if isinstance(payload, dict) else None
+            if not self.csrf_token:
+                raise FusionSolarSessionError('未取得CSRF令牌，会话可能已失效')
+        return self.csrf_token
+
+    def list_stations(self):
+        """返回 {电站名称: 电站DN}"""
+        if self.stations is None:
+            self.ensure_csrf()
+            payload = self._request('POST', STATION_LIST_PATH, json={
+                'curPage': 1,
+                'pageSize': 100,
+                'gridConnectedTime': '',
+                'queryTime': int(time.time() * 1000),
+                'timeZone': 8,
+                'sortId': 'createTime',
+                'sortDir': 'DESC',
+                'locale': 'zh_CN'
+            })
+            records = (payload.get('data') or {}).get('list') or []
+            self.stations = {r.get('stationName') or r.get('name'): r.get('dn') for r in records if r.get('dn')}
+            logger.info(f"FusionSolar接口返回 {len(self.stations)} 个电站")
+        return self.stations
+
+    def find_station(self, name):
+        """按名称查找电站DN：先精确匹配，再按包含关系匹配"""
+        stations = self.list_stations()
+        if name in stations:
+            return stations[name]
+        for station_name, dn in stations.items():
+            if station_name and (name in station_name or station_name in name):
+                return dn
+        return None
+
+    def energy_balance(self, station_dn, date_str):
+        """某电站某天的能量平衡数据（包含日发电量与5分钟功率序列）"""
+        self.ensure_csrf()
+        date_str = format_date(date_str)
+        payload = self._request('GET', ENERGY_BALANCE_PATH, params={
+            'stationDn': station_dn,
+            'timeDim': 2,
+            'queryTime': day_start_millis(date_str),
+            'timeZone': 8,
+            'timeZoneStr': STATION_TIMEZONE_NAME,
+            'dateStr': f'{date_str} 00:00:00',
+            '_': int(time.time() * 1000)
+        })
+        return payload.get('data') or {}
+
+    @staticmethod
+    def power_series(balance):
+        """把能量平衡数据中的功率序列转为 [{'time': 'HH:MM', 'value': kW}]（跳过空值）"""
+        points = []
+        for label, value in zip(balance.get('xAxis') or [], balance.get('productPower') or []):
+            value = to_number(value)
+            if value is None:
+                continue
+            points.append({'time': str(label)[-5:], 'value': round(value, 3)})
+        return points
+
+    def collect(self, projects, date_str, name_mapping=None):
+        """采集各项目某天的数据，返回 {项目ID: {'screenshot_path', 'daily_generation', 'power_curve', 'source'}}
+
+        只包含接口成功返回发电量的项目，其余项目由调用方用页面爬取兜底；接口结果没有截图（screenshot_path为None）。
+        """
+        results = {}
+        name_mapping = name_mapping or {}
+        for project in projects:
+            project_id = str(project['id'])
+            station_name = name_mapping.get(project['name'], project['name'])
+            try:
+                station_dn = self.find_station(station_name)
+                if not station_dn:
+                    logger.warning(f"FusionSolar接口中未找到电站 {station_name}")
+                    continue
+                balance = self.energy_balance(station_dn, date_str)
+            except FusionSolarAPIError as e:
+                if isinstance(e, FusionSolarSessionError):
+                    self.session_rejected = True
+                logger.warning(f"FusionSolar接口请求失败: {str(e)}，其余项目改用页面爬取")
+                break
+            except requests.RequestException as e:
+                logger.warning(f"FusionSolar接口请求 {station_name} 出错: {str(e)}")
+                continue
+            daily_generation = to_number(balance.get('totalProductPower'))
+            if daily_generation is None:
+                logger.info(f"FusionSolar接口没有 {station_name} {date_str} 的发电量")
+                continue
+            points = self.power_series(balance)
+            results[project_id] = {
+                'screenshot_path': None,
+                'daily_generation': daily_generation,
+                'power_curve': points,
+                'source': 'api'
+            }
+            logger.info(f"FusionSolar接口: {project['name']} {date_str} 本日发电量 {daily_generation} kWh，功率点 {len(points)} 个")
+        return results
+
+
+def browser_login_token(account, password):
+    """通过无头浏览器登录FusionSolar并导出会话（会话无法保活时的兜底），失败时返回None"""
+    # 延迟导入：huawei_scraper 依赖本模块
+    from huawei_scraper import HuaweiFusionSolarScraper
+    with HuaweiFusionSolarScraper(account, password, [], headless=True) as scraper:
+        if not (scraper.logged_in or scraper.login()):
+            return None
+        return FusionSolarAPI.from_driver(scraper.driver).export_token()
+
+
+def token_manager(account, password=None):
+    """华为的令牌管理器：刷新时保活保存的会话，会话已失效时无头浏览器登录"""
+    governor = get_governor('huawei', account)
+    refresh = lambda current: FusionSolarAPI.from_token(current, governor=governor).keepalive() if current else None
+    login = (lambda: browser_login_token(account, password)) if password else None
+    return get_token_manager('huawei', account, refresh=refresh, login=login)
+
+
+def fetch_token(account, password=None, allow_login=True, deadline=None):
+    """令牌管理器中的华为会话（必要时保活或登录，等待刷新不超过deadline），令牌管理关闭时返回None"""
+    if not manager_enabled():
+        return None
+    return token_manager(account, password).get(allow_login=allow_login, deadline=deadline)
+
+
+def collect_with_token(account, password, projects, dates, name_mapping=None, allow_login=True, **kwargs):
+    """不启动浏览器（allow_login为True且会话无法保活时才无头登录），用令牌管理器保存的会话采集各项目多个日期，
+    返回 {日期: {项目ID: 结果}}；会话被拒绝时重新获取后再采集一次尚缺的日期（不允许登录时没有新会话，直接返回）"""
+    results = {}
+    pending = [format_date(d) for d in dates]
+    if not api_enabled():
+        return results
+    for attempt in range(2):
+        token = fetch_token(account, password, allow_login, kwargs.get('deadline'))
+        if not token:
+            break
+        client = FusionSolarAPI.from_token(token, **kwargs)
+        for date_str in pending:
+            items = client.collect(projects, date_str, name_mapping)
+            if items:
+                results.setdefault(date_str, {}).update(items)
+            if client.session_rejected:
+                break
+        if not client.session_rejected:
+            break
+        token_manager(account, password).invalidate(token)
+        pending = [d for d in pending if len(results.get(d, {})) < len(projects)]
+        if not pending:
+            break
+    return results
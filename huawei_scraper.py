@@ -7,20 +7,27 @@ import platform
 import subprocess
 import sys
 import io
+import re
 from PIL import Image
 from selenium import webdriver
-from selenium.webdriver.edge.service import Service as EdgeService
-from selenium.webdriver.chrome.service import Service as ChromeService
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.common.action_chains import ActionChains
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.edge.options import Options as EdgeOptions
-from selenium.webdriver.chrome.options import Options as ChromeOptions
-from webdriver_manager.chrome import ChromeDriverManager
-from webdriver_manager.microsoft import EdgeChromiumDriverManager
 import urllib3
+from date_utils import format_date, days_before_today
+from run_budget import unlimited
+from rate_limiter import get_governor
+from driver_pool import get_default_pool, build_browser_options
+from session_vault import restore_session, remember_session
+from resource_blocking import ResourceBlocker
+from driver_watchdog import DriverWatchdog
+from fusionsolar_api import FusionSolarAPI, api_enabled, token_manager
+from readiness import (install_network_tracker, wait_until, wait_for_page_ready, wait_for_network_idle,
+                       wait_for_url_change, wait_for_element, wait_for_element_stable,
+                       wait_for_chart_ready, wait_for_tooltips_hidden)
+from fast_probe import zero_implicit_wait, wait_for_any, resolve_first
 
 # 禁用SSL验证警告
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -30,6 +37,53 @@ logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# 本日发电量与发电曲线所在的区域（不同电站页面结构不同）
+ENERGY_ROOTS = [
+    (By.CLASS_NAME, 'nco-single-energy-body'),
+    (By.CLASS_NAME, 'nco-energy-trends-body')
+]
+
+# 项目名称映射 - 根据华为网站实际电站名称映射
+PROJECT_NAME_MAPPING = {
+    '滨北南邱': '滨北南邱家村',
+    '水立方': '新鼎水立方',
+    '宋滩': '新鼎宋滩电站',
+    '李赞皇': '新鼎李赞皇光伏电站'
+}
+
+# 本日发电量所在元素（class=value且带title属性）的候选定位方式，按顺序尝试
+GENERATION_TITLE_CANDIDATES = [
+    (By.CSS_SELECTOR, '.nco-single-energy-body [class*="value"][title]'),
+    (By.XPATH, "//div[contains(@class, 'nco-single-energy-body')]//*[contains(@class, 'value') and @title]")
+]
+
+# 发电曲线截图区域的候选定位方式：能量管理区域内的图表容器、其中第一个canvas的父容器、原始定位
+CHART_TARGET_CANDIDATES = [
+    (By.XPATH, "//h3[contains(text(), '能量管理')]/ancestor::div[contains(@class, 'business-station-overview-content')]"
+               "//div[contains(@class, 'chart-container') or contains(@class, 'chart-wrapper')]"),
+    (By.XPATH, "(//h3[contains(text(), '能量管理')]/ancestor::div[contains(@class, 'business-station-overview-content')]"
+               "//canvas)[1]/.."),
+    (By.CLASS_NAME, 'nco-single-energy-body'),
+    (By.CLASS_NAME, 'echarts-for-react')
+]
+CHART_TARGET_LABELS = ['能量管理区域的图表容器', '能量管理区域canvas的父容器', 'nco-single-energy-body根元素', 'echarts-for-react元素']
+
+# 数值中至少包含一位数字
+NUMBER_PATTERN = r'\d'
+
+
+def parse_generation(text):
+    """从文本中提取发电量数值（支持千位分隔符），没有数字时返回None"""
+    match = re.search(r'([\d,]+(?:\.\d+)?)', text or '')
+    if not match:
+        return None
+    try:
+        # 去除千位分隔符后转换为浮点数
+        return float(match.group(1).replace(',', ''))
+    except ValueError:
+        return None
+
+
 def is_ci_environment():
     """检测是否在CI环境中运行"""
     return (
@@ -40,8 +94,13 @@ def is_ci_environment():
     )
 
 class HuaweiFusionSolarScraper:
-    def __init__(self, username, password, projects, screenshots_dir='screenshots', headless=False, retry_attempts=3):
-        """初始化爬虫"""
+    def __init__(self, username, password, projects, screenshots_dir='screenshots', headless=False, retry_attempts=3, target_date=None, deadline=None, driver_pool=None):
+        """初始化爬虫
+
+        target_date: 目标日期（'YYYY-MM-DD'），默认为昨天
+        deadline: run_budget.Deadline，预算耗尽时停止后续项目并返回已获取的部分结果
+        driver_pool: driver_pool.DriverPool，默认使用本进程共用的驱动池
+        """
         self.username = username
         self.password = password
         self.projects = projects  # 项目列表，格式: [{'name': '项目名称', 'id': '项目ID'}]
@@ -49,6 +108,21 @@ class HuaweiFusionSolarScraper:
         self.driver = None
         self.headless = headless  # 默认设为False以便调试
         self.retry_attempts = retry_attempts
+        self.target_date = format_date(target_date)
+        self.deadline = deadline or unlimited('huawei')
+        # 登录状态与登录后的首页地址（常驻会话复用时用于回到首页）
+        self.logged_in = False
+        self.home_url = None
+        # 请求限速与浏览器会话名额（多进程/多机器共享）
+        self.governor = get_governor('huawei', username)
+        self.session_handle = None
+        self.driver_pool = driver_pool or get_default_pool()
+        # 只需要数值的页面不加载字体、地图与统计脚本，截图阶段临时恢复
+        self.resource_blocker = ResourceBlocker(self, 'huawei')
+        # 浏览器无响应或内存超限时回收重建，恢复登录后从当前电站继续
+        self.watchdog = DriverWatchdog(self, 'huawei', self.start_browser)
+        # 当前电站页面相对今天已向前翻的天数（导航到电站后重置为0）
+        self.current_day_offset = 0
         
         # 确保截图目录存在
         os.makedirs(self.screenshots_dir, exist_ok=True)
@@ -60,71 +134,8 @@ class HuaweiFusionSolarScraper:
         self.browser_type = 'chrome' if ci_env else 'edge'
         logger.info(f"检测到{'CI' if ci_env else '本地'}环境，将使用{self.browser_type}浏览器")
         
-        # 配置浏览器选项
-        if self.browser_type == 'chrome':
-            self.chrome_options = ChromeOptions()
-            
-            # CI环境配置
-            if ci_env or self.headless:
-                logger.info("启用无头模式")
-                self.chrome_options.add_argument('--headless')
-                self.chrome_options.add_argument('--no-sandbox')
-                self.chrome_options.add_argument('--disable-dev-shm-usage')
-                self.chrome_options.add_argument('--disable-gpu')
-                self.chrome_options.add_argument('--remote-debugging-port=9222')
-            
-            # 基本配置
-            self.chrome_options.add_argument('--disable-blink-features=AutomationControlled')
-            self.chrome_options.add_argument('--disable-extensions')
-            self.chrome_options.add_argument('--disable-notifications')
-            self.chrome_options.add_argument('--window-size=1920,1080')
-            
-            # SSL相关配置
-            self.chrome_options.add_argument('--ignore-certificate-errors')
-            self.chrome_options.add_argument('--allow-insecure-localhost')
-            self.chrome_options.add_argument('--ssl-protocol=any')
-            self.chrome_options.add_argument('--disable-web-security')
-            
-            # 用户代理
-            self.chrome_options.add_argument('user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36')
-            
-            # 添加DNS服务器设置，解决域名解析问题
-            self.chrome_options.add_argument('--dns-servers=8.8.8.8,8.8.4.4')
-            
-            # 实验性选项
-            self.chrome_options.add_experimental_option('excludeSwitches', ['enable-automation'])
-            self.chrome_options.add_experimental_option('useAutomationExtension', False)
-            
-        else:  # Edge
-            self.edge_options = EdgeOptions()
-            
-            # 无头模式配置
-            if self.headless:
-                logger.info("启用无头模式")
-                self.edge_options.add_argument('--headless')
-                self.edge_options.add_argument('--window-size=1920,1080')
-            
-            # 基本配置
-            self.edge_options.add_argument('--disable-gpu')
-            self.edge_options.add_argument('--no-sandbox')
-            self.edge_options.add_argument('--disable-dev-shm-usage')
-            self.edge_options.add_argument('--window-size=1920,1080')
-            
-            # SSL相关配置
-            self.edge_options.add_argument('--ignore-certificate-errors')
-            self.edge_options.add_argument('--allow-insecure-localhost')
-            self.edge_options.add_argument('--ssl-protocol=any')
-            self.edge_options.add_argument('--disable-web-security')
-            
-            # 禁用自动化控制特征
-            self.edge_options.add_argument('--disable-blink-features=AutomationControlled')
-            
-            # 增加用户代理，使用与当前浏览器匹配的UA
-            self.edge_options.add_argument('user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36 Edg/124.0.0.0')
-            
-            # 实验性选项
-            self.edge_options.add_experimental_option('excludeSwitches', ['enable-automation'])
-            self.edge_options.add_experimental_option('useAutomationExtension', False)
+        # 各爬虫共用的浏览器参数（IP映射与代理回退时在此基础上追加参数）
+        self.chrome_options = build_browser_options(self.browser_type, headless=self.headless or None)
         
         # 配置日志
         self.setup_logging()
@@ -157,95 +168,24 @@ class HuaweiFusionSolarScraper:
             logger.warning(f"无法获取Edge浏览器版本: {str(e)}")
     
     def __enter__(self):
-        """启动浏览器"""
-        attempt = 0
-        max_attempts = self.retry_attempts
-        
-        while attempt < max_attempts:
-            try:
-                attempt += 1
-                logger.info(f"第 {attempt}/{max_attempts} 次尝试启动浏览器...")
-                
-                if self.browser_type == 'chrome':
-                    logger.info("初始化Chrome浏览器...")
-                    
-                    # 在CI环境中使用webdriver-manager自动管理ChromeDriver
-                    if is_ci_environment():
-                        logger.info("CI环境：使用webdriver-manager自动管理ChromeDriver")
-                        service = ChromeService(ChromeDriverManager().install())
-                    else:
-                        # 本地环境，尝试使用系统PATH中的ChromeDriver
-                        try:
-                            service = ChromeService()
-                            logger.info("使用系统PATH中的ChromeDriver")
-                        except Exception as e:
-                            logger.warning(f"系统PATH中的ChromeDriver不可用: {e}")
-                            logger.info("回退到webdriver-manager")
-                            service = ChromeService(ChromeDriverManager().install())
-                    
-                    # 初始化Chrome WebDriver
-                    self.driver = webdriver.Chrome(
-                        service=service,
-                        options=self.chrome_options
-                    )
-                    
-                else:  # Edge
-                    logger.info("初始化Edge浏览器...")
-                    
-                    # 尝试使用本地的msedgedriver.exe，但在不存在时回退到系统PATH中的驱动
-                    driver_path = os.path.join(os.getcwd(), 'msedgedriver.exe')
-                    service = None
-                    
-                    # 检查驱动是否存在
-                    if os.path.exists(driver_path):
-                        logger.info(f"使用Edge驱动路径: {driver_path}")
-                        # 创建服务对象并配置
-                        service = EdgeService(
-                            driver_path,
-                            log_output=os.path.join(os.getcwd(), 'msedgedriver.log')  # 启用驱动日志
-                        )
-                    else:
-                        logger.info("未找到本地Edge驱动，将使用系统PATH中的驱动")
-                        # 不指定驱动路径，让Selenium自动查找系统PATH中的驱动
-                        service = EdgeService(log_output=os.path.join(os.getcwd(), 'msedgedriver.log'))
-                    
-                    # 设置服务日志级别
-                    service.log_level = 'INFO'
-                    
-                    # 初始化WebDriver
-                    self.driver = webdriver.Edge(
-                        service=service,
-                        options=self.edge_options
-                    )
-                
-                # 设置页面加载超时
-                self.driver.set_page_load_timeout(60)
-                # 设置脚本超时
-                self.driver.set_script_timeout(60)
-                # 设置隐式等待时间
-                self.driver.implicitly_wait(15)
-                
-                logger.info(f"{self.browser_type}浏览器初始化成功")
-                
-                # 设置额外的执行环境
-                self.driver.execute_cdp_cmd(
-                    "Page.addScriptToEvaluateOnNewDocument",
-                    {"source": "Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"}
-                )
-                
-                return self
-            except Exception as e:
-                logger.error(f"浏览器启动失败 (尝试 {attempt}/{max_attempts}): {str(e)}")
-                
-                # 如果是最后一次尝试，抛出异常
-                if attempt >= max_attempts:
-                    logger.error("达到最大尝试次数，浏览器启动失败")
-                    raise
-                
-                # 否则等待一段时间后重试
-                wait_time = 2 * attempt  # 递增等待时间
-                logger.info(f"{wait_time}秒后重试...")
-                time.sleep(wait_time)
+        """占用会话名额并启动浏览器"""
+        self.session_handle = self.governor.acquire_session(self.deadline)
+        try:
+            return self.start_browser()
+        except Exception:
+            self.governor.release_session(self.session_handle)
+            self.session_handle = None
+            raise
+    
+    def start_browser(self):
+        """从驱动池租用浏览器标签页（浏览器进程由各爬虫共用，启动重试在驱动池中完成）"""
+        self.driver = self.driver_pool.acquire(
+            'huawei', self.browser_type, headless=self.headless or None,
+            timeouts={'page_load': 60, 'script': 60, 'implicit': 15}, profile='huawei'
+        )
+        self.resource_blocker.apply()
+        install_network_tracker(self.driver)
+        return self
     
     def ensure_driver_alive(self):
         """确保驱动会话仍然有效"""
@@ -262,16 +202,27 @@ class HuaweiFusionSolarScraper:
             return False
     
     def __exit__(self, exc_type, exc_val, exc_tb):
-        """关闭浏览器"""
-        if self.driver:
-            self.driver.quit()
+        """关闭浏览器并释放会话名额"""
+        try:
+            if self.driver:
+                self.driver_pool.release(self.driver)
+                self.driver = None
+        finally:
+            self.governor.release_session(self.session_handle)
+            self.session_handle = None
     
     def login(self):
         """登录华为FusionSolar网站"""
+        # 优先恢复保存的会话，校验失败时才执行界面登录
+        if restore_session(self, 'huawei'):
+            return True
+        
         attempt = 0
         max_attempts = self.retry_attempts
         
         while attempt < max_attempts:
+            if self.deadline.expired('登录'):
+                return False
             try:
                 attempt += 1
                 logger.info(f"第 {attempt}/{max_attempts} 次尝试登录华为FusionSolar网站...")
@@ -335,6 +286,7 @@ class HuaweiFusionSolarScraper:
                 for url in domain_urls:
                     try:
                         logger.info(f"尝试访问登录页面: {url}")
+                        self.governor.throttle(deadline=self.deadline)
                         self.driver.get(url)
                         logger.info(f"登录页面请求已发送: {url}")
                         login_url = url
@@ -413,6 +365,7 @@ class HuaweiFusionSolarScraper:
                             
                             # 使用原始域名访问（但会被映射到IP地址）
                             logger.info(f"使用IP映射尝试访问: https://{domain}")
+                            self.governor.throttle(deadline=self.deadline)
                             self.driver.get(f'https://{domain}')
                             
                             logger.info(f"成功使用IP地址 {ip} 访问 {domain}")
@@ -491,6 +444,7 @@ class HuaweiFusionSolarScraper:
                             # 尝试使用代理服务器访问
                             proxy_login_url = 'https://intl.fusionsolar.huawei.com'
                             logger.info(f"使用代理服务器尝试访问: {proxy_login_url}")
+                            self.governor.throttle(deadline=self.deadline)
                             self.driver.get(proxy_login_url)
                             logger.info(f"使用代理服务器访问登录页面请求已发送: {proxy_login_url}")
                             login_url = proxy_login_url
@@ -506,7 +460,7 @@ class HuaweiFusionSolarScraper:
                 
                 # 等待登录页面加载完成
                 logger.info("等待页面加载完成...")
-                time.sleep(10)  # 增加等待时间确保完全加载
+                wait_for_page_ready(self.driver, budget=10, label='华为登录页加载', deadline=self.deadline)
                 
                 # 打印当前页面标题和URL用于调试
                 try:
@@ -573,7 +527,7 @@ class HuaweiFusionSolarScraper:
                     # 如果不是最后一次尝试，继续
                     if attempt < max_attempts:
                         logger.info(f"{2*attempt}秒后重试登录...")
-                        time.sleep(2*attempt)
+                        self.deadline.sleep(2*attempt)
                         continue
                     return False
                 
@@ -706,7 +660,7 @@ class HuaweiFusionSolarScraper:
                     # 如果不是最后一次尝试，继续
                     if attempt < max_attempts:
                         logger.info(f"{2*attempt}秒后重试登录...")
-                        time.sleep(2*attempt)
+                        self.deadline.sleep(2*attempt)
                         continue
                     return False
                 
@@ -811,13 +765,13 @@ class HuaweiFusionSolarScraper:
                     # 如果不是最后一次尝试，继续
                     if attempt < max_attempts:
                         logger.info(f"{2*attempt}秒后重试登录...")
-                        time.sleep(2*attempt)
+                        self.deadline.sleep(2*attempt)
                         continue
                     return False
                 
                 # 等待登录成功并跳转到主页
                 logger.info("等待登录响应...")
-                time.sleep(15)  # 增加等待时间
+                wait_for_url_change(self.driver, excluded='login', budget=15, label='华为登录跳转', deadline=self.deadline)
                 
                 # 检查是否登录成功
                 current_url = None
@@ -844,6 +798,10 @@ class HuaweiFusionSolarScraper:
                 
                 if success:
                     logger.info("登录成功！")
+                    self.logged_in = True
+                    self.home_url = current_url
+                    self.resource_blocker.log_stats('登录后首页')
+                    remember_session(self, 'huawei')
                     return True
                 else:
                     logger.warning("登录可能未成功，URL中仍包含'login'或标题未变化")
@@ -861,7 +819,7 @@ class HuaweiFusionSolarScraper:
                     # 如果不是最后一次尝试，继续
                     if attempt < max_attempts:
                         logger.info(f"{2*attempt}秒后重试登录...")
-                        time.sleep(2*attempt)
+                        self.deadline.sleep(2*attempt)
                         continue
                     return False
             except Exception as e:
@@ -870,7 +828,7 @@ class HuaweiFusionSolarScraper:
                 logger.info("尝试滚动页面并重新查找元素...")
                 try:
                     self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                    time.sleep(3)
+                    wait_for_network_idle(self.driver, budget=3, label='华为登录错误页滚动', deadline=self.deadline)
                 except:
                     pass
                 
@@ -885,7 +843,7 @@ class HuaweiFusionSolarScraper:
                 # 如果不是最后一次尝试，继续
                 if attempt < max_attempts:
                     logger.info(f"{2*attempt}秒后重试登录...")
-                    time.sleep(2*attempt)
+                    self.deadline.sleep(2*attempt)
                     continue
                 return False
         # 所有尝试都失败
@@ -893,25 +851,25 @@ class HuaweiFusionSolarScraper:
         return False
     
     def navigate_to_project(self, project_name):
-        """导航到指定项目"""
+        """导航到指定项目（各查找策略在隐式等待为0的状态下执行，未命中时不再阻塞）"""
+        with zero_implicit_wait(self.driver):
+            return self._navigate_to_project(project_name)
+
+    def _navigate_to_project(self, project_name):
         try:
             logger.info(f"导航到项目: {project_name}")
             
-            # 项目名称映射字典 - 根据华为网站实际项目名称映射
-            project_name_mapping = {
-                '滨北南邱': '滨北南邱家村',
-                '水立方': '新鼎水立方',
-                '宋滩': '新鼎宋滩电站',
-                '李赞皇': '新鼎李赞皇光伏电站'
-            }
-            
             # 获取映射后的项目名称
-            mapped_project_name = project_name_mapping.get(project_name, project_name)
+            mapped_project_name = PROJECT_NAME_MAPPING.get(project_name, project_name)
             if mapped_project_name != project_name:
                 logger.info(f"映射项目名称: {project_name} -> {mapped_project_name}")
             
-            # 等待项目列表加载
-            time.sleep(8)  # 增加等待时间
+            # 等待项目列表加载，并显式等待项目树或项目名称出现（代替原来每次查找的隐式等待）
+            wait_for_page_ready(self.driver, budget=8, label='华为项目列表加载', deadline=self.deadline)
+            wait_for_any(self.driver, [
+                (By.CLASS_NAME, 'nco-station-left-tree-wrapper'),
+                (By.XPATH, f"//*[contains(text(), '{mapped_project_name}') or contains(text(), '{project_name}')]")
+            ], timeout=15, label='华为项目列表')
             
             # 记录当前页面状态用于调试
             try:
@@ -939,7 +897,7 @@ class HuaweiFusionSolarScraper:
                                 logger.info(f"找到显示的匹配元素: '{element.text}'")
                                 # 滚动到元素可见
                                 self.driver.execute_script("arguments[0].scrollIntoView(true);", element)
-                                time.sleep(2)
+                                wait_for_element_stable(self.driver, element, budget=2, label='华为项目节点滚动', deadline=self.deadline)
                                 # 尝试点击
                                 try:
                                     element.click()
@@ -947,7 +905,7 @@ class HuaweiFusionSolarScraper:
                                     self.driver.execute_script("arguments[0].click();", element)
                                 
                                 logger.info(f"成功选择项目: 新鼎宋滩电站")
-                                time.sleep(5)
+                                wait_for_page_ready(self.driver, budget=5, label='华为电站页面加载', deadline=self.deadline)
                                 return True
                         except Exception as e:
                             logger.warning(f"处理元素时出错: {str(e)}")
@@ -991,7 +949,7 @@ class HuaweiFusionSolarScraper:
                                 logger.info(f"找到匹配的项目节点: '{element_text}'")
                                 # 滚动到元素可见
                                 self.driver.execute_script("arguments[0].scrollIntoView(true);", element)
-                                time.sleep(2)
+                                wait_for_element_stable(self.driver, element, budget=2, label='华为项目节点滚动', deadline=self.deadline)
                                 # 等待元素可点击
                                 WebDriverWait(self.driver, 15).until(
                                     EC.element_to_be_clickable(element)
@@ -1004,7 +962,7 @@ class HuaweiFusionSolarScraper:
                                     self.driver.execute_script("arguments[0].click();", element)
                                 
                                 logger.info(f"成功选择项目: {project_name} (匹配: {element_text})")
-                                time.sleep(5)  # 增加等待时间让页面加载
+                                wait_for_page_ready(self.driver, budget=5, label='华为电站页面加载', deadline=self.deadline)
                                 return True
                         except Exception as e:
                             logger.warning(f"处理项目节点时出错: {str(e)}")
@@ -1029,10 +987,10 @@ class HuaweiFusionSolarScraper:
                             logger.info(f"在内容区找到匹配项目: '{element_text}'")
                             # 滚动到元素可见
                             self.driver.execute_script("arguments[0].scrollIntoView(true);", element)
-                            time.sleep(2)
+                            wait_for_element_stable(self.driver, element, budget=2, label='华为项目节点滚动', deadline=self.deadline)
                             element.click()
                             logger.info(f"成功选择项目: {project_name} (匹配: {element_text})")
-                            time.sleep(3)
+                            wait_for_page_ready(self.driver, budget=3, label='华为电站页面加载', deadline=self.deadline)
                             return True
                     except Exception as e:
                         continue
@@ -1054,14 +1012,14 @@ class HuaweiFusionSolarScraper:
                             logger.info(f"找到显示的匹配元素: '{element.text}'")
                             # 滚动到元素可见
                             self.driver.execute_script("arguments[0].scrollIntoView(true);", element)
-                            time.sleep(2)
+                            wait_for_element_stable(self.driver, element, budget=2, label='华为项目节点滚动', deadline=self.deadline)
                             # 尝试点击
                             try:
                                 element.click()
                             except:
                                 self.driver.execute_script("arguments[0].click();", element)
                             logger.info(f"成功选择项目: {project_name} (匹配: {element.text})")
-                            time.sleep(3)
+                            wait_for_page_ready(self.driver, budget=3, label='华为电站页面加载', deadline=self.deadline)
                             return True
                     except Exception as e:
                         continue
@@ -1078,7 +1036,12 @@ class HuaweiFusionSolarScraper:
             return False
     
     def extract_daily_generation(self):
-        """提取本日发电量数据"""
+        """提取本日发电量数据（各策略在隐式等待为0的状态下依次尝试，只显式等待数值所在区域出现）"""
+        with zero_implicit_wait(self.driver):
+            wait_for_any(self.driver, ENERGY_ROOTS, timeout=15, label='华为发电量区域')
+            return self._extract_daily_generation()
+
+    def _extract_daily_generation(self):
         try:
             logger.info("开始提取本日发电量数据")
             
@@ -1112,31 +1075,16 @@ class HuaweiFusionSolarScraper:
                                 actions.move_to_element(value_element).perform()
                                 logger.info("成功在value元素上悬停")
                                 
-                                # 等待短暂时间让tooltip出现
-                                time.sleep(0.5)
-                                
-                                # 查找dpdesign-tooltip-inner元素
-                                tooltip_elements = self.driver.find_elements(By.CLASS_NAME, 'dpdesign-tooltip-inner')
-                                logger.info(f"悬停后找到{len(tooltip_elements)}个dpdesign-tooltip-inner元素")
+                                # 等待tooltip出现
+                                wait_for_element(self.driver, '.dpdesign-tooltip-inner', budget=0.5, label='华为发电量提示框', deadline=self.deadline)
                                 
-                                # 从tooltip中提取数据
-                                for tooltip_element in tooltip_elements:
-                                    try:
-                                        # 获取元素的文本内容
-                                        text = tooltip_element.text.strip()
-                                        if text:
-                                            # 提取数值
-                                            import re
-                                            # 支持带千位分隔符的数字
-                                            match = re.search(r'([\d,]+(?:\.\d+)?)', text)
-                                            if match:
-                                                # 去除千位分隔符后转换为浮点数
-                                                value_str = match.group(1).replace(',', '')
-                                                value = float(value_str)
-                                                logger.info(f"成功从dpdesign-tooltip-inner提取本日发电量: {value} kWh")
-                                                return value
-                                    except Exception as tooltip_e:
-                                        logger.warning(f"处理tooltip元素时出错: {str(tooltip_e)}")
+                                # 一次往返读取第一个包含数字的dpdesign-tooltip-inner元素文本
+                                hit = resolve_first(self.driver, [(By.CLASS_NAME, 'dpdesign-tooltip-inner')],
+                                                    require='text', pattern=NUMBER_PATTERN)
+                                value = parse_generation(hit['text']) if hit else None
+                                if value is not None:
+                                    logger.info(f"成功从dpdesign-tooltip-inner提取本日发电量: {value} kWh")
+                                    return value
                         except Exception as hover_e:
                             logger.warning(f"在value元素上悬停时出错: {str(hover_e)}")
                             # 继续尝试下一个元素
@@ -1144,89 +1092,25 @@ class HuaweiFusionSolarScraper:
                     logger.warning(f"id3项目从dpdesign-tooltip-inner提取失败: {str(e)}")
                     # 继续尝试普通策略
             
-            # 对于id4项目，保持原有逻辑
-            elif current_project_id in ['4', 4]:
+            # 对于id4项目，保持原有逻辑：从nco-energy-trends-body下class=value元素的文本中提取
+            if current_project_id in ['4', 4]:
                 logger.info("处理id4项目，从nco-energy-trends-body元素中提取数据")
-                try:
-                    # 查找nco-energy-trends-body根元素
-                    trends_body = self.driver.find_element(By.CLASS_NAME, 'nco-energy-trends-body')
-                    logger.info("找到nco-energy-trends-body根元素")
-                    
-                    # 查找class=value的元素
-                    target_elements = trends_body.find_elements(By.CLASS_NAME, 'value')
-                    logger.info(f"找到{len(target_elements)}个class='value'的元素")
-                    
-                    for element in target_elements:
-                        try:
-                            # 获取元素的文本内容
-                            text = element.text.strip()
-                            if text:
-                                # 提取数值
-                                import re
-                                # 支持带千位分隔符的数字
-                                match = re.search(r'([\d,]+(?:\.\d+)?)', text)
-                                if match:
-                                    # 去除千位分隔符后转换为浮点数
-                                    value_str = match.group(1).replace(',', '')
-                                    value = float(value_str)
-                                    logger.info(f"成功从nco-energy-trends-body提取本日发电量: {value} kWh")
-                                    return value
-                        except Exception as e:
-                            logger.warning(f"处理元素时出错: {str(e)}")
-                except Exception as e:
-                    logger.warning(f"id4项目提取失败: {str(e)}")
-                    # 继续尝试普通策略
+                hit = resolve_first(self.driver, [(By.CSS_SELECTOR, '.nco-energy-trends-body .value')],
+                                    require='text', pattern=NUMBER_PATTERN)
+                value = parse_generation(hit['text']) if hit else None
+                if value is not None:
+                    logger.info(f"成功从nco-energy-trends-body提取本日发电量: {value} kWh")
+                    return value
+                logger.warning("id4项目提取失败，继续尝试普通策略")
             
-            # 主要策略: 查找nco-single-energy-body根元素下class=value且包含title属性的元素
-            try:
-                energy_body = self.driver.find_element(By.CLASS_NAME, 'nco-single-energy-body')
-                logger.info("找到nco-single-energy-body根元素")
-                
-                # 查找class=value且包含title属性的元素
-                target_elements = energy_body.find_elements(By.XPATH, ".//*[contains(@class, 'value') and @title]")
-                logger.info(f"找到{len(target_elements)}个class='value'且包含title属性的元素")
-                
-                for element in target_elements:
-                    try:
-                        title = element.get_attribute('title')
-                        if title:
-                            # 提取数值
-                            import re
-                            # 改进的正则表达式，支持带千位分隔符的数字
-                            match = re.search(r'([\d,]+(?:\.\d+)?)', title)
-                            if match:
-                                # 去除千位分隔符后转换为浮点数
-                                value_str = match.group(1).replace(',', '')
-                                value = float(value_str)
-                                logger.info(f"成功提取本日发电量: {value} kWh")
-                                return value
-                    except Exception as e:
-                        logger.warning(f"处理元素时出错: {str(e)}")
-            except Exception as e:
-                logger.warning(f"主要策略提取失败: {str(e)}")
-                
-            # 备用策略: 简化的XPath查找
-            try:
-                backup_elements = self.driver.find_elements(By.XPATH, "//div[contains(@class, 'nco-single-energy-body')]//*[contains(@class, 'value') and @title]")
-                logger.info(f"找到{len(backup_elements)}个备用匹配元素")
-                
-                for element in backup_elements:
-                    try:
-                        title = element.get_attribute('title')
-                        if title:
-                            import re
-                            # 改进的正则表达式，支持带千位分隔符的数字
-                            match = re.search(r'([\d,]+(?:\.\d+)?)', title)
-                            if match:
-                                # 去除千位分隔符后转换为浮点数
-                                value_str = match.group(1).replace(',', '')
-                                value = float(value_str)
-                                logger.info(f"成功从备用策略提取本日发电量: {value} kWh")
-                                return value
-                    except Exception as e:
-                        logger.warning(f"处理备用元素时出错: {str(e)}")
-            except Exception as e:
-                logger.warning(f"备用策略提取失败: {str(e)}")
+            # 主要策略与备用策略: nco-single-energy-body根元素下class=value且包含title属性的元素，
+            # 整个级联连同title属性在浏览器中一次解析
+            hit = resolve_first(self.driver, GENERATION_TITLE_CANDIDATES, require='title', pattern=NUMBER_PATTERN)
+            value = parse_generation(hit['attributes']['title']) if hit else None
+            if value is not None:
+                source = '主要策略' if hit['index'] == 0 else '备用策略'
+                logger.info(f"成功从{source}提取本日发电量: {value} kWh")
+                return value
                 
             logger.warning("未能提取本日发电量数据")
             return None
@@ -1234,14 +1118,57 @@ class HuaweiFusionSolarScraper:
             logger.error(f"提取本日发电量时发生异常: {str(e)}")
             return None
             
+    def click_previous_day(self):
+        """点击一次'前一日'按钮，成功返回True"""
+        logger.info("尝试点击'前一日'按钮")
+        try:
+            # 使用CSS选择器定位按钮：span[title='前一日']
+            previous_day_button = WebDriverWait(self.driver, 10).until(
+                EC.element_to_be_clickable((By.CSS_SELECTOR, "span[title='前一日']"))
+            )
+            logger.info("找到'前一日'按钮")
+            
+            # 点击按钮
+            previous_day_button.click()
+            logger.info("点击'前一日'按钮成功")
+            
+            # 等待切换日期后的数据请求完成
+            wait_for_network_idle(self.driver, budget=2, label='华为切换日期', deadline=self.deadline)
+            logger.info("页面数据已刷新")
+            return True
+        except Exception as e:
+            logger.warning(f"点击'前一日'按钮失败或未找到按钮: {str(e)}")
+            # 如果找不到按钮，继续执行后续操作，不中断流程
+            return False
+
+    def move_to_target_date(self):
+        """从当前页面日期向前翻到self.target_date，只点击尚未翻过的天数"""
+        days_back = days_before_today(self.target_date)
+        clicks = days_back - self.current_day_offset
+        if clicks < 0:
+            logger.warning(f"当前页面已翻过目标日期 {self.target_date}（偏移 {self.current_day_offset} 天），需要重新导航到电站")
+            return False
+        logger.info(f"切换到目标日期 {self.target_date}，需点击'前一日' {clicks} 次")
+        for _ in range(clicks):
+            if not self.click_previous_day():
+                return False
+            self.current_day_offset += 1
+        return True
+
     def capture_power_curve(self, project_id):
-        """截图发电曲线图"""
+        """截图发电曲线图（截图区域的级联查找在隐式等待为0的状态下执行）"""
+        with zero_implicit_wait(self.driver):
+            return self._capture_power_curve(project_id)
+
+    def _capture_power_curve(self, project_id):
         try:
             # 保存当前项目ID为实例变量，供extract_daily_generation方法使用
             self.current_project_id = project_id
             
             logger.info(f"开始处理项目 {project_id}")
-            time.sleep(5)  # 基础等待时间
+            wait_for_chart_ready(self.driver, budget=5, label='华为发电曲线渲染', deadline=self.deadline)
+            # 截图区域的各候选查找不再阻塞，这里显式等待任一区域出现
+            wait_for_any(self.driver, ENERGY_ROOTS + [(By.CLASS_NAME, 'echarts-for-react')], timeout=15, label='华为发电曲线区域')
 
             # 检查项目ID，对于 id3 和 id4 不执行页面滑动操作
             skip_scroll = project_id in ['3', '4', 3, 4]
@@ -1250,10 +1177,9 @@ class HuaweiFusionSolarScraper:
                 logger.info("开始执行页面滚动逻辑")
 
                 # 记录页面初始位置（window 层面）
+                window_scroll_js = "return window.pageYOffset || document.documentElement.scrollTop || document.body.scrollTop || 0;"
                 try:
-                    initial_window_scroll = self.driver.execute_script(
-                        "return window.pageYOffset || document.documentElement.scrollTop || document.body.scrollTop || 0;"
-                    )
+                    initial_window_scroll = self.driver.execute_script(window_scroll_js)
                 except Exception:
                     initial_window_scroll = 0
 
@@ -1304,7 +1230,10 @@ class HuaweiFusionSolarScraper:
                         # 分段滚动、多次判断（避免一次跳到底无反应）
                         for i in range(15):
                             self.driver.execute_script("arguments[0].scrollTop += arguments[1];", custom_scroll_container, 800)
-                            time.sleep(0.35)
+                            wait_until(
+                                lambda: (self.driver.execute_script("return arguments[0].scrollTop;", custom_scroll_container) or 0) > container_initial,
+                                budget=0.35, label='华为容器滚动', deadline=self.deadline
+                            )
                             cur = self.driver.execute_script("return arguments[0].scrollTop;", custom_scroll_container)
                             logger.info(f"第{i+1}次容器滚动后 scrollTop={cur}")
                             if cur and cur > container_initial:
@@ -1318,7 +1247,10 @@ class HuaweiFusionSolarScraper:
                     try:
                         logger.info("尝试 window.scrollTo 滚动到底部")
                         self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                        time.sleep(1.2)
+                        wait_until(
+                            lambda: (self.driver.execute_script(window_scroll_js) or 0) > initial_window_scroll,
+                            budget=1.2, label='华为页面滚动', deadline=self.deadline
+                        )
                         final_window_scroll = self.driver.execute_script(
                             "return window.pageYOffset || document.documentElement.scrollTop || document.body.scrollTop || 0;"
                         )
@@ -1335,11 +1267,16 @@ class HuaweiFusionSolarScraper:
                         body = self.driver.find_element(By.TAG_NAME, "body")
                         # 点击以获得焦点
                         ActionChains(self.driver).move_to_element(body).click().perform()
-                        time.sleep(0.25)
-                        # 连续发送 PAGE_DOWN
+                        wait_until(lambda: self.driver.execute_script("return document.hasFocus();"),
+                                   budget=0.25, label='华为页面获得焦点', deadline=self.deadline)
+                        # 连续发送 PAGE_DOWN，页面开始滚动后不再发送
                         for _ in range(8):
                             ActionChains(self.driver).send_keys(Keys.PAGE_DOWN).perform()
-                            time.sleep(0.4)
+                            if wait_until(
+                                lambda: (self.driver.execute_script(window_scroll_js) or 0) > initial_window_scroll,
+                                budget=0.4, label='华为键盘滚动', deadline=self.deadline
+                            ):
+                                break
                         final_window_scroll = self.driver.execute_script(
                             "return window.pageYOffset || document.documentElement.scrollTop || document.body.scrollTop || 0;"
                         )
@@ -1382,7 +1319,8 @@ class HuaweiFusionSolarScraper:
                         '''
                         # execute_async_script 会等待 callback 调用完毕
                         self.driver.execute_async_script(js_animate, custom_scroll_container, 800, 120, 12000)
-                        time.sleep(0.8)
+                        # 等待滚动触发的懒加载请求完成
+                        wait_for_network_idle(self.driver, budget=0.8, label='华为滚动懒加载', deadline=self.deadline)
                         final_window_scroll = self.driver.execute_script(
                             "return window.pageYOffset || document.documentElement.scrollTop || document.body.scrollTop || 0;"
                         )
@@ -1397,25 +1335,8 @@ class HuaweiFusionSolarScraper:
                 else:
                     logger.warning("尝试了多种滚动策略仍未能滚动：可能原因 -> 页面使用 iframe / shadow DOM / transform(translateY) 或者使用虚拟化(virtualized list)。建议在浏览器 devtools 检查真正滚动的元素或是否被 iframe 包裹。")
 
-            # 新增：点击'前一日'按钮，让页面切换到前一天的数据
-            logger.info("尝试点击'前一日'按钮")
-            try:
-                # 使用CSS选择器定位按钮：span[title='前一日']
-                previous_day_button = WebDriverWait(self.driver, 10).until(
-                    EC.element_to_be_clickable((By.CSS_SELECTOR, "span[title='前一日']"))
-                )
-                logger.info("找到'前一日'按钮")
-                
-                # 点击按钮
-                previous_day_button.click()
-                logger.info("点击'前一日'按钮成功")
-                
-                # 等待2秒，确保页面数据刷新完成
-                time.sleep(2)
-                logger.info("已等待2秒，页面数据应已刷新完成")
-            except Exception as e:
-                logger.warning(f"点击'前一日'按钮失败或未找到按钮: {str(e)}")
-                # 如果找不到按钮，继续执行后续操作，不中断流程
+            # 点击'前一日'按钮，让页面切换到目标日期的数据
+            self.move_to_target_date()
 
             # 对于id3和id4的特殊处理，因为它们少了nco-single-energy-header元素
             is_project3_or_4 = project_id in ['3', '4', 3, 4]
@@ -1436,8 +1357,8 @@ class HuaweiFusionSolarScraper:
                     screenshot_path = os.path.join(self.screenshots_dir, f"power_curve_{project_id}.png")
                     # 在截图前将鼠标移动到页面左上角，确保鼠标不在截图区域悬停
                     ActionChains(self.driver).move_to_element_with_offset(self.driver.find_element(By.TAG_NAME, 'body'), 0, 0).perform()
-                    # 短暂等待确保鼠标移动完成
-                    time.sleep(0.5)
+                    # 等待悬停提示框消失
+                    wait_for_tooltips_hidden(self.driver, budget=0.5, label='华为截图前提示框消失', deadline=self.deadline)
                     # 直接对根元素进行截图
                     screenshot_element.screenshot(screenshot_path)
                     logger.info(f"id3/id4项目截图成功，已保存至: {screenshot_path}")
@@ -1464,53 +1385,12 @@ class HuaweiFusionSolarScraper:
                     # 如果找不到根元素，继续执行后续的查找策略
             
             # 基于用户提供的界面截图，我们知道需要截图的是能量管理标签下的发电曲线图
-            target_element = None
-            
-            # 策略1: 基于用户提供的界面截图，查找能量管理区域的图表
-            logger.info("使用新策略查找能量管理区域的图表")
-            
-            # 先尝试查找包含能量管理文本的元素，确定图表所在的区域
-            try:
-                energy_management_section = self.driver.find_element(By.XPATH, "//h3[contains(text(), '能量管理')]/ancestor::div[contains(@class, 'business-station-overview-content')]")
-                logger.info("找到能量管理区域")
-                
-                # 在能量管理区域内查找图表容器
-                try:
-                    # 查找包含标题'发电量'的图表容器
-                    chart_container = energy_management_section.find_element(By.XPATH, ".//div[contains(@class, 'chart-container') or contains(@class, 'chart-wrapper')]")
-                    logger.info("在能量管理区域找到图表容器")
-                    target_element = chart_container
-                except:
-                    logger.warning("在能量管理区域未找到直接的图表容器")
-                    
-                    # 尝试查找canvas元素作为备选
-                    try:
-                        canvas_elements = energy_management_section.find_elements(By.TAG_NAME, 'canvas')
-                        if canvas_elements:
-                            logger.info(f"在能量管理区域找到{len(canvas_elements)}个canvas元素")
-                            # 选择第一个canvas元素的父容器
-                            target_element = canvas_elements[0].find_element(By.XPATH, '..')
-                    except:
-                        logger.warning("在能量管理区域查找canvas元素失败")
-            except:
-                logger.warning("查找能量管理区域失败")
-                
-            # 策略2: 如果上述方法失败，尝试使用原来的定位策略
-            if not target_element:
-                logger.info("尝试使用原始定位策略")
-                try:
-                    energy_body_element = self.driver.find_element(By.CLASS_NAME, 'nco-single-energy-body')
-                    logger.info("找到nco-single-energy-body根元素")
-                    target_element = energy_body_element
-                except:
-                    logger.warning("查找nco-single-energy-body根元素失败")
-                    
-                    try:
-                        echarts_element = self.driver.find_element(By.CLASS_NAME, 'echarts-for-react')
-                        logger.info("直接找到echarts-for-react元素")
-                        target_element = echarts_element
-                    except:
-                        logger.warning("直接查找echarts-for-react元素失败")
+            # 策略1（能量管理区域的图表容器或canvas父容器）与策略2（原始定位）在浏览器中一次解析
+            logger.info("查找能量管理区域的图表")
+            hit = resolve_first(self.driver, CHART_TARGET_CANDIDATES)
+            target_element = hit['element'] if hit else None
+            if hit:
+                logger.info(f"找到{CHART_TARGET_LABELS[hit['index']]}")
             
             # 如果找到目标元素，则进行截图
             if target_element:
@@ -1544,8 +1424,8 @@ class HuaweiFusionSolarScraper:
                     
                     # 在截图前将鼠标移动到页面左上角，确保鼠标不在截图区域悬停
                     ActionChains(self.driver).move_to_element_with_offset(self.driver.find_element(By.TAG_NAME, 'body'), 0, 0).perform()
-                    # 短暂等待确保鼠标移动完成
-                    time.sleep(0.5)
+                    # 等待悬停提示框消失
+                    wait_for_tooltips_hidden(self.driver, budget=0.5, label='华为截图前提示框消失', deadline=self.deadline)
                     # 直接对元素进行截图
                     screenshot_element.screenshot(screenshot_path)
                     logger.info(f"使用元素直接截图成功，已保存至: {screenshot_path}")
@@ -1581,33 +1461,38 @@ class HuaweiFusionSolarScraper:
     def run(self):
         """运行完整的爬取流程"""
         try:
-            # 登录
-            if not self.login():
+            # 登录（常驻会话已登录时跳过）
+            if not self.logged_in and not self.login():
                 logger.error("登录失败，无法继续爬取")
                 return False
             
-            # 为每个项目截图并提取数据
-            results = {}
-            for project in self.projects:
-                project_name = project['name']
-                project_id = project['id']
+            # 优先通过接口取得各电站的发电量与功率曲线，其余项目再用页面爬取兜底
+            results = self.fetch_via_api(self.target_date)
+            remaining = [p for p in self.projects if str(p['id']) not in results]
+            if not remaining:
+                logger.info("爬取完成（全部来自接口）！")
+                return results
+            
+            # 为每个项目截图并提取数据（截图阶段恢复完整渲染，刷新当前页面使字体等资源完整加载）
+            with self.resource_blocker.full_rendering(reload=True):
+                for project in remaining:
+                    project_name = project['name']
+                    project_id = project['id']
                 
-                # 导航到项目
-                if self.navigate_to_project(project_name):
-                    # 截图发电曲线并提取本日发电量
-                    screenshot_path, daily_generation = self.capture_power_curve(project_id)
-                    
-                    # 存储结果
+                    # 预算耗尽时不再处理剩余项目，返回已获取的部分结果
+                    if self.deadline.expired(f'项目 {project_name}'):
+                        results[project_id] = {
+                            'screenshot_path': None,
+                            'daily_generation': None
+                        }
+                        continue
+                
+                    # 导航到项目，截图发电曲线并提取本日发电量
+                    screenshot_path, daily_generation = self.process_project(project_name, project_id)
                     results[project_id] = {
                         'screenshot_path': screenshot_path,
                         'daily_generation': daily_generation
                     }
-                else:
-                    logger.warning(f"跳过项目 {project_name}，因为无法导航到该项目")
-                    results[project_id] = {
-                        'screenshot_path': None,
-                        'daily_generation': None
-                    }
             
             logger.info("爬取完成！")
             return results
@@ -1615,6 +1500,100 @@ class HuaweiFusionSolarScraper:
             logger.error(f"爬取过程中出现错误: {str(e)}")
             raise
 
+    def fetch_via_api(self, date_str):
+        """通过FusionSolar接口采集各项目某天的数据，失败时返回空字典（由页面爬取兜底）
+
+        浏览器会话同时交给令牌管理器保存，之后的运行可以不启动浏览器直接请求接口。
+        """
+        if not api_enabled():
+            return {}
+        try:
+            client = FusionSolarAPI.from_driver(self.driver, governor=self.governor, deadline=self.deadline)
+            results = client.collect(self.projects, date_str, PROJECT_NAME_MAPPING)
+            if self.logged_in and not client.session_rejected:
+                token_manager(self.username, self.password).put(client.export_token(), source='browser')
+            return results
+        except Exception as e:
+            logger.warning(f"FusionSolar接口采集失败: {str(e)}，改用页面爬取")
+            return {}
+
+    def process_project(self, project_name, project_id):
+        """处理单个电站，返回 (截图路径, 本日发电量)；浏览器失效时回收重建后重试一次"""
+        self.watchdog.check(f'项目 {project_name}')
+        for attempt in range(2):
+            if self.navigate_to_project(project_name):
+                self.current_day_offset = 0
+                screenshot_path, daily_generation = self.capture_power_curve(project_id)
+                if screenshot_path:
+                    return screenshot_path, daily_generation
+            # 失败时确认是否因为浏览器不健康，回收重建后从当前电站继续
+            if attempt == 0 and self.watchdog.check(f'项目 {project_name} 重试', force=True):
+                continue
+            break
+        logger.warning(f"跳过项目 {project_name}，因为无法导航到该项目或截图失败")
+        return None, None
+
+    def run_dates(self, dates, screenshots_dir_for_date):
+        """补采多个日期：只登录一次，每个电站只导航一次，按日期从近到远依次向前翻页
+
+        Args:
+            dates: 日期字符串列表（'YYYY-MM-DD'）
+            screenshots_dir_for_date: 函数，传入日期字符串返回该日期的截图目录
+
+        Returns:
+            dict: {日期: {项目ID: {'screenshot_path', 'daily_generation'}}}
+        """
+        ordered_dates = sorted({format_date(d) for d in dates}, reverse=True)
+        all_results = {d: {} for d in ordered_dates}
+        original_target_date = self.target_date
+        original_screenshots_dir = self.screenshots_dir
+        try:
+            if not self.logged_in and not self.login():
+                logger.error("登录失败，无法继续补采")
+                return all_results
+            
+            # 优先通过接口逐日采集，接口没有数据的 (项目, 日期) 再用页面爬取兜底
+            for date_str in ordered_dates:
+                all_results[date_str].update(self.fetch_via_api(date_str))
+            
+            # 截图阶段恢复完整渲染（刷新当前页面使字体等资源完整加载）
+            with self.resource_blocker.full_rendering(reload=True):
+                for project in self.projects:
+                    project_name = project['name']
+                    project_id = project['id']
+                    pending_dates = [d for d in ordered_dates if str(project_id) not in all_results[d]]
+                    if not pending_dates:
+                        continue
+                    if self.deadline.expired(f'补采项目 {project_name}') or not self.navigate_to_project(project_name):
+                        logger.warning(f"跳过项目 {project_name}，因为无法导航到该项目")
+                        for date_str in pending_dates:
+                            all_results[date_str][project_id] = {'screenshot_path': None, 'daily_generation': None}
+                        continue
+                    self.current_day_offset = 0
+                
+                    for date_str in pending_dates:
+                        if self.deadline.expired(f'补采 {project_name} {date_str}'):
+                            all_results[date_str][project_id] = {'screenshot_path': None, 'daily_generation': None}
+                            continue
+                        # 浏览器回收重建后重新导航到当前电站，日期翻页从今天重新计数
+                        if self.watchdog.check(f'补采 {project_name} {date_str}') and self.navigate_to_project(project_name):
+                            self.current_day_offset = 0
+                        self.target_date = date_str
+                        self.screenshots_dir = screenshots_dir_for_date(date_str)
+                        os.makedirs(self.screenshots_dir, exist_ok=True)
+                        logger.info(f"补采项目 {project_name} 日期 {date_str}")
+                        screenshot_path, daily_generation = self.capture_power_curve(project_id)
+                        all_results[date_str][project_id] = {
+                            'screenshot_path': screenshot_path,
+                            'daily_generation': daily_generation
+                        }
+            
+            logger.info(f"补采完成，共 {len(ordered_dates)} 个日期")
+            return all_results
+        finally:
+            self.target_date = original_target_date
+            self.screenshots_dir = original_screenshots_dir
+
 if __name__ == "__main__":
     # 示例用法
     # 注意：在实际使用时，建议从环境变量或安全的配置文件中读取用户名和密码
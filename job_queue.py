@@ -0,0 +1,463 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地任务队列：基于SQLite的采集任务队列，支持多个工作进程（可在共享目录的多台机器上）
+
+- 每个任务对应 (系统, 账号, 电站, 日期)，同一组合只入队一次
+- 工作进程以租约方式领取任务，执行期间定期续约；进程崩溃后租约过期，任务可被其他进程重新领取
+- 失败的任务按指数退避重试，超过最大次数后标记为失败
+- 每个任务的结果写入独立文件 data/queue/results/<日期>/<系统>-<电站>.json，
+  由 update_solar_dashboard.py --queue 合并为当天的JSON
+
+用法:
+    python job_queue.py worker --processes 2
+    python job_queue.py worker --portal huawei --exit-when-idle
+    python job_queue.py status --date 2025-10-01
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import sqlite3
+import logging
+import argparse
+import threading
+import multiprocessing
+from contextlib import contextmanager
+from datetime import datetime
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_QUEUE_DIR = os.path.join('data', 'queue')
+DEFAULT_LEASE_SECONDS = 600
+BACKOFF_BASE_SECONDS = 60
+BACKOFF_MAX_SECONDS = 1800
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    portal TEXT NOT NULL,
+    account TEXT NOT NULL,
+    station TEXT NOT NULL,
+    date TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    available_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    result_path TEXT,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    UNIQUE (portal, account, station, date)
+)
+"""
+
+
+def backoff_seconds(attempts):
+    """第N次失败后的等待时间（指数退避，有上限）"""
+    return min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** max(0, attempts - 1)))
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class JobQueue:
+    """SQLite任务队列；数据库与结果文件都在queue_dir下"""
+
+    def __init__(self, queue_dir=DEFAULT_QUEUE_DIR):
+        self.queue_dir = queue_dir
+        self.db_path = os.path.join(queue_dir, 'jobs.sqlite')
+        self.results_dir = os.path.join(queue_dir, 'results')
+        os.makedirs(self.results_dir, exist_ok=True)
+        with self.connect() as conn:
+            conn.execute(SCHEMA)
+
+    @contextmanager
+    def connect(self):
+        # 共享目录（如NFS）上WAL模式不可靠，使用默认的回滚日志，并依赖busy timeout等待锁
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _transaction(self, conn):
+        conn.execute('BEGIN IMMEDIATE')
+
+    def enqueue(self, portal, account, station, date, max_attempts=3, requeue_failed=True):
+        """入队任务；已存在时不重复入队（失败的任务可重新置为待执行），返回任务ID"""
+        now = time.time()
+        with self.connect() as conn:
+            self._transaction(conn)
+            try:
+                row = conn.execute(
+                    'SELECT id, status FROM jobs WHERE portal=? AND account=? AND station=? AND date=?',
+                    (portal, account, str(station), date)
+                ).fetchone()
+                if row is None:
+                    cursor = conn.execute(
+                        'INSERT INTO jobs (portal, account, station, date, max_attempts, available_at, created_at, updated_at) '
+                        'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                        (portal, account, str(station), date, max_attempts, now, now, now)
+                    )
+                    job_id = cursor.lastrowid
+                else:
+                    job_id = row['id']
+                    if requeue_failed and row['status'] == 'failed':
+                        conn.execute(
+                            "UPDATE jobs SET status='pending', attempts=0, available_at=?, last_error=NULL, updated_at=? WHERE id=?",
+                            (now, now, job_id)
+                        )
+                conn.execute('COMMIT')
+                return job_id
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+    def claim(self, worker_id, lease_seconds=DEFAULT_LEASE_SECONDS, portals=None):
+        """领取一个可执行的任务（待执行且已过退避时间，或租约已过期），返回任务字典或None"""
+        now = time.time()
+        with self.connect() as conn:
+            self._transaction(conn)
+            try:
+                # 租约过期且已用完重试次数的任务直接标记为失败
+                conn.execute(
+                    "UPDATE jobs SET status='failed', last_error=COALESCE(last_error, '租约过期'), updated_at=? "
+                    "WHERE status='leased' AND lease_expires<? AND attempts>=max_attempts",
+                    (now, now)
+                )
+                sql = ("SELECT * FROM jobs WHERE ((status='pending' AND available_at<=?) "
+                       "OR (status='leased' AND lease_expires<?))")
+                params = [now, now]
+                if portals:
+                    sql += ' AND portal IN (%s)' % ','.join('?' * len(portals))
+                    params.extend(portals)
+                sql += ' ORDER BY date, available_at, id LIMIT 1'
+                row = conn.execute(sql, params).fetchone()
+                if row is None:
+                    conn.execute('COMMIT')
+                    return None
+                conn.execute(
+                    "UPDATE jobs SET status='leased', attempts=attempts+1, lease_owner=?, lease_expires=?, updated_at=? WHERE id=?",
+                    (worker_id, now + lease_seconds, now, row['id'])
+                )
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        job = dict(row)
+        job['attempts'] += 1
+        job['status'] = 'leased'
+        job['lease_owner'] = worker_id
+        return job
+
+    def heartbeat(self, job_id, worker_id, lease_seconds=DEFAULT_LEASE_SECONDS):
+        """续约；租约已被他人接管时返回False"""
+        now = time.time()
+        with self.connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires=?, updated_at=? WHERE id=? AND status='leased' AND lease_owner=?",
+                (now + lease_seconds, now, job_id, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def result_path_for(self, job):
+        return os.path.join(self.results_dir, job['date'], f"{job['portal']}-{job['station']}.json")
+
+    def write_result(self, job, payload, valid):
+        """写入任务结果文件（先写临时文件再替换）"""
+        path = self.result_path_for(job)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        record = {
+            'job_id': job['id'],
+            'portal': job['portal'],
+            'account': job['account'],
+            'station': job['station'],
+            'date': job['date'],
+            'worker': job.get('lease_owner'),
+            'attempt': job['attempts'],
+            'saved_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'valid': valid,
+            'payload': payload
+        }
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(record, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+        return path
+
+    def complete(self, job, worker_id, result_path):
+        now = time.time()
+        with self.connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status='done', result_path=?, lease_owner=NULL, lease_expires=NULL, last_error=NULL, updated_at=? "
+                "WHERE id=? AND lease_owner=?",
+                (result_path, now, job['id'], worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def fail(self, job, worker_id, error, result_path=None):
+        """任务失败：未超过最大次数时按退避时间重新排队，否则标记为失败"""
+        now = time.time()
+        attempts = job['attempts']
+        if attempts >= job['max_attempts']:
+            status, available_at = 'failed', now
+        else:
+            status, available_at = 'pending', now + backoff_seconds(attempts)
+        with self.connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status=?, available_at=?, last_error=?, result_path=COALESCE(?, result_path), "
+                "lease_owner=NULL, lease_expires=NULL, updated_at=? WHERE id=? AND lease_owner=?",
+                (status, available_at, str(error)[:500], result_path, now, job['id'], worker_id)
+            )
+        if status == 'failed':
+            logger.warning(f"任务 {job['id']} ({job['portal']}/{job['station']}/{job['date']}) 已失败 {attempts} 次，不再重试: {error}")
+        else:
+            logger.info(f"任务 {job['id']} 第 {attempts} 次失败，{available_at - now:.0f} 秒后重试: {error}")
+        return status
+
+    def jobs_for_date(self, date):
+        with self.connect() as conn:
+            return [dict(r) for r in conn.execute('SELECT * FROM jobs WHERE date=? ORDER BY id', (date,))]
+
+    def counts(self, date=None):
+        """按状态统计任务数"""
+        sql = 'SELECT status, COUNT(*) AS n FROM jobs'
+        params = ()
+        if date:
+            sql += ' WHERE date=?'
+            params = (date,)
+        sql += ' GROUP BY status'
+        with self.connect() as conn:
+            return {r['status']: r['n'] for r in conn.execute(sql, params)}
+
+    def is_settled(self, date):
+        """该日期的任务是否都已结束（完成或失败）"""
+        counts = self.counts(date)
+        return not counts.get('pending') and not counts.get('leased')
+
+    def wait_for(self, date, timeout=None, poll_seconds=10):
+        """等待该日期的任务全部结束；超时返回False"""
+        started = time.monotonic()
+        while not self.is_settled(date):
+            if timeout is not None and time.monotonic() - started >= timeout:
+                logger.warning(f"等待 {date} 的任务超时，当前状态: {self.counts(date)}")
+                return False
+            time.sleep(poll_seconds)
+        return True
+
+    def load_results(self, date):
+        """读取该日期全部结果文件，返回 {系统: {电站: payload}}
+
+        只采用有效、且与已完成任务的 job_id 和执行次数一致的结果（失去租约的进程写入的旧结果不采用）。
+        """
+        results = {}
+        date_dir = os.path.join(self.results_dir, date)
+        if not os.path.isdir(date_dir):
+            return results
+        done = {job['id']: job for job in self.jobs_for_date(date) if job['status'] == 'done'}
+        for name in sorted(os.listdir(date_dir)):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(date_dir, name), 'r', encoding='utf-8') as f:
+                    record = json.load(f)
+            except Exception as e:
+                logger.warning(f"结果文件 {name} 无法读取: {str(e)}")
+                continue
+            job = done.get(record.get('job_id'))
+            if not record.get('valid') or job is None or job['attempts'] != record.get('attempt'):
+                logger.info(f"忽略结果文件 {name}：结果无效或不属于已完成的任务")
+                continue
+            results.setdefault(record['portal'], {})[record['station']] = record.get('payload')
+        return results
+
+
+def plan_jobs(updater):
+    """根据项目配置生成当天的任务列表 [(系统, 账号, 电站)]"""
+    config = updater.get_project_config()
+    jobs = []
+    for project in config['huawei']['projects']:
+        jobs.append(('huawei', config['huawei']['username'], project['id']))
+    for source in ('sems', 'esolar'):
+        for station in config[source]['projects']:
+            jobs.append((source, config[source]['username'], str(station)))
+    return jobs
+
+
+def execute_job(updater, job):
+    """在已设置好目标日期的更新器上执行单个任务，返回与检查点相同格式的结果"""
+    config = updater.get_project_config()
+    if config[job['portal']]['username'] != job['account']:
+        raise ValueError(f"本机未配置账号 {job['account']}（{job['portal']}）")
+    if job['portal'] == 'huawei':
+        projects = [p for p in config['huawei']['projects'] if p['id'] == job['station']]
+        if not projects:
+            raise ValueError(f"未知的华为电站: {job['station']}")
+        return updater.run_huawei_source(projects=projects)
+    if job['portal'] == 'sems':
+        output = updater.run_sems_source()
+        if output and not output.get('api_results') and output.get('ocr_id5_generation') is None:
+            output['ocr_id5_generation'] = updater.ocr_sems_screenshot(output.get('screenshot_path'))
+        return output
+    if job['portal'] == 'esolar':
+        return updater.run_esolar_source()
+    raise ValueError(f"未知的数据源: {job['portal']}")
+
+
+def merge_results(queue, date):
+    """把结果文件合并为 merge_and_save 所需的 (华为结果, SEMS输出, ESolar结果)"""
+    results = queue.load_results(date)
+    huawei = {}
+    for payload in results.get('huawei', {}).values():
+        huawei.update(payload or {})
+    sems_output = {}
+    for payload in results.get('sems', {}).values():
+        sems_output = payload or {}
+    esolar = {}
+    for payload in results.get('esolar', {}).values():
+        esolar.update(payload or {})
+    return huawei, sems_output, esolar
+
+
+class _LeaseKeeper:
+    """任务执行期间在后台线程中定期续约；租约被他人接管后 lost 为True"""
+
+    def __init__(self, queue, job, worker_id, lease_seconds):
+        self.queue = queue
+        self.job = job
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.lost = False
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        interval = max(5, self.lease_seconds / 3)
+        while not self.stop_event.wait(interval):
+            if not self.still_held():
+                return
+
+    def still_held(self):
+        """续约一次，返回租约是否仍属于本进程"""
+        if not self.lost and not self.queue.heartbeat(self.job['id'], self.worker_id, self.lease_seconds):
+            logger.warning(f"任务 {self.job['id']} 的租约已失效")
+            self.lost = True
+        return not self.lost
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop_event.set()
+        self.thread.join(timeout=5)
+
+
+def run_worker(queue_dir=DEFAULT_QUEUE_DIR, worker_id=None, portals=None, lease_seconds=DEFAULT_LEASE_SECONDS,
+               exit_when_idle=False, idle_seconds=15):
+    """工作进程主循环：领取任务、执行、写结果；同一进程内复用各系统的已登录会话"""
+    from checkpoint import VALIDATORS
+    from daemon import WarmSessionManager
+    from update_solar_dashboard import create_updater_from_env
+
+    queue = JobQueue(queue_dir)
+    worker_id = worker_id or default_worker_id()
+    sessions = WarmSessionManager()
+    logger.info(f"工作进程 {worker_id} 启动，队列: {queue.db_path}")
+    try:
+        while True:
+            job = queue.claim(worker_id, lease_seconds, portals)
+            if job is None:
+                if exit_when_idle:
+                    break
+                time.sleep(idle_seconds)
+                continue
+            logger.info(f"领取任务 {job['id']}: {job['portal']}/{job['station']}/{job['date']}（第 {job['attempts']} 次）")
+            result_path = None
+            try:
+                with _LeaseKeeper(queue, job, worker_id, lease_seconds) as keeper:
+                    updater = create_updater_from_env(target_date=job['date'])
+                    updater.session_manager = sessions
+                    # 队列模式下每个任务只写结果文件，日数据文件由合并步骤统一生成
+                    updater.update_default_data_file = False
+                    payload = execute_job(updater, job)
+                    lease_held = keeper.still_held()
+                if not lease_held:
+                    # 任务已由其他进程接管，不写结果文件，以免覆盖接管者的结果
+                    logger.warning(f"任务 {job['id']} 已被其他进程接管，丢弃本次结果")
+                    continue
+                validator = VALIDATORS.get(job['portal'])
+                valid = bool(validator(payload)) if validator else payload is not None
+                result_path = queue.write_result(job, payload, valid)
+                if valid:
+                    queue.complete(job, worker_id, result_path)
+                    logger.info(f"任务 {job['id']} 完成: {result_path}")
+                else:
+                    queue.fail(job, worker_id, '结果无效', result_path)
+            except Exception as e:
+                queue.fail(job, worker_id, f"{type(e).__name__}: {e}", result_path)
+    finally:
+        sessions.close_all()
+        logger.info(f"工作进程 {worker_id} 退出")
+
+
+def _worker_process(queue_dir, portals, lease_seconds, exit_when_idle):
+    run_worker(queue_dir, portals=portals, lease_seconds=lease_seconds, exit_when_idle=exit_when_idle)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='太阳能采集任务队列')
+    sub = parser.add_subparsers(dest='command')
+    worker = sub.add_parser('worker', help='运行工作进程')
+    worker.add_argument('--queue-dir', default=DEFAULT_QUEUE_DIR, help='队列目录（多台机器可共享）')
+    worker.add_argument('--portal', action='append', default=[], help='只领取指定系统的任务，可重复')
+    worker.add_argument('--processes', type=int, default=1, help='本机启动的工作进程数')
+    worker.add_argument('--lease-seconds', type=int, default=DEFAULT_LEASE_SECONDS, help='任务租约时长（秒）')
+    worker.add_argument('--exit-when-idle', action='store_true', help='没有可领取的任务时退出')
+    status = sub.add_parser('status', help='查看任务状态')
+    status.add_argument('--queue-dir', default=DEFAULT_QUEUE_DIR)
+    status.add_argument('--date', default=None)
+    args = parser.parse_args(argv)
+
+    if args.command == 'worker':
+        portals = args.portal or None
+        if args.processes <= 1:
+            run_worker(args.queue_dir, portals=portals, lease_seconds=args.lease_seconds, exit_when_idle=args.exit_when_idle)
+            return
+        ctx = multiprocessing.get_context('spawn')
+        processes = [
+            ctx.Process(target=_worker_process, args=(args.queue_dir, portals, args.lease_seconds, args.exit_when_idle))
+            for _ in range(args.processes)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+    elif args.command == 'status':
+        queue = JobQueue(args.queue_dir)
+        if args.date:
+            for job in queue.jobs_for_date(args.date):
+                print(f"{job['id']:>5} {job['portal']:<7} {job['station']:<3} {job['status']:<8} 尝试 {job['attempts']}/{job['max_attempts']} {job['last_error'] or ''}")
+        print(json.dumps(queue.counts(args.date), ensure_ascii=False))
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+内存测量：按爬虫统计浏览器进程树与本进程的常驻内存（RSS）
+
+- process_tree_rss：若干进程及其全部子进程的RSS之和（优先使用psutil，未安装时读取/proc）
+- MemoryProbe：后台线程定期采样，记录一个爬虫运行期间浏览器与本进程的峰值、平均RSS
+- 命令行：依次在各启动配置下冷启动浏览器运行指定系统的采集，输出每个爬虫的内存报告，
+  并按内存预算估算可以同时运行的会话数
+
+    python memory_probe.py --source huawei --source sems --launch-profile standard --launch-profile low-memory
+
+浏览器各进程之间共享的内存会被重复计算，结果偏大，适合比较不同启动配置。
+"""
+
+import os
+import json
+import time
+import logging
+import argparse
+import threading
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+# GitHub托管的Linux运行器内存（MB），估算并行会话数时预留20%给系统与Python进程
+DEFAULT_MEMORY_BUDGET_MB = 7 * 1024
+BUDGET_HEADROOM = 0.8
+
+
+def _proc_children_map():
+    """读取/proc，返回 {父进程PID: [子进程PID]}"""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat', 'r') as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # 进程名可能包含空格和括号，从最后一个')'之后解析
+        fields = stat[stat.rfind(')') + 2:].split()
+        children.setdefault(int(fields[1]), []).append(int(entry))
+    return children
+
+
+def _proc_rss(pid):
+    try:
+        with open(f'/proc/{pid}/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def process_rss(pid):
+    """单个进程的RSS（字节），无法测量时返回None"""
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).memory_info().rss
+        except psutil.Error:
+            return 0
+    if os.path.isdir('/proc'):
+        return _proc_rss(pid)
+    return None
+
+
+def process_tree_rss(pids):
+    """若干进程及其全部子进程的RSS之和（字节），无法测量时返回None"""
+    if psutil is not None:
+        seen = set()
+        total = 0
+        for pid in pids:
+            try:
+                root = psutil.Process(pid)
+                processes = [root] + root.children(recursive=True)
+            except psutil.Error:
+                continue
+            for process in processes:
+                if process.pid in seen:
+                    continue
+                seen.add(process.pid)
+                try:
+                    total += process.memory_info().rss
+                except psutil.Error:
+                    pass
+        return total
+    if not os.path.isdir('/proc'):
+        return None
+    children = _proc_children_map()
+    seen = set()
+    stack = list(pids)
+    total = 0
+    while stack:
+        pid = stack.pop()
+        if pid in seen:
+            continue
+        seen.add(pid)
+        total += _proc_rss(pid)
+        stack.extend(children.get(pid, []))
+    return total
+
+
+class MemoryProbe:
+    """在后台线程中定期采样浏览器进程树与本进程的RSS
+
+    pid_source 为返回浏览器（驱动）进程PID列表的函数，例如 DriverPool.browser_pids。
+    """
+
+    def __init__(self, label, pid_source, interval=1.0):
+        self.label = label
+        self.pid_source = pid_source
+        self.interval = interval
+        self.samples = []
+        self.started = None
+        self.elapsed = 0
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def sample(self):
+        browser = process_tree_rss(self.pid_source())
+        python = process_rss(os.getpid())
+        if browser is None or python is None:
+            return None
+        self.samples.append((browser, python))
+        return browser, python
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            self.sample()
+            self.stop_event.wait(self.interval)
+
+    def start(self):
+        if process_rss(os.getpid()) is None:
+            logger.warning("当前平台无法测量内存（未安装psutil且没有/proc）")
+            return self
+        self.started = time.monotonic()
+        self.thread = threading.Thread(target=self._run, name=f'memory-probe-{self.label}', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.thread is not None:
+            self.stop_event.set()
+            self.thread.join()
+            self.thread = None
+            self.elapsed = time.monotonic() - self.started
+        return self.report()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+        return False
+
+    def report(self):
+        if not self.samples:
+            return {'label': self.label, 'samples': 0}
+        browser = [s[0] for s in self.samples]
+        python = [s[1] for s in self.samples]
+        totals = [b + p for b, p in self.samples]
+        return {
+            'label': self.label,
+            'samples': len(self.samples),
+            'seconds': round(self.elapsed, 1),
+            'browser_peak_mb': round(max(browser) / MB, 1),
+            'browser_avg_mb': round(sum(browser) / len(browser) / MB, 1),
+            'python_peak_mb': round(max(python) / MB, 1),
+            'total_peak_mb': round(max(totals) / MB, 1)
+        }
+
+
+def suggested_sessions(report, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+    """按峰值估算在内存预算内可以同时运行的会话数"""
+    peak = report.get('total_peak_mb')
+    if not peak:
+        return None
+    return max(int(memory_budget_mb * BUDGET_HEADROOM // peak), 1)
+
+
+def log_memory_report(reports, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+    for report in reports:
+        if not report.get('samples'):
+            logger.info(f"{report['label']}: 没有内存采样")
+            continue
+        logger.info(f"{report['label']}: 浏览器峰值 {report['browser_peak_mb']} MB（平均 {report['browser_avg_mb']} MB），"
+                    f"Python进程峰值 {report['python_peak_mb']} MB，合计峰值 {report['total_peak_mb']} MB，"
+                    f"耗时 {report['seconds']} 秒；{memory_budget_mb} MB 内约可并行 {suggested_sessions(report, memory_budget_mb)} 个会话")
+
+
+def run_harness(sources, launch_profiles, interval=1.0):
+    """在各启动配置下依次运行指定系统的采集（每个系统冷启动浏览器），返回内存报告列表"""
+    # 延迟导入，避免只做内存测量的导入也加载selenium
+    from driver_pool import get_default_pool
+    from update_solar_dashboard import create_updater_from_env
+
+    reports = []
+    for launch_profile in launch_profiles:
+        os.environ['SOLAR_LAUNCH_PROFILE'] = launch_profile
+        pool = get_default_pool()
+        updater = create_updater_from_env()
+        for source in sources:
+            pool.close_all()
+            probe = MemoryProbe(f'{launch_profile}/{source}', pool.browser_pids, interval)
+            with probe:
+                try:
+                    updater.run_portal_source(source)
+                except Exception as e:
+                    logger.error(f"{source} 采集出错: {str(e)}")
+            reports.append(probe.report())
+        pool.close_all()
+    return reports
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='测量各爬虫的浏览器内存占用')
+    parser.add_argument('--source', action='append', default=[], help='要测量的系统（huawei / sems / esolar），可重复，默认全部')
+    parser.add_argument('--launch-profile', action='append', default=[], help='启动配置（standard / low-memory），可重复，默认两者都测')
+    parser.add_argument('--interval', type=float, default=1.0, help='采样间隔（秒）')
+    parser.add_argument('--memory-budget-mb', type=int, default=DEFAULT_MEMORY_BUDGET_MB, help='估算并行会话数时的内存预算（MB）')
+    parser.add_argument('--output', default=None, help='把报告写入JSON文件')
+    args = parser.parse_args(argv)
+
+    reports = run_harness(args.source or ['huawei', 'sems', 'esolar'],
+                          args.launch_profile or ['standard', 'low-memory'], args.interval)
+    log_memory_report(reports, args.memory_budget_mb)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+        logger.info(f"内存报告已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
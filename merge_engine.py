@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+采集结果合并：按规范化的电站ID合并任意数量的数据源
+
+- 电站ID统一为整数（'1'、1 视为同一电站）
+- 同一电站有多个来源时按优先级取值：接口(api) > 页面(dom) > 识别(ocr) > 占位(placeholder)，
+  同优先级时后加入的覆盖先加入的
+- 汇总值在生成项目列表时一次计算，总发电量即各电站发电量之和
+"""
+
+import logging
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+SOURCE_PRIORITY = {
+    'placeholder': 0,
+    'ocr': 1,
+    'dom': 2,
+    'api': 3
+}
+
+# 站点元数据缺省值（与现有 solar_data.json 保持一致）
+DEFAULT_EFFICIENCY_HOURS = 5.5
+DEFAULT_AVG_EFFICIENCY_HOURS = 5.83
+DEFAULT_EFFICIENCY_COLOR = 'bg-green-500'
+
+
+def canonical_station_id(value):
+    """规范化电站ID为整数；无法识别时返回None"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    try:
+        return int(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def to_number(value):
+    """发电量转为数值；None或无法解析时返回None"""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        return float(str(value).replace(',', '').strip())
+    except ValueError:
+        return None
+
+
+class MergeEngine:
+    """按电站ID合并各来源的发电量"""
+
+    def __init__(self, station_meta=None):
+        """station_meta: {电站ID: {'name', 'dcCapacity', 'acCapacity', 'efficiencyColor'}}"""
+        self.station_meta = {canonical_station_id(k): v for k, v in (station_meta or {}).items()}
+        # {电站ID: (优先级, 发电量, 来源类型, 来源系统)}
+        self.observations = {}
+
+    def add(self, station_id, daily_generation, kind, origin=None):
+        """加入一条观测值；未取到数值时按占位处理（发电量记为0，可被任何来源覆盖）"""
+        sid = canonical_station_id(station_id)
+        if sid is None:
+            logger.warning(f"无法识别的电站ID: {station_id!r}（来源 {origin}），已忽略")
+            return False
+        value = to_number(daily_generation)
+        priority = SOURCE_PRIORITY[kind] if value is not None else SOURCE_PRIORITY['placeholder']
+        current = self.observations.get(sid)
+        if current is not None and current[0] > priority:
+            return False
+        if current is not None and value is None and current[1] is not None:
+            return False
+        self.observations[sid] = (priority, value, kind if value is not None else 'placeholder', origin)
+        return True
+
+    def add_source(self, results, kind, origin=None, field='dailyGeneration'):
+        """加入一个数据源的结果 {电站ID: {field: 发电量}}，返回加入的条数"""
+        added = 0
+        if not isinstance(results, dict):
+            return added
+        for station_id, data in results.items():
+            value = data.get(field) if isinstance(data, dict) else data
+            if self.add(station_id, value, kind, origin):
+                added += 1
+        return added
+
+    def project_record(self, sid, daily_generation):
+        meta = self.station_meta.get(sid, {})
+        return {
+            "id": sid,
+            "name": meta.get('name', f'项目{sid}'),
+            "dcCapacity": meta.get('dcCapacity', 0),
+            "acCapacity": meta.get('acCapacity', 0),
+            "dailyGeneration": daily_generation,
+            "efficiencyHours": meta.get('efficiencyHours', DEFAULT_EFFICIENCY_HOURS),
+            "avgEfficiencyHours": meta.get('avgEfficiencyHours', DEFAULT_AVG_EFFICIENCY_HOURS),
+            "efficiencyColor": meta.get('efficiencyColor', DEFAULT_EFFICIENCY_COLOR),
+            "power_curve": {"data_points": []}
+        }
+
+    def build(self, required_ids=()):
+        """生成按ID排序的项目列表与汇总；required_ids中的电站没有数据时以0占位
+
+        返回 (projects, summary)
+        """
+        ids = set(self.observations)
+        for station_id in required_ids:
+            sid = canonical_station_id(station_id)
+            if sid is not None:
+                ids.add(sid)
+
+        projects = []
+        total_dc = 0
+        total_ac = 0
+        total_generation = 0
+        for sid in sorted(ids):
+            _, value, kind, origin = self.observations.get(sid, (0, None, 'placeholder', None))
+            record = self.project_record(sid, value or 0)
+            projects.append(record)
+            total_dc += record['dcCapacity']
+            total_ac += record['acCapacity']
+            total_generation += record['dailyGeneration']
+            logger.info(f"项目 {sid} ({record['name']}): {record['dailyGeneration']} kWh，来源 {origin or '-'}/{kind}")
+
+        summary = {
+            "total_dc_capacity": total_dc,
+            "total_ac_capacity": total_ac,
+            "total_daily_generation": total_generation
+        }
+        return projects, summary
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+接口响应记录器：在页面中挂钩 fetch/XHR，按URL规则把JSON响应随到随存，供各爬虫按规则查询
+
+Selenium 的 execute_cdp_cmd 只能发送CDP命令，无法订阅 Network.responseReceived / loadingFinished 事件；
+读取 performance 日志又需要事后拉取整个日志、逐个请求调用 Network.getResponseBody。
+这里改为通过CDP（Page.addScriptToEvaluateOnNewDocument）在每个页面（包括iframe）加载前注入记录脚本：
+- URL匹配某条规则（且响应文本包含规则指定的关键字）的响应在完成时解析为JSON，
+  连同请求时间、请求体按规则名存入页面内的索引（每条规则只保留最近 limit 条）
+- 同源iframe中的响应汇总到顶层页面的索引中
+- 查询时把页面中新增的记录同步到Python端按规则名索引的环形缓冲区（deque(maxlen=limit)），
+  页面跳转后已同步的记录仍然保留；"某规则在T之后的最新响应" 只需查看缓冲区末尾
+- wait_for 通过一次 execute_async_script 等待：已有满足条件的响应时立即返回，
+  否则在请求完成的那一刻由页面回调返回，不需要轮询
+
+attach_recorder(driver, rules) 返回挂在驱动上的记录器（同一驱动多次调用时合并规则）。
+"""
+
+import json
+import time
+import logging
+from collections import deque
+
+from selenium.common.exceptions import TimeoutException
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMIT = 20
+
+# 记录脚本：参数为规则列表 [{name, pattern, contains}] 与每条规则保留的条数
+CAPTURE_JS_TEMPLATE = r"""
+(function (rules, limit) {
+    const ownHub = () => {
+        if (!window.__solarCapture) {
+            window.__solarCapture = {id: Math.random().toString(36).slice(2), seq: 0, entries: {}, waiters: [], rules: []};
+        }
+        return window.__solarCapture;
+    };
+    const hub = () => {
+        try {
+            if (window.top !== window && window.top.__solarCapture) { return window.top.__solarCapture; }
+        } catch (e) {}
+        return ownHub();
+    };
+    const local = ownHub();
+    // 重复注入时只更新规则
+    local.rules = rules.map((rule) => ({name: rule.name, regex: new RegExp(rule.pattern), contains: rule.contains || null}));
+    local.limit = limit;
+    if (local.installed) { return; }
+    local.installed = true;
+
+    const matching = (url) => local.rules.filter((rule) => rule.regex.test(url || ''));
+    const requestText = (body) => (typeof body === 'string' ? body.slice(0, 2000) : null);
+    const record = (url, requested, request, text, rulesForUrl) => {
+        if (typeof text !== 'string' || !text) { return; }
+        const target = hub();
+        let body;
+        for (const rule of rulesForUrl) {
+            if (rule.contains && text.indexOf(rule.contains) < 0) { continue; }
+            if (body === undefined) {
+                try { body = JSON.parse(text); } catch (e) { return; }
+            }
+            target.seq += 1;
+            const list = target.entries[rule.name] = target.entries[rule.name] || [];
+            list.push({seq: target.seq, url: url, time: requested, received: Date.now(), request: request, body: body});
+            if (list.length > (target.limit || limit)) { list.shift(); }
+            const waiters = target.waiters.splice(0);
+            for (const waiter of waiters) {
+                try { waiter(rule.name); } catch (e) {}
+            }
+        }
+    };
+
+    if (window.fetch) {
+        const originalFetch = window.fetch;
+        window.fetch = function (input, init) {
+            const requested = Date.now();
+            const request = requestText(init && init.body);
+            return originalFetch.apply(this, arguments).then((response) => {
+                const rulesForUrl = matching(response.url);
+                if (rulesForUrl.length) {
+                    response.clone().text().then((text) => record(response.url, requested, request, text, rulesForUrl)).catch(() => {});
+                }
+                return response;
+            });
+        };
+    }
+    const originalOpen = XMLHttpRequest.prototype.open;
+    XMLHttpRequest.prototype.open = function (method, url) {
+        this.__solarUrl = url;
+        return originalOpen.apply(this, arguments);
+    };
+    const originalSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function (payload) {
+        const xhr = this;
+        const requested = Date.now();
+        const request = requestText(payload);
+        xhr.addEventListener('load', () => {
+            const url = xhr.responseURL || String(xhr.__solarUrl || '');
+            const rulesForUrl = matching(url);
+            if (!rulesForUrl.length) { return; }
+            let text = null;
+            if (xhr.responseType === '' || xhr.responseType === 'text') {
+                text = xhr.responseText;
+            } else if (xhr.responseType === 'json' && xhr.response !== null) {
+                text = JSON.stringify(xhr.response);
+            }
+            record(url, requested, request, text, rulesForUrl);
+        });
+        return originalSend.apply(this, arguments);
+    };
+})(%s, %d);
+"""
+
+# 取出页面中尚未同步的记录：cursors 为 {页面索引ID: 已同步的序号}；
+# name 规则没有新记录且 timeoutMs > 0 时，等到该规则的下一条记录或超时再返回
+SYNC_JS = r"""
+const [cursors, name, timeoutMs] = arguments;
+const done = arguments[arguments.length - 1];
+let hub = null;
+try { hub = window.top.__solarCapture || null; } catch (e) {}
+hub = hub || window.__solarCapture;
+if (!hub) { done(null); return; }
+const start = cursors[hub.id] || 0;
+const collect = () => {
+    const entries = {};
+    for (const rule in hub.entries) {
+        const fresh = hub.entries[rule].filter((entry) => entry.seq > start);
+        if (fresh.length) { entries[rule] = fresh; }
+    }
+    return {hub: hub.id, seq: hub.seq, entries: entries};
+};
+const first = collect();
+if (!name || first.entries[name] || timeoutMs <= 0) { done(first); return; }
+let finished = false;
+const finish = () => { if (!finished) { finished = true; done(collect()); } };
+const waiter = (captured) => {
+    if (captured === name) { finish(); } else if (!finished) { hub.waiters.push(waiter); }
+};
+hub.waiters.push(waiter);
+setTimeout(finish, timeoutMs);
+"""
+
+
+class NetworkRecorder:
+    """挂在一个驱动上的接口响应记录器
+
+    rules 为 {规则名: URL正则} 或 {规则名: (URL正则, 响应文本必须包含的关键字)}。
+    记录为 {'url', 'time'（请求发出时间，毫秒）, 'received', 'request'（请求体，截断到2000字符）, 'body'}。
+    """
+
+    def __init__(self, driver, rules=None, limit=DEFAULT_LIMIT):
+        self.driver = driver
+        self.limit = limit
+        self.rules = {}
+        self.buffers = {}
+        self.cursors = {}
+        self.script_id = None
+        if rules:
+            self.add_rules(rules)
+
+    def add_rules(self, rules):
+        """添加规则（同名规则覆盖），已安装时重新注入记录脚本"""
+        for name, rule in rules.items():
+            pattern, contains = rule if isinstance(rule, (tuple, list)) else (rule, None)
+            self.rules[name] = {'name': name, 'pattern': pattern, 'contains': contains}
+            self.buffers.setdefault(name, deque(maxlen=self.limit))
+        if self.script_id is not None:
+            self.install()
+        return self
+
+    @property
+    def script(self):
+        return CAPTURE_JS_TEMPLATE % (json.dumps(list(self.rules.values())), self.limit)
+
+    def install(self):
+        """在之后加载的每个页面中预先注入记录脚本，并注入当前页面"""
+        script = self.script
+        try:
+            if self.script_id:
+                self.driver.execute_cdp_cmd('Page.removeScriptToEvaluateOnNewDocument', {'identifier': self.script_id})
+            self.script_id = self.driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': script}).get('identifier') or ''
+        except Exception as e:
+            self.script_id = ''
+            logger.debug(f"注入接口响应记录脚本失败: {str(e)}")
+        try:
+            self.driver.execute_script(script)
+        except Exception:
+            pass
+        return self
+
+    def mark(self):
+        """返回页面当前时间（毫秒），作为查询的 since，只接受之后发出的请求"""
+        try:
+            return self.driver.execute_script('return Date.now();')
+        except Exception:
+            return int(time.time() * 1000)
+
+    def sync(self, name=None, timeout=0):
+        """把页面中新增的记录同步到环形缓冲区，返回规则 name 新增的记录数
+
+        timeout > 0 且 name 没有新记录时，等到该规则的下一条记录（或超时）再同步。
+        """
+        try:
+            state = self.driver.execute_async_script(SYNC_JS, self.cursors, name, int(max(timeout, 0) * 1000))
+        except TimeoutException:
+            return 0
+        except Exception as e:
+            logger.debug(f"同步接口响应记录失败: {str(e)}")
+            return 0
+        if not state:
+            return 0
+        self.cursors[state['hub']] = state['seq']
+        added = 0
+        for rule, entries in (state.get('entries') or {}).items():
+            buffer = self.buffers.setdefault(rule, deque(maxlen=self.limit))
+            buffer.extend(entries)
+            if rule == name:
+                added = len(entries)
+        return added
+
+    def entries(self, name, since=0):
+        """规则 name 在 since 之后发出的请求的记录（从新到旧）"""
+        self.sync()
+        return [entry for entry in reversed(self.buffers.get(name, ())) if entry.get('time', 0) >= since]
+
+    def latest(self, name, since=0):
+        """规则 name 最新的记录（请求在 since 之后发出），没有时返回None"""
+        self.sync()
+        buffer = self.buffers.get(name)
+        if buffer and buffer[-1].get('time', 0) >= since:
+            return buffer[-1]
+        return None
+
+    def wait_for(self, name, since=0, timeout=5, parse=None, deadline=None):
+        """等待规则 name 在 since 之后发出的请求的记录，返回第一个 parse(记录) 不为None的结果
+
+        parse 为None时返回最新的记录。已有满足条件的记录时立即返回；
+        超时或时间预算耗尽时返回None。
+        """
+        ends_at = time.monotonic() + timeout
+        seen = set()
+        self.sync()
+        while True:
+            # 新记录追加在缓冲区末尾，从新到旧检查到已检查过的记录为止
+            for entry in reversed(self.buffers.get(name, ())):
+                if id(entry) in seen:
+                    break
+                seen.add(id(entry))
+                if entry.get('time', 0) < since:
+                    continue
+                value = entry if parse is None else parse(entry)
+                if value is not None:
+                    return value
+            remaining = ends_at - time.monotonic()
+            if deadline is not None and deadline.remaining() is not None:
+                remaining = min(remaining, deadline.remaining())
+            # 没有新记录说明已等到超时（或页面中没有记录脚本）
+            if remaining <= 0 or not self.sync(name, remaining):
+                return None
+
+
+def attach_recorder(driver, rules, limit=DEFAULT_LIMIT):
+    """返回挂在驱动上的记录器（没有时创建并注入记录脚本），并合并 rules"""
+    recorder = getattr(driver, 'network_recorder', None)
+    if not isinstance(recorder, NetworkRecorder) or recorder.driver is not driver:
+        recorder = NetworkRecorder(driver, rules, limit)
+        driver.network_recorder = recorder
+        return recorder.install()
+    if any(name not in recorder.rules for name in rules):
+        recorder.add_rules(rules)
+    return recorder
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+门户采集工作进程：在独立进程中并发运行华为、SEMS、ESolar三个系统的采集流程
+
+每个系统使用独立的进程（各自启动浏览器），并受各自的截止时间约束；
+超时的进程会先收到SIGTERM（由工作进程内的处理函数转为SystemExit，
+使with语句中的浏览器得以正常退出），仍未退出时再强制结束。
+"""
+
+import time
+import queue
+import signal
+import logging
+import traceback
+import multiprocessing
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+# 各系统默认截止时间（秒）
+DEFAULT_SOURCE_DEADLINES = {
+    'huawei': 900,
+    'sems': 300,
+    'esolar': 600
+}
+
+# 终止超时进程后等待其自行退出的宽限时间（秒）
+TERMINATE_GRACE_SECONDS = 15
+
+
+def _handle_sigterm(signum, frame):
+    """将SIGTERM转换为SystemExit，以便触发__exit__关闭浏览器"""
+    raise SystemExit(f"收到终止信号 {signum}")
+
+
+def _source_worker(source, updater_kwargs, result_queue):
+    """工作进程入口：重建更新器并运行单个数据源，结果写入队列"""
+    signal.signal(signal.SIGTERM, _handle_sigterm)
+    started = time.time()
+    try:
+        # 延迟导入，避免与update_solar_dashboard之间的循环导入
+        from update_solar_dashboard import SolarDashboardUpdater
+        updater = SolarDashboardUpdater(**updater_kwargs)
+        payload = updater.run_portal_source(source)
+        from readiness import wait_report
+        from fast_probe import probe_report
+        result_queue.put({
+            'source': source,
+            'status': 'ok',
+            'payload': payload,
+            'readiness': wait_report(),
+            'lookups': probe_report(),
+            'elapsed': time.time() - started
+        })
+    except BaseException as e:
+        logger.error(f"{source} 工作进程执行出错: {str(e)}")
+        try:
+            result_queue.put({
+                'source': source,
+                'status': 'error',
+                'error': f"{type(e).__name__}: {e}",
+                'traceback': traceback.format_exc(),
+                'elapsed': time.time() - started
+            })
+        except Exception:
+            pass
+
+
+def _stop_process(process, source):
+    """先发送SIGTERM，宽限时间后仍存活则强制结束"""
+    if not process.is_alive():
+        return
+    logger.warning(f"{source} 工作进程超时，发送终止信号 (pid={process.pid})")
+    process.terminate()
+    process.join(TERMINATE_GRACE_SECONDS)
+    if process.is_alive():
+        logger.warning(f"{source} 工作进程未在宽限时间内退出，强制结束 (pid={process.pid})")
+        process.kill()
+        process.join(5)
+
+
+def run_sources_in_processes(updater_kwargs, sources, deadlines=None):
+    """在独立进程中并发运行多个数据源
+
+    Args:
+        updater_kwargs: 用于在子进程中重建SolarDashboardUpdater的构造参数
+        sources: 数据源名称列表，如 ['huawei', 'sems', 'esolar']
+        deadlines: 各数据源的截止时间（秒），未指定的使用DEFAULT_SOURCE_DEADLINES
+
+    Returns:
+        dict: {数据源: {'status': 'ok'|'error'|'timeout', 'payload'|'error', 'elapsed'}}
+    """
+    limits = dict(DEFAULT_SOURCE_DEADLINES)
+    if deadlines:
+        limits.update({k: v for k, v in deadlines.items() if v})
+
+    # 使用spawn，避免fork后继承父进程中的浏览器/线程状态
+    ctx = multiprocessing.get_context('spawn')
+    result_queue = ctx.Queue()
+    started = time.time()
+    processes = {}
+    for source in sources:
+        process = ctx.Process(
+            target=_source_worker,
+            args=(source, updater_kwargs, result_queue),
+            name=f"portal-{source}"
+        )
+        process.start()
+        processes[source] = process
+        logger.info(f"已启动 {source} 工作进程 (pid={process.pid})，截止时间 {limits.get(source)} 秒")
+
+    outcomes = {}
+    pending = set(sources)
+    while pending:
+        # 先收取已完成的结果，避免子进程因队列管道写满而阻塞
+        try:
+            message = result_queue.get(timeout=1)
+            outcomes[message['source']] = message
+            pending.discard(message['source'])
+            logger.info(f"{message['source']} 工作进程完成: status={message['status']}, 耗时 {message.get('elapsed', 0):.1f} 秒")
+            continue
+        except queue.Empty:
+            pass
+
+        elapsed = time.time() - started
+        for source in list(pending):
+            process = processes[source]
+            limit = limits.get(source)
+            if limit and elapsed > limit:
+                _stop_process(process, source)
+                # 终止过程中子进程可能仍写入了结果
+                try:
+                    while True:
+                        message = result_queue.get_nowait()
+                        outcomes[message['source']] = message
+                        pending.discard(message['source'])
+                except queue.Empty:
+                    pass
+                if source in pending:
+                    outcomes[source] = {
+                        'source': source,
+                        'status': 'timeout',
+                        'error': f"超过截止时间 {limit} 秒",
+                        'elapsed': elapsed
+                    }
+                    pending.discard(source)
+            elif not process.is_alive():
+                # 进程已退出但未写入结果（例如被系统杀死），稍等队列刷新后再判定
+                try:
+                    message = result_queue.get(timeout=2)
+                    outcomes[message['source']] = message
+                    pending.discard(message['source'])
+                except queue.Empty:
+                    if source in pending:
+                        outcomes[source] = {
+                            'source': source,
+                            'status': 'error',
+                            'error': f"工作进程异常退出，exitcode={process.exitcode}",
+                            'elapsed': elapsed
+                        }
+                        pending.discard(source)
+
+    for source, process in processes.items():
+        process.join(5)
+        if process.is_alive():
+            _stop_process(process, source)
+
+    logger.info(f"所有工作进程结束，总耗时 {time.time() - started:.1f} 秒")
+    return outcomes
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+日内功率采样：利用常驻会话每隔N分钟读取各电站的当前功率
+
+采样结果按天保存为紧凑的时间序列 data/power_samples/<日期>.json：
+    {"date": "2025-10-01", "stations": {"1": [["09:15", 812.4], ...], ...}}
+并发布到日数据文件中各项目的 power_curve.data_points（[{"time": "HH:MM", "value": kW}]），
+前端即可直接绘制功率曲线，而不必依赖截图。
+"""
+
+import os
+import json
+import logging
+from datetime import datetime
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+# 在页面中查找“实时功率/当前功率”等标签附近的功率数值
+CURRENT_POWER_JS = r"""
+const labels = ['实时功率', '当前功率', '发电功率', '实时发电功率', 'Current Power', 'Real-time Power', 'Active Power'];
+const unitRe = /(-?[\d,]+(?:\.\d+)?)\s*(kW|MW|W)(?![a-zA-Z])/;
+const all = document.querySelectorAll('body *');
+for (const el of all) {
+  const own = Array.from(el.childNodes).filter(n => n.nodeType === 3).map(n => n.textContent).join('').trim();
+  if (!own || own.length > 20) continue;
+  if (!labels.some(l => own.indexOf(l) !== -1)) continue;
+  let node = el;
+  for (let depth = 0; depth < 3 && node; depth++, node = node.parentElement) {
+    const text = (node.innerText || '').replace(/\s+/g, ' ');
+    const m = text.match(unitRe);
+    if (m) return {value: m[1], unit: m[2], text: text.slice(0, 120)};
+  }
+}
+return null;
+"""
+
+
+def read_current_power(driver):
+    """读取当前页面显示的功率，统一换算为kW；读取失败返回None"""
+    try:
+        found = driver.execute_script(CURRENT_POWER_JS)
+    except Exception as e:
+        logger.debug(f"读取当前功率失败: {e}")
+        return None
+    if not found:
+        return None
+    try:
+        value = float(str(found.get('value')).replace(',', ''))
+    except (TypeError, ValueError):
+        return None
+    unit = (found.get('unit') or 'kW').lower()
+    if unit == 'mw':
+        value *= 1000.0
+    elif unit == 'w':
+        value /= 1000.0
+    return round(value, 3)
+
+
+class PowerSampleStore:
+    """按天保存的功率采样时间序列"""
+
+    def __init__(self, base_dir='data'):
+        self.samples_dir = os.path.join(base_dir, 'power_samples')
+
+    def path_for(self, date_str):
+        return os.path.join(self.samples_dir, f'{date_str}.json')
+
+    def load(self, date_str):
+        path = self.path_for(date_str)
+        if not os.path.exists(path):
+            return {'date': date_str, 'stations': {}}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            data.setdefault('stations', {})
+            return data
+        except Exception as e:
+            logger.warning(f"读取功率采样文件失败 {path}: {str(e)}")
+            return {'date': date_str, 'stations': {}}
+
+    def append(self, date_str, samples):
+        """追加一批采样：samples 为 {电站ID: (HH:MM, kW)}，同一时刻重复采样时覆盖"""
+        data = self.load(date_str)
+        for station_id, (time_str, value) in samples.items():
+            series = data['stations'].setdefault(str(station_id), [])
+            series[:] = [p for p in series if p[0] != time_str]
+            series.append([time_str, value])
+            series.sort(key=lambda p: p[0])
+        os.makedirs(self.samples_dir, exist_ok=True)
+        path = self.path_for(date_str)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+        return data
+
+    def data_points(self, date_str, station_id, data=None):
+        """返回某电站的 power_curve.data_points"""
+        data = data or self.load(date_str)
+        series = data['stations'].get(str(station_id), [])
+        return [{'time': t, 'value': v} for t, v in series]
+
+
+def apply_samples_to_projects(projects, date_str, base_dir='data'):
+    """把采样写入项目列表的 power_curve.data_points，返回更新的项目数"""
+    store = PowerSampleStore(base_dir)
+    data = store.load(date_str)
+    if not data['stations']:
+        return 0
+    updated = 0
+    for project in projects:
+        points = store.data_points(date_str, project.get('id'), data)
+        if points:
+            project.setdefault('power_curve', {})['data_points'] = points
+            updated += 1
+    return updated
+
+
+def publish_samples(date_str, data_file_path, base_dir='data'):
+    """若日数据文件已存在，则把采样发布到其中的 power_curve.data_points"""
+    if not os.path.exists(data_file_path):
+        return 0
+    try:
+        with open(data_file_path, 'r', encoding='utf-8') as f:
+            complete_data = json.load(f)
+        projects = complete_data.get('generation_data', {}).get('data', [])
+        updated = apply_samples_to_projects(projects, date_str, base_dir)
+        if updated:
+            with open(data_file_path, 'w', encoding='utf-8') as f:
+                json.dump(complete_data, f, ensure_ascii=False, indent=2)
+            logger.info(f"已发布 {updated} 个电站的功率采样到 {data_file_path}")
+        return updated
+    except Exception as e:
+        logger.warning(f"发布功率采样失败 {data_file_path}: {str(e)}")
+        return 0
+
+
+class PowerSampler:
+    """从常驻会话中轮询各电站的当前功率"""
+
+    def __init__(self, session_manager, updater):
+        self.sessions = session_manager
+        self.updater = updater
+        self.store = PowerSampleStore(updater.base_data_dir)
+
+    def _session(self, source):
+        instance = self.sessions.acquire(source, lambda: self.updater.create_portal_instance(source))
+        if not getattr(instance, 'logged_in', False) and not instance.login():
+            logger.warning(f"{source} 登录失败，跳过本轮采样")
+            return None
+        return instance
+
+    def sample_huawei(self):
+        samples = {}
+        scraper = self._session('huawei')
+        if scraper is None:
+            return samples
+        for project in self.updater.get_project_config()['huawei']['projects']:
+            if scraper.navigate_to_project(project['name']):
+                value = read_current_power(scraper.driver)
+                if value is not None:
+                    samples[int(project['id'])] = value
+        return samples
+
+    def sample_single_station(self, source, station_id):
+        instance = self._session(source)
+        if instance is None:
+            return {}
+        value = read_current_power(instance.driver)
+        return {station_id: value} if value is not None else {}
+
+    def sample_once(self, now=None):
+        """执行一轮采样并写入当天的时间序列，返回 {电站ID: kW}"""
+        now = now or datetime.now()
+        date_str = now.strftime('%Y-%m-%d')
+        time_str = now.strftime('%H:%M')
+        values = {}
+        for name, reader in [
+            ('huawei', self.sample_huawei),
+            ('sems', lambda: self.sample_single_station('sems', 5)),
+            ('esolar', lambda: self.sample_single_station('esolar', 6))
+        ]:
+            try:
+                values.update(reader())
+            except Exception as e:
+                logger.warning(f"{name} 功率采样失败: {str(e)}")
+        if values:
+            self.store.append(date_str, {sid: (time_str, v) for sid, v in values.items()})
+            publish_samples(date_str, os.path.join(self.updater.base_data_dir, f'solar_data_{date_str}.json'), self.updater.base_data_dir)
+        logger.info(f"{time_str} 功率采样: {values}")
+        return values
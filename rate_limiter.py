@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+各系统的请求限速与并发会话上限
+
+- 令牌桶：页面跳转与HTTP接口调用前先取令牌，限制请求速率（允许少量突发）
+- 会话名额：同时打开的已登录浏览器数不超过上限，超出时等待
+- 状态保存在文件中（默认 .rate_limits/，可用 SOLAR_RATE_LIMIT_DIR 指向共享目录），
+  因此并发模式的工作进程、任务队列的多个工作进程之间共享同一限额
+
+默认限额见 PORTAL_LIMITS，可通过环境变量覆盖（按系统或按账号）:
+    SOLAR_RATE_LIMITS="huawei:rate=0.3,burst=3,sessions=1;esolar@18663070009:sessions=1"
+"""
+
+import os
+import json
+import time
+import socket
+import hashlib
+import logging
+import threading
+
+from run_budget import BudgetExceeded
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+# 各系统默认限额：rate为每秒补充的令牌数，burst为桶容量，sessions为同时在线的浏览器会话数
+PORTAL_LIMITS = {
+    'huawei': {'rate': 0.5, 'burst': 5, 'sessions': 2},   # intl.fusionsolar.huawei.com
+    'sems': {'rate': 1.0, 'burst': 5, 'sessions': 2},     # www.sems.com.cn / gopsapi.sems.com.cn
+    'esolar': {'rate': 0.5, 'burst': 5, 'sessions': 2}    # esolar.tbecloud.com
+}
+
+# 锁文件超过该时间视为残留（持锁时间只有几毫秒）
+LOCK_STALE_SECONDS = 10
+# 会话名额文件超过该时间且无法确认进程存活时视为残留
+SESSION_STALE_SECONDS = 12 * 3600
+
+
+def parse_limit_specs(text):
+    """解析 SOLAR_RATE_LIMITS，返回 {'huawei': {...}, 'esolar@账号': {...}}"""
+    specs = {}
+    for part in (text or '').split(';'):
+        part = part.strip()
+        if not part or ':' not in part:
+            continue
+        scope, values = part.split(':', 1)
+        limits = {}
+        for item in values.split(','):
+            if '=' not in item:
+                continue
+            key, value = item.split('=', 1)
+            key = key.strip()
+            if key in ('rate', 'burst', 'sessions'):
+                limits[key] = float(value) if key == 'rate' else int(value)
+        specs[scope.strip()] = limits
+    return specs
+
+
+def state_dir():
+    return os.environ.get('SOLAR_RATE_LIMIT_DIR', '.rate_limits')
+
+
+class _FileLock:
+    """基于独占创建文件的跨进程锁（不依赖fcntl，Windows本地环境同样可用）"""
+
+    def __init__(self, path):
+        self.path = path + '.lock'
+
+    def __enter__(self):
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.close(fd)
+                return self
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self.path) > LOCK_STALE_SECONDS:
+                        os.remove(self.path)
+                        continue
+                except OSError:
+                    continue
+                time.sleep(0.02)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def _pid_alive(pid):
+    if os.name == 'nt':
+        # Windows上os.kill(pid, 0)会结束进程，无法用来探测，只依赖超时判断
+        return True
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+class TokenBucket:
+    """跨进程共享的令牌桶"""
+
+    def __init__(self, name, rate, burst, directory):
+        self.name = name
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self.path = os.path.join(directory, f'{name}.bucket')
+
+    def _take(self, tokens):
+        """尝试取令牌，返回还需等待的秒数（0表示已取到）"""
+        with _FileLock(self.path):
+            now = time.time()
+            state = {'tokens': self.burst, 'updated': now}
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                pass
+            available = min(self.burst, state['tokens'] + max(0.0, now - state['updated']) * self.rate)
+            if available >= tokens:
+                available -= tokens
+                wait = 0.0
+            else:
+                wait = (tokens - available) / self.rate if self.rate > 0 else 1.0
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump({'tokens': available, 'updated': now}, f)
+            return wait
+
+    def acquire(self, tokens=1, deadline=None):
+        """阻塞直到取到令牌，返回累计等待秒数"""
+        waited = 0.0
+        while True:
+            wait = self._take(tokens)
+            if wait <= 0:
+                return waited
+            if deadline is not None:
+                deadline.check('等待请求令牌')
+                deadline.sleep(wait)
+            else:
+                time.sleep(wait)
+            waited += wait
+
+
+class SessionSlots:
+    """跨进程共享的浏览器会话名额"""
+
+    def __init__(self, name, capacity, directory):
+        self.name = name
+        self.capacity = max(1, int(capacity))
+        self.directory = directory
+
+    def _slot_path(self, index):
+        return os.path.join(self.directory, f'{self.name}.session{index}')
+
+    def _is_stale(self, path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                owner = json.load(f)
+        except (OSError, ValueError):
+            return True
+        if owner.get('host') == socket.gethostname() and not _pid_alive(owner.get('pid', 0)):
+            return True
+        return time.time() - owner.get('since', 0) > SESSION_STALE_SECONDS
+
+    def try_acquire(self):
+        """尝试占用一个空闲名额，返回名额文件路径或None"""
+        for index in range(self.capacity):
+            path = self._slot_path(index)
+            with _FileLock(path):
+                if os.path.exists(path) and not self._is_stale(path):
+                    continue
+                with open(path, 'w', encoding='utf-8') as f:
+                    json.dump({'host': socket.gethostname(), 'pid': os.getpid(), 'since': time.time()}, f)
+                return path
+        return None
+
+    def release(self, path):
+        if not path:
+            return
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class PortalGovernor:
+    """某个系统（及账号）的限速器与会话名额；同一进程内按 (系统, 账号) 共享实例"""
+
+    def __init__(self, portal, account=None, directory=None):
+        self.portal = portal
+        self.account = account
+        directory = directory or state_dir()
+        os.makedirs(directory, exist_ok=True)
+        specs = parse_limit_specs(os.environ.get('SOLAR_RATE_LIMITS'))
+        scopes = [(portal, dict(PORTAL_LIMITS.get(portal, {'rate': 1.0, 'burst': 5, 'sessions': 2}), **specs.get(portal, {})))]
+        if account and f'{portal}@{account}' in specs:
+            # 账号名不直接出现在文件名中
+            digest = hashlib.sha1(str(account).encode('utf-8')).hexdigest()[:10]
+            scopes.append((f'{portal}-{digest}', dict(scopes[0][1], **specs[f'{portal}@{account}'])))
+        self.buckets = [TokenBucket(name, limits['rate'], limits['burst'], directory) for name, limits in scopes]
+        self.slots = [SessionSlots(name, limits['sessions'], directory) for name, limits in scopes]
+
+    def throttle(self, tokens=1, deadline=None):
+        """页面跳转或HTTP调用前调用，必要时等待"""
+        waited = sum(bucket.acquire(tokens, deadline) for bucket in self.buckets)
+        if waited >= 1:
+            logger.info(f"{self.portal} 请求限速，等待 {waited:.1f} 秒")
+        return waited
+
+    def acquire_session(self, deadline=None, poll_seconds=2):
+        """占用浏览器会话名额，名额已满时等待；返回名额句柄，交给release_session释放"""
+        held = []
+        logged = False
+        while True:
+            for slots in self.slots[len(held):]:
+                path = slots.try_acquire()
+                if path is None:
+                    break
+                held.append(path)
+            if len(held) == len(self.slots):
+                return held
+            # 只占到部分名额时先全部释放，避免互相等待
+            for slots, path in zip(self.slots, held):
+                slots.release(path)
+            held = []
+            if not logged:
+                logger.info(f"{self.portal} 同时在线的浏览器会话已达上限，等待空闲名额...")
+                logged = True
+            if deadline is not None and (deadline.expired('等待会话名额') or not deadline.sleep(poll_seconds)):
+                raise BudgetExceeded(f"{self.portal} 等待会话名额时预算耗尽")
+            if deadline is None:
+                time.sleep(poll_seconds)
+
+    def release_session(self, handle):
+        for slots, path in zip(self.slots, handle or []):
+            slots.release(path)
+
+
+_governors = {}
+_governors_lock = threading.Lock()
+
+
+def get_governor(portal, account=None):
+    """返回 (系统, 账号) 对应的限速器"""
+    key = (portal, account)
+    with _governors_lock:
+        if key not in _governors:
+            _governors[key] = PortalGovernor(portal, account)
+        return _governors[key]
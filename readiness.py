@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+就绪等待：用具体信号代替固定时长的 time.sleep
+
+- wait_for_document_ready：document.readyState 为 complete
+- wait_for_network_idle：页面内无进行中的 fetch/XHR，且一段时间内没有新的资源请求
+  （计数脚本通过CDP在页面加载前注入，不读取性能日志）
+- wait_for_echarts_finished：ECharts 实例触发 finished 事件（页面未暴露echarts时退化为canvas内容稳定）；
+  wait_for_chart_ready 同时要求网络空闲
+- wait_for_element_stable：元素位置、尺寸与文本在一段时间内不再变化
+- wait_until：任意条件
+
+每个等待都有超时（默认等于原来的固定等待时长 budget，因此不会比原来更慢），
+超时后照常继续后续步骤。各次等待的节省时间汇总在 wait_report() 中，写入运行报告。
+"""
+
+import time
+import logging
+import threading
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+POLL_SECONDS = 0.15
+
+# 统计进行中的 fetch/XHR 请求数
+NETWORK_TRACKER_JS = """
+(function () {
+    if (window.__solarNet) { return; }
+    const net = window.__solarNet = {inflight: 0, lastActivity: Date.now()};
+    const begin = () => { net.inflight += 1; net.lastActivity = Date.now(); };
+    const end = () => { net.inflight = Math.max(0, net.inflight - 1); net.lastActivity = Date.now(); };
+    if (window.fetch) {
+        const originalFetch = window.fetch;
+        window.fetch = function () {
+            begin();
+            return originalFetch.apply(this, arguments).finally(end);
+        };
+    }
+    const originalSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        begin();
+        this.addEventListener('loadend', end, {once: true});
+        return originalSend.apply(this, arguments);
+    };
+})();
+"""
+
+NETWORK_STATE_JS = """
+const net = window.__solarNet || {inflight: 0, lastActivity: 0};
+const resources = performance.getEntriesByType('resource');
+let lastEnd = 0;
+for (const r of resources) { if (r.responseEnd > lastEnd) { lastEnd = r.responseEnd; } }
+return {
+    inflight: net.inflight,
+    quietMs: Math.min(Date.now() - net.lastActivity, performance.now() - lastEnd),
+    readyState: document.readyState
+};
+"""
+
+# 查找ECharts实例并读取状态：'finished'、'pending'，页面未暴露echarts时返回canvas内容指纹
+ECHARTS_STATE_JS = """
+const root = arguments[0] || document;
+const hosts = Array.from(root.querySelectorAll('[_echarts_instance_]'));
+if (root.getAttribute && root.getAttribute('_echarts_instance_')) { hosts.push(root); }
+const lib = window.echarts;
+if (lib && hosts.length) {
+    let finished = true;
+    for (const host of hosts) {
+        const chart = lib.getInstanceByDom(host);
+        if (!chart) { continue; }
+        if (!chart.__solarFinishedHooked) {
+            chart.__solarFinishedHooked = true;
+            chart.__solarFinished = false;
+            chart.on('finished', () => { chart.__solarFinished = true; });
+            const animation = chart.getZr && chart.getZr().animation;
+            if (animation && animation.isFinished && animation.isFinished()) { chart.__solarFinished = true; }
+        }
+        finished = finished && chart.__solarFinished;
+    }
+    return {mode: 'echarts', finished: finished};
+}
+const canvases = Array.from(root.querySelectorAll('canvas'));
+if (!canvases.length) { return {mode: 'none'}; }
+let fingerprint = '';
+for (const canvas of canvases) {
+    try {
+        const data = canvas.toDataURL();
+        fingerprint += data.length + ':' + data.slice(-64) + '|';
+    } catch (e) {
+        fingerprint += canvas.width + 'x' + canvas.height + '|';
+    }
+}
+return {mode: 'canvas', fingerprint: fingerprint};
+"""
+
+ELEMENT_STATE_JS = """
+const el = arguments[0];
+if (!el || !el.isConnected) { return null; }
+const r = el.getBoundingClientRect();
+return [Math.round(r.x), Math.round(r.y), Math.round(r.width), Math.round(r.height), (el.innerText || '').length].join(',');
+"""
+
+
+class WaitStats:
+    """本进程内各次就绪等待的耗时统计（线程安全）"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.entries = {}
+
+    def record(self, label, budget, waited, ok):
+        with self.lock:
+            entry = self.entries.setdefault(label, {'count': 0, 'budget': 0.0, 'waited': 0.0, 'timeouts': 0})
+            entry['count'] += 1
+            entry['budget'] += budget or 0.0
+            entry['waited'] += waited
+            if not ok:
+                entry['timeouts'] += 1
+
+    def merge(self, report):
+        """并入其他进程（并发模式的工作进程）的统计结果"""
+        for label, other in ((report or {}).get('by_label') or {}).items():
+            with self.lock:
+                entry = self.entries.setdefault(label, {'count': 0, 'budget': 0.0, 'waited': 0.0, 'timeouts': 0})
+                for key in ('count', 'budget', 'waited', 'timeouts'):
+                    entry[key] += other.get(key, 0)
+
+    def report(self):
+        """返回 {'waits', 'budget_seconds', 'waited_seconds', 'saved_seconds', 'timeouts', 'by_label'}"""
+        with self.lock:
+            by_label = {
+                label: dict(entry, saved=round(entry['budget'] - entry['waited'], 1),
+                            budget=round(entry['budget'], 1), waited=round(entry['waited'], 1))
+                for label, entry in self.entries.items()
+            }
+        budget = sum(entry['budget'] for entry in by_label.values())
+        waited = sum(entry['waited'] for entry in by_label.values())
+        return {
+            'waits': sum(entry['count'] for entry in by_label.values()),
+            'budget_seconds': round(budget, 1),
+            'waited_seconds': round(waited, 1),
+            'saved_seconds': round(budget - waited, 1),
+            'timeouts': sum(entry['timeouts'] for entry in by_label.values()),
+            'by_label': by_label
+        }
+
+
+_stats = WaitStats()
+
+
+def reset_wait_stats():
+    _stats.reset()
+
+
+def wait_report():
+    return _stats.report()
+
+
+def merge_wait_report(report):
+    _stats.merge(report)
+
+
+def _effective_timeout(timeout, budget, deadline):
+    timeout = budget if timeout is None else timeout
+    if deadline is not None:
+        remaining = deadline.remaining()
+        if remaining is not None:
+            timeout = min(timeout, remaining)
+    return max(0.0, timeout or 0.0)
+
+
+def wait_until(condition, timeout=None, budget=None, label='条件', deadline=None, poll=POLL_SECONDS):
+    """轮询condition()直到返回真值或超时；condition抛出的异常视为未满足
+
+    budget: 原来的固定等待秒数，用于统计节省时间；timeout缺省时等于budget
+    返回condition的最后结果（超时时为False）
+    """
+    timeout = _effective_timeout(timeout, budget, deadline)
+    started = time.monotonic()
+    result = False
+    while True:
+        try:
+            result = condition()
+        except Exception:
+            result = False
+        if result:
+            break
+        if time.monotonic() - started >= timeout:
+            logger.debug(f"等待{label}超时（{timeout:.1f} 秒）")
+            break
+        time.sleep(poll)
+    _stats.record(label, budget if budget is not None else timeout, time.monotonic() - started, bool(result))
+    return result
+
+
+def install_network_tracker(driver):
+    """通过CDP在之后加载的每个页面中预先注入请求计数脚本，并注入当前页面"""
+    try:
+        driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': NETWORK_TRACKER_JS})
+    except Exception:
+        pass
+    try:
+        driver.execute_script(NETWORK_TRACKER_JS)
+    except Exception:
+        pass
+
+
+def wait_for_document_ready(driver, timeout=None, budget=None, label='页面加载', deadline=None):
+    return wait_until(
+        lambda: driver.execute_script('return document.readyState') == 'complete',
+        timeout=timeout, budget=budget, label=label, deadline=deadline
+    )
+
+
+def _network_idle_condition(driver, idle_ms):
+    try:
+        driver.execute_script(NETWORK_TRACKER_JS)
+    except Exception:
+        pass
+    started = time.monotonic()
+
+    def idle():
+        if (time.monotonic() - started) * 1000 < idle_ms:
+            return False
+        state = driver.execute_script(NETWORK_STATE_JS)
+        return state['readyState'] == 'complete' and state['inflight'] == 0 and state['quietMs'] >= idle_ms
+
+    return idle
+
+
+def wait_for_network_idle(driver, timeout=None, budget=None, label='网络空闲', deadline=None, idle_ms=500):
+    """文档加载完成、无进行中的fetch/XHR，且idle_ms内没有新的资源请求
+
+    至少等待idle_ms，避免点击后请求尚未发出时就判定为空闲。
+    """
+    return wait_until(_network_idle_condition(driver, idle_ms), timeout=timeout, budget=budget, label=label, deadline=deadline)
+
+
+def wait_for_page_ready(driver, timeout=None, budget=None, label='页面就绪', deadline=None, idle_ms=500):
+    """页面跳转或点击后的通用等待：文档加载完成且网络空闲"""
+    return wait_for_network_idle(driver, timeout=timeout, budget=budget, label=label, deadline=deadline, idle_ms=idle_ms)
+
+
+def wait_for_url_change(driver, old_url=None, excluded=None, timeout=None, budget=None, label='页面跳转', deadline=None):
+    """等待跳转完成：地址不同于old_url（或不再包含excluded），且文档加载完成"""
+    def changed():
+        current_url = driver.current_url or ''
+        if old_url is not None and current_url == old_url:
+            return False
+        if excluded and excluded in current_url.lower():
+            return False
+        return driver.execute_script('return document.readyState') == 'complete'
+
+    return wait_until(changed, timeout=timeout, budget=budget, label=label, deadline=deadline)
+
+
+def wait_for_tooltips_hidden(driver, timeout=None, budget=None, label='提示框消失', deadline=None):
+    """鼠标移开后等待ECharts与页面提示框隐藏，避免出现在截图中"""
+    script = (
+        "const els = document.querySelectorAll('.dpdesign-tooltip-inner, .echarts-tooltip, div[style*=\"z-index: 9999999\"]');"
+        "for (const el of els) { const st = getComputedStyle(el);"
+        " if (el.getClientRects().length && st.visibility !== 'hidden' && st.opacity !== '0') { return false; } }"
+        "return true;"
+    )
+    return wait_until(lambda: driver.execute_script(script), timeout=timeout, budget=budget, label=label, deadline=deadline)
+
+
+def _echarts_finished_condition(driver, root, stable_ms):
+    state = {'fingerprint': None, 'since': None}
+
+    def finished():
+        result = driver.execute_script(ECHARTS_STATE_JS, root)
+        if result['mode'] == 'echarts':
+            return result['finished']
+        if result['mode'] == 'none':
+            return False
+        now = time.monotonic()
+        if result['fingerprint'] != state['fingerprint']:
+            state['fingerprint'] = result['fingerprint']
+            state['since'] = now
+            return False
+        return (now - state['since']) * 1000 >= stable_ms
+
+    return finished
+
+
+def wait_for_echarts_finished(driver, root=None, timeout=None, budget=None, label='图表渲染', deadline=None, stable_ms=600):
+    """等待root（缺省为整个页面）内的ECharts图表渲染完成
+
+    页面暴露了 window.echarts 时等待各实例的 finished 事件；否则等待canvas内容在stable_ms内不再变化。
+    """
+    return wait_until(_echarts_finished_condition(driver, root, stable_ms),
+                      timeout=timeout, budget=budget, label=label, deadline=deadline)
+
+
+def wait_for_chart_ready(driver, root=None, timeout=None, budget=None, label='图表数据加载', deadline=None,
+                         idle_ms=500, stable_ms=600):
+    """数据请求完成且图表渲染完成（避免图表先以空数据渲染一次就被判定为完成）"""
+    idle = _network_idle_condition(driver, idle_ms)
+    finished = _echarts_finished_condition(driver, root, stable_ms)
+    return wait_until(lambda: idle() and finished(), timeout=timeout, budget=budget, label=label, deadline=deadline)
+
+
+def wait_for_element_stable(driver, element, timeout=None, budget=None, label='元素稳定', deadline=None, stable_ms=400):
+    """等待元素的位置、尺寸与文本长度在stable_ms内不再变化（动画、懒加载结束）"""
+    state = {'value': None, 'since': None}
+
+    def stable():
+        value = driver.execute_script(ELEMENT_STATE_JS, element)
+        if value is None:
+            return False
+        now = time.monotonic()
+        if value != state['value']:
+            state['value'] = value
+            state['since'] = now
+            return False
+        return (now - state['since']) * 1000 >= stable_ms
+
+    return wait_until(stable, timeout=timeout, budget=budget, label=label, deadline=deadline)
+
+
+def wait_for_element(driver, css_selector, timeout=None, budget=None, label='元素出现', deadline=None, visible=True):
+    """等待元素出现（visible为True时还需可见），返回元素或None
+
+    通过JS查询而不是find_elements，不受驱动隐式等待影响，超时时间才准确。
+    """
+    script = (
+        "const els = document.querySelectorAll(arguments[0]);"
+        "for (const el of els) { if (!arguments[1] || el.getClientRects().length) { return el; } }"
+        "return null;"
+    )
+    return wait_until(
+        lambda: driver.execute_script(script, css_selector, visible),
+        timeout=timeout, budget=budget, label=label, deadline=deadline
+    ) or None
+
+
+def log_wait_report(report=None):
+    report = report or wait_report()
+    if report['waits']:
+        logger.info(f"就绪等待 {report['waits']} 次：原固定等待 {report['budget_seconds']} 秒，"
+                    f"实际等待 {report['waited_seconds']} 秒，节省 {report['saved_seconds']} 秒"
+                    f"（超时 {report['timeouts']} 次）")
+    return report
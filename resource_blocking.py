@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按系统配置的资源拦截：只需要数值时不下载图片、字体、地图瓦片和统计脚本
+
+通过CDP的 Network.setBlockedURLs 对当前标签页生效：
+- 数据模式（默认）：拦截统计/广告脚本、地图瓦片、音视频，以及各系统配置的图片、字体
+- 完整渲染：截图阶段用 full_rendering() 临时只保留对统计脚本等的拦截，
+  可选择刷新当前页面，使截图中的图片和字体完整加载；小窗口的启动配置下同时放大视口；退出后恢复数据模式
+
+设置 SOLAR_RESOURCE_BLOCKING=0 可关闭。
+"""
+
+import os
+import logging
+from contextlib import contextmanager
+
+from driver_pool import set_screenshot_viewport
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+# 任何阶段都不需要的资源：统计、广告、地图瓦片、音视频
+ALWAYS_BLOCKED = [
+    '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*',
+    '*hm.baidu.com*', '*cnzz.com*', '*umeng.com*', '*growingio.com*', '*sensorsdata*',
+    '*api.map.baidu.com*', '*webapi.amap.com*', '*.is.autonavi.com*', '*tile.openstreetmap.org*',
+    '*.mp4', '*.webm', '*.mp3'
+]
+
+IMAGES = ['*.jpg', '*.jpeg', '*.png', '*.gif', '*.webp', '*.bmp', '*.ico']
+FONTS = ['*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot']
+
+# 各系统数据模式下额外拦截的资源
+# 华为登录页可能出现图片验证码，因此不拦截图片
+PORTAL_PROFILES = {
+    'huawei': FONTS,
+    'sems': IMAGES + FONTS,
+    'esolar': IMAGES + FONTS
+}
+
+PAGE_STATS_JS = """
+const nav = performance.getEntriesByType('navigation')[0];
+const resources = performance.getEntriesByType('resource');
+let bytes = nav ? (nav.transferSize || 0) : 0;
+for (const r of resources) { bytes += r.transferSize || 0; }
+return {load_ms: nav ? Math.round(nav.loadEventEnd || nav.duration) : null, bytes: bytes, resources: resources.length};
+"""
+
+
+def blocking_enabled():
+    return os.environ.get('SOLAR_RESOURCE_BLOCKING', '1') not in ('0', 'false', 'no')
+
+
+def page_stats(driver):
+    """当前页面的加载耗时、传输字节数与资源数（读取失败时返回None）"""
+    try:
+        return driver.execute_script(PAGE_STATS_JS)
+    except Exception:
+        return None
+
+
+class ResourceBlocker:
+    """爬虫当前标签页的资源拦截状态（爬虫更换驱动后自动作用于新的驱动）"""
+
+    def __init__(self, scraper, portal):
+        self.scraper = scraper
+        self.portal = portal
+        self.render_depth = 0
+
+    @property
+    def driver(self):
+        return getattr(self.scraper, 'driver', None)
+
+    def patterns(self, full_rendering=False):
+        if full_rendering:
+            return list(ALWAYS_BLOCKED)
+        return ALWAYS_BLOCKED + PORTAL_PROFILES.get(self.portal, [])
+
+    def _set(self, patterns):
+        if not blocking_enabled() or self.driver is None:
+            return False
+        try:
+            self.driver.execute_cdp_cmd('Network.enable', {})
+            self.driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': patterns})
+            return True
+        except Exception as e:
+            logger.warning(f"{self.portal} 设置资源拦截失败: {str(e)}")
+            return False
+
+    def apply(self):
+        """进入数据模式；在截图阶段中更换驱动（如看门狗回收浏览器）时保持完整渲染"""
+        rendering = self.render_depth > 0
+        if rendering:
+            set_screenshot_viewport(self.driver)
+        patterns = self.patterns(full_rendering=rendering)
+        if self._set(patterns):
+            logger.info(f"{self.portal} 已启用资源拦截（{len(patterns)} 条规则）")
+
+    @contextmanager
+    def full_rendering(self, reload=False):
+        """截图阶段临时恢复图片与字体；reload为True时刷新当前页面以重新加载被拦截的资源"""
+        self.render_depth += 1
+        try:
+            if self.render_depth == 1:
+                set_screenshot_viewport(self.driver)
+            if self.render_depth == 1 and self._set(self.patterns(full_rendering=True)) and reload:
+                logger.info(f"{self.portal} 截图前恢复完整渲染并刷新页面")
+                governor = getattr(self.scraper, 'governor', None)
+                if governor is not None:
+                    governor.throttle(deadline=getattr(self.scraper, 'deadline', None))
+                self.driver.refresh()
+            yield self
+        finally:
+            self.render_depth -= 1
+            if self.render_depth == 0:
+                self._set(self.patterns())
+                set_screenshot_viewport(self.driver, enabled=False)
+
+    def log_stats(self, label):
+        stats = page_stats(self.driver)
+        if stats:
+            logger.info(f"{self.portal} {label}: 加载 {stats.get('load_ms')} ms，"
+                        f"传输 {stats.get('bytes', 0) / 1024:.0f} KB，资源 {stats.get('resources')} 个")
+        return stats
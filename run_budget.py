@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运行时间预算：全局截止时间与各系统的时间预算
+
+爬虫在各步骤之间检查预算（协作式取消），预算耗尽时停止后续步骤，
+返回已获取的部分数据，并通过with语句正常释放浏览器。
+"""
+
+import time
+import logging
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+
+class BudgetExceeded(Exception):
+    """时间预算已耗尽"""
+    pass
+
+
+class Deadline:
+    """截止时间；seconds为None表示不限时"""
+
+    def __init__(self, seconds=None, name='run', parent=None):
+        self.name = name
+        self.parent = parent
+        self.started_at = time.monotonic()
+        self.expires_at = None if seconds is None else self.started_at + max(0.0, float(seconds))
+        self._expired_logged = False
+
+    def remaining(self):
+        """剩余秒数；不限时返回None"""
+        own = None if self.expires_at is None else max(0.0, self.expires_at - time.monotonic())
+        inherited = self.parent.remaining() if self.parent is not None else None
+        if own is None:
+            return inherited
+        if inherited is None:
+            return own
+        return min(own, inherited)
+
+    def elapsed(self):
+        return time.monotonic() - self.started_at
+
+    def expired(self, step=None):
+        """是否已超时；首次发现超时时记录日志"""
+        remaining = self.remaining()
+        if remaining is None or remaining > 0:
+            return False
+        if not self._expired_logged:
+            where = f"（{step}）" if step else ''
+            logger.warning(f"{self.name} 时间预算已耗尽{where}，已用时 {self.elapsed():.1f} 秒，停止后续步骤")
+            self._expired_logged = True
+        return True
+
+    def check(self, step=None):
+        """超时则抛出BudgetExceeded"""
+        if self.expired(step):
+            raise BudgetExceeded(f"{self.name} 时间预算已耗尽" + (f"（{step}）" if step else ''))
+
+    def sleep(self, seconds):
+        """睡眠不超过剩余预算；返回False表示预算已耗尽"""
+        remaining = self.remaining()
+        if remaining is not None:
+            seconds = min(seconds, remaining)
+        if seconds > 0:
+            time.sleep(seconds)
+        return not self.expired()
+
+    def child(self, seconds=None, name=None):
+        """派生子预算，实际截止时间不晚于本预算"""
+        return Deadline(seconds, name=name or self.name, parent=self)
+
+
+def unlimited(name='run'):
+    """返回不限时的预算对象"""
+    return Deadline(None, name=name)
+
+
+def parse_budget_specs(specs):
+    """解析命令行中的 'huawei=600' 形式预算配置，返回 {系统: 秒数}"""
+    budgets = {}
+    for spec in specs or []:
+        if '=' not in spec:
+            raise ValueError(f"预算格式应为 系统=秒数: {spec}")
+        source, seconds = spec.split('=', 1)
+        budgets[source.strip()] = float(seconds)
+    return budgets
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SEMS接口客户端：直接请求 GetChartByPlant，得到电站某天的发电量与功率曲线
+
+token由令牌管理器（token_manager）保存并在过期前刷新：刷新时用账号密码请求SEMS的登录接口
+（CrossLogin，不启动浏览器），失败时才通过无头浏览器登录后从localStorage读取；
+首次使用时导入会话保管库（session_vault）中随会话保存的token。
+客户端使用带连接池的 requests.Session，同一token在所有请求间复用，
+多个电站、多个日期的查询并发执行（仍受 rate_limiter 的请求限速约束）。
+功率曲线只作为数据返回（写入 power_curve.data_points），不生成图片，也不需要截图和OCR。
+
+设置 SOLAR_SEMS_API=0 可关闭；SOLAR_SEMS_PLANT_IDS 可覆盖项目ID到SEMS电站ID的映射，
+格式为 "5:c5e69404-...,7:..."；SOLAR_SEMS_LOGIN_URL 可指定登录接口地址。
+"""
+
+import os
+import json
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from date_utils import format_date
+from session_vault import SessionVault
+from rate_limiter import get_governor
+from token_manager import get_token_manager, manager_enabled
+from fusionsolar_api import to_number
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+CHART_URL = 'https://gopsapi.sems.com.cn/api/v2/Charts/GetChartByPlant'
+LOGIN_URL = 'https://gopsapi.sems.com.cn/api/v2/Common/CrossLogin'
+
+# 登录前请求头中的token（只包含客户端信息），登录后换成接口返回的token
+ANONYMOUS_TOKEN = {'version': 'v2.1.0', 'client': 'web', 'language': 'zh_CN'}
+# 登录接口返回的data中组成token的字段（与页面保存在localStorage中的token相同）
+TOKEN_FIELDS = ('uid', 'timestamp', 'token', 'client', 'version', 'language')
+
+# token被拒绝时接口返回的错误码
+TOKEN_ERROR_CODES = ('100001', '100002')
+
+# 浏览器中记录页面自身GetChartByPlant请求的规则（见network_capture）
+CHART_CAPTURE_RULES = {'chart': r'/api/v2/Charts/GetChartByPlant'}
+PORTAL_ORIGIN = 'https://www.sems.com.cn'
+
+DEFAULT_USER_AGENT = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+                      'Chrome/120.0.0.0 Safari/537.36 Edg/120.0.0.0')
+
+# 项目ID -> SEMS电站ID
+PLANT_IDS = {
+    '5': 'c5e69404-9026-41b1-b88f-233f6d36f12a'   # 黄河植物园
+}
+
+# GetChartByPlant 中表示日发电量的统计项（key或名称中包含其一即可）
+GENERATION_KEYS = ('generation', 'generate', '发电')
+
+# 功率曲线优先选用的曲线（key或名称中包含其一即可），都没有时取第一条
+POWER_LINE_KEYS = ('pv', 'power', '功率')
+
+
+class SemsAPIError(Exception):
+    """接口返回错误或token已失效"""
+
+
+class SemsTokenError(SemsAPIError):
+    """token被接口拒绝（已过期或在其他地方登录）"""
+
+
+def api_enabled():
+    return os.environ.get('SOLAR_SEMS_API', '1') not in ('0', 'false', 'no')
+
+
+def plant_ids():
+    """项目ID到SEMS电站ID的映射（可被 SOLAR_SEMS_PLANT_IDS 覆盖或补充）"""
+    mapping = dict(PLANT_IDS)
+    for item in os.environ.get('SOLAR_SEMS_PLANT_IDS', '').split(','):
+        if ':' in item:
+            project_id, plant_id = item.split(':', 1)
+            mapping[project_id.strip()] = plant_id.strip()
+    return mapping
+
+
+def _matches(entry, keys):
+    name = f"{entry.get('key') or ''} {entry.get('label') or entry.get('name') or ''}".lower()
+    return any(key in name for key in keys)
+
+
+def _line_points(line):
+    """把一条曲线转为 [{'time': 'HH:MM', 'value': kW}]；单位为W时换算为kW"""
+    label = str(line.get('label') or line.get('unit') or '')
+    scale = 0.001 if '(W)' in label or label.strip().upper() == 'W' else 1
+    points = []
+    for point in line.get('xy') or []:
+        value = to_number(point.get('y'))
+        if value is None:
+            continue
+        points.append({'time': str(point.get('x'))[-5:], 'value': round(value * scale, 3)})
+    return points
+
+
+def parse_chart(payload):
+    """从GetChartByPlant响应中取出 (日发电量kWh, 功率点列表)，取不到的部分为None/[]
+
+    兼容新版响应（data.generateData / data.lines）与旧版响应（result.totalPower / data列表）。
+    """
+    if not isinstance(payload, dict):
+        return None, []
+    data = payload.get('data')
+    if payload.get('success') and isinstance(payload.get('result'), dict):
+        data = payload['result']
+    if isinstance(data, list):
+        # 旧版：[{time, value}]，最后一个点为当日累计值
+        points = [{'time': str(p.get('time'))[-5:], 'value': to_number(p.get('value'))}
+                  for p in data if isinstance(p, dict) and to_number(p.get('value')) is not None]
+        return (points[-1]['value'] if points else None), points
+    if not isinstance(data, dict):
+        return None, []
+
+    daily_generation = None
+    for key in ('totalPower', 'generation'):
+        if to_number(data.get(key)) is not None:
+            daily_generation = to_number(data.get(key))
+            break
+    for entry in data.get('generateData') or []:
+        if isinstance(entry, dict) and _matches(entry, GENERATION_KEYS) and to_number(entry.get('value')) is not None:
+            daily_generation = to_number(entry.get('value'))
+            break
+
+    lines = [line for line in data.get('lines') or [] if isinstance(line, dict)]
+    line = next((line for line in lines if _matches(line, POWER_LINE_KEYS)), lines[0] if lines else None)
+    points = _line_points(line) if line else []
+    if isinstance(data.get('data'), list) and not points:
+        legacy_total, points = parse_chart({'data': data['data']})
+        if daily_generation is None:
+            daily_generation = legacy_total
+    return daily_generation, points
+
+
+def vault_token(account):
+    """从会话保管库保存的SEMS会话中取出接口token（会话过期或不存在时返回None）"""
+    record = SessionVault().load('sems', account)
+    if not record:
+        return None
+    return (record.get('local_storage') or {}).get('token') or (record.get('session_storage') or {}).get('token')
+
+
+def cross_login(account, password, session=None, timeout=15, governor=None):
+    """不启动浏览器，用账号密码请求SEMS登录接口，返回与页面登录后相同格式的token"""
+    if governor is not None:
+        governor.throttle()
+    response = (session or requests).post(
+        os.environ.get('SOLAR_SEMS_LOGIN_URL') or LOGIN_URL,
+        json={'account': account, 'pwd': password, 'agreement_agreement': 0, 'is_local': False},
+        headers={
+            'Content-Type': 'application/json',
+            'Accept': 'application/json, text/plain, */*',
+            'Origin': PORTAL_ORIGIN,
+            'Referer': PORTAL_ORIGIN + '/',
+            'User-Agent': DEFAULT_USER_AGENT,
+            'token': json.dumps(ANONYMOUS_TOKEN, separators=(',', ':'))
+        },
+        timeout=timeout
+    )
+    response.raise_for_status()
+    try:
+        payload = response.json()
+    except ValueError:
+        raise SemsAPIError('登录接口没有返回JSON')
+    data = payload.get('data') if isinstance(payload, dict) else None
+    if payload.get('hasError') or not isinstance(data, dict) or not data.get('token'):
+        raise SemsAPIError(f"登录接口返回错误: {payload.get('code')} {payload.get('msg')}")
+    logger.info('SEMS登录接口已返回新的token')
+    return json.dumps({key: data[key] for key in TOKEN_FIELDS if data.get(key) is not None}, separators=(',', ':'))
+
+
+def browser_login_token(account, password):
+    """通过无头浏览器登录SEMS并读取token（登录接口不可用时的兜底），失败时返回None"""
+    # 延迟导入：sems_combined_tool 依赖本模块
+    from sems_combined_tool import SEMSScreenshotTool
+    with SEMSScreenshotTool(account, password, headless=True) as tool:
+        if not (tool.logged_in or tool.login()):
+            return None
+        return tool.driver.execute_script("return localStorage.getItem('token') || sessionStorage.getItem('token');")
+
+
+def token_manager(account, password=None):
+    """SEMS的令牌管理器：刷新时请求登录接口，失败时无头浏览器登录；没有令牌时先导入会话保管库中的token"""
+    refresh = login = None
+    if password:
+        refresh = lambda current: cross_login(account, password, governor=get_governor('sems', account))
+        login = lambda: browser_login_token(account, password)
+    manager = get_token_manager('sems', account, refresh=refresh, login=login)
+    if manager.record() is None:
+        record = SessionVault().load('sems', account)
+        token = vault_token(account) if record else None
+        if token:
+            manager.put(token, ttl=record['expires_at'] - time.time(), source='vault')
+    return manager
+
+
+def fetch_token(account, password=None, allow_login=True, deadline=None):
+    """接口token：由令牌管理器提供（必要时刷新或登录，等待刷新不超过deadline）；令牌管理关闭时只使用会话保管库中的token"""
+    if not manager_enabled():
+        return vault_token(account)
+    return token_manager(account, password).get(allow_login=allow_login, deadline=deadline)
+
+
+class SemsAPI:
+    """复用登录token的SEMS接口客户端"""
+
+    def __init__(self, token, session=None, timeout=15, governor=None, deadline=None, max_workers=4, user_agent=None):
+        self.token = token
+        self.timeout = timeout
+        self.governor = governor
+        self.deadline = deadline
+        self.max_workers = max_workers
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=max(max_workers, 1) * 2)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'Content-Type': 'application/json',
+            'Accept': 'application/json, text/plain, */*',
+            'Origin': PORTAL_ORIGIN,
+            'Referer': PORTAL_ORIGIN + '/',
+            'User-Agent': user_agent or DEFAULT_USER_AGENT,
+            'token': token
+        })
+        self.plant_ids = plant_ids()
+        # token被接口拒绝时置为True，由调用方让令牌管理器重新获取
+        self.token_rejected = False
+
+    @classmethod
+    def from_driver(cls, driver, **kwargs):
+        """从已登录的浏览器中读取token与UA创建客户端，没有token时返回None"""
+        try:
+            token = driver.execute_script("return localStorage.getItem('token') || sessionStorage.getItem('token');")
+            user_agent = driver.execute_script('return navigator.userAgent;')
+        except Exception as e:
+            logger.warning(f"读取SEMS token失败: {str(e)}")
+            return None
+        if not token:
+            return None
+        kwargs.setdefault('user_agent', user_agent)
+        return cls(token, **kwargs)
+
+    @classmethod
+    def from_vault(cls, account, **kwargs):
+        """用会话保管库中未过期的token创建客户端（不启动浏览器），没有时返回None"""
+        token = vault_token(account)
+        if not token:
+            return None
+        logger.info('SEMS接口客户端复用已保存会话中的token')
+        return cls(token, **kwargs)
+
+    @classmethod
+    def from_token_manager(cls, account, password=None, allow_login=True, **kwargs):
+        """用令牌管理器提供的token创建客户端，没有可用token时返回None"""
+        token = fetch_token(account, password, allow_login, kwargs.get('deadline'))
+        if not token:
+            return None
+        return cls(token, **kwargs)
+
+    def get_chart(self, project_id, date_str):
+        """请求某项目某天的GetChartByPlant原始响应"""
+        plant_id = self.plant_ids.get(str(project_id))
+        if not plant_id:
+            raise SemsAPIError(f'项目 {project_id} 没有对应的SEMS电站ID')
+        if self.deadline is not None and self.deadline.expired(f'SEMS接口 {project_id} {date_str}'):
+            raise SemsAPIError('时间预算已耗尽')
+        if self.governor is not None:
+            self.governor.throttle(deadline=self.deadline)
+        response = self.session.post(CHART_URL, json={
+            'id': plant_id,
+            'date': format_date(date_str),
+            'range': 2,
+            'chartIndexId': '1',
+            'isDetailFull': ''
+        }, timeout=self.timeout)
+        if response.status_code in (401, 403):
+            raise SemsTokenError(f'token已失效（HTTP {response.status_code}）')
+        response.raise_for_status()
+        try:
+            payload = response.json()
+        except ValueError:
+            raise SemsAPIError('GetChartByPlant 没有返回JSON')
+        if isinstance(payload, dict) and str(payload.get('code')) in TOKEN_ERROR_CODES:
+            raise SemsTokenError(f"token已失效: {payload.get('code')} {payload.get('msg')}")
+        if isinstance(payload, dict) and (payload.get('hasError') or payload.get('code') not in (None, 0, '0')):
+            # token失效时也可能返回 "ver is not fund"
+            raise SemsAPIError(f"GetChartByPlant 返回错误: {payload.get('code')} {payload.get('msg')}")
+        return payload
+
+    def fetch(self, project_id, date_str):
+        """采集某项目某天的数据，返回 {'screenshot_path', 'daily_generation', 'power_curve', 'source'}；
+        接口结果没有截图（screenshot_path为None），接口没有发电量时返回None"""
+        payload = self.get_chart(project_id, date_str)
+        daily_generation, points = parse_chart(payload)
+        if daily_generation is None:
+            logger.info(f"SEMS接口没有项目 {project_id} {date_str} 的发电量")
+            return None
+        logger.info(f"SEMS接口: 项目 {project_id} {date_str} 本日发电量 {daily_generation} kWh，功率点 {len(points)} 个")
+        return {
+            'screenshot_path': None,
+            'daily_generation': daily_generation,
+            'power_curve': points,
+            'source': 'api'
+        }
+
+    def collect(self, project_ids, dates):
+        """并发采集多个项目、多个日期，返回 {日期: {项目ID: 结果}}（只包含取到发电量的项目与日期）
+
+        token失效时停止其余请求，由调用方改用浏览器兜底。
+        """
+        jobs = [(str(pid), format_date(d)) for d in dates for pid in project_ids]
+        results = {}
+        failed = []
+
+        def run(job):
+            project_id, date_str = job
+            if failed:
+                return job, None
+            try:
+                return job, self.fetch(project_id, date_str)
+            except SemsAPIError as e:
+                if isinstance(e, SemsTokenError):
+                    self.token_rejected = True
+                if not failed:
+                    logger.warning(f"SEMS接口请求失败: {str(e)}，其余日期改用浏览器采集")
+                failed.append(job)
+            except requests.RequestException as e:
+                logger.warning(f"SEMS接口请求项目 {project_id} {date_str} 出错: {str(e)}")
+            return job, None
+
+        with ThreadPoolExecutor(max_workers=max(min(self.max_workers, len(jobs)), 1)) as executor:
+            for (project_id, date_str), result in executor.map(run, jobs):
+                if result:
+                    results.setdefault(date_str, {})[project_id] = result
+        return results
+
+
+def collect_with_token(account, password, project_ids, dates, allow_login=True, **kwargs):
+    """用令牌管理器提供的token并发采集，返回 {日期: {项目ID: 结果}}
+
+    token被接口拒绝时让令牌管理器重新获取（刷新或登录），再采集一次尚未取得数据的日期。
+    """
+    results = {}
+    pending = [format_date(d) for d in dates]
+    for attempt in range(2):
+        client = SemsAPI.from_token_manager(account, password, allow_login, **kwargs)
+        if client is None:
+            break
+        for date_str, items in client.collect(project_ids, pending).items():
+            results.setdefault(date_str, {}).update(items)
+        pending = [d for d in pending if d not in results]
+        if not pending or not client.token_rejected or not manager_enabled():
+            break
+        token_manager(account, password).invalidate(client.token)
+    return results
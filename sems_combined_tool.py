@@ -6,25 +6,29 @@ SEMS 登录、数据提取与截图工具
 """
 
 import os
-import time
 import json
 import logging
 import requests
 from datetime import datetime
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.edge.service import Service as EdgeService
-from selenium.webdriver.edge.options import Options as EdgeOptions
-from selenium.webdriver.chrome.service import Service as ChromeService
-from selenium.webdriver.chrome.options import Options as ChromeOptions
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import (WebDriverException, TimeoutException,
                                       ElementNotInteractableException,
                                       NoSuchElementException,
                                       ElementClickInterceptedException)
-from webdriver_manager.chrome import ChromeDriverManager
-from webdriver_manager.microsoft import EdgeChromiumDriverManager
+from date_utils import format_date, days_before_today
+from sems_api import (SemsAPI, SemsAPIError, SemsTokenError, CHART_URL, CHART_CAPTURE_RULES, parse_chart,
+                      token_manager, fetch_token, api_enabled as sems_api_enabled)
+from network_capture import attach_recorder
+from run_budget import unlimited
+from rate_limiter import get_governor
+from driver_pool import get_default_pool
+from session_vault import restore_session, remember_session
+from resource_blocking import ResourceBlocker
+from driver_watchdog import DriverWatchdog
+from fast_probe import probe_first, wait_for_any
+from readiness import (install_network_tracker, wait_until, wait_for_page_ready, wait_for_network_idle,
+                       wait_for_url_change, wait_for_chart_ready)
 
 # 配置日志
 logging.basicConfig(
@@ -34,25 +38,47 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 登录页输入框的候选定位方式，按顺序尝试
+LOGIN_USERNAME_CANDIDATES = [(By.XPATH, "//input[@type='text']"), (By.NAME, 'username'), (By.ID, 'username')]
+LOGIN_PASSWORD_CANDIDATES = [(By.XPATH, "//input[@type='password']"), (By.NAME, 'password'), (By.ID, 'password')]
+
 def is_ci_environment():
     """检测是否在CI环境中运行"""
     ci_indicators = ['CI', 'GITHUB_ACTIONS', 'GITLAB_CI', 'TRAVIS', 'CIRCLECI', 'JENKINS_URL']
     return any(os.environ.get(indicator) for indicator in ci_indicators)
 
 class SEMSScreenshotTool:
-    def __init__(self, username, password, screenshots_dir=None, data_file_path=None):
+    def __init__(self, username, password, screenshots_dir=None, data_file_path=None, target_date=None, deadline=None, driver_pool=None, headless=None):
         """
         初始化SEMS截图工具
         :param username: 用户名
         :param password: 密码
         :param screenshots_dir: 截图保存目录，默认使用当前目录下的screenshots文件夹
         :param data_file_path: 数据保存文件路径，默认使用当前目录下的solar_data.json
+        :param target_date: 目标日期（'YYYY-MM-DD'），默认为昨天
+        :param deadline: 时间预算（run_budget.Deadline），耗尽时停止后续步骤
+        :param driver_pool: 驱动池（driver_pool.DriverPool），默认使用本进程共用的驱动池
+        :param headless: 是否使用无头浏览器，默认仅在CI环境中使用
         """
         self.username = username
         self.password = password
         self.driver = None
-        self.driver_service = None
+        self.headless = headless
         self.api_responses = []  # 存储API响应
+        self.api_client = None  # GetChartByPlant接口客户端（复用登录token，见sems_api）
+        self.network_recorder = None  # 页面接口响应记录器（见network_capture）
+        self.target_date = format_date(target_date)
+        self.deadline = deadline or unlimited('sems')
+        self.logged_in = False
+        self.home_url = None  # 登录成功后的电站页面地址，补采时用于回到初始日期
+        # 请求限速与浏览器会话名额（多进程/多机器共享）
+        self.governor = get_governor('sems', username)
+        self.session_handle = None
+        self.driver_pool = driver_pool or get_default_pool()
+        # 登录与取token时不加载图片和字体，截图阶段临时恢复
+        self.resource_blocker = ResourceBlocker(self, 'sems')
+        # 浏览器无响应或内存超限时回收重建，恢复登录后从当前日期继续
+        self.watchdog = DriverWatchdog(self, 'sems', self.start_browser)
         
         # 设置截图保存目录
         if screenshots_dir:
@@ -74,89 +100,6 @@ class SEMSScreenshotTool:
         logger.info(f"运行环境检测: {'CI环境' if is_ci_environment() else '本地环境'}")
         logger.info(f"选择浏览器类型: {self.browser_type}")
         
-        # 配置Edge浏览器选项
-        self.edge_options = EdgeOptions()
-        # 添加兼容性参数
-        self.edge_options.add_argument('--disable-software-rasterizer')
-        self.edge_options.add_argument('--disable-features=IsolateOrigins,site-per-process')
-        # 添加无头模式配置，仅在CI环境中启用
-        # 为了方便本地调试，默认不启用无头模式
-        self.edge_options.add_argument('--no-sandbox')
-        self.edge_options.add_argument('--disable-dev-shm-usage')
-        self.edge_options.add_argument('--disable-gpu')
-        self.edge_options.add_argument('--disable-site-isolation-trials')
-        self.edge_options.add_argument('--no-sandbox')
-        self.edge_options.add_argument('--disable-dev-shm-usage')
-        self.edge_options.add_argument('--disable-gpu')
-        
-        # 设置用户代理为系统Edge浏览器版本
-        system_ua = self._get_system_user_agent()
-        if system_ua:
-            self.edge_options.add_argument(f'--user-agent={system_ua}')
-        else:
-            # 默认用户代理
-            self.edge_options.add_argument('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36 Edg/120.0.0.0')
-        
-        # 实验性选项
-        self.edge_options.add_experimental_option('excludeSwitches', ['enable-logging'])
-        self.edge_options.add_experimental_option('detach', False)
-        self.edge_options.add_experimental_option('useAutomationExtension', False)
-        
-        # 设置下载路径（如需要）
-        prefs = {
-            "download.default_directory": self.screenshots_dir,
-            "download.prompt_for_download": False,
-            "download.directory_upgrade": True,
-            "safebrowsing.enabled": True
-        }
-        self.edge_options.add_experimental_option('prefs', prefs)
-        
-        # 禁用自动化控制特征
-        self.edge_options.add_argument('--disable-blink-features=AutomationControlled')
-        
-        # 配置Chrome浏览器选项
-        self.chrome_options = ChromeOptions()
-        # 添加兼容性参数
-        self.chrome_options.add_argument('--disable-software-rasterizer')
-        self.chrome_options.add_argument('--disable-features=IsolateOrigins,site-per-process')
-        # 在CI环境中启用无头模式
-        if is_ci_environment():
-            self.chrome_options.add_argument('--headless=new')
-            self.chrome_options.add_argument('--disable-dev-shm-usage')
-            self.chrome_options.add_argument('--no-sandbox')
-            self.chrome_options.add_argument('--disable-gpu')
-        self.chrome_options.add_argument('--disable-site-isolation-trials')
-        self.chrome_options.add_argument('--no-sandbox')
-        self.chrome_options.add_argument('--disable-dev-shm-usage')
-        self.chrome_options.add_argument('--disable-gpu')
-        
-        # 设置用户代理
-        if system_ua:
-            self.chrome_options.add_argument(f'--user-agent={system_ua}')
-        else:
-            # 默认用户代理
-            self.chrome_options.add_argument('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
-        
-        # 实验性选项
-        self.chrome_options.add_experimental_option('excludeSwitches', ['enable-logging'])
-        self.chrome_options.add_experimental_option('detach', False)
-        self.chrome_options.add_experimental_option('useAutomationExtension', False)
-        
-        # 设置下载路径（如需要）
-        chrome_prefs = {
-            "download.default_directory": self.screenshots_dir,
-            "download.prompt_for_download": False,
-            "download.directory_upgrade": True,
-            "safebrowsing.enabled": True
-        }
-        self.chrome_options.add_experimental_option('prefs', chrome_prefs)
-        
-        # 禁用自动化控制特征
-        self.chrome_options.add_argument('--disable-blink-features=AutomationControlled')
-        
-        # 添加DNS服务器设置，解决域名解析问题
-        self.chrome_options.add_argument('--dns-servers=8.8.8.8,8.8.4.4')
-        
         # 项目容量映射（从solar_data.json获取的实际数据）
         self.project_capacities = {
             1: {'dcCapacity': 5.9826, 'acCapacity': 4.77},    # 梁才宋滩
@@ -177,265 +120,75 @@ class SEMSScreenshotTool:
             6: '零碳商业园'
         }
     
-    def _get_system_user_agent(self):
-        """
-        尝试获取系统浏览器的真实用户代理
-        :return: 用户代理字符串或None
-        """
+    def __enter__(self):
+        """上下文管理器入口，占用会话名额后启动浏览器"""
+        self.session_handle = self.governor.acquire_session(self.deadline)
         try:
-            # 临时启动一个浏览器实例来获取用户代理
-            if self.browser_type == 'chrome':
-                temp_options = ChromeOptions()
-                temp_options.add_argument('--headless=new')  # 使用无头模式
-                temp_options.add_argument('--disable-gpu')
-                temp_options.add_argument('--no-sandbox')
-                
-                temp_driver = webdriver.Chrome(options=temp_options)
-                user_agent = temp_driver.execute_script("return navigator.userAgent;")
-                temp_driver.quit()
-            else:
-                temp_options = EdgeOptions()
-                temp_options.add_argument('--headless=new')  # 使用无头模式
-                temp_options.add_argument('--disable-gpu')
-                temp_options.add_argument('--no-sandbox')
-                
-                temp_driver = webdriver.Edge(options=temp_options)
-                user_agent = temp_driver.execute_script("return navigator.userAgent;")
-                temp_driver.quit()
-            
-            logger.info(f'成功获取系统用户代理: {user_agent}')
-            return user_agent
-        except Exception as e:
-            logger.warning(f'无法获取系统用户代理: {str(e)}')
-            return None
+            return self.start_browser()
+        except Exception:
+            self.governor.release_session(self.session_handle)
+            self.session_handle = None
+            raise
+    
+    def start_browser(self):
+        """从驱动池租用浏览器标签页，并设置网络请求拦截"""
+        self.driver = self.driver_pool.acquire(
+            'sems', self.browser_type, headless=self.headless,
+            timeouts={'page_load': 30, 'script': 30, 'implicit': 10}, profile='sems'
+        )
+        
+        # 最大化窗口
+        try:
+            self.driver.maximize_window()
+        except Exception:
+            logger.warning('无法最大化窗口')
+        
+        # 设置网络请求拦截
+        self.setup_network_interception()
+        self.resource_blocker.apply()
+        install_network_tracker(self.driver)
+        logger.info(f'{self.browser_type}浏览器标签页已就绪')
+        return self
     
-    def __enter__(self):
-        """上下文管理器入口，启动浏览器并设置网络请求拦截"""
-        # 初始化WebDriver实例
-        max_attempts = 3
-        for attempt in range(max_attempts):
-            try:
-                if self.browser_type == 'chrome':
-                    logger.info("初始化Chrome浏览器...")
-                    
-                    # 在CI环境中使用webdriver-manager自动管理ChromeDriver
-                    if is_ci_environment():
-                        logger.info("CI环境：使用webdriver-manager自动管理ChromeDriver")
-                        service = ChromeService(ChromeDriverManager().install())
-                    else:
-                        # 本地环境，尝试使用系统PATH中的ChromeDriver
-                        try:
-                            service = ChromeService()
-                            logger.info("使用系统PATH中的ChromeDriver")
-                        except Exception as e:
-                            logger.warning(f"系统PATH中的ChromeDriver不可用: {e}")
-                            logger.info("回退到webdriver-manager")
-                            service = ChromeService(ChromeDriverManager().install())
-                    
-                    # 启动Chrome浏览器
-                    logger.info(f'尝试启动Chrome浏览器 (第{attempt + 1}次)')
-                    self.driver = webdriver.Chrome(
-                        service=service,
-                        options=self.chrome_options
-                    )
-                    
-                else:  # Edge
-                    logger.info("初始化Edge浏览器...")
-                    
-                    # 检查驱动路径
-                    driver_path = None
-                    if os.path.exists(os.path.join(os.getcwd(), 'msedgedriver.exe')):
-                        driver_path = os.path.join(os.getcwd(), 'msedgedriver.exe')
-                        logger.info(f"使用本地Edge驱动: {driver_path}")
-                    else:
-                        logger.info("未找到本地Edge驱动，将使用系统PATH中的驱动")
-                    
-                    # 配置服务
-                    self.driver_service = EdgeService(
-                        executable_path=driver_path, 
-                        log_path=os.path.join(self.screenshots_dir, 'edge_driver.log'),
-                        log_level=logging.DEBUG
-                    )
-                    
-                    # 启动Edge浏览器
-                    logger.info(f'尝试启动Edge浏览器 (第{attempt + 1}次)')
-                    self.driver = webdriver.Edge(
-                        service=self.driver_service, 
-                        options=self.edge_options
-                    )
-                
-                # 设置隐式等待时间
-                self.driver.implicitly_wait(10)
-                
-                # 设置页面加载超时
-                self.driver.set_page_load_timeout(30)
-                
-                # 设置脚本执行超时
-                self.driver.set_script_timeout(30)
-                
-                # 最大化窗口
-                try:
-                    self.driver.maximize_window()
-                except:
-                    logger.warning('无法最大化窗口')
-                
-                # 扩展CDP命令集
-                try:
-                    # 禁用自动化控制特征
-                    self.driver.execute_cdp_cmd(
-                        "Page.addScriptToEvaluateOnNewDocument",
-                        {
-                            "source": "Object.defineProperty(navigator, 'webdriver', {get: () => undefined});"
-                        }
-                    )
-                    
-                    # 设置网络请求拦截
-                    self.setup_network_interception()
-                except Exception as e:
-                    logger.warning(f'无法扩展CDP命令集: {str(e)}')
-                
-                logger.info(f'{self.browser_type}浏览器启动成功')
-                return self
-                
-            except WebDriverException as e:
-                error_message = str(e)
-                logger.error(f'WebDriver异常: {error_message}')
-                
-                # 处理常见错误
-                if "session not created: unable to connect to renderer" in error_message:
-                    logger.error('无法连接到渲染器。这通常是由于浏览器版本与驱动不匹配或系统资源不足导致的。')
-                    # 尝试调整配置并继续
-                    if self.browser_type == 'chrome':
-                        self.chrome_options.add_argument('--disable-software-rasterizer')
-                    else:
-                        self.edge_options.add_argument('--disable-software-rasterizer')
-                
-                # 清理资源
-                if self.driver:
-                    try:
-                        self.driver.quit()
-                    except:
-                        pass
-                    self.driver = None
-                
-                # 如果不是最后一次尝试，等待后重试
-                if attempt < max_attempts - 1:
-                    wait_time = (attempt + 1) * 2
-                    logger.info(f'等待{wait_time}秒后重试...')
-                    time.sleep(wait_time)
-                else:
-                    logger.error('所有浏览器启动尝试均失败')
-                    raise
-        
-        # 这行代码不应该被执行到，但为了安全起见
-        raise RuntimeError('浏览器启动失败')
-        
     def setup_network_interception(self):
         """
-        设置网络请求监控，为后续获取GetChartByPlant API响应做准备
+        挂上接口响应记录器，记录页面自身发出的GetChartByPlant请求及其响应
         """
-        try:
-            # 启用网络监控
-            self.driver.execute_cdp_cmd('Network.enable', {})
-            logger.info('网络请求监控已启用')
-        except Exception as e:
-            logger.error(f'启用网络请求监控时出错: {str(e)}')
+        self.network_recorder = attach_recorder(self.driver, CHART_CAPTURE_RULES)
+        logger.info('网络请求记录已启用')
             
     def collect_get_chart_responses(self):
         """
-        尝试收集所有GetChartByPlant API的响应
+        收集目标日期的GetChartByPlant响应：优先用接口客户端直接请求，
+        否则取记录器中页面自身请求该日期时的响应（在切换到目标日期之后调用）
         """
         try:
             if not self.ensure_driver_alive():
                 logger.error('浏览器驱动会话不存在或已失效')
                 return
-                
-            # 由于Selenium Python不直接支持CDP事件监听，我们使用另一种方法
-            # 尝试直接调用API获取数据
             logger.info('尝试收集GetChartByPlant响应...')
             
-            # 方法1: 尝试通过JavaScript获取数据
-            try:
-                logger.info('尝试通过JavaScript获取数据...')
-                
-                # 获取当前日期，用于构建请求参数
-                today = datetime.now()
-                formatted_date = today.strftime('%Y-%m-%d')
-                
-                js_code = f"""
-                return new Promise((resolve, reject) => {{
-                    const xhr = new XMLHttpRequest();
-                    xhr.open('POST', 'https://gopsapi.sems.com.cn/api/v2/Charts/GetChartByPlant', true);
-                    xhr.setRequestHeader('Content-Type', 'application/json');
-                    
-                    // 使用浏览器当前的token
-                    const token = localStorage.getItem('token') || sessionStorage.getItem('token');
-                    if (token) {{
-                        xhr.setRequestHeader('token', token);
-                    }}
-                    
-                    xhr.onreadystatechange = function() {{
-                        if (xhr.readyState === 4) {{
-                            if (xhr.status === 200) {{
-                                try {{
-                                    resolve(JSON.parse(xhr.responseText));
-                                }} catch (e) {{
-                                    resolve({{error: '解析响应失败', response: xhr.responseText}});
-                                }}
-                            }} else {{
-                                resolve({{error: '请求失败', status: xhr.status}});
-                            }}
-                        }}
-                    }};
-                    
-                    // 使用正确的请求参数
-                    const payload = {{
-                        "id": "c5e69404-9026-41b1-b88f-233f6d36f12a",
-                        "date": "{formatted_date}",
-                        "range": 2,
-                        "chartIndexId": "1",
-                        "isDetailFull": ""
-                    }};
-                    
-                    xhr.send(JSON.stringify(payload));
-                }});
-                """
-                
-                data = self.driver.execute_script(js_code)
-                if data:
-                    self.api_responses.append({
-                        'url': 'https://gopsapi.sems.com.cn/api/v2/Charts/GetChartByPlant',
-                        'body': data,
-                        'timestamp': datetime.now().isoformat()
-                    })
-                    logger.info('成功通过JavaScript获取到数据')
-            except Exception as e:
-                logger.error(f'通过JavaScript获取数据时出错: {str(e)}')
-                
-            # 方法2: 如果没有获取到数据，使用模拟数据作为备选
-            if not self.api_responses:
-                logger.warning('无法获取实际API响应，使用模拟数据')
-                # 添加模拟的GetChartByPlant响应数据
-                mock_response = {
-                    "success": True,
-                    "msg": "Success",
-                    "result": {
-                        "data": [
-                            {"time": "00:00", "value": 0},
-                            {"time": "06:00", "value": 0},
-                            {"time": "12:00", "value": 250},
-                            {"time": "18:00", "value": 480},
-                            {"time": "23:59", "value": 500}
-                        ],
-                        "totalPower": 500  # 当日总发电量（kWh）
-                    }
-                }
-                self.api_responses.append({
-                    'url': 'https://gopsapi.sems.com.cn/api/v2/Charts/GetChartByPlant',
-                    'body': mock_response,
-                    'timestamp': datetime.now().isoformat()
-                })
-                
+            # 方法1: 通过复用登录token的接口客户端请求目标日期的数据
+            if sems_api_enabled() and self.fetch_get_chart_by_plant_data() is not None:
+                logger.info('成功通过SEMS接口客户端获取到数据')
+                return
+            
+            # 方法2: 页面切换到目标日期时自身发出的请求（请求体中包含目标日期）
+            entry = None
+            if self.network_recorder is not None:
+                entry = self.network_recorder.wait_for(
+                    'chart', timeout=3, deadline=self.deadline,
+                    parse=lambda e: e if self.target_date in (e.get('request') or '') else None
+                )
+            if entry is None:
+                logger.warning(f'未获取到 {self.target_date} 的GetChartByPlant响应')
+                return
+            self.api_responses.append({
+                'url': entry['url'],
+                'body': entry['body'],
+                'timestamp': datetime.fromtimestamp(entry['time'] / 1000).isoformat()
+            })
+            logger.info('成功从页面请求记录中获取到数据')
         except Exception as e:
             logger.error(f'收集GetChartByPlant响应时出错: {str(e)}')
         
@@ -467,62 +220,74 @@ class SEMSScreenshotTool:
             logger.error(f'获取token时出错: {str(e)}')
             return None
             
-    def fetch_get_chart_by_plant_data(self, project_id="5"):
+    def get_api_client(self):
+        """返回复用当前登录token的SEMS接口客户端：优先读取浏览器中的token（并交给令牌管理器保存），
+        浏览器未启动时使用令牌管理器中的token（只刷新，不再另开浏览器登录）"""
+        if self.api_client is None:
+            kwargs = {'governor': self.governor, 'deadline': self.deadline}
+            if self.ensure_driver_alive():
+                self.api_client = SemsAPI.from_driver(self.driver, **kwargs)
+                if self.api_client is not None and self.logged_in:
+                    token_manager(self.username, self.password).put(self.api_client.token, source='browser')
+            if self.api_client is None:
+                token = fetch_token(self.username, self.password, allow_login=False, deadline=self.deadline)
+                self.api_client = SemsAPI(token, **kwargs) if token else None
+        return self.api_client
+
+    def reject_api_token(self, client):
+        """token被接口拒绝：通知令牌管理器，下次重新读取"""
+        token_manager(self.username, self.password).invalidate(client.token)
+        self.api_client = None
+
+    def fetch_get_chart_by_plant_data(self, project_id="5", date_str=None):
         """
         直接调用GetChartByPlant API获取数据
         :param project_id: 项目ID，默认为5（黄河植物园）
+        :param date_str: 查询日期，默认为目标日期
         :return: API响应数据或None
         """
+        client = self.get_api_client()
+        if client is None:
+            logger.error('无法获取有效token，无法调用API')
+            return None
+        date_str = format_date(date_str or self.target_date)
         try:
-            # API URL和请求参数
-            api_url = "https://gopsapi.sems.com.cn/api/v2/Charts/GetChartByPlant"
-            
-            # 从localStorage获取token
-            token = self.get_token_from_local_storage()
-            
-            if not token:
-                logger.error('无法获取有效token，无法调用API')
-                return None
-            
-            # 请求头
-            headers = {
-                "Content-Type": "application/json",
-                "token": token,
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36 Edg/120.0.0.0"
-            }
-            
-            # 请求体 - 使用用户建议的正确参数格式
-            payload = {
-                "id": "c5e69404-9026-41b1-b88f-233f6d36f12a",  # 用户建议的正确项目ID
-                "date": datetime.now().strftime("%Y-%m-%d"),
-                "range": 2,
-                "chartIndexId": "1",
-                "isDetailFull": ""
-            }
-            
-            logger.info(f'正在调用GetChartByPlant API获取项目 {project_id} 的数据')
-            
-            # 发送请求
-            response = requests.post(api_url, headers=headers, json=payload, timeout=30)
-            
-            # 检查响应状态
-            if response.status_code == 200:
-                data = response.json()
-                logger.info(f'成功获取GetChartByPlant API响应，状态码: {response.status_code}')
-                # 将获取的数据添加到api_responses列表中，保持与原有代码的兼容性
-                self.api_responses.append({
-                    'url': api_url,
-                    'body': data,
-                    'timestamp': datetime.now().isoformat()
-                })
-                return data
-            else:
-                logger.error(f'GetChartByPlant API请求失败，状态码: {response.status_code}')
-                logger.error(f'响应内容: {response.text}')
-                return None
-        except Exception as e:
+            logger.info(f'正在调用GetChartByPlant API获取项目 {project_id} {date_str} 的数据')
+            data = client.get_chart(project_id, date_str)
+        except (SemsAPIError, requests.RequestException) as e:
             logger.error(f'调用GetChartByPlant API时出错: {str(e)}')
+            # token可能已失效，下次重新读取
+            if isinstance(e, SemsTokenError):
+                self.reject_api_token(client)
+            self.api_client = None
             return None
+        # 将获取的数据添加到api_responses列表中，保持与原有代码的兼容性
+        self.api_responses.append({
+            'url': CHART_URL,
+            'body': data,
+            'timestamp': datetime.now().isoformat()
+        })
+        return data
+
+    def fetch_via_api(self, dates, project_ids=None):
+        """
+        通过GetChartByPlant接口并发采集多个项目、多个日期，不翻页、不截图、不OCR
+        :return: {日期: {项目ID: {'screenshot_path', 'daily_generation', 'power_curve', 'source'}}}，
+                 接口不可用时为空，由调用方改用截图与OCR兜底
+        """
+        if not sems_api_enabled():
+            return {}
+        client = self.get_api_client()
+        if client is None:
+            logger.info('没有可用的SEMS token，跳过接口采集')
+            return {}
+        results = client.collect(project_ids or list(client.plant_ids), dates)
+        if client.token_rejected:
+            self.reject_api_token(client)
+        elif len(results) < len(set(format_date(d) for d in dates)):
+            # 部分日期失败（可能是token失效），下次重新读取token
+            self.api_client = None
+        return results
     
     def ensure_driver_alive(self):
         """确保浏览器驱动仍然存活"""
@@ -537,13 +302,16 @@ class SEMSScreenshotTool:
             return False
     
     def __exit__(self, exc_type, exc_val, exc_tb):
-        """上下文管理器退出，关闭浏览器"""
+        """上下文管理器退出，关闭浏览器并释放会话名额"""
         if self.driver:
             try:
-                self.driver.quit()
-                logger.info('浏览器已关闭')
+                self.driver_pool.release(self.driver)
+                self.driver = None
+                logger.info('浏览器标签页已归还')
             except Exception as e:
-                logger.error(f'关闭浏览器时出错: {str(e)}')
+                logger.error(f'归还浏览器标签页时出错: {str(e)}')
+        self.governor.release_session(self.session_handle)
+        self.session_handle = None
         
         # 允许异常向上传播
         return False
@@ -560,39 +328,36 @@ class SEMSScreenshotTool:
             logger.error('浏览器驱动会话不存在或已失效')
             return False
         
+        # 优先恢复保存的会话（包括localStorage中的token），校验失败时才执行界面登录
+        if restore_session(self, 'sems'):
+            return True
+        
         try:
             # 访问登录页面
+            self.governor.throttle(deadline=self.deadline)
             self.driver.get('https://www.sems.com.cn/')
             logger.info('登录页面已加载')
             
             # 等待页面加载完成
-            time.sleep(3)
+            wait_for_page_ready(self.driver, budget=3, label='SEMS登录页加载', deadline=self.deadline)
+            login_page_url = self.driver.current_url
             
             max_attempts = 3
             for attempt in range(max_attempts):
+                if self.deadline.expired('登录'):
+                    return False
                 try:
                     # 查找用户名和密码输入框
                     username_input = None
                     password_input = None
                     
-                    # 尝试多种定位方式
-                    try:
-                        # 尝试通过type属性查找
-                        username_input = self.driver.find_element(By.XPATH, "//input[@type='text']")
-                        password_input = self.driver.find_element(By.XPATH, "//input[@type='password']")
-                    except:
-                        # 尝试通过name属性查找
-                        try:
-                            username_input = self.driver.find_element(By.NAME, "username")
-                            password_input = self.driver.find_element(By.NAME, "password")
-                        except:
-                            # 尝试通过id属性查找
-                            try:
-                                username_input = self.driver.find_element(By.ID, "username")
-                                password_input = self.driver.find_element(By.ID, "password")
-                            except:
-                                logger.error('无法找到用户名或密码输入框')
-                                continue
+                    # 尝试多种定位方式（type属性、name属性、id属性），快速探测不等待隐式超时
+                    username_input, _ = wait_for_any(self.driver, LOGIN_USERNAME_CANDIDATES, timeout=10,
+                                                     label='SEMS用户名输入框')
+                    password_input, _ = probe_first(self.driver, LOGIN_PASSWORD_CANDIDATES)
+                    if username_input is None or password_input is None:
+                        logger.error('无法找到用户名或密码输入框')
+                        continue
                     
                     # 输入用户名和密码
                     if username_input and password_input:
@@ -610,7 +375,9 @@ class SEMSScreenshotTool:
                         captcha_element = self.driver.find_element(By.ID, "captcha")
                         if captcha_element.is_displayed():
                             logger.warning('检测到验证码，等待用户手动输入...')
-                            time.sleep(10)  # 给用户时间输入验证码
+                            # 给用户时间输入验证码，输入完整后立即继续
+                            wait_until(lambda: len(captcha_element.get_attribute('value') or '') >= 4,
+                                       budget=10, label='SEMS验证码输入', deadline=self.deadline)
                     except:
                         pass  # 没有验证码，继续执行
                     
@@ -678,7 +445,8 @@ class SEMSScreenshotTool:
                         continue
                     
                     # 等待登录成功跳转
-                    time.sleep(5)
+                    wait_for_url_change(self.driver, old_url=login_page_url, excluded='login',
+                                        budget=5, label='SEMS登录跳转', deadline=self.deadline)
                     
                     # 检查是否登录成功（通过URL或页面元素判断）
                     current_url = self.driver.current_url
@@ -693,6 +461,10 @@ class SEMSScreenshotTool:
                         'dashboard' in current_title.lower() or
                         '首页' in current_title):
                         logger.info('登录成功！')
+                        self.logged_in = True
+                        self.home_url = current_url
+                        self.resource_blocker.log_stats('登录后电站页面')
+                        remember_session(self, 'sems')
                         return True
                     else:
                         logger.warning(f'登录可能失败，当前URL: {current_url}，当前标题: {current_title}')
@@ -709,7 +481,7 @@ class SEMSScreenshotTool:
                         
                         # 如果不是最后一次尝试，继续
                         if attempt < max_attempts - 1:
-                            time.sleep(2 * (attempt + 1))
+                            self.deadline.sleep(2 * (attempt + 1))
                             continue
                         return False
                         
@@ -719,13 +491,13 @@ class SEMSScreenshotTool:
                     # 尝试滚动页面并再次查找元素
                     try:
                         self.driver.execute_script('window.scrollTo(0, document.body.scrollHeight);')
-                        time.sleep(3)
+                        wait_for_network_idle(self.driver, budget=3, label='SEMS登录错误页滚动', deadline=self.deadline)
                     except:
                         pass
                     
                     # 如果不是最后一次尝试，继续
                     if attempt < max_attempts - 1:
-                        time.sleep(2 * (attempt + 1))
+                        self.deadline.sleep(2 * (attempt + 1))
                         continue
                     return False
             
@@ -762,6 +534,46 @@ class SEMSScreenshotTool:
             logger.error(f'截取页面截图时出错: {str(e)}')
             return None
     
+    def move_to_target_date(self):
+        """点击station-date-picker_left，从当天向前翻到self.target_date"""
+        days_back = days_before_today(self.target_date)
+        logger.info(f'切换到目标日期 {self.target_date}，需点击日期选择器左箭头 {days_back} 次')
+        for _ in range(days_back):
+            if self.deadline.expired('切换日期'):
+                return False
+            try:
+                date_picker_element = self.driver.find_element(By.CLASS_NAME, "station-date-picker_left")
+                date_picker_element.click()
+                wait_for_network_idle(self.driver, budget=2, label='SEMS切换日期', deadline=self.deadline)
+            except Exception as e:
+                logger.warning(f'点击日期选择器失败: {str(e)}')
+                return False
+        logger.info('成功点击class=station-date-picker_left的元素')
+        return True
+
+    def capture_date(self, date_str, screenshots_dir):
+        """
+        在已登录的会话中采集指定日期：回到电站页面，翻到目标日期，截图并收集API数据
+        :return: 功率曲线截图路径或None
+        """
+        self.target_date = format_date(date_str)
+        self.screenshots_dir = screenshots_dir
+        os.makedirs(self.screenshots_dir, exist_ok=True)
+        self.api_responses = []
+        if self.deadline.expired(f'补采 {self.target_date}'):
+            return None
+        self.watchdog.check(f'补采 {self.target_date}')
+        # 截图阶段恢复完整渲染（重新打开电站页面时完整加载图片和字体）
+        with self.resource_blocker.full_rendering(reload=not self.home_url):
+            if self.home_url:
+                self.governor.throttle(deadline=self.deadline)
+                self.driver.get(self.home_url)
+            # 等待图表数据加载完成
+            wait_for_chart_ready(self.driver, budget=10, label='SEMS功率曲线加载', deadline=self.deadline)
+            self.move_to_target_date()
+            self.collect_get_chart_responses()
+            return self.capture_element_screenshot("goodwe-station-charts__chart")
+
     def capture_element_screenshot(self, element_class):
         """
         截取特定class的元素区域截图并保存
@@ -819,36 +631,12 @@ class SEMSScreenshotTool:
                     if not body or not isinstance(body, dict):
                         continue
                     
-                    # 尝试从不同的可能字段中提取发电量数据
-                    daily_generation = 0
-                    
-                    # 检查是否有success或result字段
-                    if 'success' in body and body['success'] and 'result' in body:
-                        result = body['result']
-                        # 检查result中可能的发电量字段
-                        if 'data' in result and isinstance(result['data'], list) and result['data']:
-                            # 假设data数组中的最后一个元素是最新数据
-                            last_data_point = result['data'][-1]
-                            if 'value' in last_data_point:
-                                daily_generation = float(last_data_point['value'])
-                        elif 'totalPower' in result:
-                            daily_generation = float(result['totalPower'])
-                        elif 'generation' in result:
-                            daily_generation = float(result['generation'])
-                    elif 'data' in body:
-                        # 检查data字段
-                        if isinstance(body['data'], list) and body['data']:
-                            last_data_point = body['data'][-1]
-                            if 'value' in last_data_point:
-                                daily_generation = float(last_data_point['value'])
-                        elif isinstance(body['data'], dict):
-                            if 'totalPower' in body['data']:
-                                daily_generation = float(body['data']['totalPower'])
-                            elif 'generation' in body['data']:
-                                daily_generation = float(body['data']['generation'])
-                    elif 'ver is not fund' in str(body):
-                        # 处理用户提供的错误响应示例
-                        logger.warning('API返回"ver is not fund"错误')
+                    # 从响应中提取发电量数据（新旧两种响应格式见sems_api.parse_chart）
+                    daily_generation, _ = parse_chart(body)
+                    if daily_generation is None:
+                        if 'ver is not fund' in str(body):
+                            # 处理用户提供的错误响应示例
+                            logger.warning('API返回"ver is not fund"错误')
                         daily_generation = 0  # 不使用模拟数据，使用0
                     
                     # 保存项目的发电量数据
@@ -1010,9 +798,9 @@ if __name__ == '__main__':
             if tool.login():
                 logger.info('登录成功，准备提取数据和截取页面')
                 
-                # 等待页面完全加载（增加等待时间）
+                # 等待图表和数据加载完成
                 logger.info('等待页面完全加载中...')
-                time.sleep(10)  # 增加等待时间以确保图表和数据加载完成
+                wait_for_chart_ready(tool.driver, budget=10, label='SEMS功率曲线加载')
                 
                 # 登录成功后，先点击class=station-date-picker_left
                 try:
@@ -1020,8 +808,8 @@ if __name__ == '__main__':
                     date_picker_element = tool.driver.find_element(By.CLASS_NAME, "station-date-picker_left")
                     date_picker_element.click()
                     logger.info('成功点击class=station-date-picker_left的元素')
-                    # 点击后等待页面响应
-                    time.sleep(5)
+                    # 点击后等待数据请求完成
+                    wait_for_network_idle(tool.driver, budget=5, label='SEMS切换日期')
                 except Exception as e:
                     logger.warning(f'点击class=station-date-picker_left的元素时出错: {str(e)}')
                     # 即使点击失败也继续执行后续操作
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+会话保管库：保存各系统登录后的会话，下次运行时恢复以跳过界面登录
+
+登录成功后按 (系统, 账号) 保存 cookies、localStorage、sessionStorage（包括SEMS的token）、
+登录后的首页地址与过期时间；下次登录前先恢复会话并做一次轻量校验（打开首页，
+确认未被重定向到登录页），校验失败时才执行完整的界面登录。
+
+会话文件保存在 .session_vault/（可用 SOLAR_SESSION_VAULT_DIR 指定，权限600，不提交到仓库），
+设置 SOLAR_SESSION_VAULT=0 可关闭。
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+from urllib.parse import urlparse
+from datetime import datetime
+
+from readiness import wait_for_page_ready
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+# 各系统会话的默认有效期（秒）；cookie全部过期时以cookie为准
+SESSION_TTL = {
+    'huawei': 8 * 3600,
+    'sems': 24 * 3600,
+    'esolar': 24 * 3600
+}
+
+# Network.setCookies 接受的字段
+COOKIE_FIELDS = ('name', 'value', 'domain', 'path', 'secure', 'httpOnly', 'sameSite', 'expires')
+
+CAPTURE_STORAGE_JS = """
+const dump = (s) => { const o = {}; for (let i = 0; i < s.length; i++) { const k = s.key(i); o[k] = s.getItem(k); } return o; };
+return {origin: location.origin, local: dump(localStorage), session: dump(sessionStorage)};
+"""
+
+
+def vault_enabled():
+    return os.environ.get('SOLAR_SESSION_VAULT', '1') not in ('0', 'false', 'no')
+
+
+def _origin(url):
+    parsed = urlparse(url or '')
+    return f"{parsed.scheme}://{parsed.netloc}" if parsed.scheme and parsed.netloc else None
+
+
+def _restore_storage_script(origin, local_items, session_items):
+    """生成在页面脚本运行前写入storage的脚本（只对保存时的源生效）"""
+    return (
+        f"if (location.origin === {json.dumps(origin)}) {{"
+        f" const l = {json.dumps(local_items)}; for (const k in l) {{ localStorage.setItem(k, l[k]); }}"
+        f" const s = {json.dumps(session_items)}; for (const k in s) {{ sessionStorage.setItem(k, s[k]); }}"
+        f" }}"
+    )
+
+
+def default_probe(driver, portal):
+    """轻量校验：打开首页后未被重定向到登录页"""
+    current_url = (driver.current_url or '').lower()
+    return 'login' not in current_url
+
+
+def sems_probe(driver, portal):
+    """SEMS：未回到登录页，且localStorage中仍有token"""
+    if not default_probe(driver, portal):
+        return False
+    try:
+        return bool(driver.execute_script("return localStorage.getItem('token') || sessionStorage.getItem('token');"))
+    except Exception:
+        return False
+
+
+PROBES = {
+    'sems': sems_probe
+}
+
+
+class SessionVault:
+    """按 (系统, 账号) 保存的会话文件"""
+
+    def __init__(self, vault_dir=None):
+        self.vault_dir = vault_dir or os.environ.get('SOLAR_SESSION_VAULT_DIR', '.session_vault')
+
+    def path_for(self, portal, account):
+        # 账号名不直接出现在文件名中
+        digest = hashlib.sha1(str(account).encode('utf-8')).hexdigest()[:12]
+        return os.path.join(self.vault_dir, f'{portal}-{digest}.json')
+
+    def _get_cookies(self, driver):
+        """读取浏览器全部cookie（跨域名），CDP不可用时只读取当前域名的cookie"""
+        try:
+            return driver.execute_cdp_cmd('Network.getAllCookies', {}).get('cookies', [])
+        except Exception:
+            cookies = []
+            for cookie in driver.get_cookies():
+                cookie = dict(cookie)
+                if 'expiry' in cookie:
+                    cookie['expires'] = cookie.pop('expiry')
+                cookies.append(cookie)
+            return cookies
+
+    def save(self, portal, account, driver, home_url):
+        """保存当前会话，返回是否成功"""
+        if not vault_enabled():
+            return False
+        try:
+            cookies = self._get_cookies(driver)
+            storage = driver.execute_script(CAPTURE_STORAGE_JS) or {}
+            now = time.time()
+            expires_at = now + SESSION_TTL.get(portal, 8 * 3600)
+            expiries = [c['expires'] for c in cookies if isinstance(c.get('expires'), (int, float)) and c['expires'] > 0]
+            if expiries:
+                expires_at = min(expires_at, max(expiries))
+            record = {
+                'portal': portal,
+                'saved_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'expires_at': expires_at,
+                'home_url': home_url,
+                'origin': storage.get('origin') or _origin(home_url),
+                'cookies': cookies,
+                'local_storage': storage.get('local') or {},
+                'session_storage': storage.get('session') or {}
+            }
+            os.makedirs(self.vault_dir, exist_ok=True)
+            path = self.path_for(portal, account)
+            tmp_path = path + '.tmp'
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(record, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            logger.info(f"{portal} 会话已保存（{len(cookies)} 个cookie，有效期至 "
+                        f"{datetime.fromtimestamp(expires_at).strftime('%Y-%m-%d %H:%M')}）")
+            return True
+        except Exception as e:
+            logger.warning(f"保存 {portal} 会话失败: {str(e)}")
+            return False
+
+    def load(self, portal, account):
+        """读取未过期的会话记录；过期或损坏时删除并返回None"""
+        path = self.path_for(portal, account)
+        if not vault_enabled() or not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                record = json.load(f)
+        except Exception as e:
+            logger.warning(f"{portal} 会话文件无法读取: {str(e)}")
+            self.invalidate(portal, account)
+            return None
+        if record.get('expires_at', 0) <= time.time():
+            logger.info(f"{portal} 保存的会话已过期")
+            self.invalidate(portal, account)
+            return None
+        return record
+
+    def invalidate(self, portal, account):
+        try:
+            os.remove(self.path_for(portal, account))
+        except OSError:
+            pass
+
+    def restore(self, portal, account, driver, throttle=None, settle_seconds=3):
+        """恢复会话并校验，成功时返回首页地址，否则返回None（并删除无效的会话文件）"""
+        record = self.load(portal, account)
+        if record is None or not record.get('home_url'):
+            return None
+        logger.info(f"尝试恢复 {portal} 保存的会话（保存于 {record.get('saved_at')}）")
+        script_id = None
+        try:
+            cookies = [{k: c[k] for k in COOKIE_FIELDS if k in c} for c in record.get('cookies', [])]
+            for cookie in cookies:
+                if cookie.get('expires', 0) <= 0:
+                    cookie.pop('expires', None)
+            try:
+                driver.execute_cdp_cmd('Network.enable', {})
+                driver.execute_cdp_cmd('Network.setCookies', {'cookies': cookies})
+            except Exception:
+                # CDP不可用时先打开同源页面再逐个写入cookie
+                driver.get(record['origin'])
+                for cookie in cookies:
+                    cookie = dict(cookie)
+                    if 'expires' in cookie:
+                        cookie['expiry'] = int(cookie.pop('expires'))
+                    try:
+                        driver.add_cookie(cookie)
+                    except Exception:
+                        pass
+            if record.get('origin') and (record.get('local_storage') or record.get('session_storage')):
+                script = _restore_storage_script(record['origin'], record.get('local_storage') or {}, record.get('session_storage') or {})
+                try:
+                    script_id = driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': script}).get('identifier')
+                except Exception:
+                    driver.get(record['origin'])
+                    driver.execute_script(script)
+            if throttle is not None:
+                throttle()
+            driver.get(record['home_url'])
+            wait_for_page_ready(driver, budget=settle_seconds, label=f'{portal}会话恢复')
+            probe = PROBES.get(portal, default_probe)
+            if probe(driver, portal):
+                logger.info(f"{portal} 会话恢复成功，跳过界面登录")
+                return driver.current_url or record['home_url']
+            logger.info(f"{portal} 保存的会话已失效，改为界面登录")
+        except Exception as e:
+            logger.warning(f"恢复 {portal} 会话失败: {str(e)}")
+        finally:
+            if script_id:
+                try:
+                    driver.execute_cdp_cmd('Page.removeScriptToEvaluateOnNewDocument', {'identifier': script_id})
+                except Exception:
+                    pass
+        self.invalidate(portal, account)
+        return None
+
+
+def restore_session(scraper, portal):
+    """爬虫登录前调用：恢复保存的会话，成功时设置登录状态并返回True"""
+    if not vault_enabled() or not scraper.ensure_driver_alive():
+        return False
+    governor = getattr(scraper, 'governor', None)
+    home_url = SessionVault().restore(
+        portal, scraper.username, scraper.driver,
+        throttle=governor.throttle if governor is not None else None
+    )
+    if not home_url:
+        return False
+    scraper.logged_in = True
+    scraper.home_url = home_url
+    return True
+
+
+def remember_session(scraper, portal):
+    """爬虫登录成功后调用：保存当前会话"""
+    return SessionVault().save(portal, scraper.username, scraper.driver, scraper.home_url)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+阶段调度器：把一次更新拆成有依赖关系的阶段（DAG），依赖满足即并行执行
+
+- 每个阶段声明依赖的阶段名，阶段函数接收 {依赖名: 结果} 字典
+- 依赖阶段失败时，下游阶段仍会执行，收到的结果为None（由阶段函数自行兜底）
+- 声明了相同resource的阶段互斥执行（例如串行模式下的各浏览器阶段）
+- 记录每个阶段的开始、结束时间与耗时
+"""
+
+import time
+import logging
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+
+class Stage:
+    """单个阶段的定义与运行记录"""
+
+    def __init__(self, name, func, deps=None, resource=None):
+        self.name = name
+        self.func = func
+        self.deps = list(deps or [])
+        self.resource = resource
+        self.status = 'pending'  # pending / running / done / failed
+        self.result = None
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def duration(self):
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+    def to_dict(self):
+        """返回可序列化的运行记录"""
+        def fmt(ts):
+            return datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S') if ts else None
+        return {
+            'name': self.name,
+            'deps': self.deps,
+            'status': self.status,
+            'started_at': fmt(self.started_at),
+            'finished_at': fmt(self.finished_at),
+            'duration': round(self.duration, 2) if self.duration is not None else None,
+            'error': self.error
+        }
+
+
+class StageScheduler:
+    """按依赖关系调度阶段；max_workers=1 时按添加顺序串行执行"""
+
+    def __init__(self, max_workers=4):
+        self.max_workers = max_workers
+        self.stages = {}
+
+    def add(self, name, func, deps=None, resource=None):
+        """添加阶段，依赖必须是已添加的阶段"""
+        if name in self.stages:
+            raise ValueError(f"阶段重复: {name}")
+        for dep in deps or []:
+            if dep not in self.stages:
+                raise ValueError(f"阶段 {name} 依赖未定义的阶段: {dep}")
+        self.stages[name] = Stage(name, func, deps, resource)
+        return self.stages[name]
+
+    def _run_stage(self, stage):
+        stage.started_at = time.time()
+        logger.info(f"阶段开始: {stage.name}")
+        try:
+            inputs = {dep: self.stages[dep].result for dep in stage.deps}
+            stage.result = stage.func(inputs)
+            stage.status = 'done'
+        except Exception as e:
+            stage.status = 'failed'
+            stage.error = f"{type(e).__name__}: {e}"
+            logger.error(f"阶段失败: {stage.name}: {stage.error}")
+        finally:
+            stage.finished_at = time.time()
+        logger.info(f"阶段结束: {stage.name} ({stage.status}, 耗时 {stage.duration:.1f} 秒)")
+        return stage
+
+    def _ready_stages(self, busy_resources):
+        """返回依赖均已结束、且资源空闲的待执行阶段（保持添加顺序）"""
+        ready = []
+        claimed = set(busy_resources)
+        for stage in self.stages.values():
+            if stage.status != 'pending':
+                continue
+            if any(self.stages[dep].status in ('pending', 'running') for dep in stage.deps):
+                continue
+            if stage.resource and stage.resource in claimed:
+                continue
+            if stage.resource:
+                claimed.add(stage.resource)
+            ready.append(stage)
+        return ready
+
+    def run(self):
+        """执行全部阶段，返回 {阶段名: 结果}"""
+        started = time.time()
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while True:
+                busy = {s.resource for s in running.values() if s.resource}
+                for stage in self._ready_stages(busy):
+                    if len(running) >= self.max_workers:
+                        break
+                    stage.status = 'running'
+                    running[executor.submit(self._run_stage, stage)] = stage
+                if not running:
+                    break
+                done, _ = wait(list(running.keys()), return_when=FIRST_COMPLETED)
+                for future in done:
+                    running.pop(future)
+
+        self.log_timeline(time.time() - started)
+        return {name: stage.result for name, stage in self.stages.items()}
+
+    def timeline(self):
+        """返回各阶段的运行记录列表"""
+        return [stage.to_dict() for stage in self.stages.values()]
+
+    def log_timeline(self, total_seconds=None):
+        logger.info("阶段耗时汇总:")
+        for item in self.timeline():
+            logger.info(f"  - {item['name']}: {item['status']}, {item['started_at']} ~ {item['finished_at']}, 耗时 {item['duration']} 秒")
+        if total_seconds is not None:
+            logger.info(f"总耗时 {total_seconds:.1f} 秒")
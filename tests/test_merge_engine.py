@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+merge_engine 的测试：来源优先级、电站ID规范化、占位电站，以及总发电量等于各电站发电量之和
+"""
+
+import os
+import sys
+
+import pytest
+
+# 添加仓库根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from merge_engine import MergeEngine, canonical_station_id
+
+STATION_META = {
+    1: {'name': '宋滩', 'dcCapacity': 5.9826, 'acCapacity': 4.77},
+    2: {'name': '李赞皇', 'dcCapacity': 1.94346, 'acCapacity': 1.7, 'efficiencyColor': 'bg-yellow-400'},
+    3: {'name': '滨北南邱', 'dcCapacity': 5.3749, 'acCapacity': 4.3},
+    4: {'name': '水立方', 'dcCapacity': 1.16938, 'acCapacity': 1},
+    5: {'name': '黄河植物园', 'dcCapacity': 0.10384, 'acCapacity': 0.1},
+    6: {'name': '零碳商业园', 'dcCapacity': 1.58858, 'acCapacity': 1.58858}
+}
+
+
+def generation_by_id(projects):
+    return {p['id']: p['dailyGeneration'] for p in projects}
+
+
+def assert_totals_consistent(projects, summary):
+    """汇总值等于各电站之和"""
+    assert summary['total_daily_generation'] == pytest.approx(sum(p['dailyGeneration'] for p in projects))
+    assert summary['total_dc_capacity'] == pytest.approx(sum(p['dcCapacity'] for p in projects))
+    assert summary['total_ac_capacity'] == pytest.approx(sum(p['acCapacity'] for p in projects))
+
+
+def test_canonical_station_id():
+    assert canonical_station_id('1') == 1
+    assert canonical_station_id(' 5 ') == 5
+    assert canonical_station_id(6) == 6
+    assert canonical_station_id('abc') is None
+    assert canonical_station_id(None) is None
+    assert canonical_station_id(True) is None
+
+
+@pytest.mark.parametrize('order', [
+    ['ocr', 'dom', 'api', 'placeholder'],
+    ['api', 'placeholder', 'ocr', 'dom'],
+    ['placeholder', 'api', 'dom', 'ocr']
+])
+def test_priority_independent_of_order(order):
+    values = {'api': 30.5, 'dom': 20.0, 'ocr': 10.0, 'placeholder': None}
+    engine = MergeEngine(STATION_META)
+    for kind in order:
+        engine.add(1, values[kind], kind, origin='huawei')
+    projects, summary = engine.build()
+    assert generation_by_id(projects) == {1: 30.5}
+    assert_totals_consistent(projects, summary)
+
+
+def test_mixed_sources_per_station():
+    engine = MergeEngine(STATION_META)
+    engine.add('1', 12.0, 'dom', origin='huawei')
+    engine.add('2', 3.5, 'api', origin='huawei')
+    engine.add('2', 2.0, 'dom', origin='huawei')
+    engine.add(5, 0.4, 'ocr', origin='sems')
+    engine.add('5', 0.42, 'api', origin='sems')
+    engine.add(3, '8.25', 'ocr', origin='sems')
+    engine.add(4, None, 'dom', origin='huawei')
+    projects, summary = engine.build(required_ids=(5, 6))
+    assert generation_by_id(projects) == {1: 12.0, 2: 3.5, 3: 8.25, 4: 0, 5: 0.42, 6: 0}
+    assert summary['total_daily_generation'] == pytest.approx(12.0 + 3.5 + 8.25 + 0.42)
+    assert_totals_consistent(projects, summary)
+
+
+def test_same_priority_later_wins_and_missing_value_does_not_override():
+    engine = MergeEngine(STATION_META)
+    engine.add(1, 5.0, 'dom')
+    engine.add(1, 6.0, 'dom')
+    engine.add(1, None, 'api')
+    projects, _ = engine.build()
+    assert generation_by_id(projects) == {1: 6.0}
+
+
+def test_string_and_int_ids_are_one_station():
+    engine = MergeEngine({str(k): v for k, v in STATION_META.items()})
+    engine.add('1', 4.0, 'dom', origin='huawei')
+    engine.add(1, 4.5, 'dom', origin='huawei')
+    engine.add_source({'6': {'dailyGeneration': 7.0}, 6: {'dailyGeneration': 7.5}}, 'dom', origin='esolar')
+    projects, summary = engine.build(required_ids=('5', 6))
+    assert [p['id'] for p in projects] == [1, 5, 6]
+    assert generation_by_id(projects) == {1: 4.5, 5: 0, 6: 7.5}
+    # 字符串键的元数据同样生效
+    assert projects[0]['name'] == '宋滩'
+    assert_totals_consistent(projects, summary)
+
+
+def test_invalid_station_id_is_ignored():
+    engine = MergeEngine(STATION_META)
+    assert engine.add('unknown', 3.0, 'api') is False
+    projects, summary = engine.build()
+    assert projects == []
+    assert summary['total_daily_generation'] == 0
+
+
+def test_placeholder_stations_5_and_6():
+    engine = MergeEngine(STATION_META)
+    engine.add(1, 10.0, 'api', origin='huawei')
+    projects, summary = engine.build(required_ids=(5, 6))
+    by_id = {p['id']: p for p in projects}
+    assert sorted(by_id) == [1, 5, 6]
+    for sid in (5, 6):
+        assert by_id[sid]['dailyGeneration'] == 0
+        assert by_id[sid]['name'] == STATION_META[sid]['name']
+        assert by_id[sid]['dcCapacity'] == STATION_META[sid]['dcCapacity']
+    assert summary['total_daily_generation'] == pytest.approx(10.0)
+    assert_totals_consistent(projects, summary)
+
+
+def test_placeholder_is_replaced_by_real_value():
+    engine = MergeEngine(STATION_META)
+    engine.add(5, None, 'api', origin='sems')
+    engine.add(5, 0.38, 'ocr', origin='sems')
+    projects, summary = engine.build(required_ids=(5, 6))
+    assert generation_by_id(projects) == {5: 0.38, 6: 0}
+    assert_totals_consistent(projects, summary)
+
+
+def test_unknown_station_uses_default_meta():
+    engine = MergeEngine(STATION_META)
+    engine.add(42, 1.5, 'dom')
+    projects, summary = engine.build()
+    assert projects[0]['name'] == '项目42'
+    assert projects[0]['dcCapacity'] == 0
+    assert_totals_consistent(projects, summary)
+
+
+def test_many_station_total():
+    engine = MergeEngine()
+    expected = {}
+    kinds = ('placeholder', 'ocr', 'dom', 'api')
+    for sid in range(1, 201):
+        value = round(sid * 0.37 % 17, 3)
+        # 每个电站先加入低优先级的值，再加入最终应生效的值
+        engine.add(str(sid), value + 100, kinds[sid % 3], origin='low')
+        engine.add(sid, value, 'api' if sid % 2 else kinds[sid % 3], origin='final')
+        expected[sid] = value
+    projects, summary = engine.build(required_ids=range(1, 206))
+    assert len(projects) == 205
+    expected.update({sid: 0 for sid in range(201, 206)})
+    assert generation_by_id(projects) == expected
+    assert summary['total_daily_generation'] == pytest.approx(sum(expected.values()))
+    assert_totals_consistent(projects, summary)
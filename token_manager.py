@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+接口令牌管理：保存SEMS token与华为会话令牌及其过期时间，到期前主动刷新，刷新失败时才无头登录
+
+各系统的接口客户端（sems_api / fusionsolar_api）只需要一个令牌：SEMS为请求头中的token，
+华为为登录会话的cookie。令牌按 (系统, 账号) 保存在 .token_store/（可用 SOLAR_TOKEN_STORE_DIR 指定，
+权限600，不提交到仓库），记录 {'value', 'expires_at', 'obtained_at', 'source'}。
+
+- get()：令牌距过期还有 margin 秒以上时直接返回；否则刷新
+- 刷新：先调用 refresh(当前令牌)（SEMS为HTTP登录接口，华为为会话保活），失败时才调用 login()（无头浏览器登录）
+- 同一 (系统, 账号) 的刷新在进程内（线程锁）与进程间（锁文件）串行执行，
+  等到锁的调用方先重新读取令牌，其他调用方已刷新时直接使用，不重复登录；
+  传入 deadline（run_budget.Deadline）时等锁不超过其剩余预算，超时返回尚未过期的令牌或None
+- start()：后台线程在令牌过期前主动刷新（只调用refresh，不启动浏览器）
+
+设置 SOLAR_TOKEN_MANAGER=0 可关闭；SOLAR_TOKEN_REFRESH_MARGIN 为提前刷新的秒数（默认600）。
+"""
+
+import os
+import json
+import time
+import socket
+import hashlib
+import logging
+import threading
+from datetime import datetime
+
+from session_vault import SESSION_TTL
+from run_budget import Deadline
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+# 各系统令牌的默认有效期（秒）；华为会话在闲置约30分钟后失效，每次保活后重新计时
+TOKEN_TTL = {
+    'sems': SESSION_TTL['sems'],
+    'huawei': 30 * 60
+}
+
+DEFAULT_REFRESH_MARGIN = 600
+
+# 刷新锁文件超过该时间（或持有进程已退出）视为残留；无头登录最长需要几分钟
+REFRESH_LOCK_STALE_SECONDS = 600
+
+
+def manager_enabled():
+    return os.environ.get('SOLAR_TOKEN_MANAGER', '1') not in ('0', 'false', 'no')
+
+
+def _env_number(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _wait_seconds(deadline):
+    """等锁的最长秒数：deadline为None或不限时返回None"""
+    return deadline.remaining() if deadline is not None else None
+
+
+def _pid_alive(pid):
+    if os.name == 'nt':
+        return True
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+class TokenStore:
+    """按 (系统, 账号) 保存的令牌文件"""
+
+    def __init__(self, store_dir=None):
+        self.store_dir = store_dir or os.environ.get('SOLAR_TOKEN_STORE_DIR', '.token_store')
+
+    def path_for(self, portal, account):
+        # 账号名不直接出现在文件名中
+        digest = hashlib.sha1(str(account).encode('utf-8')).hexdigest()[:12]
+        return os.path.join(self.store_dir, f'{portal}-{digest}.json')
+
+    def load(self, portal, account):
+        """读取令牌记录（不检查是否过期），不存在或损坏时返回None"""
+        try:
+            with open(self.path_for(portal, account), 'r', encoding='utf-8') as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return record if isinstance(record, dict) and record.get('value') else None
+
+    def save(self, portal, account, record):
+        os.makedirs(self.store_dir, exist_ok=True)
+        path = self.path_for(portal, account)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(record, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def delete(self, portal, account):
+        try:
+            os.remove(self.path_for(portal, account))
+        except OSError:
+            pass
+
+
+class _RefreshLock:
+    """跨进程的刷新锁：独占创建锁文件并写入持有者，持有者进程已退出或超时时视为残留
+
+    deadline 耗尽时不再等待，held 为False，由调用方放弃刷新。
+    """
+
+    def __init__(self, path, deadline=None):
+        self.path = path + '.refresh.lock'
+        self.deadline = deadline
+        self.held = False
+
+    def _is_stale(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                owner = json.load(f)
+        except (OSError, ValueError):
+            # 持有者刚创建、尚未写入时按修改时间判断
+            try:
+                return time.time() - os.path.getmtime(self.path) > REFRESH_LOCK_STALE_SECONDS
+            except OSError:
+                return False
+        if owner.get('host') == socket.gethostname() and not _pid_alive(owner.get('pid', 0)):
+            return True
+        return time.time() - owner.get('since', 0) > REFRESH_LOCK_STALE_SECONDS
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        logged = False
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600)
+            except FileExistsError:
+                if self._is_stale():
+                    try:
+                        os.remove(self.path)
+                    except OSError:
+                        pass
+                    continue
+                wait = _wait_seconds(self.deadline)
+                if wait is not None and wait <= 0:
+                    return self
+                if not logged:
+                    logger.info('其他进程正在刷新令牌，等待其完成...')
+                    logged = True
+                time.sleep(0.2 if wait is None else min(0.2, wait))
+                continue
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'host': socket.gethostname(), 'pid': os.getpid(), 'since': time.time()}, f)
+            self.held = True
+            return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.held:
+            self.held = False
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+class TokenManager:
+    """某个系统（及账号）的接口令牌；同一进程内按 (系统, 账号) 共享实例
+
+    refresh(当前令牌或None) 不启动浏览器换取新令牌，login() 通过无头浏览器登录取得令牌；
+    两者返回新令牌，失败时返回None或抛出异常。
+    """
+
+    def __init__(self, portal, account, refresh=None, login=None, ttl=None, margin=None, store=None):
+        self.portal = portal
+        self.account = account
+        self.refresh = refresh
+        self.login = login
+        self.ttl = ttl or TOKEN_TTL.get(portal, 3600)
+        self.margin = margin if margin is not None else _env_number('SOLAR_TOKEN_REFRESH_MARGIN', DEFAULT_REFRESH_MARGIN)
+        # 有效期较短的令牌（华为会话）至少保留一半有效期用于刷新
+        self.margin = min(self.margin, self.ttl / 2)
+        self.store = store or TokenStore()
+        # lock 在刷新期间（可能包括几分钟的浏览器登录）一直持有；record_lock 只保护令牌文件的读改写
+        self.lock = threading.Lock()
+        self.record_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def _remaining(self, record):
+        return (record or {}).get('expires_at', 0) - time.time()
+
+    def record(self):
+        """当前保存的令牌记录（可能已过期），没有时返回None"""
+        return self.store.load(self.portal, self.account)
+
+    def peek(self):
+        """未过期的令牌（不刷新），没有时返回None"""
+        record = self.record()
+        return record['value'] if self._remaining(record) > 0 else None
+
+    def get(self, allow_login=True, deadline=None):
+        """返回可用的令牌：距过期不足 margin 秒时先刷新；刷新与登录都失败（或在 deadline 内等不到刷新锁）时
+        返回尚未过期的令牌或None"""
+        if not manager_enabled():
+            return None
+        record = self.record()
+        if self._remaining(record) > self.margin:
+            return record['value']
+        return self.refresh_now(allow_login=allow_login, deadline=deadline)
+
+    def put(self, value, ttl=None, source='browser'):
+        """保存新取得的令牌（例如浏览器登录后从页面读取的token）"""
+        if not value or not manager_enabled():
+            return value
+        now = time.time()
+        expires_at = now + (ttl or self.ttl)
+        try:
+            with self.record_lock:
+                self.store.save(self.portal, self.account, {
+                    'portal': self.portal,
+                    'value': value,
+                    'obtained_at': now,
+                    'expires_at': expires_at,
+                    'source': source
+                })
+            logger.info(f"{self.portal} 令牌已保存（来源: {source}，有效期至 "
+                        f"{datetime.fromtimestamp(expires_at).strftime('%Y-%m-%d %H:%M')}）")
+        except OSError as e:
+            logger.warning(f"保存 {self.portal} 令牌失败: {str(e)}")
+        return value
+
+    def invalidate(self, value=None):
+        """令牌被接口拒绝时调用；value 不是当前保存的令牌时（其他调用方已刷新）不删除"""
+        with self.record_lock:
+            record = self.record()
+            if record and (value is None or record.get('value') == value):
+                self.store.delete(self.portal, self.account)
+                logger.info(f"{self.portal} 令牌已失效，下次使用前重新获取")
+
+    def _call(self, label, fn, *args):
+        try:
+            return fn(*args)
+        except Exception as e:
+            logger.warning(f"{self.portal} 令牌{label}失败: {str(e)}")
+            return None
+
+    def _wait_timed_out(self):
+        logger.warning(f"{self.portal} 令牌正在由其他调用方刷新，时间预算内等不到，不再等待")
+        return self.peek()
+
+    def refresh_now(self, allow_login=True, force=False, deadline=None):
+        """刷新令牌并返回新令牌：先refresh，失败时（allow_login为True时）无头登录
+
+        同一 (系统, 账号) 的刷新串行执行；等待期间其他调用方已刷新时直接返回其结果（force=True 时仍刷新）。
+        deadline 耗尽前拿不到刷新锁时不再等待，返回尚未过期的令牌或None。
+        """
+        if not manager_enabled():
+            return None
+        wait = _wait_seconds(deadline)
+        if not self.lock.acquire(timeout=-1 if wait is None else wait):
+            return self._wait_timed_out()
+        try:
+            with _RefreshLock(self.store.path_for(self.portal, self.account), deadline) as file_lock:
+                if not file_lock.held:
+                    return self._wait_timed_out()
+                return self._refresh_locked(allow_login, force)
+        finally:
+            self.lock.release()
+
+    def _refresh_locked(self, allow_login, force):
+        """持有刷新锁时执行刷新"""
+        record = self.record()
+        if not force and self._remaining(record) > self.margin:
+            return record['value']
+        current = record['value'] if self._remaining(record) > 0 else None
+        if self.refresh is not None:
+            value = self._call('刷新', self.refresh, current)
+            if value:
+                return self.put(value, source='refresh')
+        if allow_login and self.login is not None:
+            logger.info(f"{self.portal} 令牌无法刷新，通过无头浏览器登录获取")
+            value = self._call('登录获取', self.login)
+            if value:
+                return self.put(value, source='login')
+        if current:
+            # 刷新失败但令牌尚未过期时继续使用，由后台线程或下次调用再刷新
+            return current
+        logger.warning(f"{self.portal} 没有可用的令牌")
+        return None
+
+    def start(self, interval=None):
+        """启动后台刷新线程：令牌将在下一次检查前进入 margin 时提前刷新（只调用refresh）"""
+        if self.thread is not None or self.refresh is None or not manager_enabled():
+            return self
+        interval = interval or max(60, min(self.ttl / 3, self.margin))
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, args=(interval,), name=f'token-refresh-{self.portal}', daemon=True)
+        self.thread.start()
+        logger.info(f"{self.portal} 令牌后台刷新已启动（每 {interval:.0f} 秒检查一次）")
+        return self
+
+    def _run(self, interval):
+        while not self.stop_event.wait(interval):
+            record = self.record()
+            if record is None or self._remaining(record) > self.margin + interval:
+                continue
+            try:
+                # 其他调用方正在刷新（例如浏览器登录）时最多等一个检查周期
+                self.refresh_now(allow_login=False, force=True, deadline=Deadline(interval, name=f'{self.portal} 令牌后台刷新'))
+            except Exception as e:
+                logger.warning(f"{self.portal} 令牌后台刷新出错: {str(e)}")
+
+    def stop(self):
+        if self.thread is not None:
+            self.stop_event.set()
+            self.thread.join()
+            self.thread = None
+
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+def get_token_manager(portal, account, refresh=None, login=None, **kwargs):
+    """返回 (系统, 账号) 对应的令牌管理器；传入的 refresh/login 覆盖已有实例上的同名方法"""
+    key = (portal, account)
+    with _managers_lock:
+        if key not in _managers:
+            _managers[key] = TokenManager(portal, account, **kwargs)
+        manager = _managers[key]
+        if refresh is not None:
+            manager.refresh = refresh
+        if login is not None:
+            manager.login = login
+        return manager
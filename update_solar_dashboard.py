@@ -1,20 +1,15 @@
 import os
 import json
-import time
 import logging
 import os
 import requests
 import re
 import cv2
+from contextlib import contextmanager
 import easyocr
 from PIL import Image
 from datetime import datetime, timedelta
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.edge.service import Service as EdgeService
-from selenium.webdriver.edge.options import Options as EdgeOptions
-from selenium.webdriver.chrome.service import Service as ChromeService
-from selenium.webdriver.chrome.options import Options as ChromeOptions
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import (
@@ -22,10 +17,20 @@ from selenium.common.exceptions import (
     ElementNotInteractableException, NoSuchElementException,
     ElementClickInterceptedException
 )
-from webdriver_manager.chrome import ChromeDriverManager
-from webdriver_manager.microsoft import EdgeChromiumDriverManager
-from huawei_scraper import HuaweiFusionSolarScraper
+from huawei_scraper import HuaweiFusionSolarScraper, PROJECT_NAME_MAPPING
 from esolar_scraper import ESolarScraper
+from date_utils import format_date, days_before_today
+from checkpoint import CheckpointStore
+from merge_engine import MergeEngine
+from run_budget import Deadline
+from rate_limiter import get_governor
+from driver_pool import get_default_pool
+from readiness import (wait_for_network_idle, wait_for_chart_ready, reset_wait_stats, wait_report,
+                       merge_wait_report, log_wait_report)
+from fast_probe import reset_probe_stats, probe_report, merge_probe_report, log_probe_report
+from sems_api import collect_with_token, CHART_CAPTURE_RULES, api_enabled as sems_api_enabled
+import fusionsolar_api
+from network_capture import attach_recorder
 
 # 配置日志
 logging.basicConfig(
@@ -35,6 +40,12 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Open-Meteo天气接口：预报接口只覆盖最近约3个月（past_days 最多92天），更早的日期使用历史归档接口
+WEATHER_FORECAST_URL = 'https://api.open-meteo.com/v1/forecast'
+WEATHER_ARCHIVE_URL = 'https://archive-api.open-meteo.com/v1/archive'
+WEATHER_FORECAST_PAST_DAYS = 92
+WEATHER_LOCATION = {'latitude': 37.4375, 'longitude': 118}
+
 # 将Open-Meteo的天气代码转换为中文描述
 def get_weather_description(code):
     # 天气代码映射表（基于Open-Meteo的WMO代码标准）
@@ -82,89 +93,15 @@ def is_ci_environment():
 
 def create_webdriver(browser_type=None):
     """
-    创建WebDriver实例，自动检测CI环境并选择合适的浏览器
+    从本进程共用的驱动池租用浏览器标签页（浏览器参数、驱动查找与启动重试由driver_pool统一处理）
     :param browser_type: 指定浏览器类型 ('chrome' 或 'edge')，None表示自动选择
-    :return: WebDriver实例
+    :return: 租用的WebDriver（调用quit()即归还标签页）
     """
-    ci_env = is_ci_environment()
-    
-    # 如果没有指定浏览器类型，根据环境自动选择
-    if browser_type is None:
-        browser_type = 'chrome' if ci_env else 'edge'
-    
-    try:
-        if browser_type.lower() == 'chrome':
-            logger.info("初始化Chrome浏览器...")
-            chrome_options = ChromeOptions()
-            
-            # CI环境配置
-            if ci_env:
-                chrome_options.add_argument('--headless')
-                chrome_options.add_argument('--no-sandbox')
-                chrome_options.add_argument('--disable-dev-shm-usage')
-                chrome_options.add_argument('--disable-gpu')
-                chrome_options.add_argument('--remote-debugging-port=9222')
-            
-            # 通用配置
-            chrome_options.add_argument('--disable-blink-features=AutomationControlled')
-            chrome_options.add_argument('--disable-extensions')
-            chrome_options.add_argument('--disable-notifications')
-            chrome_options.add_argument('--window-size=1920,1080')
-            chrome_options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
-            
-            # 添加DNS服务器设置，解决域名解析问题
-            chrome_options.add_argument('--dns-servers=8.8.8.8,8.8.4.4')
-            
-            # 实验性选项
-            chrome_options.add_experimental_option('excludeSwitches', ['enable-automation'])
-            chrome_options.add_experimental_option('useAutomationExtension', False)
-            
-            # 使用webdriver-manager自动管理ChromeDriver
-            service = ChromeService(ChromeDriverManager().install())
-            driver = webdriver.Chrome(service=service, options=chrome_options)
-            
-        elif browser_type.lower() == 'edge':
-            logger.info("初始化Edge浏览器...")
-            edge_options = EdgeOptions()
-            
-            # CI环境配置
-            if ci_env:
-                edge_options.add_argument('--headless')
-                edge_options.add_argument('--no-sandbox')
-                edge_options.add_argument('--disable-dev-shm-usage')
-                edge_options.add_argument('--disable-gpu')
-            
-            # 通用配置
-            edge_options.add_argument('--disable-blink-features=AutomationControlled')
-            edge_options.add_argument('--window-size=1920,1080')
-            edge_options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36 Edg/120.0.0.0')
-            
-            # 实验性选项
-            edge_options.add_experimental_option('excludeSwitches', ['enable-automation'])
-            edge_options.add_experimental_option('useAutomationExtension', False)
-            
-            # 使用webdriver-manager自动管理EdgeDriver
-            service = EdgeService(EdgeChromiumDriverManager().install())
-            driver = webdriver.Edge(service=service, options=edge_options)
-            
-        else:
-            raise ValueError(f"不支持的浏览器类型: {browser_type}")
-        
-        # 设置超时时间
-        driver.set_page_load_timeout(60)
-        driver.set_script_timeout(60)
-        driver.implicitly_wait(15)
-        
-        logger.info(f"{browser_type.capitalize()}浏览器初始化成功")
-        return driver
-        
-    except Exception as e:
-        logger.error(f"浏览器初始化失败: {str(e)}")
-        raise
+    return get_default_pool().acquire('sems-fallback', browser_type, profile='sems')
 
 
 class SolarDashboardUpdater:
-    def __init__(self, huawei_username, huawei_password, sems_username, sems_password, esolar_username, esolar_password):
+    def __init__(self, huawei_username, huawei_password, sems_username, sems_password, esolar_username, esolar_password, target_date=None, run_budget=None, source_budgets=None):
         # 初始化参数
         self.huawei_username = huawei_username
         self.huawei_password = huawei_password
@@ -173,20 +110,32 @@ class SolarDashboardUpdater:
         self.esolar_username = esolar_username
         self.esolar_password = esolar_password
         
-        # 设置日期相关
-        today = datetime.now()
-        yesterday = today - timedelta(days=1)
-        self.target_date = yesterday.strftime('%Y-%m-%d')
-        
         # 设置文件路径
         self.base_data_dir = 'data'
         self.base_screenshots_dir = 'screenshots'
         self.reports_dir = 'reports'
-        
-        # 创建按日期组织的目录
-        self.data_file_path = os.path.join(self.base_data_dir, f'solar_data_{self.target_date}.json')
-        self.screenshots_dir = os.path.join(self.base_screenshots_dir, self.target_date)
         self.default_data_file_path = 'solar_data.json'
+        # 是否同时更新默认文件solar_data.json（补采历史日期时关闭）
+        self.update_default_data_file = True
+        # 是否把截图裁剪与OCR留给后续阶段处理（阶段调度模式下开启，使其与浏览器采集并行）
+        self.defer_postprocessing = False
+        # 最近一次运行的阶段耗时记录
+        self.last_stage_timeline = []
+        # 最近一次运行的就绪等待统计（相对原固定等待节省的时间）
+        self.last_readiness_report = {}
+        self.last_lookup_report = {}
+        
+        # 时间预算：全局截止时间（秒）与各系统预算（秒），None表示不限时
+        self.source_budgets = dict(source_budgets or {})
+        self.run_deadline = Deadline(run_budget, name='run')
+        # 各系统本次运行的预算（首次使用时创建，接口、浏览器等各阶段共用同一个）
+        self.source_deadlines = {}
+        
+        # 常驻模式下由daemon注入的浏览器会话管理器；为None时每次运行新建并关闭浏览器
+        self.session_manager = None
+        
+        # 设置日期相关（默认为昨天），并创建按日期组织的目录
+        self.set_target_date(target_date)
         
         # 项目名称映射
         self.project_names = {
@@ -194,16 +143,25 @@ class SolarDashboardUpdater:
             6: '零碳商业园'
         }
         
-        # 项目容量映射
+        # 项目容量映射（按整数电站ID，取自 get_station_meta）
         self.project_capacities = {
-            '1': {'dcCapacity': 5.9826, 'acCapacity': 4.77},    # 宋滩
-            '2': {'dcCapacity': 1.94346, 'acCapacity': 1.7},    # 杨柳雪李赞皇
-            '3': {'dcCapacity': 5.3749, 'acCapacity': 4.3},     # 滨北南邱家
-            '4': {'dcCapacity': 1.16938, 'acCapacity': 1},      # 水立方
-            5: {'dcCapacity': 0.10384, 'acCapacity': 0.1},         # 黄河植物园
-            6: {'dcCapacity': 1.58858, 'acCapacity': 1.58858}   # 零碳商业园
+            sid: {'dcCapacity': meta['dcCapacity'], 'acCapacity': meta['acCapacity']}
+            for sid, meta in self.get_station_meta().items()
         }
     
+    def get_source_deadline(self, source):
+        """返回某个系统本次运行的时间预算（不晚于全局截止时间）；同一次运行中各阶段共用，从首次使用时开始计时"""
+        if source not in self.source_deadlines:
+            self.source_deadlines[source] = self.run_deadline.child(self.source_budgets.get(source), name=source)
+        return self.source_deadlines[source]
+
+    def set_target_date(self, target_date=None):
+        """设置目标日期，并同步更新按日期组织的数据文件与截图目录（各系统预算重新计时）"""
+        self.source_deadlines = {}
+        self.target_date = format_date(target_date)
+        self.data_file_path = os.path.join(self.base_data_dir, f'solar_data_{self.target_date}.json')
+        self.screenshots_dir = os.path.join(self.base_screenshots_dir, self.target_date)
+
     def get_easyocr_reader(self, use_gpu=False, languages=None):
         """缓存并返回EasyOCR Reader实例"""
         if languages is None:
@@ -331,46 +289,27 @@ class SolarDashboardUpdater:
             # 创建截图目录（如果不存在）
             os.makedirs(self.screenshots_dir, exist_ok=True)
             
-            # 配置Edge浏览器选项
-            self.edge_options = Options()
-            # 添加兼容性参数
-            self.edge_options.add_argument('--disable-software-rasterizer')
-            self.edge_options.add_argument('--disable-features=IsolateOrigins,site-per-process')
-            self.edge_options.add_argument('--disable-site-isolation-trials')
-            self.edge_options.add_argument('--no-sandbox')
-            self.edge_options.add_argument('--disable-dev-shm-usage')
-            self.edge_options.add_argument('--disable-gpu')
-            
-            # 设置用户代理
-            self.edge_options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36 Edg/120.0.0.0')
-            
-            # 实验性选项
-            self.edge_options.add_experimental_option('excludeSwitches', ['enable-logging'])
-            self.edge_options.add_experimental_option('detach', False)
-            self.edge_options.add_experimental_option('useAutomationExtension', False)
-            
-            # 设置下载路径
-            prefs = {
-                "download.default_directory": self.screenshots_dir,
-                "download.prompt_for_download": False,
-                "download.directory_upgrade": True,
-                "safebrowsing.enabled": True
-            }
-            self.edge_options.add_experimental_option('prefs', prefs)
-            
-            # 禁用自动化控制特征
-            self.edge_options.add_argument('--disable-blink-features=AutomationControlled')
+            # 浏览器参数由driver_pool统一提供（见create_webdriver）
+        
+        def quit(self):
+            """归还浏览器标签页"""
+            if self.driver:
+                get_default_pool().release(self.driver)
+                self.driver = None
         
         def login(self):
             """登录SEMS系统"""
             try:
                 # 使用新的create_webdriver函数初始化WebDriver
                 self.driver = create_webdriver()
+                # 登录前挂上接口响应记录器，记录电站页面自身的GetChartByPlant请求
+                attach_recorder(self.driver, CHART_CAPTURE_RULES)
                 
                 # 设置页面加载超时
                 self.driver.set_page_load_timeout(30)
                 
                 # 访问SEMS系统登录页面
+                get_governor('sems', self.username).throttle()
                 self.driver.get('https://www.sems.com.cn/login')
                 
                 # 等待登录页面加载完成
@@ -424,56 +363,21 @@ class SolarDashboardUpdater:
                 return False
         
         def collect_get_chart_responses(self):
-            """收集GetChartByPlant API的响应"""
+            """从接口响应记录器中取出页面最近一次GetChartByPlant请求的响应"""
             if not self.ensure_driver_alive():
                 logger.error('浏览器驱动会话不存在或已失效')
                 return
             
             try:
-                # 使用JavaScript直接调用GetChartByPlant API
-                logger.info('尝试通过JavaScript调用GetChartByPlant API获取数据')
-                
-                # 这里是一个简化的实现，实际实现可能需要根据SEMS系统的API进行调整
-                # 我们可以尝试执行JavaScript来获取数据
-                script = """
-                    // 尝试找到页面上已有的数据或调用API
-                    try {
-                        // 这只是一个示例，实际实现需要根据SEMS系统的实际情况调整
-                        return {success: true, result: {totalPower: 500}};
-                    } catch (e) {
-                        return {error: e.toString()};
-                    }
-                """
-                
-                result = self.driver.execute_script(script)
-                
-                if result:
-                    self.api_responses.append({'body': result})
-                    logger.info('成功收集到API响应数据')
-                
-                # 如果没有获取到数据，添加模拟数据作为备选
-                if not self.api_responses:
-                    logger.warning('未收集到API响应，添加模拟数据作为备选')
-                    self.api_responses.append({
-                        'body': {
-                            'success': true,
-                            'result': {
-                                'totalPower': 500  # 模拟数据
-                            }
-                        }
-                    })
+                recorder = attach_recorder(self.driver, CHART_CAPTURE_RULES)
+                entry = recorder.wait_for('chart', timeout=3)
+                if entry is None:
+                    logger.warning('未收集到GetChartByPlant响应')
+                    return
+                self.api_responses.append({'url': entry['url'], 'body': entry['body']})
+                logger.info('成功收集到API响应数据')
             except Exception as e:
                 logger.error(f'收集API响应时出错: {str(e)}')
-                # 添加模拟数据作为备选
-                logger.info('已添加模拟数据作为备选')
-                self.api_responses.append({
-                    'body': {
-                        'success': true,
-                        'result': {
-                            'totalPower': 500  # 模拟数据
-                        }
-                    }
-                })
         
         def capture_element_screenshot(self, element_class):
             """截取特定class的元素区域截图并保存到按日期组织的目录"""
@@ -587,12 +491,9 @@ class SolarDashboardUpdater:
             
             return sems_data
     
-    def update_dashboard(self):
-        """更新太阳能发电仪表盘数据，整合SEMS、华为和ESolar系统的数据"""
-        logger.info("开始更新太阳能发电仪表盘数据...")
-        
-        # 定义项目配置
-        project_config = {
+    def get_project_config(self):
+        """返回各系统的项目与账号配置"""
+        return {
             'huawei': {
                 'projects': [
                     {'id': '1', 'name': '宋滩'},
@@ -614,50 +515,118 @@ class SolarDashboardUpdater:
                 'password': self.esolar_password
             }
         }
-        
-        # 初始化系统相关变量
-        results = {}
-        sems_data = {}
-        esolar_data = {}
-        ocr_id5_generation = None
-        
+
+    def get_station_meta(self):
+        """返回各电站的名称、容量与效率颜色（按整数电站ID）"""
+        project_capacities = {
+            1: {'dcCapacity': 5.9826, 'acCapacity': 4.77},     # 宋滩
+            2: {'dcCapacity': 1.94346, 'acCapacity': 1.7},     # 杨柳雪李赞皇
+            3: {'dcCapacity': 5.3749, 'acCapacity': 4.3},      # 滨北南邱家
+            4: {'dcCapacity': 1.16938, 'acCapacity': 1},       # 水立方
+            5: {'dcCapacity': 0.10384, 'acCapacity': 0.1},     # 黄河植物园
+            6: {'dcCapacity': 1.58858, 'acCapacity': 1.58858}  # 零碳商业园
+        }
+        names = {int(p['id']): p['name'] for p in self.get_project_config()['huawei']['projects']}
+        names.update(self.project_names)
+        meta = {}
+        for sid, capacities in project_capacities.items():
+            meta[sid] = dict(capacities, name=names.get(sid, f'项目{sid}'))
+        # 李赞皇项目效率偏低，沿用黄色标识
+        meta[2]['efficiencyColor'] = 'bg-yellow-400'
+        return meta
+
+    def get_init_kwargs(self):
+        """返回重建本实例所需的构造参数（供工作进程使用）"""
+        return {
+            'huawei_username': self.huawei_username,
+            'huawei_password': self.huawei_password,
+            'sems_username': self.sems_username,
+            'sems_password': self.sems_password,
+            'esolar_username': self.esolar_username,
+            'esolar_password': self.esolar_password,
+            'target_date': self.target_date,
+            'run_budget': self.run_deadline.remaining(),
+            'source_budgets': self.source_budgets
+        }
+
+    def crop_huawei_screenshots(self, results, screenshots_dir=None):
+        """对华为项目截图进行后处理：分别处理1/2与3/4的两步裁剪（接口取得的项目没有新截图，不裁剪）"""
+        screenshots_dir = screenshots_dir or self.screenshots_dir
+        try:
+            # 项目1和2：先顶裁260，再底裁195；项目3和4：先顶裁225，再底裁180
+            for pids, top_height, bottom_height in ((['1', '2'], 260, 195), (['3', '4'], 225, 180)):
+                for pid in pids:
+                    path = None
+                    if isinstance(results, dict) and pid in results and isinstance(results[pid], dict):
+                        if results[pid].get('source') == 'api':
+                            continue
+                        path = results[pid].get('screenshot_path')
+                    if not path:
+                        path = os.path.join(screenshots_dir, f"power_curve_{pid}.png")
+                    if path and os.path.exists(path):
+                        self.crop_screenshot_with_origin(path, target_height=top_height, origin='top')
+                        self.crop_screenshot_with_origin(path, target_height=bottom_height, origin='bottom')
+        except Exception as crop_e:
+            logger.warning(f'裁剪华为截图失败: {str(crop_e)}')
+
+    def create_portal_instance(self, source, **attrs):
+        """新建某个系统的爬虫实例（未进入with，不启动浏览器）"""
+        config = self.get_project_config()[source]
+        if source == 'huawei':
+            projects = attrs.pop('projects', None) or config['projects']
+            return HuaweiFusionSolarScraper(config['username'], config['password'], projects, **attrs)
+        if source == 'sems':
+            import sems_combined_tool
+            return sems_combined_tool.SEMSScreenshotTool(config['username'], config['password'], **attrs)
+        if source == 'esolar':
+            return ESolarScraper(config['username'], config['password'], **attrs)
+        raise ValueError(f"未知的数据源: {source}")
+
+    @contextmanager
+    def portal_session(self, source, factory, **attrs):
+        """获取某个系统的爬虫实例
+
+        有会话管理器时复用已登录的常驻浏览器（attrs会更新到实例上，退出时不关闭）；
+        否则调用factory新建实例，并在退出时关闭浏览器。
+        """
+        if self.session_manager is not None:
+            yield self.session_manager.acquire(source, factory, **attrs)
+        else:
+            with factory() as instance:
+                yield instance
+
+    def run_huawei_source(self, projects=None):
+        """运行华为爬虫，返回 {项目ID: {'screenshot_path', 'daily_generation'}}
+
+        projects: 只采集其中的项目（任务队列按电站拆分任务时使用），默认全部项目
+        """
+        project_config = self.get_project_config()
+        projects = projects or project_config['huawei']['projects']
+        # 令牌管理器中的会话仍有效（或保活成功）时直接请求接口，全部取到时不启动浏览器
+        results = self.fetch_huawei_via_api([self.target_date], projects).get(self.target_date, {})
+        remaining = [p for p in projects if str(p['id']) not in results]
+        if not remaining:
+            logger.info('华为接口已取得全部项目的数据，跳过浏览器登录与页面爬取')
+            return results
         # 初始化华为爬虫并运行，传递截图目录（不传递date_str）
         logger.info('初始化华为爬虫')
         if project_config['huawei']['username'] and project_config['huawei']['password']:
             try:
-                with HuaweiFusionSolarScraper(
-                    project_config['huawei']['username'], 
-                    project_config['huawei']['password'], 
-                    project_config['huawei']['projects'],
-                    screenshots_dir=self.screenshots_dir
-                ) as scraper:
+                attrs = {
+                    'projects': remaining,
+                    'screenshots_dir': self.screenshots_dir,
+                    'target_date': self.target_date,
+                    'deadline': self.get_source_deadline('huawei')
+                }
+                with self.portal_session('huawei', lambda: self.create_portal_instance('huawei', **dict(attrs)), **attrs) as scraper:
                     # 运行爬虫
-                    results = scraper.run()
+                    scraped = scraper.run()
+                    if isinstance(scraped, dict):
+                        results.update(scraped)
                     
-                    # 对华为项目截图进行后处理：分别处理1/2与3/4的两步裁剪
-                    try:
-                        # 项目1和2：先顶裁260，再底裁195
-                        for pid in ['1', '2']:
-                            path = None
-                            if isinstance(results, dict) and pid in results and isinstance(results[pid], dict):
-                                path = results[pid].get('screenshot_path')
-                            if not path:
-                                path = os.path.join(self.screenshots_dir, f"power_curve_{pid}.png")
-                            if path and os.path.exists(path):
-                                self.crop_screenshot_with_origin(path, target_height=260, origin='top')
-                                self.crop_screenshot_with_origin(path, target_height=195, origin='bottom')
-                        # 项目3和4：先顶裁225，再底裁180
-                        for pid in ['3', '4']:
-                            path = None
-                            if isinstance(results, dict) and pid in results and isinstance(results[pid], dict):
-                                path = results[pid].get('screenshot_path')
-                            if not path:
-                                path = os.path.join(self.screenshots_dir, f"power_curve_{pid}.png")
-                            if path and os.path.exists(path):
-                                self.crop_screenshot_with_origin(path, target_height=225, origin='top')
-                                self.crop_screenshot_with_origin(path, target_height=180, origin='bottom')
-                    except Exception as crop_e:
-                        logger.warning(f'裁剪华为截图失败: {str(crop_e)}')
+                    # 对华为项目截图进行后处理（延后处理时交给独立的裁剪阶段）
+                    if not self.defer_postprocessing:
+                        self.crop_huawei_screenshots(results)
                     
                     if not results:
                         logger.warning('华为爬虫未返回任何数据')
@@ -665,7 +634,53 @@ class SolarDashboardUpdater:
                 logger.error(f"华为爬虫执行出错: {str(e)}")
         else:
             logger.warning('华为系统的用户名或密码为空，跳过华为爬虫')
-            
+        return results if isinstance(results, dict) else {}
+
+    def fetch_huawei_via_api(self, dates, projects=None):
+        """用令牌管理器保存的华为会话请求接口（只保活，不启动浏览器也不无头登录），
+        返回 {日期: {项目ID: 结果}}；没有可用会话时为空
+
+        冷启动时由随后的浏览器爬取登录一次，登录后的接口采集（fetch_via_api）再把会话交给令牌管理器，
+        避免无头登录与爬虫登录各做一次。
+        """
+        config = self.get_project_config()['huawei']
+        if not config['username']:
+            return {}
+        return fusionsolar_api.collect_with_token(
+            config['username'], config['password'], projects or config['projects'], dates, PROJECT_NAME_MAPPING,
+            allow_login=False,
+            governor=get_governor('huawei', config['username']),
+            deadline=self.get_source_deadline('huawei')
+        )
+
+    def fetch_sems_via_api(self, dates):
+        """用令牌管理器提供的SEMS token请求接口，返回 {日期: {项目ID: 结果}}；没有可用token时为空
+
+        token过期时通过登录接口刷新，多数运行不需要打开浏览器；刷新失败时不无头登录，
+        由随后的浏览器流程登录一次，并经 get_api_client() 把token交给令牌管理器。
+        """
+        config = self.get_project_config()['sems']
+        if not sems_api_enabled() or not config['username']:
+            return {}
+        return collect_with_token(
+            config['username'], config['password'], config['projects'], dates,
+            allow_login=False,
+            governor=get_governor('sems', config['username']),
+            deadline=self.get_source_deadline('sems')
+        )
+
+    def run_sems_source(self):
+        """运行SEMS系统处理，返回 {'sems_data': ..., 'ocr_id5_generation': ..., 'api_results': {项目ID: 接口结果}}"""
+        project_config = self.get_project_config()
+        sems_data = {}
+        ocr_id5_generation = None
+        screenshot_path = None
+        sems_deadline = self.get_source_deadline('sems')
+        # 有可用token（保存的或通过登录接口刷新的）时直接请求接口，不截图、不OCR
+        api_results = self.fetch_sems_via_api([self.target_date]).get(self.target_date, {})
+        if api_results:
+            logger.info('SEMS接口已取得数据，跳过浏览器登录、截图与OCR')
+            return {'sems_data': sems_data, 'ocr_id5_generation': None, 'screenshot_path': None, 'api_results': api_results}
         # 初始化SEMS系统处理
         logger.info('初始化SEMS系统处理')
         sems_combined_success = False
@@ -683,40 +698,37 @@ class SolarDashboardUpdater:
                     logger.info("SEMSScreenshotTool类存在于sems_combined_tool模块中")
                     
                     # 使用日期参数和按日期组织的截图目录
-                    with sems_combined_tool.SEMSScreenshotTool(
-                        project_config['sems']['username'],
-                        project_config['sems']['password'],
-                        screenshots_dir=self.screenshots_dir,
-                        data_file_path=self.data_file_path
-                    ) as sems_tool:
-                        if sems_tool.login():
+                    attrs = {
+                        'screenshots_dir': self.screenshots_dir,
+                        'data_file_path': self.data_file_path,
+                        'target_date': self.target_date,
+                        'deadline': sems_deadline
+                    }
+                    with self.portal_session('sems', lambda: self.create_portal_instance('sems', **attrs), **attrs) as sems_tool:
+                        if sems_tool.logged_in or sems_tool.login():
                             logger.info('SEMS系统登录成功')
-                            # 收集API响应数据
-                            sems_tool.collect_get_chart_responses()
-                            
-                            # 等待页面完全加载
-                            logger.info('等待页面完全加载中...')
-                            time.sleep(10)
-                            
-                            # 尝试点击日期选择器以确保页面更新
-                            try:
-                                logger.info('尝试点击class=station-date-picker_left的元素')
-                                date_picker_element = sems_tool.driver.find_element(By.CLASS_NAME, "station-date-picker_left")
-                                date_picker_element.click()
-                                logger.info('成功点击class=station-date-picker_left的元素')
-                                time.sleep(2)
-                            except Exception as e:
-                                logger.warning(f'点击日期选择器失败: {str(e)}')
-                            
-                            # 截取功率曲线截图 - 使用正确的class名称
-                            screenshot_path = sems_tool.capture_element_screenshot("goodwe-station-charts__chart")
-                            # OCR识别项目5本日发电量
-                            if screenshot_path:
-                                ocr_id5_generation = self.extract_daily_generation_from_image(screenshot_path)
-                            else:
-                                fallback_path = os.path.join(self.screenshots_dir, "power_curve_5.png")
-                                if os.path.exists(fallback_path):
-                                    ocr_id5_generation = self.extract_daily_generation_from_image(fallback_path)
+                            # 优先用登录后的token请求接口，取到数据时不再翻页、截图和OCR
+                            api_results = sems_tool.fetch_via_api([self.target_date]).get(self.target_date, {})
+                            if api_results:
+                                return {'sems_data': sems_data, 'ocr_id5_generation': None,
+                                        'screenshot_path': screenshot_path, 'api_results': api_results}
+                            # 截图阶段恢复完整渲染：刷新电站页面，使图表中的图片和字体完整加载
+                            with sems_tool.resource_blocker.full_rendering(reload=True):
+                                # 等待图表数据加载完成
+                                logger.info('等待页面完全加载中...')
+                                wait_for_chart_ready(sems_tool.driver, budget=10, label='SEMS功率曲线加载', deadline=sems_deadline)
+                                
+                                # 点击日期选择器切换到目标日期
+                                sems_tool.move_to_target_date()
+                                
+                                # 收集目标日期的API响应数据
+                                sems_tool.collect_get_chart_responses()
+                                
+                                # 截取功率曲线截图 - 使用正确的class名称
+                                screenshot_path = sems_tool.capture_element_screenshot("goodwe-station-charts__chart")
+                            # OCR识别项目5本日发电量（延后处理时交给独立的OCR阶段）
+                            if not self.defer_postprocessing:
+                                ocr_id5_generation = self.ocr_sems_screenshot(screenshot_path)
                             
                             sems_data = sems_tool.extract_power_data_from_api_responses()
                             sems_combined_success = True
@@ -732,8 +744,8 @@ class SolarDashboardUpdater:
             except Exception as e:
                 logger.error(f'使用sems_combined_tool处理SEMS系统时出错: {str(e)}')
             
-            # 如果使用外部工具失败，尝试使用内置的SEMSystemHandler
-            if not sems_combined_success:
+            # 如果使用外部工具失败，尝试使用内置的SEMSystemHandler（预算耗尽时不再尝试）
+            if not sems_combined_success and not sems_deadline.expired('内置SEMS处理'):
                 logger.info('尝试使用内置的SEMSystemHandler处理SEMS系统')
                 try:
                     # 修复内部类访问问题：Python中内部类应通过self访问
@@ -747,12 +759,9 @@ class SolarDashboardUpdater:
                     
                     # 登录SEMS系统
                     if sems_handler.login():
-                        # 收集API响应数据
-                        sems_handler.collect_get_chart_responses()
-                        
-                        # 等待页面完全加载
+                        # 等待图表数据加载完成
                         logger.info('等待页面完全加载中...')
-                        time.sleep(10)
+                        wait_for_chart_ready(sems_handler.driver, budget=10, label='SEMS功率曲线加载', deadline=sems_deadline)
                         
                         # 尝试点击日期选择器以确保页面更新
                         try:
@@ -760,19 +769,18 @@ class SolarDashboardUpdater:
                             date_picker_element = sems_handler.driver.find_element(By.CLASS_NAME, "station-date-picker_left")
                             date_picker_element.click()
                             logger.info('成功点击class=station-date-picker_left的元素')
-                            time.sleep(2)
+                            wait_for_network_idle(sems_handler.driver, budget=2, label='SEMS切换日期', deadline=sems_deadline)
                         except Exception as e:
                             logger.warning(f'点击日期选择器失败: {str(e)}')
                         
+                        # 收集切换日期后的API响应数据
+                        sems_handler.collect_get_chart_responses()
+                        
                         # 截取功率曲线截图 - 使用正确的class名称
                         screenshot_path = sems_handler.capture_element_screenshot("goodwe-station-charts__chart")
-                        # OCR识别项目5本日发电量
-                        if screenshot_path:
-                            ocr_id5_generation = self.extract_daily_generation_from_image(screenshot_path)
-                        else:
-                            fallback_path = os.path.join(self.screenshots_dir, "power_curve_5.png")
-                            if os.path.exists(fallback_path):
-                                ocr_id5_generation = self.extract_daily_generation_from_image(fallback_path)
+                        # OCR识别项目5本日发电量（延后处理时交给独立的OCR阶段）
+                        if not self.defer_postprocessing:
+                            ocr_id5_generation = self.ocr_sems_screenshot(screenshot_path)
                         
                         # 提取SEMS系统数据
                         sems_data = self._extract_sems_project_data(sems_handler.api_responses)
@@ -783,7 +791,21 @@ class SolarDashboardUpdater:
                     logger.error(f"从SEMS系统获取数据时出错: {str(e)}")
         else:
             logger.warning('SEMS系统的用户名或密码为空，跳过SEMS系统处理')
-        
+        return {'sems_data': sems_data, 'ocr_id5_generation': ocr_id5_generation, 'screenshot_path': screenshot_path, 'api_results': {}}
+
+    def ocr_sems_screenshot(self, screenshot_path=None):
+        """OCR识别SEMS功率曲线截图中的项目5本日发电量，截图缺失时回退到默认路径"""
+        if screenshot_path:
+            return self.extract_daily_generation_from_image(screenshot_path)
+        fallback_path = os.path.join(self.screenshots_dir, "power_curve_5.png")
+        if os.path.exists(fallback_path):
+            return self.extract_daily_generation_from_image(fallback_path)
+        return None
+
+    def run_esolar_source(self):
+        """运行ESolar爬虫，返回 {'6': {...}} 格式的项目数据"""
+        project_config = self.get_project_config()
+        esolar_data = {}
         # 初始化ESolar系统处理
         logger.info('初始化ESolar系统处理')
         if project_config['esolar']['username'] and project_config['esolar']['password']:
@@ -799,16 +821,21 @@ class SolarDashboardUpdater:
                 if hasattr(esolar_scraper, 'ESolarScraper'):
                     logger.info("ESolarScraper类存在于esolar_scraper模块中")
                     
-                    with esolar_scraper.ESolarScraper(
-                        project_config['esolar']['username'],
-                        project_config['esolar']['password'],
-                        screenshots_dir=self.screenshots_dir
-                    ) as esolar_scraper_instance:
-                        # 执行登录
-                        login_success = esolar_scraper_instance.login()
+                    attrs = {
+                        'screenshots_dir': self.screenshots_dir,
+                        'target_date': self.target_date,
+                        'deadline': self.get_source_deadline('esolar')
+                    }
+                    with self.portal_session('esolar', lambda: self.create_portal_instance('esolar', **attrs), **attrs) as esolar_scraper_instance:
+                        # 执行登录（常驻会话已登录时跳过）
+                        login_success = esolar_scraper_instance.logged_in or esolar_scraper_instance.login()
                         if login_success:
                             # 执行登录后的操作（如导航到数据页面）
                             esolar_scraper_instance.perform_post_login_actions()
+                            # 未取得数值且浏览器已不健康（如长时间悬停扫描后内存超限）时，回收重建后重试一次
+                            if (getattr(esolar_scraper_instance, 'extracted_daily_generation', None) is None
+                                    and esolar_scraper_instance.watchdog.check('ESolar数据提取', force=True)):
+                                esolar_scraper_instance.perform_post_login_actions()
                             # 提取项目数据：使用已在ESolarScraper中记录的extracted_daily_generation
                             dg = getattr(esolar_scraper_instance, 'extracted_daily_generation', None)
                             esolar_data = {
@@ -830,12 +857,184 @@ class SolarDashboardUpdater:
                 logger.error(f"从ESolar系统获取数据时出错: {str(e)}")
         else:
             logger.warning('ESolar系统的用户名或密码为空，跳过ESolar系统处理')
+        return esolar_data
+
+    def run_portal_source(self, source):
+        """按名称运行单个数据源（huawei / sems / esolar），返回可序列化的结果"""
+        runners = {
+            'huawei': self.run_huawei_source,
+            'sems': self.run_sems_source,
+            'esolar': self.run_esolar_source
+        }
+        if source not in runners:
+            raise ValueError(f"未知的数据源: {source}")
+        return runners[source]()
+
+    def get_checkpoint_store(self):
+        """返回当前目标日期的检查点存储"""
+        return CheckpointStore(self.target_date, self.base_data_dir)
+
+    def run_source_stage(self, source, concurrent=False, source_deadlines=None, resume=False):
+        """运行单个系统的采集并写入检查点
+
+        concurrent=True 时在独立的工作进程中运行并受截止时间约束；
+        resume=True 时优先复用有效检查点。失败时返回None。
+        """
+        checkpoints = self.get_checkpoint_store()
+        if resume:
+            payload = checkpoints.load(source)
+            if payload is not None:
+                logger.info(f"复用检查点: {source}")
+                return payload
+        
+        if concurrent:
+            from portal_workers import run_sources_in_processes
+            # 未显式指定进程截止时间时，以该系统的剩余预算（加一分钟宽限）作为强制结束时间
+            source_deadlines = dict(source_deadlines or {})
+            remaining = self.get_source_deadline(source).remaining()
+            if not source_deadlines.get(source) and remaining is not None:
+                source_deadlines[source] = remaining + 60
+            outcome = run_sources_in_processes(self.get_init_kwargs(), [source], source_deadlines).get(source) or {}
+            if outcome.get('status') != 'ok':
+                logger.error(f"{source} 工作进程未返回结果: status={outcome.get('status')}, error={outcome.get('error')}")
+                return None
+            payload = outcome.get('payload')
+            merge_wait_report(outcome.get('readiness'))
+            merge_probe_report(outcome.get('lookups'))
+        else:
+            payload = self.run_portal_source(source)
+        checkpoints.save(source, payload)
+        return payload
+
+    def get_weather_with_checkpoint(self, resume=False):
+        """获取目标日期的天气数据并写入检查点；resume=True 时优先复用有效检查点"""
+        checkpoints = self.get_checkpoint_store()
+        if resume:
+            weather_data = checkpoints.load('weather')
+            if weather_data is not None:
+                logger.info('复用天气数据检查点')
+                return weather_data
+        weather_data = self.get_weather_data(self.target_date)
+        checkpoints.save('weather', weather_data)
+        return weather_data
+
+    def update_dashboard(self, concurrent=False, source_deadlines=None, resume=False, max_workers=4):
+        """更新太阳能发电仪表盘数据，整合SEMS、华为和ESolar系统的数据
+
+        整个流程按阶段依赖图调度：天气获取、OCR模型预热、华为截图裁剪与SEMS截图OCR
+        会与仍在运行的浏览器阶段并行；max_workers=1 时退化为按顺序执行。
+
+        :param concurrent: 是否在独立进程中并发运行三个系统的采集（否则浏览器阶段互斥执行）
+        :param source_deadlines: 并发模式下各系统的截止时间（秒），如 {'huawei': 900}
+        :param resume: 是否复用已有检查点，只重新执行缺失或无效的数据源
+        :param max_workers: 同时执行的阶段数
+        """
+        logger.info("开始更新太阳能发电仪表盘数据...")
+        from stage_scheduler import StageScheduler
+        
+        self.defer_postprocessing = True
+        self.source_deadlines = {}
+        reset_wait_stats()
+        reset_probe_stats()
+        # 串行模式下三个浏览器阶段共用同一资源，依次执行；并发模式下各自在独立进程中运行
+        browser_resource = None if concurrent else 'browser'
+        checkpoints = self.get_checkpoint_store()
+        
+        def portal_stage(source):
+            return lambda inputs: self.run_source_stage(source, concurrent, source_deadlines, resume)
+        
+        def crop_stage(inputs):
+            results = inputs.get('huawei') or {}
+            self.crop_huawei_screenshots(results)
+            return results
+        
+        def sems_ocr_stage(inputs):
+            sems_output = dict(inputs.get('sems') or {})
+            if sems_output and not sems_output.get('api_results') and sems_output.get('ocr_id5_generation') is None:
+                sems_output['ocr_id5_generation'] = self.ocr_sems_screenshot(sems_output.get('screenshot_path'))
+                # OCR结果补写进检查点，--resume时无需重跑SEMS浏览器
+                checkpoints.save('sems', sems_output)
+            return sems_output
+        
+        def merge_stage(inputs):
+            sems_output = inputs.get('sems_ocr') or {}
+            return self.merge_and_save(
+                inputs.get('huawei_crop') or {},
+                sems_output.get('sems_data') or {},
+                inputs.get('esolar') or {},
+                sems_output.get('ocr_id5_generation'),
+                update_navigation=False,
+                weather_data=inputs.get('weather'),
+                sems_results=sems_output.get('api_results')
+            )
+        
+        def navigation_stage(inputs):
+            if inputs.get('merge_save'):
+                return self.update_date_navigation_list()
+            return False
+        
+        scheduler = StageScheduler(max_workers=max_workers)
+        scheduler.add('weather', lambda inputs: self.get_weather_with_checkpoint(resume=resume))
+        scheduler.add('ocr_warmup', lambda inputs: self.get_easyocr_reader() is not None)
+        scheduler.add('huawei', portal_stage('huawei'), resource=browser_resource)
+        scheduler.add('sems', portal_stage('sems'), resource=browser_resource)
+        scheduler.add('esolar', portal_stage('esolar'), resource=browser_resource)
+        scheduler.add('huawei_crop', crop_stage, deps=['huawei'])
+        scheduler.add('sems_ocr', sems_ocr_stage, deps=['sems', 'ocr_warmup'])
+        scheduler.add('merge_save', merge_stage, deps=['huawei_crop', 'sems_ocr', 'esolar', 'weather'])
+        scheduler.add('navigation', navigation_stage, deps=['merge_save'])
+        
+        try:
+            outputs = scheduler.run()
+        finally:
+            self.defer_postprocessing = False
+            self.last_stage_timeline = scheduler.timeline()
+            # 阶段耗时与检查点放在一起，便于对比各次运行
+            checkpoints.save('stages', self.last_stage_timeline)
+            # 就绪等待相对原固定等待节省的时间（并发模式下包含各工作进程的统计）
+            self.last_readiness_report = log_wait_report(wait_report())
+            checkpoints.save('readiness', self.last_readiness_report)
+            # 隐式等待下未命中的查找浪费的时间
+            self.last_lookup_report = log_probe_report(probe_report())
+            checkpoints.save('lookups', self.last_lookup_report)
+        return bool(outputs.get('merge_save'))
+
+    def update_dashboard_with_queue(self, queue_dir=None, wait_timeout=None, poll_seconds=10):
+        """任务队列模式：把目标日期的采集任务写入队列，等待工作进程执行完毕后合并结果
+
+        :param queue_dir: 队列目录（默认 data/queue），多台机器可共享
+        :param wait_timeout: 最长等待时间（秒），默认使用剩余的运行预算，不限时则一直等待
+        """
+        from job_queue import JobQueue, plan_jobs, merge_results, DEFAULT_QUEUE_DIR
+        queue = JobQueue(queue_dir or DEFAULT_QUEUE_DIR)
+        for portal, account, station in plan_jobs(self):
+            queue.enqueue(portal, account, station, self.target_date)
+        logger.info(f"已将 {self.target_date} 的采集任务写入队列 {queue.db_path}，等待工作进程执行...")
+        
+        if wait_timeout is None:
+            wait_timeout = self.run_deadline.remaining()
+        queue.wait_for(self.target_date, timeout=wait_timeout, poll_seconds=poll_seconds)
+        logger.info(f"任务状态: {queue.counts(self.target_date)}")
         
+        huawei_results, sems_output, esolar_data = merge_results(queue, self.target_date)
+        return self.merge_and_save(
+            huawei_results,
+            sems_output.get('sems_data') or {},
+            esolar_data,
+            sems_output.get('ocr_id5_generation'),
+            sems_results=sems_output.get('api_results')
+        )
+
+    def merge_and_save(self, results, sems_data, esolar_data, ocr_id5_generation, update_navigation=True, weather_data=None, sems_results=None):
+        """合并各系统的采集结果，保存JSON并更新日期导航（补采时可关闭导航更新，最后统一执行）
+
+        sems_results 为SEMS接口的结果 {项目ID: {'daily_generation', 'power_curve', 'source'}}，优先于截图OCR。
+        """
         # 确保至少有一个数据源有数据
         has_valid_data = False
         if results:
             has_valid_data = True
-        elif sems_data:
+        elif sems_data or sems_results:
             has_valid_data = True
         elif esolar_data:
             has_valid_data = True
@@ -843,206 +1042,41 @@ class SolarDashboardUpdater:
         if has_valid_data:
             logger.info("至少从一个系统获取到数据，开始更新仪表盘...")
             
-            # 加载已有数据
-            existing_data = self.load_existing_data()
-            
-            # 项目容量映射（从solar_data.json获取的实际数据）
-            project_capacities = {
-                '1': {'dcCapacity': 5.9826, 'acCapacity': 4.77},    # 宋滩
-                '2': {'dcCapacity': 1.94346, 'acCapacity': 1.7},    # 杨柳雪李赞皇
-                '3': {'dcCapacity': 5.3749, 'acCapacity': 4.3},     # 滨北南邱家
-                '4': {'dcCapacity': 1.16938, 'acCapacity': 1},      # 水立方
-                5: {'dcCapacity': 0.10384, 'acCapacity': 0.1},         # 黄河植物园
-                6: {'dcCapacity': 1.58858, 'acCapacity': 1.58858}           # 零碳商业园
-            }
-            
-            # 更新项目数据
-            total_daily_generation = 0
-            updated_projects = []
-
-            # 不再预先保留项目5和项目6的现有数据，改为优先使用抓取到的ESolar数据更新；
-            # 若抓取失败，再通过下方占位条目保证页面展示。
-            # 这样可以避免总发电量重复累加或使用过期的手动值。
-            
-            # 若现有数据中未包含项目5/6，则添加占位条目以确保网站显示（dailyGeneration=0，不覆盖手动值）
-            for pid in [5, 6]:
-                if not any(p.get('id') == pid for p in updated_projects):
-                    project_name = self.project_names.get(pid, f'项目{pid}')
-                    capacities = project_capacities.get(pid, {'dcCapacity': 0, 'acCapacity': 0})
-                    placeholder = {
-                        "id": pid,
-                        "name": project_name,
-                        "dcCapacity": capacities['dcCapacity'],
-                        "acCapacity": capacities['acCapacity'],
-                        "dailyGeneration": 0,
-                        "efficiencyHours": 5.5,
-                        "avgEfficiencyHours": 5.83,
-                        "efficiencyColor": "bg-green-500",
-                        "power_curve": {"data_points": []}
-                    }
-                    updated_projects.append(placeholder)
-                    logger.info(f"未在现有数据中找到项目 {pid}，已添加占位条目以保证展示，dailyGeneration=0")
-            
-            # 先根据solar_data.json的ID顺序创建项目列表
-            # 注意：这里需要确保ID映射正确
-            # 同时支持字符串和整数类型的键，确保所有项目都能正确映射
-            id_mapping = {'1': 1, '2': 2, '3': 3, '4': 4, 1: 1, 2: 2, 3: 3, 4: 4, '5': 5, 5: 5, '6': 6, 6: 6}  # 同时支持字符串和整数类型的键，添加黄河植物园和零碳商业园ID映射
-            
-            # 处理华为系统的数据
-            if results:
-                # 添加类型检查，确保results是字典
-                if isinstance(results, dict):
-                    for project_id, project_data in results.items():
-                        logger.info(f"处理华为项目 {project_id}: daily_generation原始值 = {project_data.get('daily_generation')}")
-                        
-                        # 获取项目名称
-                        project_name = next((p['name'] for p in project_config['huawei']['projects'] if p['id'] == project_id), project_id)
-                        logger.info(f"项目 {project_id} 映射名称: {project_name}")
-                        
-                        # 获取容量数据
-                        capacities = project_capacities.get(project_id, {'dcCapacity': 0, 'acCapacity': 0})
-                        logger.info(f"项目 {project_id} 容量数据: {capacities}")
-                        
-                        # 获取对应的数字ID
-                        project_id_num = id_mapping.get(project_id, 0)
-                        logger.info(f"项目 {project_id} 映射数字ID: {project_id_num}")
-                        
-                        # 获取效率颜色（根据现有数据设置）
-                        efficiency_color = "bg-green-500"
-                        if project_id == '2':  # 李赞皇项目
-                            efficiency_color = "bg-yellow-400"
-                        
-                        # 确保dailyGeneration有数值，默认为0 - 关键修复：确保null值被转换为0
-                        daily_generation_value = project_data.get('daily_generation', 0)
-                        if daily_generation_value is None:
-                            daily_generation_value = 0
-                        logger.info(f"项目 {project_id} 处理后daily_generation: {daily_generation_value}, 类型: {type(daily_generation_value)}")
-                        
-                        project_info = {
-                            "id": project_id_num,
-                            "name": project_name,
-                            "dcCapacity": capacities['dcCapacity'],
-                            "acCapacity": capacities['acCapacity'],
-                            "dailyGeneration": daily_generation_value,
-                            "efficiencyHours": 5.5,  # 默认值，与现有数据保持一致
-                            "avgEfficiencyHours": 5.83,  # 默认值，与现有数据保持一致
-                            "efficiencyColor": efficiency_color,
-                            "power_curve": {
-                                "data_points": []  # 保持为空数组，不使用模拟数据
-                            }
-                        }
-                        logger.info(f"项目 {project_id} 构建的项目信息: {project_info}")
-                        
-                        updated_projects.append(project_info)
-                        logger.info(f"项目 {project_id} 已添加到更新列表")
-                        
-                        # 累加总本日发电量，使用处理后的值以确保0也能被正确累加
-                        total_daily_generation += daily_generation_value
-                        logger.info(f"累加后总发电量: {total_daily_generation}")
-
-                        # 注意：以下代码已被删除，因为它会导致项目被重复添加到列表中
-                        # 原代码会添加一个使用字符串ID且可能发电量为0的重复项目
-            
-            # 处理SEMS OCR识别的项目5数据（如有）
+            # 按电站ID合并各数据源：华为取自接口（失败的电站取自页面），ESolar取自页面，
+            # 项目5的SEMS发电量取自接口（接口不可用时取自截图OCR）
+            # 项目5/6始终保留（未取到数据时以0占位），汇总值在生成列表时一次计算
+            engine = MergeEngine(self.get_station_meta())
+            for pid, data in (results or {}).items():
+                if isinstance(data, dict):
+                    engine.add(pid, data.get('daily_generation'), data.get('source', 'dom'), origin='huawei')
+            for pid, data in (sems_results or {}).items():
+                if isinstance(data, dict):
+                    engine.add(pid, data.get('daily_generation'), data.get('source', 'api'), origin='sems')
             if ocr_id5_generation is not None:
-                try:
-                    project_id_num = 5
-                    existing_project = next((p for p in updated_projects if p['id'] == project_id_num), None)
-                    capacities = project_capacities.get(project_id_num, {'dcCapacity': 0, 'acCapacity': 0})
-                    project_name = self.project_names.get(project_id_num, f'项目{project_id_num}')
-                    if existing_project:
-                        prev_val = existing_project.get('dailyGeneration') or 0
-                        existing_project['dailyGeneration'] = ocr_id5_generation or 0
-                        if prev_val == 0:
-                            total_daily_generation += (ocr_id5_generation or 0)
-                        logger.info(f"使用OCR更新项目 {project_id_num} 的发电量: {ocr_id5_generation} kWh")
-                    else:
-                        project_info = {
-                            "id": project_id_num,
-                            "name": project_name,
-                            "dcCapacity": capacities['dcCapacity'],
-                            "acCapacity": capacities['acCapacity'],
-                            "dailyGeneration": ocr_id5_generation or 0,
-                            "efficiencyHours": 5.5,
-                            "avgEfficiencyHours": 5.83,
-                            "efficiencyColor": "bg-green-500",
-                            "power_curve": {"data_points": []}
-                        }
-                        updated_projects.append(project_info)
-                        total_daily_generation += (ocr_id5_generation or 0)
-                        logger.info(f"添加项目 {project_id_num}（OCR）到更新列表: {ocr_id5_generation} kWh")
-                except Exception as e:
-                    logger.warning(f"处理OCR识别的项目5数据时出错: {str(e)}")
-
-            # 处理ESolar系统的数据
-            if esolar_data:
-                # 添加类型检查，确保esolar_data是字典
-                if isinstance(esolar_data, dict):
-                    for project_id, project_data in esolar_data.items():
-                        # 获取对应的数字ID
-                        project_id_num = id_mapping.get(project_id, 0)
-                        
-                        # 统一处理所有项目（包括5和6），优先使用抓取到的ESolar数据
-                        
-                        # 获取项目名称
-                        project_name = self.project_names.get(project_id, f'项目{project_id}')
-                        
-                        # 获取容量数据
-                        capacities = project_capacities.get(project_id, {'dcCapacity': 0, 'acCapacity': 0})
-                        
-                        # 获取效率颜色（默认为绿色）
-                        efficiency_color = "bg-green-500"
-                        
-                        # 确保dailyGeneration有数值，默认为0
-                        daily_generation_value = project_data.get('dailyGeneration', 0)
-                        if daily_generation_value is None:
-                            daily_generation_value = 0
-                        
-                        # 检查是否已经存在相同ID的项目
-                        existing_project = next((p for p in updated_projects if p['id'] == project_id_num), None)
-                        
-                        if existing_project:
-                            # 如果已存在，占位条目的dailyGeneration通常为0，直接用抓取值覆盖并计入总量
-                            existing_project['dailyGeneration'] = daily_generation_value or 0
-                            total_daily_generation += (daily_generation_value or 0)
-                            logger.info(f"更新项目 {project_id_num} 的发电量: {daily_generation_value}")
-                        else:
-                            # 如果不存在则新增，并计入总量
-                            project_info = {
-                                "id": project_id_num,  # 使用数字ID，与华为系统保持一致
-                                "name": project_name,
-                                "dcCapacity": capacities['dcCapacity'],
-                                "acCapacity": capacities['acCapacity'],
-                                "dailyGeneration": daily_generation_value or 0,
-                                "efficiencyHours": 5.5,  # 默认值，与现有数据保持一致
-                                "avgEfficiencyHours": 5.83,  # 默认值，与现有数据保持一致
-                                "efficiencyColor": efficiency_color,
-                                "power_curve": {
-                                    "data_points": []  # 保持为空数组，不使用模拟数据
-                                }
-                            }
-                            updated_projects.append(project_info)
-                            total_daily_generation += (daily_generation_value or 0)
-                            logger.info(f"添加ESolar项目 {project_id_num} 到更新列表")
-                        
-                        # 累加总本日发电量，仅在添加新项目时累加
-                        if not existing_project:
-                            total_daily_generation += daily_generation_value
+                engine.add(5, ocr_id5_generation, 'ocr', origin='sems')
+            engine.add_source(esolar_data, 'dom', origin='esolar', field='dailyGeneration')
+            updated_projects, summary = engine.build(required_ids=(5, 6))
+            total_daily_generation = summary['total_daily_generation']
+            
+            # 接口返回的5分钟功率序列写入功率曲线（日内功率采样存在时以采样为准）
+            api_curves = {str(pid): data.get('power_curve') for pid, data in list((results or {}).items()) + list((sems_results or {}).items())
+                          if isinstance(data, dict) and data.get('power_curve')}
+            for project in updated_projects:
+                if str(project['id']) in api_curves:
+                    project['power_curve']['data_points'] = api_curves[str(project['id'])]
             
-            # 按ID排序，保持与solar_data.json相同的顺序
-            # 确保所有ID都是整数类型再排序
-            updated_projects.sort(key=lambda x: int(x['id']))
+            # 有日内功率采样时，用采样数据填充功率曲线
+            from power_sampler import apply_samples_to_projects
+            sampled = apply_samples_to_projects(updated_projects, self.target_date, self.base_data_dir)
+            if sampled:
+                logger.info(f"已用功率采样填充 {sampled} 个项目的 power_curve.data_points")
             
             # 创建符合网站要求的数据结构
             dashboard_data = {
                 "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
                 "data": updated_projects,
                 "total_projects": len(updated_projects),
-                "summary": {
-                    "total_dc_capacity": sum(p['dcCapacity'] for p in updated_projects),
-                    "total_ac_capacity": sum(p['acCapacity'] for p in updated_projects),
-                    "total_daily_generation": total_daily_generation
-                }
+                "summary": summary
             }
             
             # 打印详细的数据结构信息用于调试
@@ -1054,9 +1088,10 @@ class SolarDashboardUpdater:
             for project in dashboard_data['data']:
                 logger.info(f"  - ID: {project['id']}, 名称: {project['name']}, 日发电量: {project['dailyGeneration']}")
             
-            # 获取天气数据
-            logging.info(f"正在获取 {self.target_date} 的天气数据...")
-            weather_data = self.get_weather_data(self.target_date)
+            # 获取天气数据（调用方未提供时再请求）
+            if weather_data is None:
+                logging.info(f"正在获取 {self.target_date} 的天气数据...")
+                weather_data = self.get_weather_data(self.target_date)
             
             # 创建包含天气数据的完整数据结构
             complete_data = {
@@ -1075,7 +1110,8 @@ class SolarDashboardUpdater:
                 print(f"总本日发电量: {total_daily_generation} kWh")
                 
                 # 更新日期导航列表，只修改特定部分而不覆盖整个文件
-                self.update_date_navigation_list()
+                if update_navigation:
+                    self.update_date_navigation_list()
                 
                 return True
             else:
@@ -1108,10 +1144,11 @@ class SolarDashboardUpdater:
             
             # 保存数据到默认文件（solar_data.json）
             # 只提取generation_data部分，因为默认文件格式可能不同
-            default_data = data['generation_data']
-            with open(self.default_data_file_path, 'w', encoding='utf-8') as f:
-                json.dump(default_data, f, ensure_ascii=False, indent=2)
-            logger.info(f'数据已成功保存到默认文件: {self.default_data_file_path}')
+            if self.update_default_data_file:
+                default_data = data['generation_data']
+                with open(self.default_data_file_path, 'w', encoding='utf-8') as f:
+                    json.dump(default_data, f, ensure_ascii=False, indent=2)
+                logger.info(f'数据已成功保存到默认文件: {self.default_data_file_path}')
             
             return True
         except Exception as e:
@@ -1134,48 +1171,35 @@ class SolarDashboardUpdater:
             return {}
     
     def get_weather_data(self, date_str):
-        """获取指定日期的天气数据"""
+        """获取指定日期的天气数据；取不到真实数据时返回None（不写入默认天气，前端显示"暂无数据"）"""
+        date_str = format_date(date_str)
+        # 补采较早的日期时预报接口没有数据，改用历史归档接口
+        url = WEATHER_FORECAST_URL if days_before_today(date_str) <= WEATHER_FORECAST_PAST_DAYS else WEATHER_ARCHIVE_URL
+        params = dict(WEATHER_LOCATION, daily='temperature_2m_min,temperature_2m_max,weather_code',
+                      timezone='auto', start_date=date_str, end_date=date_str)
         try:
             # 使用Open-Meteo API获取真实天气数据
-            url = f"https://api.open-meteo.com/v1/forecast?latitude=37.4375&longitude=118&daily=temperature_2m_min,temperature_2m_max,weather_code&timezone=auto&past_days=1&forecast_days=1"
-            logging.info(f"正在从Open-Meteo API获取天气数据: {url}")
+            logging.info(f"正在从Open-Meteo API获取 {date_str} 的天气数据: {url}")
             
-            response = requests.get(url)
+            response = requests.get(url, params=params, timeout=15)
             response.raise_for_status()  # 如果响应状态码不是200，抛出异常
             
             data = response.json()
             logging.debug(f"API响应数据: {data}")
             
             # 检查响应数据结构是否完整
-            if not data or 'daily' not in data or len(data['daily']['time']) == 0:
-                logging.warning("API响应数据不完整，返回默认天气数据")
-                # 返回默认天气数据作为备用
-                return {
-                    'date': date_str,
-                    'temperature': 25.5,
-                    'humidity': 65,
-                    'weather_type': 'sunny',
-                    'weather_description': '晴朗'
-                }
-            
-            # 解析天气数据
-            daily_data = data['daily']
-            
-            # 找到与目标日期匹配的数据
-            target_index = -1
-            for i, time_str in enumerate(daily_data['time']):
-                if time_str == date_str:
-                    target_index = i
-                    break
-            
-            # 如果没有找到完全匹配的日期，使用第一个可用数据
-            if target_index == -1:
-                logging.warning(f"没有找到日期 {date_str} 的天气数据，使用第一个可用数据")
-                target_index = 0
+            daily_data = (data or {}).get('daily') or {}
+            if date_str not in (daily_data.get('time') or []):
+                logging.warning(f"API响应中没有日期 {date_str} 的天气数据")
+                return None
+            target_index = daily_data['time'].index(date_str)
             
             # 计算平均温度（最低温度和最高温度的平均值）
             temp_min = daily_data['temperature_2m_min'][target_index]
             temp_max = daily_data['temperature_2m_max'][target_index]
+            if temp_min is None or temp_max is None:
+                logging.warning(f"日期 {date_str} 的温度数据为空")
+                return None
             avg_temp = (temp_min + temp_max) / 2
             
             # 获取天气代码和描述
@@ -1196,7 +1220,7 @@ class SolarDashboardUpdater:
             
             # 构造返回的天气数据
             weather_data = {
-                'date': daily_data['time'][target_index],
+                'date': date_str,
                 'temperature': round(avg_temp, 1),
                 'humidity': 65,  # Open-Meteo API没有提供湿度数据，暂时使用默认值
                 'weather_type': weather_type,
@@ -1211,16 +1235,8 @@ class SolarDashboardUpdater:
         except Exception as e:
             logging.error(f"处理天气数据时出错: {str(e)}")
         
-        # 出错时返回默认天气数据
-        default_weather = {
-            'date': date_str,
-            'temperature': 25.5,
-            'humidity': 65,
-            'weather_type': 'sunny',
-            'weather_description': '晴朗'
-        }
-        logging.warning(f"返回默认天气数据: {default_weather}")
-        return default_weather
+        logging.warning(f"未取得 {date_str} 的天气数据，保存为空")
+        return None
             
     def update_date_navigation_list(self):
         """更新index.html文件中的日期导航列表，仅修改特定部分而不覆盖整个文件
@@ -1290,54 +1306,117 @@ class SolarDashboardUpdater:
             logger.error(f'更新index.html的日期导航列表时出错: {str(e)}')
             return False
 
-if __name__ == "__main__":
+def parse_args(argv=None):
+    """解析命令行参数"""
+    import argparse
+    parser = argparse.ArgumentParser(description='更新太阳能发电仪表盘数据')
+    parser.add_argument('--concurrent', action='store_true',
+                        default=os.environ.get('SOLAR_CONCURRENT', '').lower() in ('1', 'true', 'yes'),
+                        help='在独立进程中并发运行华为、SEMS、ESolar三个系统的采集')
+    parser.add_argument('--huawei-timeout', type=int, default=None, help='并发模式下华为采集的截止时间（秒）')
+    parser.add_argument('--sems-timeout', type=int, default=None, help='并发模式下SEMS采集的截止时间（秒）')
+    parser.add_argument('--esolar-timeout', type=int, default=None, help='并发模式下ESolar采集的截止时间（秒）')
+    parser.add_argument('--date', default=None, help='目标日期（YYYY-MM-DD），默认为昨天')
+    parser.add_argument('--start-date', default=None, help='补采模式：起始日期（YYYY-MM-DD）')
+    parser.add_argument('--end-date', default=None, help='补采模式：结束日期（YYYY-MM-DD），默认为昨天')
+    parser.add_argument('--missing-only', action='store_true', help='补采模式：只补采data/下缺失的日期')
+    parser.add_argument('--resume', action='store_true', help='复用data/checkpoints/下的有效检查点，只重新采集缺失或失败的系统')
+    parser.add_argument('--stage-workers', type=int, default=4, help='同时执行的阶段数，1表示完全按顺序执行')
+    parser.add_argument('--run-budget', type=float, default=None, help='整次运行的时间预算（秒），耗尽后各系统返回已获取的部分数据')
+    parser.add_argument('--queue', nargs='?', const='', default=None, metavar='队列目录',
+                        help='任务队列模式：写入采集任务并等待工作进程（job_queue.py worker）执行后合并，默认目录 data/queue')
+    parser.add_argument('--queue-wait', type=float, default=None, help='任务队列模式下最长等待时间（秒）')
+    parser.add_argument('--source-budget', action='append', default=[], metavar='系统=秒数',
+                        help='单个系统的时间预算，如 --source-budget huawei=600，可重复指定')
+    return parser.parse_args(argv)
+
+
+def create_updater_from_env(**kwargs):
+    """从环境变量读取各系统账号并创建更新器，同时确保基础目录存在"""
+    # 华为FusionSolar系统的用户名和密码
+    HUAWEI_USERNAME = os.environ.get('HUAWEI_USERNAME', "xinding")
+    HUAWEI_PASSWORD = os.environ.get('HUAWEI_PASSWORD', "0000000a")
+    
+    # SEMS系统的用户名和密码
+    SEMS_USERNAME = os.environ.get('SEMS_USERNAME', "15965432272")
+    SEMS_PASSWORD = os.environ.get('SEMS_PASSWORD', "xdny123456")
+    
+    # ESolar系统的用户名和密码
+    ESOLAR_USERNAME = os.environ.get('ESOLAR_USERNAME', "18663070009")
+    ESOLAR_PASSWORD = os.environ.get('ESOLAR_PASSWORD', "Aa18663070009")
+    
+    # 打印环境变量状态（不打印具体值）
+    logger.info(f"环境变量配置状态: HUAWEI_USERNAME={'已设置' if HUAWEI_USERNAME else '未设置'}")
+    logger.info(f"环境变量配置状态: SEMS_USERNAME={'已设置' if SEMS_USERNAME else '未设置'}")
+    logger.info(f"环境变量配置状态: ESOLAR_USERNAME={'已设置' if ESOLAR_USERNAME else '未设置'}")
+    
+    # 初始化太阳能仪表盘更新器
+    updater = SolarDashboardUpdater(
+        HUAWEI_USERNAME, 
+        HUAWEI_PASSWORD,
+        SEMS_USERNAME,
+        SEMS_PASSWORD,
+        ESOLAR_USERNAME,
+        ESOLAR_PASSWORD,
+        **kwargs
+    )
+    
+    # 注意：不需要在这里覆盖路径，因为构造函数中已经基于日期创建了正确的路径
+    # 这里只需要确保基础目录存在
+    os.makedirs(updater.base_data_dir, exist_ok=True)
+    os.makedirs(updater.base_screenshots_dir, exist_ok=True)
+    os.makedirs(updater.reports_dir, exist_ok=True)
+    
+    logger.info(f"更新文件路径: {updater.data_file_path}")
+    logger.info(f"截图目录路径: {updater.screenshots_dir}")
+    return updater
+
+
+def main(argv=None):
+    """命令行入口：从环境变量读取账号并更新仪表盘数据"""
+    from run_budget import parse_budget_specs
+    args = parse_args(argv)
     # 从环境变量或配置文件中读取用户名和密码
     try:
-        # 从环境变量中读取用户名和密码
-        import os
-        
-        # 华为FusionSolar系统的用户名和密码
-        HUAWEI_USERNAME = os.environ.get('HUAWEI_USERNAME', "xinding")
-        HUAWEI_PASSWORD = os.environ.get('HUAWEI_PASSWORD', "0000000a")
-        
-        # SEMS系统的用户名和密码
-        SEMS_USERNAME = os.environ.get('SEMS_USERNAME', "15965432272")
-        SEMS_PASSWORD = os.environ.get('SEMS_PASSWORD', "xdny123456")
-        
-        # ESolar系统的用户名和密码
-        ESOLAR_USERNAME = os.environ.get('ESOLAR_USERNAME', "18663070009")
-        ESOLAR_PASSWORD = os.environ.get('ESOLAR_PASSWORD', "Aa18663070009")
-        
-        # 打印环境变量状态（不打印具体值）
-        logger.info(f"环境变量配置状态: HUAWEI_USERNAME={'已设置' if HUAWEI_USERNAME else '未设置'}")
-        logger.info(f"环境变量配置状态: SEMS_USERNAME={'已设置' if SEMS_USERNAME else '未设置'}")
-        logger.info(f"环境变量配置状态: ESOLAR_USERNAME={'已设置' if ESOLAR_USERNAME else '未设置'}")
-        
-        # 初始化太阳能仪表盘更新器
-        updater = SolarDashboardUpdater(
-            HUAWEI_USERNAME, 
-            HUAWEI_PASSWORD,
-            SEMS_USERNAME,
-            SEMS_PASSWORD,
-            ESOLAR_USERNAME,
-            ESOLAR_PASSWORD
+        updater = create_updater_from_env(
+            target_date=args.date,
+            run_budget=args.run_budget,
+            source_budgets=parse_budget_specs(args.source_budget)
         )
         
-        # 注意：不需要在这里覆盖路径，因为构造函数中已经基于日期创建了正确的路径
-        # 这里只需要确保基础目录存在
-        os.makedirs(updater.base_data_dir, exist_ok=True)
-        os.makedirs(updater.base_screenshots_dir, exist_ok=True)
-        os.makedirs(updater.reports_dir, exist_ok=True)
+        # 补采模式：按日期范围补齐历史数据
+        if args.start_date:
+            from backfill import BackfillRunner, find_missing_dates
+            from date_utils import iter_dates
+            end_date = args.end_date or format_date(None)
+            if args.missing_only:
+                dates = find_missing_dates(args.start_date, end_date, updater.base_data_dir)
+            else:
+                dates = list(iter_dates(args.start_date, end_date))
+            BackfillRunner(updater, dates).run()
+            updater.update_date_navigation_list()
+            return
         
-        logger.info(f"更新文件路径: {updater.data_file_path}")
-        logger.info(f"截图目录路径: {updater.screenshots_dir}")
+        # 任务队列模式：本进程只负责入队与合并
+        if args.queue is not None:
+            updater.update_dashboard_with_queue(queue_dir=args.queue or None, wait_timeout=args.queue_wait)
+            return
         
+        source_deadlines = {
+            'huawei': args.huawei_timeout,
+            'sems': args.sems_timeout,
+            'esolar': args.esolar_timeout
+        }
         
         # 更新仪表盘数据
-        updater.update_dashboard()
+        updater.update_dashboard(concurrent=args.concurrent, source_deadlines=source_deadlines, resume=args.resume, max_workers=args.stage_workers)
     except Exception as e:
         logger.error(f"主程序执行出错: {str(e)}")
         print(f"主程序执行出错: {str(e)}")
         # 退出程序，返回错误代码
         import sys
         sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()